@@ -1,5 +1,7 @@
 #!/usr/bin/env python
-from abc import abc, abstractmethod
+# NOTE: Prototype implementations only. The benchmark harness for the current converters is in
+#       pdf_conversion/benchmark (run pdf_conversion/pdf_benchmark.py).
+from abc import ABC, abstractmethod
 import locale
 import os
 from time import perf_counter
@@ -9,7 +11,7 @@ import pdf2image
 import pdf2image.exceptions as pdf_exc
 
 
-class IPDFConversion(abc):
+class IPDFConversion(ABC):
     """
     This is a simple base class, designed with the purpose of being able to compare different pdf-to-<image>
     implementation - by creating a common process for invocation. This would not be needed in a production
@@ -102,7 +104,7 @@ class PDFtoTiff(IPDFConversion):
                     self.pdf_file_spec,
                     dpi=self.dpi,
                     fmt=self.fmt,
-                    thread_count=num_threads,
+                    thread_count=self.threads,
                     output_folder=self.output_folder,
                     paths_only=True,
                 )
@@ -209,58 +211,3 @@ class GhostscriptPDF2Tiff(IPDFConversion):
 
         return self
 
-
-if __name__ == '__main__':
-    " TESTING ROUTINE - executed as this script"
-
-    output_dir = "../../data/tiffs"  # Base Relative Directory for storing resulting images
-    big_pdf = True        # Which PDF should be tested (6 pages vs 25 pages)
-    num_threads = 4       # Number of threads to use in conversion process
-    iterations = 1        # Number of test iterations to build sample
-
-    stats = {}            # Store timing results (k: conversion_process, v: timings)
-
-    # Determine which PDF (absolute path) to use, based on big_pdf boolean
-    pdf_file = "./pdfs/ddmdp.pdf" if big_pdf else "./pdfs/lflm.pdf"
-    pdf_filespec = os.path.abspath(pdf_file)
-
-    # Mapping algorithm type to concrete class
-    sub_path_mapping = {
-        # "gs": GhostscriptPDF2Tiff,
-        "pdf2tiff": PDFtoTiff
-    }
-
-    # For each conversion algorithm, convert the PDF 'iteration' times and record the conversions times.
-    for sub_path, conversion_class in sub_path_mapping.items():
-
-        # Determine the output file spec
-        output_image_dir = os.path.abspath(os.path.sep.join([output_dir, sub_path]))
-        outfile = os.path.sep.join([output_image_dir, f"{pdf_file.split(os.path.sep)[-1].split('.')[0]}"])
-        print(f"\nINPUT FILE:  {pdf_file}\nOUTPUT DIR: {outfile}.*\nLarge PDF? {big_pdf}\nThreads: {num_threads}")
-
-        # Initialize the algorithm conversion time list.
-        stats[sub_path] = []
-
-        # Execute the conversion and record the time
-        pdf_converter = None
-        for _ in range(iterations):
-            pdf_converter = conversion_class(
-                pdf_filespec, output_file=outfile, threads=num_threads, output_folder=output_image_dir)
-            stats[sub_path].append(pdf_converter.convert_to_image().conversion_duration)
-            if hasattr(pdf_converter, 'image_names'):
-                print(f"Number of unique image files: {len(set(pdf_converter.image_names))}")
-                print(f"Unique Image files: {set(pdf_converter.image_names)}")
-
-    # Determine and print the stats (Min, Max, Avg, Multiplier change)
-    avgs = []
-    for key, data in stats.items():
-        avg = sum(data) / len(data)
-        print(f"{key}:\n"
-              f"\tIterations: {len(data)}\n"
-              f"\tAvg: {avg:0.4f} sec\n"
-              f"\tMin: {min(data):0.4f} sec\n"
-              f"\tMax: {max(data):0.4f} sec\n")
-        avgs.append(avg)
-    if len(stats.keys()) > 1:
-        print(f"There is a factor of {avgs[0]/avgs[1]:0.2f} difference based on the average.")
-
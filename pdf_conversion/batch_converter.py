@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+from pdf_conversion.config.cli import BatchCommandLine
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.batch import BatchConversion
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
+
+default_cfg = './defaults.cfg'
+
+# NOTE: The main guard is required; the batch worker pool may spawn processes that re-import this module.
+if __name__ == '__main__':
+    defaults = DefaultValues(filespec=default_cfg)
+    app_defaults = getattr(defaults, DefaultValues.APP_DEFAULTS)
+
+    cli = BatchCommandLine(app_defaults)
+    cli.print_args()
+
+    cache = None
+    cache_defaults = getattr(defaults, DefaultValues.CACHE_DEFAULTS, None) or {}
+    if cli.args.cache_dir is not None or cache_defaults.get('enabled', False):
+        cache = ConversionCache(cache_dir=cli.args.cache_dir, max_bytes=cli.args.cache_max_bytes,
+                                defaults=cache_defaults)
+
+    batch = BatchConversion(inputs=cli.args.inputs, manifest=cli.args.manifest, output_dir=cli.args.image_dir,
+                            image_format=cli.args.doc_format, defaults=defaults, cache=cache)
+
+    batch.convert(
+        workers=cli.args.workers, pool_type=cli.args.encode_pool, chunk_pages=cli.args.chunk_pages,
+        lossless=cli.args.lossless, dpi=cli.args.dpi, quality=cli.args.quality, renderer=cli.args.renderer,
+        color_mode=cli.args.color_mode, compression=cli.args.compression, profile=cli.args.profile,
+        method=cli.args.method, target_bytes=cli.args.target_bytes, max_memory=cli.args.max_memory,
+        sizes=cli.args.sizes, resume=cli.args.resume)
+
+    if cli.args.report is not None:
+        batch.write_report(cli.args.report)
+    if cli.args.metrics_json is not None:
+        ConversionMetrics.write_json(cli.args.metrics_json, batch.metrics())
+    if cli.args.metrics_prom is not None:
+        ConversionMetrics.write_prometheus(cli.args.metrics_prom, batch.metrics())
+
+    print(batch.batch_status())
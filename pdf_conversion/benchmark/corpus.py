@@ -0,0 +1,181 @@
+import io
+import os
+import random
+import typing
+
+from PIL import Image, ImageDraw, ImageFilter
+
+
+class SyntheticPdf:
+    """
+    Minimal, dependency-free PDF writer used to build a synthetic benchmark corpus offline.
+
+    Page kinds:
+        * text  - vector text only (standard Helvetica font; no embedded resources)
+        * scan  - a single full-page JPEG image (simulates a scanned page)
+        * mixed - vector text over a half-page image (simulates a typical form or report page)
+    """
+
+    TEXT = 'text'
+    SCAN = 'scan'
+    MIXED = 'mixed'
+    PAGE_KINDS = (TEXT, SCAN, MIXED)
+
+    # US Letter, in points
+    PAGE_WIDTH = 612
+    PAGE_HEIGHT = 792
+
+    SCAN_DPI = 150
+    WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+             'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua', 'loan',
+             'borrower', 'signature', 'date', 'amount', 'principal', 'interest', 'escrow', 'payment')
+
+    def __init__(self, seed: int = 0) -> None:
+        """
+        :param seed: Random seed (the generated documents are deterministic for a given seed)
+        """
+        self.random = random.Random(seed)
+        self.objects = []
+
+    def _add_object(self, body: bytes) -> int:
+        self.objects.append(body)
+        return len(self.objects)
+
+    def _stream(self, dictionary: str, data: bytes) -> bytes:
+        return f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode('latin-1') + data + b"\nendstream"
+
+    def _text_ops(self, top: int, bottom: int) -> bytes:
+        """
+        Build the content stream operators for lines of random text between top and bottom (in points).
+        """
+        ops = ["BT", "/F1 10 Tf", "12 TL", f"54 {top} Td"]
+        for _ in range(max(0, (top - bottom) // 12)):
+            line = ' '.join(self.random.choice(self.WORDS) for _ in range(self.random.randint(6, 14)))
+            ops.append(f"({line}) Tj T*")
+        ops.append("ET")
+        return '\n'.join(ops).encode('latin-1')
+
+    def _scan_image(self, width_pts: int, height_pts: int) -> typing.Tuple[bytes, int, int]:
+        """
+        Generate a noisy, slightly blurred 'scanned' page image (JPEG encoded).
+
+        :return: Tuple of (JPEG data, width in pixels, height in pixels)
+        """
+        width = width_pts * self.SCAN_DPI // 72
+        height = height_pts * self.SCAN_DPI // 72
+        image = Image.effect_noise((width, height), 24).point(lambda value: 200 + value // 8).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        for y in range(40, height - 40, 28):
+            x = 40
+            while x < width - 80:
+                word = self.random.randint(20, 90)
+                draw.rectangle((x, y, min(x + word, width - 40), y + 10), fill=(40, 40, 50))
+                x += word + 12
+        image = image.filter(ImageFilter.GaussianBlur(0.8))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=75)
+        return buffer.getvalue(), width, height
+
+    def _add_page(self, kind: str, pages_id: int) -> int:
+        """
+        Add a page (and its content/resources) of the specified kind.
+
+        :return: Object number of the page
+        """
+        resources = "/Font << /F1 1 0 R >>"
+        if kind == self.TEXT:
+            content = self._text_ops(self.PAGE_HEIGHT - 72, 72)
+
+        else:
+            image_height = self.PAGE_HEIGHT if kind == self.SCAN else self.PAGE_HEIGHT // 2
+            data, width, height = self._scan_image(self.PAGE_WIDTH, image_height)
+            image_id = self._add_object(self._stream(
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+                f"/BitsPerComponent 8 /Filter /DCTDecode", data))
+            resources += f" /XObject << /Im1 {image_id} 0 R >>"
+            content = f"q {self.PAGE_WIDTH} 0 0 {image_height} 0 0 cm /Im1 Do Q\n".encode('latin-1')
+            if kind == self.MIXED:
+                content += self._text_ops(self.PAGE_HEIGHT - 72, image_height + 24)
+
+        content_id = self._add_object(self._stream("", content))
+        return self._add_object(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {self.PAGE_WIDTH} {self.PAGE_HEIGHT}] "
+            f"/Resources << {resources} >> /Contents {content_id} 0 R >>".encode('latin-1'))
+
+    def write(self, file_spec: str, kinds: typing.List[str]) -> str:
+        """
+        Write a PDF with one page per entry in kinds.
+
+        :param file_spec: Output file spec
+        :param kinds: List of page kinds (see PAGE_KINDS)
+
+        :return: file_spec
+        """
+        self.objects = []
+        self._add_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        pages_id = self._add_object(b"")       # Placeholder; written once the page ids are known.
+        catalog_id = self._add_object(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode('latin-1'))
+
+        page_ids = [self._add_page(kind, pages_id) for kind in kinds]
+        self.objects[pages_id - 1] = (
+            f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] "
+            f"/Count {len(page_ids)} >>").encode('latin-1')
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n"
+
+        xref_offset = len(output)
+        output += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+        output += b''.join(f"{offset:010d} 00000 n \n".encode('latin-1') for offset in offsets)
+        output += (f"trailer\n<< /Size {len(self.objects) + 1} /Root {catalog_id} 0 R >>\n"
+                   f"startxref\n{xref_offset}\n%%EOF\n").encode('latin-1')
+
+        with open(file_spec, "wb") as PDF:
+            PDF.write(bytes(output))
+        return file_spec
+
+
+class SyntheticCorpus:
+    """
+    Builds the benchmark corpus: documents of varied page counts, for each document class (text-only, scanned,
+    mixed), plus documents that interleave all page kinds.
+    """
+
+    DEFAULT_PAGE_COUNTS = (1, 4, 16)
+    DOCUMENT_CLASSES = SyntheticPdf.PAGE_KINDS + ('interleaved', )
+
+    def __init__(self, corpus_dir: str, page_counts: typing.Optional[typing.Iterable[int]] = None,
+                 seed: int = 0) -> None:
+        """
+        :param corpus_dir: Directory to write the corpus into
+        :param page_counts: Page counts to generate for each document class
+        :param seed: Random seed (the corpus is deterministic for a given seed)
+        """
+        self.corpus_dir = os.path.abspath(corpus_dir)
+        self.page_counts = tuple(page_counts or self.DEFAULT_PAGE_COUNTS)
+        self.seed = seed
+
+    def build(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Generate the corpus (existing documents are regenerated).
+
+        :return: List of document descriptions: {'filespec', 'class', 'pages', 'bytes'}
+        """
+        os.makedirs(self.corpus_dir, exist_ok=True)
+        documents = []
+        for doc_class in self.DOCUMENT_CLASSES:
+            for num_pages in self.page_counts:
+                if doc_class == 'interleaved':
+                    kinds = [SyntheticPdf.PAGE_KINDS[page % len(SyntheticPdf.PAGE_KINDS)] for page in range(num_pages)]
+                else:
+                    kinds = [doc_class] * num_pages
+
+                file_spec = os.path.join(self.corpus_dir, f"{doc_class}_{num_pages:03d}.pdf")
+                SyntheticPdf(seed=self.seed + num_pages).write(file_spec, kinds)
+                documents.append({'filespec': file_spec, 'class': doc_class, 'pages': num_pages,
+                                  'bytes': os.path.getsize(file_spec)})
+        return documents
@@ -0,0 +1,322 @@
+import itertools
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from time import perf_counter
+import typing
+
+from pdf_conversion.benchmark.corpus import SyntheticCorpus
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.memory_budget import PeakMemoryMonitor
+from pdf_conversion.converters.pdf2raster import PdfToRaster
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.renderers import RENDERERS, RendererSelector
+from pdf_conversion.converters.tiff2webp import TiffToWebp
+from pdf_conversion.converters.tiff_compression import TiffCompression
+
+
+class StageResult:
+    """
+    Accumulates the measurements for one stage (for one combination of parameters).
+    """
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.pages = 0
+        self.seconds = 0
+        self.page_seconds = []
+        self.bytes_written = 0
+        self.peak_rss = 0
+
+    @staticmethod
+    def percentile(values: typing.List[float], percent: float) -> float:
+        """
+        Nearest-rank percentile.
+        """
+        if not values:
+            return 0
+        ordered = sorted(values)
+        rank = max(1, int(round(percent / 100.0 * len(ordered) + 0.5)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'stage': self.stage,
+            'pages': self.pages,
+            'seconds': round(self.seconds, 6),
+            'pages_per_sec': round(self.pages / self.seconds, 4) if self.seconds else 0,
+            'p50_page_seconds': round(self.percentile(self.page_seconds, 50), 6),
+            'p95_page_seconds': round(self.percentile(self.page_seconds, 95), 6),
+            'peak_rss_bytes': self.peak_rss,
+            'bytes_written': self.bytes_written,
+        }
+
+
+class BenchmarkSuite:
+    """
+    Benchmarks the conversion stages over a synthetic corpus, sweeping the conversion parameters. Results are
+    reported per stage, per parameter combination and per document class (text, scan, mixed, interleaved).
+
+    Stages:
+        * render_tiff  - PdfToTiff: whole document to TIFF files (per-page time = document time / pages)
+        * render_page  - PdfToRaster: one page at a time into memory (true per-page render latency)
+        * encode_webp  - TiffToWebp: TIFF file to webp, per page
+        * direct_webp  - TiffToWebp: in-memory raster to webp, per page
+        * write_tiff   - TiffCompression: in-memory raster to a compressed TIFF file, per page (write time and bytes
+                         written of the compression)
+    """
+
+    STAGES = ('render_tiff', 'render_page', 'encode_webp', 'direct_webp', 'write_tiff')
+
+    DEFAULT_SWEEP = {
+        'dpi': [100, 200],
+        'threads': [1, 4],
+        'lossless': [False, True],
+        'quality': [80],
+    }
+
+    # Relative change (fraction) beyond which a metric is flagged as a regression.
+    DEFAULT_THRESHOLD = 0.10
+
+    # Metric: True if higher values are better.
+    COMPARED_METRICS = {
+        'pages_per_sec': True,
+        'p95_page_seconds': False,
+        'peak_rss_bytes': False,
+        'bytes_written': False,
+    }
+
+    def __init__(self, corpus_dir: typing.Optional[str] = None, page_counts: typing.Optional[typing.List[int]] = None,
+                 sweep: typing.Optional[typing.Dict[str, list]] = None, iterations: int = 1,
+                 stages: typing.Optional[typing.List[str]] = None) -> None:
+        """
+        :param corpus_dir: Directory for the synthetic corpus (default: temporary directory)
+        :param page_counts: Page counts to generate per document class (see SyntheticCorpus)
+        :param sweep: Parameter values to sweep: {'dpi': [...], 'threads': [...], 'lossless': [...], 'quality': [...]}
+              'renderer': [...] can be added to compare the rendering backends (the measured throughput is recorded
+              for the 'auto' renderer selection), 'color_mode': [...] to compare the color modes, and
+              'compression': [...] to compare the TIFF compressions. 'profile': [...] compares the webp encoder
+              profiles (the profiles set quality and lossless, so those are only swept if given explicitly), and
+              'target_bytes': [...] the target page sizes.
+        :param iterations: Number of times each measurement is repeated
+        :param stages: Stages to run (default: all)
+        """
+        self.corpus_dir = corpus_dir
+        self.page_counts = page_counts
+        self.sweep = dict(self.DEFAULT_SWEEP)
+        if (sweep or {}).get('profile'):
+            self.sweep.pop('quality')
+            self.sweep.pop('lossless')
+        self.sweep.update(sweep or {})
+        self.iterations = max(1, iterations)
+        self.stages = [stage for stage in (stages or self.STAGES) if stage in self.STAGES]
+
+    def combinations(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        :return: List of parameter dictionaries (cartesian product of the sweep)
+        """
+        keys = sorted(self.sweep)
+        return [dict(zip(keys, values)) for values in itertools.product(*(self.sweep[key] for key in keys))]
+
+    def run(self) -> typing.Dict[str, typing.Any]:
+        """
+        Build the corpus and run every stage for every parameter combination.
+
+        :return: Results (JSON serializable)
+        """
+        corpus_dir = self.corpus_dir or tempfile.mkdtemp(prefix='pdf_corpus_')
+        documents = SyntheticCorpus(corpus_dir, page_counts=self.page_counts).build()
+        output_dir = tempfile.mkdtemp(prefix='pdf_benchmark_')
+
+        results = []
+        try:
+            for params in self.combinations():
+                print(f"{self.__class__.__name__}: {params}")
+                class_results = {doc_class: {stage: StageResult(stage) for stage in self.stages}
+                                 for doc_class in dict.fromkeys(document['class'] for document in documents)}
+                for _ in range(self.iterations):
+                    for document in documents:
+                        self._run_document(document['filespec'], document['pages'], params,
+                                           class_results[document['class']], output_dir)
+                results.extend(dict(params=params, doc_class=doc_class, **stage.to_dict())
+                               for doc_class, stage_results in class_results.items()
+                               for stage in stage_results.values())
+                if params.get('renderer') in RENDERERS:
+                    self._record_throughput(params['renderer'], class_results)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if self.corpus_dir is None:
+                shutil.rmtree(corpus_dir, ignore_errors=True)
+
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'iterations': self.iterations,
+            },
+            'corpus': [{key: value for key, value in document.items() if key != 'filespec'}
+                       for document in documents],
+            'results': results,
+        }
+
+    def _run_document(self, file_spec: str, num_pages: int, params: typing.Dict[str, typing.Any],
+                      stage_results: typing.Dict[str, StageResult], output_dir: str) -> typing.NoReturn:
+        """
+        Run the stages for one document (outputs are removed once measured).
+        """
+        work_dir = tempfile.mkdtemp(dir=output_dir)
+        try:
+            tiffs = []
+            if 'render_tiff' in stage_results or 'encode_webp' in stage_results:
+                result = stage_results.get('render_tiff', StageResult('render_tiff'))
+                with PeakMemoryMonitor() as monitor:
+                    start = perf_counter()
+                    tiffs = PdfToTiff(src_file_spec=file_spec, output_folder=work_dir, dpi=params['dpi'],
+                                      threads=params['threads'], renderer=params.get('renderer'),
+                                      color_mode=params.get('color_mode'),
+                                      compression=params.get('compression')).convert().images
+                    elapsed = perf_counter() - start
+                result.seconds += elapsed
+                result.pages += len(tiffs)
+                result.page_seconds.extend([elapsed / len(tiffs)] * len(tiffs) if tiffs else [])
+                result.bytes_written += sum(os.path.getsize(tiff) for tiff in tiffs)
+                result.peak_rss = max(result.peak_rss, monitor.peak_rss)
+
+            if 'encode_webp' in stage_results:
+                self._encode(stage_results['encode_webp'], params, work_dir,
+                             [dict(src_file_spec=tiff) for tiff in tiffs])
+
+            if any(stage in stage_results for stage in ('render_page', 'direct_webp', 'write_tiff')):
+                result = stage_results.get('render_page', StageResult('render_page'))
+                rasters = []
+                with PeakMemoryMonitor() as monitor:
+                    for page_num in range(1, num_pages + 1):
+                        start = perf_counter()
+                        images = PdfToRaster(src_file_spec=file_spec, dpi=params['dpi'], threads=1,
+                                             first_page=page_num, last_page=page_num,
+                                             renderer=params.get('renderer'),
+                                             color_mode=params.get('color_mode')).convert().images
+                        elapsed = perf_counter() - start
+                        result.seconds += elapsed
+                        result.page_seconds.append(elapsed)
+                        rasters.extend(images)
+                result.pages += len(rasters)
+                result.peak_rss = max(result.peak_rss, monitor.peak_rss)
+
+                if 'direct_webp' in stage_results:
+                    self._encode(stage_results['direct_webp'], params, work_dir,
+                                 [dict(src_file_spec=file_spec, src_image=raster, output_file=f"direct-{index:04d}")
+                                  for index, raster in enumerate(rasters, start=1)])
+                if 'write_tiff' in stage_results:
+                    self._write_tiffs(stage_results['write_tiff'], params, work_dir, rasters)
+                for raster in rasters:
+                    raster.close()
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _record_throughput(renderer: str, class_results: typing.Dict[str, typing.Dict[str, StageResult]]) -> None:
+        """
+        Record the measured render throughput per document class, for the 'auto' renderer selection.
+        Interleaved documents classify as 'mixed' (see RendererSelector.classify()).
+        """
+        selector = RendererSelector()
+        for doc_class, stage_results in class_results.items():
+            for stage in ('render_tiff', 'render_page'):
+                if stage in stage_results:
+                    selector.record(renderer, 'mixed' if doc_class == 'interleaved' else doc_class,
+                                    stage_results[stage].pages, stage_results[stage].seconds)
+
+    @staticmethod
+    def _encode(result: StageResult, params: typing.Dict[str, typing.Any], work_dir: str,
+                jobs: typing.List[typing.Dict[str, typing.Any]]) -> typing.NoReturn:
+        """
+        Encode each page to webp, recording the per-page timings and the bytes written.
+        """
+        with PeakMemoryMonitor() as monitor:
+            for job in jobs:
+                start = perf_counter()
+                images = TiffToWebp(output_folder=work_dir, lossless=params.get('lossless'),
+                                    quality=params.get('quality', -1), color_mode=params.get('color_mode'),
+                                    profile=params.get('profile'), target_bytes=params.get('target_bytes'),
+                                    **job).convert().images
+                elapsed = perf_counter() - start
+                result.seconds += elapsed
+                result.page_seconds.append(elapsed)
+                result.pages += 1
+                result.bytes_written += sum(os.path.getsize(image) for image in images)
+        result.peak_rss = max(result.peak_rss, monitor.peak_rss)
+
+    @staticmethod
+    def _write_tiffs(result: StageResult, params: typing.Dict[str, typing.Any], work_dir: str,
+                     rasters: typing.List[typing.Any]) -> typing.NoReturn:
+        """
+        Write each raster as a TIFF file with the compression, recording the per-page timings and the bytes written.
+        """
+        compression = TiffCompression.resolve(params.get('compression'))
+        with PeakMemoryMonitor() as monitor:
+            for index, raster in enumerate(rasters, start=1):
+                file_spec = os.path.join(work_dir, f"write-{index:04d}.tif")
+                start = perf_counter()
+                TiffCompression.save(raster, file_spec,
+                                     TiffCompression.for_color_mode(compression, ColorMode.of_image(raster)))
+                elapsed = perf_counter() - start
+                result.seconds += elapsed
+                result.page_seconds.append(elapsed)
+                result.pages += 1
+                result.bytes_written += os.path.getsize(file_spec)
+        result.peak_rss = max(result.peak_rss, monitor.peak_rss)
+
+    @staticmethod
+    def write(results: typing.Dict[str, typing.Any], file_spec: str) -> typing.NoReturn:
+        """
+        Write the results as JSON.
+        """
+        with open(file_spec, "w") as RESULTS:
+            json.dump(results, RESULTS, indent=2)
+
+    @staticmethod
+    def read(file_spec: str) -> typing.Dict[str, typing.Any]:
+        """
+        Read results (or a baseline) from JSON.
+        """
+        with open(file_spec, "r") as RESULTS:
+            return json.load(RESULTS)
+
+    @classmethod
+    def compare(cls, baseline: typing.Dict[str, typing.Any], current: typing.Dict[str, typing.Any],
+                threshold: float = DEFAULT_THRESHOLD) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Compare results against a baseline. Measurements are matched on stage + document class + parameters.
+
+        :param baseline: Baseline results (see run())
+        :param current: Current results (see run())
+        :param threshold: Relative change (fraction) beyond which a metric is flagged
+
+        :return: List of regressions: {'stage', 'doc_class', 'params', 'metric', 'baseline', 'current', 'change'}
+        """
+        def key(entry):
+            return entry['stage'], entry.get('doc_class'), json.dumps(entry['params'], sort_keys=True)
+
+        baseline_results = {key(entry): entry for entry in baseline.get('results', [])}
+        regressions = []
+        for entry in current.get('results', []):
+            reference = baseline_results.get(key(entry))
+            if reference is None:
+                continue
+            for metric, higher_is_better in cls.COMPARED_METRICS.items():
+                old, new = reference.get(metric, 0), entry.get(metric, 0)
+                if not old:
+                    continue
+                change = (new - old) / old
+                if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+                    regressions.append({'stage': entry['stage'], 'doc_class': entry.get('doc_class'),
+                                        'params': entry['params'], 'metric': metric,
+                                        'baseline': old, 'current': new, 'change': round(change, 4)})
+        return regressions
@@ -2,6 +2,13 @@ import argparse
 import os
 import typing
 
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.concurrency import ConcurrencySizer
+from pdf_conversion.converters.conversion_planner import ConversionPlanner
+from pdf_conversion.converters.memory_budget import MemoryBudget
+from pdf_conversion.converters.renderers import RENDERERS, RendererSelector
+from pdf_conversion.converters.tiff_compression import TiffCompression
+from pdf_conversion.converters.webp_profiles import WebpProfile
 from pdf_conversion.documents.file_extensions import SupportedDocTypes
 
 
@@ -12,10 +19,12 @@ class CommandLine:
     DEFAULT_QUALITY = 90
     DEFAULT_FORMAT = SupportedDocTypes.WEBP
     DEFAULT_LOSSLESS = True
-    DEFAULT_THREADS = 4
+    DEFAULT_ENCODERS = 0
+    DEFAULT_ENCODE_POOL = 'process'
+    DEFAULT_CHUNK_PAGES = 4
 
-    CONV_TYPES = dict([(doc_type.value, doc_type.name) for doc_type in SupportedDocTypes if
-                       not doc_type.name.lower().startswith("not")])
+    # The formats a PDF can be converted to (see ConversionPlanner: any format a registered converter produces).
+    CONV_TYPES = dict([(doc_type.value, doc_type.name) for doc_type in ConversionPlanner().targets()])
 
     def __init__(self, defaults_dict: typing.Optional[dict] = None) -> None:
         """
@@ -43,9 +52,52 @@ class CommandLine:
                                  default=-1,
                                  type=int)
         self.parser.add_argument("-t", "--threads",
-                                 help=f"Set number of processing threads (tiff). Default: {self.DEFAULT_THREADS}",
+                                 help=f"Set number of processing threads (tiff), or '{ConcurrencySizer.AUTO}' (sized "
+                                      f"from the page count, CPUs and free memory). Default: the 'threads' setting "
+                                      f"of the tif defaults ({ConcurrencySizer.AUTO})",
                                  default=-1,
-                                 type=int)
+                                 type=self._int_or_auto)
+        self.parser.add_argument("-R", "--renderer",
+                                 help=f"Rendering backend: {', '.join(RENDERERS)}, {RendererSelector.AUTO} "
+                                      f"(fastest installed backend for the document class). "
+                                      f"Default: pdftocairo for tiff, pdftoppm for webp",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--color_mode",
+                                 help=f"Color mode of the rendered and encoded pages: {', '.join(ColorMode.MODES)}, "
+                                      f"{ColorMode.AUTO} (smallest mode that keeps each page's content). "
+                                      f"Default: {ColorMode.DEFAULT_COLOR_MODE}",
+                                 default=None,
+                                 choices=(*ColorMode.MODES, ColorMode.AUTO),
+                                 type=str.lower)
+        self.parser.add_argument("--compression",
+                                 help=f"TIFF compression: {', '.join(TiffCompression.MODES)} ({TiffCompression.G4} "
+                                      f"applies to mono pages, others are compressed with "
+                                      f"{TiffCompression.G4_FALLBACK}). Default: {TiffCompression.DEFAULT_COMPRESSION}",
+                                 default=None,
+                                 choices=TiffCompression.MODES,
+                                 type=str.lower)
+        self.parser.add_argument("--multipage",
+                                 help="Write one multi-page TIFF per document, instead of one TIFF file per page.",
+                                 action='store_true',
+                                 default=None)
+        self.parser.add_argument("--sizes",
+                                 help="Output sizes of each page, as 'name:dpi' or 'name:<pixels>px' (longest side), "
+                                      "e.g. - 'thumb:256px,preview:100,full:300'. Each page is rendered once, at the "
+                                      "highest DPI, and the smaller sizes are derived from it. Default: none",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("-e", "--encoders",
+                                 help=f"Set number of parallel encoding workers (webp), 0 = one per CPU, "
+                                      f"'{ConcurrencySizer.AUTO}' = sized from the page count, CPUs and free memory. "
+                                      f"Default: {self.DEFAULT_ENCODERS}",
+                                 default=-1,
+                                 type=self._int_or_auto)
+        self.parser.add_argument("--encode_pool",
+                                 help=f"Type of encoding worker pool (webp): process, thread. "
+                                      f"Default: {self.DEFAULT_ENCODE_POOL}",
+                                 default=None,
+                                 type=str)
         self.parser.add_argument('-l', '--not_lossless',
                                  help=f"Do not create a lossless representation, if applicable.",
                                  action='store_true',
@@ -55,15 +107,122 @@ class CommandLine:
                                       f"(Default: {self.DEFAULT_QUALITY})",
                                  default=-1,
                                  type=int)
+        self.parser.add_argument("-P", "--profile",
+                                 help=f"webp encoder profile: {', '.join(WebpProfile.PROFILES)} (sets the method, "
+                                      f"quality and lossless). Default: none",
+                                 default=None,
+                                 choices=tuple(WebpProfile.PROFILES),
+                                 type=str.lower)
+        self.parser.add_argument("--method",
+                                 help=f"webp encoder effort: {WebpProfile.MIN_METHOD} (fastest) to "
+                                      f"{WebpProfile.MAX_METHOD} (smallest output). "
+                                      f"Default: {WebpProfile.DEFAULT_METHOD}, or the profile's method",
+                                 default=-1,
+                                 type=int,
+                                 choices=range(WebpProfile.MIN_METHOD, WebpProfile.MAX_METHOD + 1))
+        self.parser.add_argument("--target_bytes",
+                                 help="Target webp size per page, e.g. 150K: each page is encoded (lossy) with the "
+                                      "highest quality that fits. Default: disabled",
+                                 default=None,
+                                 type=self._byte_size)
+        self.parser.add_argument("-x", "--via_tiff",
+                                 help=f"Write intermediate TIFF files when converting to webp, instead of encoding "
+                                      f"the rendered pages directly from memory.",
+                                 action='store_true',
+                                 default=False)
+        self.parser.add_argument("-s", "--stream",
+                                 help=f"Stream the webp conversion: render in page chunks, and encode the pages while "
+                                      f"the remaining chunks are rendered.",
+                                 action='store_true',
+                                 default=False)
+        self.parser.add_argument("-c", "--chunk_pages",
+                                 help=f"Number of pages rendered per chunk when streaming. "
+                                      f"Default: {self.DEFAULT_CHUNK_PAGES}",
+                                 default=-1,
+                                 type=int)
+        self.parser.add_argument("--max_memory",
+                                 help="Memory budget for rendered pages, e.g. 2G or 512M. Pages are rendered in "
+                                      "chunks that fit the budget. Default: no budget",
+                                 default=None,
+                                 type=self._byte_size)
         self.parser.add_argument("-i", "--image_dir",
                                  help=f"Set the image storage directory. (Default: {self.DEFAULT_IMAGE_DIR})",
                                  default=self.DEFAULT_IMAGE_DIR,
                                  type=str)
 
+        self.parser.add_argument("-n", "--incremental",
+                                 help="Only convert the pages that changed since the previous conversion "
+                                      "(requires pypdf).",
+                                 action='store_true',
+                                 default=False)
+        self.parser.add_argument("--resume",
+                                 help="Resume an interrupted conversion: only convert the pages missing from the "
+                                      "checkpoint manifest (or whose files are missing or corrupt).",
+                                 action='store_true',
+                                 default=False)
+        self.parser.add_argument("--cache_dir",
+                                 help="Enable the conversion cache, stored in the specified directory.",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--cache_max_bytes",
+                                 help="Byte budget for the conversion cache (least recently used entries are evicted).",
+                                 default=-1,
+                                 type=int)
+        self.parser.add_argument("--metrics_json",
+                                 help="Write the per-stage, per-page conversion metrics (JSON) to the specified file.",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--metrics_prom",
+                                 help="Write the conversion metrics as a Prometheus textfile (e.g. - into the "
+                                      "node_exporter textfile collector directory, as <name>.prom).",
+                                 default=None,
+                                 type=str)
+
+        # Allow subclasses to add their own options before parsing.
+        self._add_arguments()
+
         self.args = self.parser.parse_args()
         self.args.lossless = not self.args.not_lossless
+        self.args.direct = False if self.args.via_tiff else None
         self.args.doc_format = self._validate_doc_format_type()
 
+    @staticmethod
+    def _int_or_auto(value: str) -> typing.Union[int, str]:
+        """
+        argparse type for counts that can also be sized automatically.
+
+        :param value: CLI value
+        :return: int, or ConcurrencySizer.AUTO
+        """
+        if value.lower() == ConcurrencySizer.AUTO:
+            return ConcurrencySizer.AUTO
+        try:
+            return int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid value: '{value}' (expected an integer or "
+                                             f"'{ConcurrencySizer.AUTO}')")
+
+    @staticmethod
+    def _byte_size(value: str) -> int:
+        """
+        argparse type for byte counts with an optional unit (e.g. - 2G, 512M).
+
+        :param value: CLI value
+        :return: Number of bytes
+        """
+        try:
+            return MemoryBudget.parse_bytes(value)
+        except ValueError as exc:
+            raise argparse.ArgumentTypeError(str(exc))
+
+    def _add_arguments(self) -> typing.NoReturn:
+        """
+        Add any additional CLI arguments (no additional arguments at this level; override in subclasses).
+
+        :return: None
+        """
+        pass
+
     def _validate_doc_format_type(self) -> SupportedDocTypes:
         """
         Verify specified conversion format matches supported types.
@@ -90,8 +249,20 @@ class CommandLine:
         border = '-' * 80
         print(border)
         print(f"FORMAT: {self.args.doc_format.value}")
-        print(f"TIFF --> DPI: {self.args.dpi}  Threads: {self.args.threads}")
-        print(f"WEBP --> Quality: {self.args.quality}  Lossless? {str(not self.args.not_lossless)}")
+        print(f"TIFF --> DPI: {self.args.dpi}  Threads: {self.args.threads}  Renderer: {self.args.renderer}  "
+              f"Color Mode: {self.args.color_mode}  Compression: {self.args.compression}  "
+              f"Multipage? {self.args.multipage}")
+        print(f"SIZES --> {self.args.sizes}")
+        print(f"WEBP --> Quality: {self.args.quality}  Lossless? {str(not self.args.not_lossless)}  "
+              f"Via TIFF? {str(self.args.via_tiff)}")
+        print(f"WEBP --> Profile: {self.args.profile}  Method: {self.args.method}  "
+              f"Target Bytes: {self.args.target_bytes}")
+        print(f"WEBP --> Encoders: {self.args.encoders}  Encode Pool: {self.args.encode_pool}")
+        print(f"MEMORY --> Max Memory: {self.args.max_memory}")
+        print(f"STREAM? {str(self.args.stream)}  Chunk Pages: {self.args.chunk_pages}")
+        print(f"INCREMENTAL? {str(self.args.incremental)}  RESUME? {str(self.args.resume)}")
+        print(f"CACHE --> Directory: {self.args.cache_dir}  Max Bytes: {self.args.cache_max_bytes}")
+        print(f"METRICS --> JSON: {self.args.metrics_json}  Prometheus: {self.args.metrics_prom}")
         print(f"Image Directory: {os.path.abspath(self.args.image_dir)} (Provided [raw]: '{self.args.image_dir}')")
         print(border)
 
@@ -112,3 +283,225 @@ class CommandLine:
                 default_val = getattr(SupportedDocTypes, tuple_name)
 
             setattr(self, f"DEFAULT_{def_key.upper()}", default_val)
+
+
+class BatchCommandLine(CommandLine):
+
+    DEFAULT_WORKERS = 0
+
+    def _add_arguments(self) -> typing.NoReturn:
+        """
+        Add the batch specific CLI arguments.
+
+        :return: None
+        """
+        self.parser.add_argument("inputs",
+                                 help="PDF files, directories (searched recursively for PDFs) or glob patterns.",
+                                 nargs='*')
+        self.parser.add_argument("-m", "--manifest",
+                                 help="File containing the list of PDFs to convert (one file spec per line).",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("-w", "--workers",
+                                 help=f"Number of workers shared by all documents, 0 = one per CPU, "
+                                      f"'{ConcurrencySizer.AUTO}' = sized from the page count, CPUs and free memory. "
+                                      f"Default: {self.DEFAULT_WORKERS}",
+                                 default=-1,
+                                 type=self._int_or_auto)
+        self.parser.add_argument("-r", "--report",
+                                 help="Write the aggregate batch report (JSON) to the specified file.",
+                                 default=None,
+                                 type=str)
+
+    def print_args(self) -> typing.NoReturn:
+        """
+        Print the arg values provided by the CLI.
+
+        :return: None
+        """
+        super().print_args()
+        print(f"BATCH --> Inputs: {self.args.inputs}  Manifest: {self.args.manifest}")
+        print(f"BATCH --> Workers: {self.args.workers}  Report: {self.args.report}")
+        print('-' * 80)
+
+
+class ServiceCommandLine(CommandLine):
+
+    DEFAULT_JOBS = 0
+
+    def _add_arguments(self) -> typing.NoReturn:
+        """
+        Add the conversion service specific CLI arguments. The conversion options are the defaults for the jobs
+        (jobs can override them); the encoders are shared by all jobs.
+
+        :return: None
+        """
+        self.parser.add_argument("--host",
+                                 help="Interface to listen on. Default: 127.0.0.1",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("-p", "--port",
+                                 help="Port to listen on. Default: 8765",
+                                 default=-1,
+                                 type=int)
+        self.parser.add_argument("-u", "--socket",
+                                 help="Listen on the specified Unix socket instead of host/port.",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("-j", "--jobs",
+                                 help="Number of documents converted concurrently. Default: 4",
+                                 default=self.DEFAULT_JOBS,
+                                 type=int)
+        self.parser.add_argument("--input_dirs",
+                                 help="Comma-separated directories the submitted documents must be in. Default: the "
+                                      "current directory",
+                                 default=None,
+                                 type=str)
+
+    def print_args(self) -> typing.NoReturn:
+        """
+        Print the arg values provided by the CLI.
+
+        :return: None
+        """
+        super().print_args()
+        print(f"SERVICE --> Host: {self.args.host}  Port: {self.args.port}  Socket: {self.args.socket}  "
+              f"Jobs: {self.args.jobs}  Input Dirs: {self.args.input_dirs}")
+        print('-' * 80)
+
+
+class QueueCommandLine(CommandLine):
+
+    def _add_arguments(self) -> typing.NoReturn:
+        """
+        Add the work queue specific CLI arguments. The documents are submitted to the queue (split into tasks of
+        --chunk_pages pages), and converted by the queue workers.
+
+        :return: None
+        """
+        self.parser.add_argument("inputs",
+                                 help="PDF files, directories (searched recursively for PDFs) or glob patterns to "
+                                      "submit to the queue.",
+                                 nargs='*')
+        self.parser.add_argument("-m", "--manifest",
+                                 help="File containing the list of PDFs to submit (one file spec per line).",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("-Q", "--queue",
+                                 help="Work queue: a SQLite database (*.db, *.sqlite) or a spool directory (shared by "
+                                      "the workers of several hosts).",
+                                 required=True,
+                                 type=str)
+        self.parser.add_argument("-w", "--work",
+                                 help="Convert the queued tasks after submitting the inputs (always, if there are "
+                                      "no inputs).",
+                                 action='store_true',
+                                 default=False)
+        self.parser.add_argument("--worker_id",
+                                 help="Worker id. Default: <host>-<pid>-<random>",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--lease_seconds",
+                                 help="Duration of a task lease (extended by heartbeats while converting). Default: 60",
+                                 default=-1,
+                                 type=float)
+
+    def print_args(self) -> typing.NoReturn:
+        """
+        Print the arg values provided by the CLI.
+
+        :return: None
+        """
+        super().print_args()
+        print(f"QUEUE --> Queue: {self.args.queue}  Inputs: {self.args.inputs}  Manifest: {self.args.manifest}")
+        print(f"QUEUE --> Work: {self.args.work}  Worker Id: {self.args.worker_id}  "
+              f"Lease Seconds: {self.args.lease_seconds}")
+        print('-' * 80)
+
+
+class BenchmarkCommandLine:
+
+    DEFAULT_OUTPUT = 'benchmark_results.json'
+    DEFAULT_ITERATIONS = 1
+    DEFAULT_THRESHOLD = 0.10
+
+    def __init__(self) -> None:
+        """
+        Sets up the benchmark CLI arguments. Lists are comma separated (e.g. - "--dpi 100,200,300").
+        """
+        self.parser = argparse.ArgumentParser(description="Benchmark the PDF conversion stages.")
+        self.parser.add_argument("-o", "--output",
+                                 help=f"Write the benchmark results (JSON) to this file. "
+                                      f"Default: {self.DEFAULT_OUTPUT}",
+                                 default=self.DEFAULT_OUTPUT,
+                                 type=str)
+        self.parser.add_argument("-b", "--baseline",
+                                 help="Baseline results (JSON); regressions against the baseline are reported.",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--compare",
+                                 help="Compare this results file against the baseline, instead of running the "
+                                      "benchmarks.",
+                                 default=None,
+                                 type=str)
+        self.parser.add_argument("--threshold",
+                                 help=f"Relative change flagged as a regression. Default: {self.DEFAULT_THRESHOLD}",
+                                 default=self.DEFAULT_THRESHOLD,
+                                 type=float)
+        self.parser.add_argument("-d", "--dpi", help="DPI values to sweep.", default=None, type=str)
+        self.parser.add_argument("-t", "--threads", help="Render thread counts to sweep.", default=None, type=str)
+        self.parser.add_argument("-q", "--quality", help="webp quality values to sweep.", default=None, type=str)
+        self.parser.add_argument("-l", "--lossless", help="webp lossless values to sweep (true/false).",
+                                 default=None, type=str)
+        self.parser.add_argument("-R", "--renderer", help="Rendering backends to sweep.", default=None, type=str)
+        self.parser.add_argument("-C", "--color_mode", help="Color modes to sweep (rgb, gray, mono, auto).",
+                                 default=None, type=str)
+        self.parser.add_argument("-P", "--profile", help="webp encoder profiles to sweep (fast, balanced, smallest).",
+                                 default=None, type=str)
+        self.parser.add_argument("--target_bytes", help="webp target page sizes (bytes) to sweep.",
+                                 default=None, type=str)
+        self.parser.add_argument("-z", "--compression",
+                                 help="TIFF compressions to sweep (none, lzw, deflate, packbits, g4).",
+                                 default=None, type=str)
+        self.parser.add_argument("-p", "--pages", help="Page counts of the synthetic documents.",
+                                 default=None, type=str)
+        self.parser.add_argument("-s", "--stages", help="Stages to run (default: all).", default=None, type=str)
+        self.parser.add_argument("-n", "--iterations",
+                                 help=f"Number of iterations per measurement. Default: {self.DEFAULT_ITERATIONS}",
+                                 default=self.DEFAULT_ITERATIONS,
+                                 type=int)
+        self.parser.add_argument("-c", "--corpus_dir",
+                                 help="Keep the synthetic corpus in this directory (default: temporary directory).",
+                                 default=None,
+                                 type=str)
+
+        self.args = self.parser.parse_args()
+
+    @staticmethod
+    def _split(value: typing.Optional[str], convert: typing.Callable = str) -> typing.Optional[list]:
+        if value is None:
+            return None
+        return [convert(item.strip()) for item in value.split(',') if item.strip()]
+
+    def sweep(self) -> typing.Dict[str, list]:
+        """
+        :return: The parameter sweep specified on the CLI (only the parameters that were provided)
+        """
+        sweep = {
+            'dpi': self._split(self.args.dpi, int),
+            'threads': self._split(self.args.threads, int),
+            'quality': self._split(self.args.quality, int),
+            'lossless': self._split(self.args.lossless, lambda item: item.lower() in ('1', 'true', 'yes')),
+            'renderer': self._split(self.args.renderer),
+            'color_mode': self._split(self.args.color_mode, str.lower),
+            'compression': self._split(self.args.compression, str.lower),
+            'profile': self._split(self.args.profile, str.lower),
+            'target_bytes': self._split(self.args.target_bytes, int),
+        }
+        return {key: values for key, values in sweep.items() if values}
+
+    def page_counts(self) -> typing.Optional[typing.List[int]]:
+        return self._split(self.args.pages, int)
+
+    def stages(self) -> typing.Optional[typing.List[str]]:
+        return self._split(self.args.stages)
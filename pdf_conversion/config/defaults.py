@@ -10,6 +10,10 @@ class DefaultValues:
     APP_DEFAULTS = 'defaults'
     TIFF_DEFAULTS = 'tif'
     WEBP_DEFAULTS = 'webp'
+    CACHE_DEFAULTS = 'cache'
+    SERVICE_DEFAULTS = 'service'
+    ASYNC_DEFAULTS = 'async'
+    QUEUE_DEFAULTS = 'queue'
 
     def __init__(self, filespec: str = DEFAULTS_CFG_FILE) -> None:
         """
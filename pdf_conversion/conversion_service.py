@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+from pdf_conversion.config.cli import ServiceCommandLine
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.service import ConversionService
+
+default_cfg = './defaults.cfg'
+
+# NOTE: The main guard is required; the encode pool may spawn worker processes that re-import this module.
+if __name__ == '__main__':
+    defaults = DefaultValues(filespec=default_cfg)
+    app_defaults = getattr(defaults, DefaultValues.APP_DEFAULTS)
+
+    cli = ServiceCommandLine(app_defaults)
+    cli.print_args()
+
+    cache = None
+    cache_defaults = getattr(defaults, DefaultValues.CACHE_DEFAULTS, None) or {}
+    if cli.args.cache_dir is not None or cache_defaults.get('enabled', False):
+        cache = ConversionCache(cache_dir=cli.args.cache_dir, max_bytes=cli.args.cache_max_bytes,
+                                defaults=cache_defaults)
+
+    pool = EncodePool(workers=cli.args.encoders, pool_type=cli.args.encode_pool,
+                      defaults=getattr(defaults, DefaultValues.WEBP_DEFAULTS, None))
+
+    service = ConversionService(
+        defaults=defaults, output_dir=cli.args.image_dir, jobs=cli.args.jobs, pool=pool, cache=cache,
+        job_defaults=dict(lossless=cli.args.lossless, dpi=cli.args.dpi, quality=cli.args.quality,
+                          threads=cli.args.threads, renderer=cli.args.renderer, color_mode=cli.args.color_mode,
+                          compression=cli.args.compression, multipage=cli.args.multipage, profile=cli.args.profile,
+                          method=cli.args.method, target_bytes=cli.args.target_bytes, direct=cli.args.direct,
+                          max_memory=cli.args.max_memory, incremental=cli.args.incremental,
+                          sizes=cli.args.sizes, resume=cli.args.resume),
+        input_dirs=[input_dir for input_dir in (cli.args.input_dirs or '').split(',') if input_dir])
+    service.serve(host=cli.args.host, port=cli.args.port, socket_path=cli.args.socket)
@@ -0,0 +1,454 @@
+from concurrent.futures import as_completed
+import glob
+import json
+import os
+from time import perf_counter
+import typing
+
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.concurrency import ConcurrencySizer
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.conversion_planner import ConversionPlanner
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.memory_budget import MemoryBudget, PeakMemoryMonitor
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.converters.resolutions import Resolution, Resolutions
+from pdf_conversion.converters.tiff2webp import TiffToWebp
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+def convert_chunk(task: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    """
+    Convert a page range of a single document (module level, so it can be executed by a worker process).
+    The rendered rasters never leave the worker; only the resulting file specs and timings are returned.
+
+    :param task: Dictionary describing the work (see BatchConversion._build_tasks())
+
+    :return: Dictionary: doc index, render duration, a list of (page number, file specs, encode duration), the
+             metrics spans (see ConversionMetrics), the color mode of each rendered page and the output sizes of each
+             page (see DocumentInfo.page_variants)
+
+    """
+    kwargs = task['kwargs']
+    resolutions = task.get('resolutions') or []
+    metrics = ConversionMetrics()
+    result = {'doc': task['doc'], 'render_duration': 0, 'pages': [], 'spans': metrics.spans, 'color_modes': [],
+              'variants': []}
+
+    # The cheapest conversion path: files written by the backend (e.g. - TIFF, PNG), or rasters encoded directly.
+    # Multiple output sizes are derived from the rasters, so the pages are always rendered into memory.
+    steps = ConversionPlanner().plan(SupportedDocTypes.PDF, SupportedDocTypes(task['format']),
+                                     via=SupportedDocTypes.RASTER if resolutions else None)
+    renderer = steps[0].converter(
+        src_file_spec=task['filespec'], output_folder=task['output_folder'], first_page=task['first_page'],
+        last_page=task['last_page'], threads=1, defaults=task['render_defaults'], **kwargs).convert()
+    result['render_duration'] = renderer.conversion_duration
+    result['color_modes'] = renderer.page_modes
+    metrics.add(ConversionMetrics.RENDER, renderer.conversion_duration, task['first_page'], task['last_page'],
+                bytes_out=renderer.output_bytes())
+
+    if len(steps) == 1:
+        result['pages'] = [(page_num, [image], 0) for page_num, image in
+                           enumerate(renderer.images, start=task['first_page'])]
+        return result
+
+    encode_defaults = (task['render_defaults'] if steps[1].converter.DEFAULTS_SECTION == DefaultValues.TIFF_DEFAULTS
+                       else task['encode_defaults'])
+    for page_num, raster in enumerate(renderer.images, start=task['first_page']):
+        files, duration = [], 0
+        for resolution in resolutions or [None]:
+            image = raster if resolution is None else Resolutions.derive(raster, resolution, renderer.dpi)
+            output_file = f"{task['output_file']}-{page_num:04d}"
+            if resolution is not None:
+                output_file = f"{output_file}-{resolution.name}"
+            encoder = steps[1].converter(
+                src_file_spec=task['filespec'], src_image=image, output_file=output_file,
+                output_folder=task['output_folder'], defaults=encode_defaults, **kwargs).convert()
+            files.extend(encoder.images)
+            duration += encoder.conversion_duration
+            metrics.add(ConversionMetrics.ENCODE, encoder.encode_duration, page_num,
+                        bytes_in=encoder.bytes_in, bytes_out=encoder.bytes_out)
+            metrics.add(ConversionMetrics.WRITE, encoder.write_duration, page_num,
+                        bytes_in=encoder.bytes_out, bytes_out=encoder.bytes_out)
+            if resolution is not None:
+                result['variants'].append({'page': page_num, 'name': resolution.name,
+                                           'dpi': round(renderer.dpi * image.width / raster.width),
+                                           'width': image.width, 'height': image.height, 'files': encoder.images})
+                image.close()
+        raster.close()
+        result['pages'].append((page_num, files, duration))
+
+    return result
+
+
+class BatchConversion:
+    """
+    Converts a corpus of PDFs under a single scheduler. Each document is split into page-range chunks, and the chunks
+    of all documents are scheduled on one shared worker pool (largest documents first), so the small documents fill
+    the gaps left by the large ones, and the interpreter/imports/pool are only started once for the whole batch.
+    """
+
+    PDF_EXTENSION = SupportedDocTypes.PDF.value
+    DEFAULT_CHUNK_PAGES = 4
+
+    def __init__(self, inputs: typing.Optional[typing.List[str]] = None, manifest: typing.Optional[str] = None,
+                 output_dir: str = '.', image_format: SupportedDocTypes = SupportedDocTypes.WEBP,
+                 defaults: typing.Optional[DefaultValues] = None,
+                 cache: typing.Optional[ConversionCache] = None) -> None:
+        """
+        :param inputs: List of PDF file specs, directories (searched recursively) and/or glob patterns
+        :param manifest: File spec of a manifest: one PDF file spec per line (blank lines and '#' comments ignored)
+        :param output_dir: Directory to store the converted images (one sub-directory per document)
+        :param image_format: Target image format (SupportedDocTypes enumeration)
+        :param defaults: A dictionary of defaults for each image type (optional)
+        :param cache: Conversion cache; documents found in the cache are restored instead of converted (optional)
+
+        """
+        self.output_dir = os.path.abspath(output_dir)
+        self.image_format = image_format
+        self.defaults = defaults
+        self.cache = cache
+
+        self.documents = [
+            DocumentInfo(file_spec=filespec, conversion_dir=os.path.join(
+                self.output_dir, os.path.split(filespec)[-1].rsplit('.', 1)[0]))
+            for filespec in self.collect_documents(inputs or [], manifest)]
+
+        self.errors = {}
+        self.conversion_duration = 0
+        self.concurrency = {}
+        self.peak_memory = 0
+        self.memory_budget = 0
+        self.encode_settings = None
+
+    @classmethod
+    def collect_documents(cls, inputs: typing.List[str], manifest: typing.Optional[str] = None) -> typing.List[str]:
+        """
+        Expand the inputs (files, directories, globs, manifest entries) into a unique list of PDF file specs.
+
+        :param inputs: List of PDF file specs, directories and/or glob patterns
+        :param manifest: File spec of the manifest file (optional)
+
+        :return: List of absolute PDF file specs (in the order they were found)
+
+        """
+        entries = list(inputs)
+        if manifest is not None:
+            with open(manifest, "r") as MANIFEST:
+                entries.extend(line.strip() for line in MANIFEST
+                               if line.strip() and not line.strip().startswith('#'))
+
+        filespecs = []
+        for entry in entries:
+            if os.path.isdir(entry):
+                matches = sorted(glob.glob(os.path.join(entry, '**', f'*.{cls.PDF_EXTENSION}'), recursive=True))
+            elif os.path.isfile(entry):
+                matches = [entry]
+            else:
+                matches = sorted(glob.glob(entry, recursive=True))
+                if not matches:
+                    print(f"WARNING: No documents found for '{entry}'")
+
+            filespecs.extend(os.path.abspath(match) for match in matches
+                             if match.lower().endswith(f'.{cls.PDF_EXTENSION}'))
+
+        # Remove duplicates, but keep the order.
+        return list(dict.fromkeys(filespecs))
+
+    @staticmethod
+    def _dpi(render_defaults: dict, **kwargs) -> typing.Optional[int]:
+        """
+        :return: The rendering DPI (CLI arg, else configured default; None: unknown)
+        """
+        return kwargs['dpi'] if (kwargs.get('dpi') or 0) > 0 else render_defaults.get('dpi')
+
+    def _build_tasks(self, chunk_pages: int, render_defaults: dict, encode_defaults: dict,
+                     budget: typing.Optional[MemoryBudget] = None, chunk_budget: int = 0,
+                     resolutions: typing.Optional[typing.List[Resolution]] = None,
+                     done_pages: typing.Optional[typing.Dict[int, typing.Dict[int, typing.List[str]]]] = None,
+                     renderers: typing.Optional[typing.Dict[int, typing.Dict[str, typing.Any]]] = None,
+                     **kwargs) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Split every document into page-range tasks. Tasks are ordered largest document first (the longest jobs
+        start first, and the small documents are used to fill the remaining capacity).
+
+        :param chunk_pages: Number of pages per task
+        :param render_defaults: rendering defaults (See PdfToTiff class for DEFAULT_* parameters)
+        :param encode_defaults: webp encoding defaults (See TiffToWebp class for DEFAULT_* parameters)
+        :param budget: If enabled, tasks are also split so that each task's rasters fit chunk_budget
+        :param chunk_budget: Raster bytes available to each task (i.e. - each worker)
+        :param resolutions: Output sizes of each page (see Resolutions)
+        :param done_pages: Pages restored from each document's checkpoint (not converted; see ConversionCheckpoint)
+        :param renderers: The renderer args resolved for each document (see PDFConversion.resolve_renderer())
+        :param kwargs: conversion args (dpi, quality, lossless, etc.)
+
+        :return: List of task dictionaries (see convert_chunk())
+
+        """
+        # Documents are probed once (the probe is shared with the cache lookup, see convert()).
+        page_counts = {}
+        for index, document in enumerate(self.documents):
+            if document.cache_hit:
+                continue
+            probe = document.probe()
+            if probe is None:
+                self.errors[document.filespec] = "Unable to probe the document"
+                continue
+            page_counts[index] = probe.page_count
+
+        tasks = []
+        for index in sorted(page_counts, key=lambda doc_index: page_counts[doc_index], reverse=True):
+            document = self.documents[index]
+            os.makedirs(document.file_dir, exist_ok=True)
+            if budget is not None and budget.enabled:
+                page_bytes = MemoryBudget.page_bytes(document.filespec, self._dpi(render_defaults, **kwargs),
+                                                     probe=document.probe())
+                ranges = budget.chunks(page_bytes, max_pages=chunk_pages, budget=chunk_budget)
+            else:
+                ranges = [(first_page, min(first_page + chunk_pages - 1, page_counts[index]))
+                          for first_page in range(1, page_counts[index] + 1, chunk_pages)]
+
+            # Resumed documents only convert the pages that are not in the checkpoint.
+            done = (done_pages or {}).get(index) or {}
+            if done:
+                pending = []
+                for first_page, last_page in ranges:
+                    for page_num in range(first_page, last_page + 1):
+                        if page_num in done:
+                            continue
+                        if pending and pending[-1][1] == page_num - 1 and pending[-1][0] >= first_page:
+                            pending[-1] = (pending[-1][0], page_num)
+                        else:
+                            pending.append((page_num, page_num))
+                ranges = pending
+
+            for first_page, last_page in ranges:
+                tasks.append({
+                    'doc': index,
+                    'filespec': document.filespec,
+                    'format': self.image_format.value,
+                    'first_page': first_page,
+                    'last_page': last_page,
+                    'output_folder': document.file_dir,
+                    'output_file': document.filename.rsplit('.', 1)[0],
+                    'render_defaults': render_defaults,
+                    'encode_defaults': encode_defaults,
+                    'resolutions': resolutions,
+                    'kwargs': {**kwargs, **(renderers or {}).get(index, {})},
+                })
+        return tasks
+
+    def convert(self, workers: typing.Optional[int] = 0, pool_type: typing.Optional[str] = None,
+                chunk_pages: typing.Optional[int] = 0, **kwargs) -> "BatchConversion":
+        """
+        Convert all documents.
+
+        :param workers: Number of workers shared by all documents (<= 0: the webp 'encoders' default, 0 in the
+              defaults = one per CPU), or 'auto' (sized from the number of tasks, the usable CPUs and the memory needed
+              to render a chunk - see ConcurrencySizer)
+        :param pool_type: 'process' or 'thread' (default: the webp 'encode_pool' default; see EncodePool)
+        :param chunk_pages: Number of pages per scheduled task
+        :param kwargs: conversion args (dpi, quality, lossless, etc.; resume: only convert the pages missing from each
+              document's checkpoint manifest)
+
+        :return: self (allows chaining of methods)
+
+        """
+        render_defaults = getattr(self.defaults, DefaultValues.TIFF_DEFAULTS) if self.defaults is not None else {}
+        encode_defaults = getattr(self.defaults, DefaultValues.WEBP_DEFAULTS) if self.defaults is not None else {}
+        chunk_pages = chunk_pages if chunk_pages and chunk_pages > 0 else render_defaults.get(
+            'chunk_pages', self.DEFAULT_CHUNK_PAGES)
+
+        # Parallelism comes from the shared pool; options that only apply to single document runs are dropped.
+        # Documents are rendered in chunks by different workers, so TIFF pages are never written to a container.
+        for key in ('threads', 'direct', 'encoders', 'encode_pool'):
+            kwargs.pop(key, None)
+        kwargs[PdfToTiff.MULTIPAGE_KW] = False
+        resume = kwargs.pop(PDFConversion.RESUME_KW, False)
+
+        if self.image_format == SupportedDocTypes.WEBP:
+            self.encode_settings = TiffToWebp(src_file_spec='', defaults=encode_defaults, **kwargs).settings()
+
+        start_time = perf_counter()
+
+        # An 'auto' renderer is resolved once per document, so its chunks, cache key and checkpoint all use the same
+        # backend.
+        renderers = {index: PDFConversion(document, defaults=self.defaults).resolve_renderer(
+                         {'renderer': kwargs.get('renderer')})
+                     for index, document in enumerate(self.documents)}
+
+        # Restore the documents that have already been converted with the same settings.
+        cache_keys = {}
+        if self.cache is not None:
+            for index, document in enumerate(self.documents):
+                cache_keys[index] = PDFConversion(document, defaults=self.defaults).cache_key(
+                    self.image_format, direct=True, **{**kwargs, **renderers[index]})
+                cached_files = self.cache.lookup(cache_keys[index], document.file_dir)
+                if cached_files is not None:
+                    document.add_files(cached_files)
+                    document.cache_hit = True
+
+        # The checkpoint manifest of each document is written as its chunks finish.
+        checkpoints = {index: PDFConversion(document, defaults=self.defaults).open_checkpoint(
+                           self.image_format, direct=True, **{**kwargs, **renderers[index]})
+                       for index, document in enumerate(self.documents) if not document.cache_hit}
+
+        # Each page is rendered once, at the highest requested DPI, and the smaller sizes are derived from it.
+        resolutions = Resolutions.resolve(kwargs.pop(Resolutions.SIZES_KW, None), render_defaults)
+        if resolutions:
+            kwargs['dpi'] = Resolutions.render_dpi(resolutions, self._dpi(render_defaults, **kwargs) or
+                                                   PdfToTiff.DEFAULT_DPI)
+
+        # Resumed documents restore the verified pages of their checkpoint (the sizes of each page are not recorded,
+        # so documents with multiple sizes are converted again).
+        done_pages = {}
+        if resume and resolutions:
+            print(f"{self.__class__.__name__}: WARNING: Resume does not support multiple sizes; converting all pages.")
+        elif resume:
+            for index, checkpoint in checkpoints.items():
+                if checkpoint is not None:
+                    done_pages[index] = checkpoint.verified_pages()
+                    checkpoint.discard(page_num for page_num in checkpoint.pages if page_num not in done_pages[index])
+
+        # Each worker holds the rasters of a whole chunk while it is being encoded; with a memory budget, the raster
+        # budget is shared by the workers (the chunks are split to fit each worker's share).
+        pool = EncodePool(workers=workers, pool_type=pool_type, defaults=encode_defaults)
+        budget = MemoryBudget(kwargs.pop(MemoryBudget.MAX_MEMORY_KW, None), defaults=render_defaults)
+        chunk_budget = budget.raster_budget // pool.workers
+
+        tasks = self._build_tasks(chunk_pages, render_defaults, encode_defaults, budget=budget,
+                                  chunk_budget=chunk_budget, resolutions=resolutions, done_pages=done_pages,
+                                  renderers=renderers, **kwargs)
+
+        chunk_bytes = (chunk_budget if budget.enabled else
+                       ConcurrencySizer.page_bytes(self._dpi(render_defaults, **kwargs)) * chunk_pages)
+        num_workers = pool.size(len(tasks), chunk_bytes) if tasks else 0
+        self.concurrency = {'workers': num_workers, 'pool_type': pool.pool_type, 'sizing': pool.sizing}
+        self.memory_budget = budget.max_bytes
+        print(f"{self.__class__.__name__}: {len(self.documents)} document(s), {len(tasks)} task(s), "
+              f"{num_workers} {pool.pool_type} worker(s).")
+
+        # Collect the results per document; pages are put back into page order once everything is done.
+        pages = {index: [(page_num, files, 0) for page_num, files in done_pages.get(index, {}).items()]
+                 for index in range(len(self.documents))}
+        variants = {index: [] for index in range(len(self.documents))}
+        for index, done in done_pages.items():
+            probe = self.documents[index].probe()
+            self.documents[index].pages_reused = len(done)
+            self.documents[index].pages_regenerated = probe.page_count - len(done) if probe is not None else 0
+        with PeakMemoryMonitor() as monitor:
+            if tasks:
+                with pool.executor(len(tasks), chunk_bytes) as executor:
+                    futures = {executor.submit(convert_chunk, task): task for task in tasks}
+                    for future in as_completed(futures):
+                        task = futures[future]
+                        document = self.documents[task['doc']]
+                        try:
+                            result = future.result()
+                        except Exception as exc:
+                            self.errors[document.filespec] = f"({exc.__class__.__name__}): {exc}"
+                            print(f"ERROR: Pages {task['first_page']}-{task['last_page']} of '{document.filespec}': "
+                                  f"({exc.__class__.__name__}): {exc}")
+                            continue
+
+                        document.conversion_duration += result['render_duration']
+                        document.metrics.extend(result['spans'])
+                        document.add_color_modes(result['color_modes'])
+                        pages[task['doc']].extend(result['pages'])
+                        variants[task['doc']].extend(result['variants'])
+
+                        checkpoint = checkpoints.get(task['doc'])
+                        if checkpoint is not None:
+                            for page_num, files, _ in result['pages']:
+                                checkpoint.add(page_num, checkpoint.final_stage, files)
+                            checkpoint.save()
+        self.peak_memory = monitor.peak_rss
+
+        for index, document in enumerate(self.documents):
+            for page_num, files, duration in sorted(pages[index]):
+                document.add_page_files(page_num, files, seconds=duration)
+                document.page_durations.append(duration)
+                document.conversion_duration += duration
+            document.page_variants.extend(sorted(variants[index], key=lambda variant: variant['page']))
+
+            # Documents with missing pages (render/encode failures are reported, not raised) are not cached.
+            if (index in cache_keys and not document.cache_hit and document.filespec not in self.errors and
+                    document.complete(self.image_format, files_per_page=max(1, len(resolutions)))):
+                self.cache.store(cache_keys[index], document.files)
+
+        self.conversion_duration = perf_counter() - start_time
+        return self
+
+    def metrics(self) -> typing.Dict[str, ConversionMetrics]:
+        """
+        :return: The conversion metrics of each document: {document file spec: ConversionMetrics}
+        """
+        return {document.filespec: document.metrics for document in self.documents}
+
+    def report(self) -> typing.Dict[str, typing.Any]:
+        """
+        Build the aggregate batch report.
+
+        :return: Dictionary (JSON serializable) describing the batch
+        """
+        num_pages = sum(len(document.page_durations) for document in self.documents)
+        return {
+            'format': self.image_format.value,
+            'documents': len(self.documents),
+            'failed_documents': len(self.errors),
+            'pages': num_pages,
+            'wall_clock_seconds': round(self.conversion_duration, 4),
+            'pages_per_second': round(num_pages / self.conversion_duration, 4) if self.conversion_duration else 0,
+            'errors': self.errors,
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'concurrency': self.concurrency,
+            'peak_rss_bytes': self.peak_memory,
+            'max_memory': self.memory_budget,
+            'webp': self.encode_settings,
+            'stages': ConversionMetrics.merge(self.metrics().values()).summary(),
+            'document_details': [
+                {
+                    'filespec': document.filespec,
+                    'pages': len(document.page_durations),
+                    'files': len(document.files),
+                    'conversion_seconds': round(document.conversion_duration, 4),
+                    'cache_hit': document.cache_hit,
+                    'stages': document.metrics.summary(),
+                } for document in self.documents],
+        }
+
+    def write_report(self, report_file: str) -> typing.NoReturn:
+        """
+        Write the aggregate batch report as JSON.
+
+        :param report_file: File spec of the report file
+
+        :return: None
+        """
+        with open(report_file, "w") as REPORT:
+            json.dump(self.report(), REPORT, indent=2)
+
+    def batch_status(self) -> str:
+        report = self.report()
+        output = f"DOCUMENTS: {report['documents']}  (FAILED: {report['failed_documents']})\n"
+        output += f"PAGES: {report['pages']}\n"
+        output += f"BATCH DURATION: {report['wall_clock_seconds']:0.4f} seconds\n"
+        output += f"THROUGHPUT: {report['pages_per_second']:0.2f} pages/second\n"
+        if report['cache'] is not None:
+            output += f"CACHE: {report['cache']['hits']} hit(s), {report['cache']['misses']} miss(es), " \
+                      f"{report['cache']['evictions']} eviction(s)\n"
+        output += f"PEAK MEMORY: {report['peak_rss_bytes'] / 2 ** 20:0.1f} MB\n"
+        if report['webp'] is not None:
+            output += f"WEBP: PROFILE: {report['webp']['profile']}  METHOD: {report['webp']['method']}  " \
+                      f"QUALITY: {report['webp']['quality']}  LOSSLESS: {report['webp']['lossless']}  " \
+                      f"TARGET BYTES: {report['webp']['target_bytes']}\n"
+        if report['concurrency']:
+            output += f"WORKERS: {report['concurrency']['workers']} ({report['concurrency']['pool_type']})\n"
+        for stage, summary in report['stages'].items():
+            output += f"STAGE {stage.upper()}: {summary['seconds']:0.4f} seconds  PAGES: {summary['pages']}  " \
+                      f"PAGES/SEC: {summary['pages_per_sec']}  P95 PAGE: {summary['p95_page_seconds']:0.4f} seconds  " \
+                      f"BYTES OUT: {summary['bytes_out']}\n"
+        return output
@@ -0,0 +1,153 @@
+import typing
+
+from PIL import Image, ImageChops, ImageFilter
+
+
+class ColorMode:
+    """
+    Color modes for rendering and encoding pages: rgb (24-bit), gray (8-bit) or mono (1-bit).
+
+    In 'auto' mode each page is checked on a low DPI preview, and rendered/encoded in the smallest mode that keeps its
+    content: rgb if the page has any noticeable color, mono if the page is (almost) purely black and white, else
+    gray. The check uses PIL's histograms and filters (computed in C), so it is cheap compared to rendering the page.
+    """
+
+    RGB = 'rgb'
+    GRAY = 'gray'
+    MONO = 'mono'
+    AUTO = 'auto'
+    MODES = (RGB, GRAY, MONO)
+
+    COLOR_MODE_KW = 'color_mode'
+    DEFAULT_COLOR_MODE = RGB
+
+    # PIL image mode of each color mode.
+    IMAGE_MODES = {RGB: 'RGB', GRAY: 'L', MONO: '1'}
+
+    # DPI of the preview used by the 'auto' check.
+    PREVIEW_DPI = 36
+
+    # A page is in color if more than COLOR_FRACTION of its pixels have a chroma (max - min of R, G, B) above
+    # CHROMA_THRESHOLD (low chroma is treated as scanner/anti-aliasing noise).
+    CHROMA_THRESHOLD = 32
+    COLOR_FRACTION = 0.001
+
+    # A gray page is mono if at most MONO_FRACTION of its pixels are flat mid-tones: MONO_LOW < value < MONO_HIGH,
+    # and a 3x3 neighbourhood range below MONO_FLAT_RANGE. On a low DPI preview, the anti-aliased edges of text are
+    # mid-tones too (most of the ink of a text page), but they sit between dark and light pixels; gray content
+    # (photos, shading) is mid-tones in flat areas.
+    MONO_LOW = 64
+    MONO_HIGH = 192
+    MONO_FLAT_RANGE = 48
+    MONO_FRACTION = 0.001
+
+    # Gray to mono threshold (no dithering; the pages are mostly text).
+    MONO_THRESHOLD = 128
+
+    @classmethod
+    def resolve(cls, color_mode: typing.Optional[str], defaults: typing.Optional[dict] = None) -> str:
+        """
+        Resolve the color mode option (CLI arg, else configured default, else DEFAULT_COLOR_MODE).
+
+        :param color_mode: rgb, gray, mono or auto (None: use the default)
+        :param defaults: conversion defaults (read from file)
+
+        :return: Color mode
+        """
+        color_mode = (color_mode or (defaults or {}).get(cls.COLOR_MODE_KW) or cls.DEFAULT_COLOR_MODE).lower()
+        if color_mode not in cls.MODES and color_mode != cls.AUTO:
+            print(f"WARNING: Unrecognized color mode: '{color_mode}' -- Supported color modes: "
+                  f"{', '.join(cls.MODES)}, {cls.AUTO}\n"
+                  f"\t Using the default color mode: '{cls.DEFAULT_COLOR_MODE}'")
+            color_mode = cls.DEFAULT_COLOR_MODE
+        return color_mode
+
+    @classmethod
+    def of_image(cls, image: Image.Image) -> str:
+        """
+        :return: The color mode of a PIL image (rgb for anything that is not gray or bilevel)
+        """
+        return {'L': cls.GRAY, '1': cls.MONO}.get(image.mode, cls.RGB)
+
+    @classmethod
+    def detect(cls, image: Image.Image) -> str:
+        """
+        Determine the smallest color mode that keeps the content of a (preview) image.
+
+        :param image: PIL image (ideally a low DPI preview of the page)
+        :return: Color mode
+        """
+        if image.mode in ('L', '1'):
+            gray = image.convert('L')
+        else:
+            red, green, blue = image.convert('RGB').split()
+            chroma = ImageChops.subtract(ImageChops.lighter(ImageChops.lighter(red, green), blue),
+                                         ImageChops.darker(ImageChops.darker(red, green), blue))
+            pixels = image.width * image.height
+            if sum(chroma.histogram()[cls.CHROMA_THRESHOLD + 1:]) > cls.COLOR_FRACTION * pixels:
+                return cls.RGB
+            gray = image.convert('L')
+
+        local_range = ImageChops.subtract(gray.filter(ImageFilter.MaxFilter(3)), gray.filter(ImageFilter.MinFilter(3)))
+        flat_mid_tones = ImageChops.multiply(
+            gray.point([255 if cls.MONO_LOW < value < cls.MONO_HIGH else 0 for value in range(256)]),
+            local_range.point([255 if value < cls.MONO_FLAT_RANGE else 0 for value in range(256)]))
+        mid_tones = flat_mid_tones.histogram()[255]
+        return cls.MONO if mid_tones <= cls.MONO_FRACTION * gray.width * gray.height else cls.GRAY
+
+    @classmethod
+    def detect_image(cls, image: Image.Image) -> str:
+        """
+        Determine the color mode of a full resolution image (see detect()); the check runs on a reduced copy.
+
+        :param image: PIL image
+        :return: Color mode
+        """
+        if image.mode in ('L', '1'):
+            return cls.detect(image)
+        factor = max(1, min(image.width, image.height) // 300)
+        return cls.detect(image.reduce(factor) if factor > 1 else image)
+
+    @classmethod
+    def convert(cls, image: Image.Image, color_mode: str) -> Image.Image:
+        """
+        Convert an image to a color mode (a new image is only created if the mode changes).
+
+        :param image: PIL image
+        :param color_mode: rgb, gray or mono
+        :return: PIL image in the color mode
+        """
+        image_mode = cls.IMAGE_MODES[color_mode]
+        if image.mode == image_mode:
+            return image
+        if color_mode == cls.MONO:
+            return image.convert('L').point(lambda value: 255 if value >= cls.MONO_THRESHOLD else 0, '1')
+        return image.convert(image_mode)
+
+    @staticmethod
+    def raster_bytes(image: Image.Image) -> int:
+        """
+        :return: Size (bytes) of an image's raster
+        """
+        if image.mode == '1':
+            return (image.width + 7) // 8 * image.height
+        return image.width * image.height * len(image.getbands())
+
+    @staticmethod
+    def page_ranges(color_modes: typing.List[str],
+                    first_page: int = 1) -> typing.List[typing.Tuple[int, int, str]]:
+        """
+        Group consecutive pages with the same color mode.
+
+        :param color_modes: Color mode of each page (in page order)
+        :param first_page: Page number of the first entry
+
+        :return: List of inclusive (first_page, last_page, color_mode) ranges
+        """
+        ranges = []
+        for page_num, color_mode in enumerate(color_modes, start=first_page):
+            if ranges and ranges[-1][2] == color_mode:
+                ranges[-1] = (ranges[-1][0], page_num, color_mode)
+            else:
+                ranges.append((page_num, page_num, color_mode))
+        return ranges
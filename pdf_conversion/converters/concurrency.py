@@ -0,0 +1,180 @@
+import math
+import os
+import typing
+
+
+class ConcurrencySizer:
+    """
+    Sizes render and encode concurrency ('auto' threads/encoders) from the work and the machine:
+
+        * the number of pages (never more workers than pages),
+        * the usable CPUs (CPU affinity, capped by the cgroup CPU quota when running in a container),
+        * the available memory (MemAvailable, capped by the cgroup memory limit), using an estimate of the memory
+          each renderer/encoder needs for one page raster.
+
+    Every decision is returned together with the inputs it was based on, so it can be recorded in the run report.
+    """
+
+    AUTO = 'auto'
+
+    # Page raster estimate (used when the page size is unknown): US Letter, RGB.
+    DEFAULT_PAGE_INCHES = (8.5, 11)
+    BYTES_PER_PIXEL = 3
+    DEFAULT_DPI = 200
+
+    # Fixed memory cost of a renderer process (pdftoppm/pdftocairo/gs) and of an encoder (worker process).
+    RENDER_OVERHEAD_BYTES = 32 * 2 ** 20
+    ENCODE_OVERHEAD_BYTES = 64 * 2 ** 20
+
+    # An encoder holds the raster, a decoded/converted copy and the encoder's working buffers.
+    ENCODE_RASTERS_PER_WORKER = 3
+
+    # Fraction of the available memory the conversion may use.
+    MEMORY_FRACTION = 0.75
+
+    CGROUP_DIR = os.path.join(os.path.sep, 'sys', 'fs', 'cgroup')
+    MEMINFO_FILE = os.path.join(os.path.sep, 'proc', 'meminfo')
+
+    def __init__(self) -> None:
+        self.cpu_quota = self.cgroup_cpu_quota()
+        self.cpus = self.available_cpus(self.cpu_quota)
+        self.memory_available = self.available_memory()
+
+    @staticmethod
+    def _read(file_spec: str) -> typing.Optional[str]:
+        try:
+            with open(file_spec, "r") as SOURCE:
+                return SOURCE.read().strip()
+        except OSError:
+            return None
+
+    @classmethod
+    def cgroup_cpu_quota(cls) -> typing.Optional[float]:
+        """
+        :return: CPU quota of the cgroup (in CPUs, e.g. 1.5), or None if there is no quota
+        """
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        cpu_max = cls._read(os.path.join(cls.CGROUP_DIR, 'cpu.max'))
+        if cpu_max is not None:
+            quota, _, period = cpu_max.partition(' ')
+            if quota != 'max' and period:
+                return int(quota) / int(period)
+            return None
+
+        # cgroup v1: quota of -1 = no quota
+        quota = cls._read(os.path.join(cls.CGROUP_DIR, 'cpu', 'cpu.cfs_quota_us'))
+        period = cls._read(os.path.join(cls.CGROUP_DIR, 'cpu', 'cpu.cfs_period_us'))
+        if quota is not None and period is not None and int(quota) > 0:
+            return int(quota) / int(period)
+        return None
+
+    @staticmethod
+    def available_cpus(cpu_quota: typing.Optional[float] = None) -> int:
+        """
+        :param cpu_quota: cgroup CPU quota (see cgroup_cpu_quota())
+        :return: Number of CPUs this process can use
+        """
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+        if cpu_quota is not None:
+            cpus = min(cpus, max(1, math.ceil(cpu_quota)))
+        return cpus
+
+    @classmethod
+    def available_memory(cls) -> typing.Optional[int]:
+        """
+        :return: Memory available to this process (bytes), or None if it cannot be determined
+        """
+        available = None
+        meminfo = cls._read(cls.MEMINFO_FILE)
+        if meminfo is not None:
+            for line in meminfo.splitlines():
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) * 1024
+                    break
+
+        # cgroup v2, then v1 (v1 reports a huge number when there is no limit)
+        limits = ((os.path.join(cls.CGROUP_DIR, 'memory.max'), os.path.join(cls.CGROUP_DIR, 'memory.current')),
+                  (os.path.join(cls.CGROUP_DIR, 'memory', 'memory.limit_in_bytes'),
+                   os.path.join(cls.CGROUP_DIR, 'memory', 'memory.usage_in_bytes')))
+        for limit_file, usage_file in limits:
+            limit, usage = cls._read(limit_file), cls._read(usage_file)
+            if limit is not None and usage is not None and limit.isdigit() and int(limit) < 2 ** 60:
+                cgroup_available = max(0, int(limit) - int(usage))
+                available = cgroup_available if available is None else min(available, cgroup_available)
+                break
+
+        return available
+
+    @classmethod
+    def page_bytes(cls, dpi: typing.Optional[int] = None,
+                   page_inches: typing.Optional[typing.Tuple[float, float]] = None) -> int:
+        """
+        Estimate the size of a rendered page raster.
+
+        :param dpi: Rendering resolution
+        :param page_inches: Page (width, height) in inches
+
+        :return: Raster size in bytes
+        """
+        width, height = page_inches or cls.DEFAULT_PAGE_INCHES
+        dpi = dpi or cls.DEFAULT_DPI
+        return int(width * dpi) * int(height * dpi) * cls.BYTES_PER_PIXEL
+
+    def _size(self, num_pages: typing.Optional[int], worker_bytes: int) -> typing.Tuple[int, typing.Optional[int]]:
+        """
+        :return: Tuple of (number of workers, memory bound on the number of workers)
+        """
+        workers = self.cpus
+        if num_pages is not None:
+            workers = min(workers, num_pages)
+
+        memory_bound = None
+        if self.memory_available is not None:
+            memory_bound = int(self.memory_available * self.MEMORY_FRACTION // worker_bytes)
+            workers = min(workers, memory_bound)
+        return max(1, workers), memory_bound
+
+    def _decision(self, workers: int, num_pages: typing.Optional[int], worker_bytes: int,
+                  memory_bound: typing.Optional[int]) -> typing.Dict[str, typing.Any]:
+        return {
+            'workers': workers,
+            'pages': num_pages,
+            'cpus': self.cpus,
+            'cpu_quota': self.cpu_quota,
+            'memory_available': self.memory_available,
+            'worker_bytes': worker_bytes,
+            'memory_bound': memory_bound,
+        }
+
+    def render_threads(self, num_pages: typing.Optional[int], dpi: typing.Optional[int] = None,
+                       page_inches: typing.Optional[typing.Tuple[float, float]] = None) -> typing.Dict[str, typing.Any]:
+        """
+        Size the number of rendering threads (each thread runs its own renderer process).
+
+        :param num_pages: Number of pages to render (None: unknown)
+        :param dpi: Rendering resolution
+        :param page_inches: Page (width, height) in inches
+
+        :return: Decision: {'workers': int, and the inputs the decision was based on}
+        """
+        worker_bytes = self.page_bytes(dpi, page_inches) + self.RENDER_OVERHEAD_BYTES
+        workers, memory_bound = self._size(num_pages, worker_bytes)
+        return self._decision(workers, num_pages, worker_bytes, memory_bound)
+
+    def encode_workers(self, num_pages: typing.Optional[int], raster_bytes: typing.Optional[int] = None) -> \
+            typing.Dict[str, typing.Any]:
+        """
+        Size the number of encoding workers.
+
+        :param num_pages: Number of pages to encode (None: unknown)
+        :param raster_bytes: Size of a page raster (default: estimate for a Letter page at the default DPI)
+
+        :return: Decision: {'workers': int, and the inputs the decision was based on}
+        """
+        worker_bytes = ((raster_bytes or self.page_bytes()) * self.ENCODE_RASTERS_PER_WORKER +
+                        self.ENCODE_OVERHEAD_BYTES)
+        workers, memory_bound = self._size(num_pages, worker_bytes)
+        return self._decision(workers, num_pages, worker_bytes, memory_bound)
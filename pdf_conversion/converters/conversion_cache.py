@@ -0,0 +1,251 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+
+from pdf_conversion.documents.document_probe import DocumentProbe
+
+# fcntl is not available on every platform; without it, only the conversions of this process are serialized (several
+# processes sharing the cache directory may drop each other's index entries).
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConversionCache:
+    """
+    Persistent, content-addressed cache of conversion outputs.
+
+    Entries are keyed by the SHA-256 of the source document's content plus the effective conversion settings
+    (format, dpi, quality, lossless, renderer, ...). Outputs are copied into the cache, and the cached files are
+    read-only; a hit restores them (hardlinks, or copies if linking is not possible) into the conversion directory.
+    The converters replace an existing output file instead of writing into it (see
+    IImageFormatConverter.replace_file()), so a restored link is never modified; an entry whose files no longer have
+    their recorded sizes is treated as a miss. The total size of the cache is bounded by a byte budget; the least
+    recently used entries are evicted when the budget is exceeded.
+
+    Layout:
+        <cache_dir>/index.json          - {key: {'bytes': int, 'last_access': float, 'files': [names],
+                                                 'sizes': [bytes of each file]}}
+        <cache_dir>/<key[:2]>/<key>/*   - cached output files (read-only)
+    """
+
+    INDEX_FILE = 'index.json'
+    LOCK_FILE = 'index.json.lock'
+
+    DEFAULT_CACHE_DIR = os.path.join('~', '.cache', 'pdf_conversion')
+    DEFAULT_MAX_BYTES = 1024 ** 3       # 1 GB
+    DEFAULT_LINK = True
+
+    # Mode of the cached files.
+    ENTRY_MODE = 0o444
+
+    def __init__(self, cache_dir: typing.Optional[str] = None, max_bytes: typing.Optional[int] = 0,
+                 link: typing.Optional[bool] = None, defaults: typing.Optional[dict] = None) -> None:
+        """
+        ConversionCache Constructor
+        :param cache_dir: Directory where the cache is stored
+        :param max_bytes: Byte budget for the cache (<= 0: use the default)
+        :param link: Hardlink cached outputs into place (True), or always copy them (False)
+        :param defaults: cache defaults (read from file, used if specific values are not provided)
+        """
+        defaults = defaults or {}
+        self.cache_dir = os.path.abspath(os.path.expanduser(
+            cache_dir or defaults.get('dir', self.DEFAULT_CACHE_DIR)))
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else defaults.get(
+            'max_bytes', self.DEFAULT_MAX_BYTES)
+        self.link = link if link is not None else defaults.get('link', self.DEFAULT_LINK)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_spec: str) -> str:
+        """
+        Calculate the SHA-256 of a file's content (see DocumentProbe.file_hash()).
+
+        :param file_spec: File to hash
+
+        :return: Hex digest
+        """
+        return DocumentProbe.file_hash(file_spec)
+
+    @staticmethod
+    def make_key(content_hash: str, settings: typing.Dict[str, typing.Any]) -> str:
+        """
+        Build the cache key from the document's content hash and the effective conversion settings.
+
+        :param content_hash: SHA-256 of the source document
+        :param settings: Effective conversion settings (must be JSON serializable)
+
+        :return: Cache key (hex digest)
+        """
+        encoded_settings = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha256(f"{content_hash}:{encoded_settings}".encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    @contextmanager
+    def _locked(self) -> typing.Iterator[None]:
+        """
+        Hold an exclusive lock on the cache: between the threads of this process, and between processes (where fcntl
+        is available).
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.cache_dir, self.LOCK_FILE), "a") as LOCK:
+                fcntl.flock(LOCK, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(LOCK, fcntl.LOCK_UN)
+
+    def _read_index(self) -> typing.Dict[str, dict]:
+        index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_file):
+            return {}
+        try:
+            with open(index_file, "r") as INDEX:
+                return json.load(INDEX)
+        except (OSError, ValueError) as exc:
+            print(f"{self.__class__.__name__}: WARNING: Unable to read the cache index ({exc}); starting empty.")
+            return {}
+
+    def _write_index(self, index: typing.Dict[str, dict]) -> typing.NoReturn:
+        # Write to a temp file and rename, so a crash never leaves a partially written index.
+        index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        temp_file = f"{index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, "w") as INDEX:
+            json.dump(index, INDEX)
+        os.replace(temp_file, index_file)
+
+    def _place(self, source: str, target: str) -> typing.NoReturn:
+        """
+        Hardlink (or copy) a cached file to target, replacing any existing target.
+        """
+        if os.path.exists(target):
+            os.remove(target)
+        if self.link:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+
+    @staticmethod
+    def _intact(entry_dir: str, entry: typing.Dict[str, typing.Any]) -> bool:
+        """
+        :return: True if every file of the entry exists with its recorded size (entries stored before the sizes were
+                 recorded are checked against their total size)
+        """
+        file_specs = [os.path.join(entry_dir, name) for name in entry['files']]
+        if not all(os.path.exists(file_spec) for file_spec in file_specs):
+            return False
+        sizes = [os.path.getsize(file_spec) for file_spec in file_specs]
+        return sizes == entry['sizes'] if 'sizes' in entry else sum(sizes) == entry['bytes']
+
+    def lookup(self, key: str, output_folder: str) -> typing.Optional[typing.List[str]]:
+        """
+        Restore the cached outputs for the key into the output folder.
+
+        :param key: Cache key (see make_key())
+        :param output_folder: Directory to restore the files into
+
+        :return: List of restored file specs (in the original order), or None on a miss.
+        """
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(key)
+            entry_dir = self._entry_dir(key)
+
+            if entry is None or not self._intact(entry_dir, entry):
+                if entry is not None:
+                    print(f"{self.__class__.__name__}: WARNING: Cache entry {key} is missing files or was modified; "
+                          f"converting again.")
+                self.misses += 1
+                return None
+
+            os.makedirs(output_folder, exist_ok=True)
+            restored = []
+            for name in entry['files']:
+                target = os.path.join(output_folder, name)
+                self._place(os.path.join(entry_dir, name), target)
+                restored.append(target)
+
+            entry['last_access'] = time.time()
+            self._write_index(index)
+            self.hits += 1
+            return restored
+
+    def store(self, key: str, files: typing.List[str]) -> typing.NoReturn:
+        """
+        Add the conversion outputs to the cache (as read-only copies, so later writes to the outputs never change the
+        entry), then evict least recently used entries until the cache fits its byte budget. Outputs larger than the
+        entire budget are not cached. Only the outputs of conversions that produced every requested page should be
+        stored (see DocumentInfo.complete()).
+
+        :param key: Cache key (see make_key())
+        :param files: List of output file specs (in order)
+
+        :return: None
+        """
+        files = [file_ for file_ in files if os.path.exists(file_)]
+        sizes = [os.path.getsize(file_) for file_ in files]
+        if not files or sum(sizes) > self.max_bytes:
+            return
+
+        with self._locked():
+            entry_dir = self._entry_dir(key)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(entry_dir)
+            for file_ in files:
+                entry_file = os.path.join(entry_dir, os.path.split(file_)[-1])
+                shutil.copyfile(file_, entry_file)
+                os.chmod(entry_file, self.ENTRY_MODE)
+
+            index = self._read_index()
+            index[key] = {'bytes': sum(sizes), 'last_access': time.time(),
+                          'files': [os.path.split(file_)[-1] for file_ in files], 'sizes': sizes}
+            self._evict(index)
+            self._write_index(index)
+
+    def _evict(self, index: typing.Dict[str, dict]) -> typing.NoReturn:
+        """
+        Remove least recently used entries until the total size fits within max_bytes (index updated in place).
+        """
+        total = sum(entry['bytes'] for entry in index.values())
+        for key in sorted(index, key=lambda entry_key: index[entry_key]['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= index.pop(key)['bytes']
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self.evictions += 1
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """
+        Cache counters and usage (for run reports).
+
+        :return: Dictionary of cache statistics
+        """
+        index = self._read_index()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(index),
+            'bytes': sum(entry['bytes'] for entry in index.values()),
+            'max_bytes': self.max_bytes,
+        }
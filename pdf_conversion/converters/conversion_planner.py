@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import typing
+
+from pdf_conversion.converters.image_converter import CONVERTERS, IImageFormatConverter
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+# The converters register themselves when their module is imported.
+from pdf_conversion.converters import pdf2jpeg, pdf2png, pdf2raster, pdf2tiff, raster2image, tiff2webp  # noqa: F401
+
+
+class NoConversionPath(Exception):
+    def __init__(self, source: SupportedDocTypes, target: SupportedDocTypes) -> None:
+        super().__init__(source, target)
+        self.source = source
+        self.target = target
+
+    def __str__(self):
+        return f"No conversion path from '{self.source.value}' to '{self.target.value}'."
+
+
+class ConversionStep(typing.NamedTuple):
+    """
+    One step of a conversion path: the converter, the format it reads and the format it produces, and its cost per
+    page.
+    """
+    converter: typing.Type[IImageFormatConverter]
+    input_format: SupportedDocTypes
+    output_format: SupportedDocTypes
+    cost: float
+
+
+class ConversionPlanner:
+    """
+    Chooses the cheapest chain of registered converters (see register_converter()) from a source format to a target
+    format: the formats are the nodes of a graph, and each converter is an edge from each of its INPUT_FORMATS to its
+    OUTPUT_FORMAT, weighted by its cost per page (shortest path, Dijkstra).
+
+    e.g. - PDF to webp is rendered into memory and encoded (pdf -> raster -> webp), rather than through TIFF files;
+    PDF to PNG or JPEG is written by the backend directly. A new format is supported by registering its converter.
+    """
+
+    def __init__(self, converters: typing.Optional[typing.List[typing.Type[IImageFormatConverter]]] = None) -> None:
+        """
+        :param converters: Converters to plan with (default: the registered converters)
+        """
+        self.converters = list(CONVERTERS if converters is None else converters)
+
+    def _edges(self, input_format: SupportedDocTypes) -> typing.Iterator[ConversionStep]:
+        for converter in self.converters:
+            if input_format in converter.INPUT_FORMATS:
+                yield ConversionStep(converter, input_format, converter.OUTPUT_FORMAT, converter.cost(input_format))
+
+    def plan(self, source: SupportedDocTypes, target: SupportedDocTypes,
+             via: typing.Optional[SupportedDocTypes] = None) -> typing.List[ConversionStep]:
+        """
+        Find the cheapest conversion path.
+
+        :param source: Format of the document
+        :param target: Target format
+        :param via: Intermediate format the path must go through (e.g. - TIFF, to keep the TIFF files)
+
+        :return: List of ConversionStep (empty if the source is already in the target format)
+        :raises NoConversionPath: if no chain of registered converters leads to the target
+        """
+        if via is not None and via not in (source, target):
+            return self.plan(source, via) + self.plan(via, target)
+
+        # The counter breaks cost ties (in registration order), so steps are never compared.
+        counter = itertools.count()
+        queue = [(0.0, next(counter), source, [])]
+        visited = set()
+        while queue:
+            cost, _, doc_format, steps = heapq.heappop(queue)
+            if doc_format == target:
+                return steps
+            if doc_format in visited:
+                continue
+            visited.add(doc_format)
+
+            for step in self._edges(doc_format):
+                if step.output_format not in visited:
+                    heapq.heappush(queue, (cost + step.cost, next(counter), step.output_format, steps + [step]))
+
+        raise NoConversionPath(source, target)
+
+    def targets(self, source: SupportedDocTypes = SupportedDocTypes.PDF) -> typing.List[SupportedDocTypes]:
+        """
+        :return: The formats a document can be converted to (in-memory rasters are only intermediate)
+        """
+        reachable = []
+        pending = [source]
+        while pending:
+            for step in self._edges(pending.pop()):
+                if step.output_format not in reachable and step.output_format != source:
+                    reachable.append(step.output_format)
+                    pending.append(step.output_format)
+        return [doc_format for doc_format in reachable if doc_format != SupportedDocTypes.RASTER]
+
+    @staticmethod
+    def describe(steps: typing.List[ConversionStep]) -> str:
+        """
+        :return: Readable form of a path, e.g. - 'pdf -> raster -> webp (PdfToRaster, TiffToWebp; cost: 4.0)'
+        """
+        if not steps:
+            return 'no conversion'
+        formats = [steps[0].input_format.value] + [step.output_format.value for step in steps]
+        converters = ', '.join(step.converter.__name__ for step in steps)
+        return f"{' -> '.join(formats)} ({converters}; cost: {sum(step.cost for step in steps):0.1f})"
@@ -0,0 +1,262 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+import functools
+import os
+import typing
+
+from pdf_conversion.converters.concurrency import ConcurrencySizer
+from pdf_conversion.converters.image_converter import IImageFormatConverter
+from pdf_conversion.converters.tiff2webp import TiffToWebp
+
+
+class EncodedPage(typing.NamedTuple):
+    """
+    Result of encoding a single page: the generated image file specs, the total duration, the stage metrics
+    (encode: raster/TIFF to webp in memory; write: encoded webp to disk), and the pixel dimensions of the image.
+    """
+    files: typing.List[str]
+    duration: float
+    encode_seconds: float = 0
+    write_seconds: float = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    image_size: typing.Optional[typing.Tuple[int, int]] = None
+
+
+def encode_page(converter_args: typing.Dict[str, typing.Any],
+                converter: typing.Type[IImageFormatConverter] = TiffToWebp) -> EncodedPage:
+    """
+    Encode a single page (module level, so it can be pickled and executed by a worker process).
+
+    :param converter_args: Keyword arguments for the converter's constructor.
+    :param converter: Page converter (a step of a conversion path; see ConversionPlanner)
+
+    :return: EncodedPage (the stage metrics are only reported by converters that measure them, e.g. - TiffToWebp)
+
+    """
+    converter = converter(**converter_args).convert()
+    return EncodedPage(files=converter.images, duration=converter.conversion_duration,
+                       encode_seconds=getattr(converter, 'encode_duration', converter.conversion_duration),
+                       write_seconds=getattr(converter, 'write_duration', 0),
+                       bytes_in=getattr(converter, 'bytes_in', 0), bytes_out=getattr(converter, 'bytes_out', 0),
+                       image_size=getattr(converter, 'image_size', None))
+
+
+def warm_up() -> int:
+    """
+    No-op task used to start a worker process (and import the encoder) ahead of the first page.
+
+    :return: Process id of the worker
+    """
+    return os.getpid()
+
+
+class EncodePool:
+    """
+    Fans page encoding out across a pool of workers. Results are returned in the order the pages were submitted,
+    regardless of the order in which the workers finish.
+
+    By default, a pool of workers is started for each set of pages encoded. A conversion that encodes several sets
+    of pages (e.g. - one per page range) keeps its workers running while it is reserved(). A long-running process
+    (e.g. - the conversion service) can start() the pool once: the workers are kept warm and shared by all
+    conversions (and concurrent callers) until shutdown().
+    """
+
+    PROCESS = 'process'
+    THREAD = 'thread'
+    POOL_TYPES = (PROCESS, THREAD)
+
+    DEFAULT_POOL_TYPE = PROCESS
+    DEFAULT_WORKERS = 0             # 0 = one worker per available CPU
+
+    def __init__(self, workers: typing.Optional[typing.Union[int, str]] = 0, pool_type: typing.Optional[str] = None,
+                 defaults: typing.Optional[dict] = None) -> None:
+        """
+        EncodePool Constructor
+        :param workers: Number of encoding workers (<= 0: use the default, 0 in the default = one per CPU), or 'auto'
+              (sized from the number of pages, the usable CPUs and the available memory - see ConcurrencySizer)
+        :param pool_type: 'process' (pages are encoded in separate processes) or 'thread' (relies on Pillow
+              releasing the GIL while encoding)
+        :param defaults: encoder defaults (read from file, used if specific values are not provided)
+        """
+        defaults = defaults or {}
+        self.workers = (workers if workers == ConcurrencySizer.AUTO or (workers and workers > 0) else
+                        defaults.get('encoders', self.DEFAULT_WORKERS))
+
+        # 'auto': size for an unknown number of pages now (upper bound); refined for each set of pages encoded.
+        self.auto = self.workers == ConcurrencySizer.AUTO
+        self.sizing = None
+        if self.auto:
+            self.sizing = ConcurrencySizer().encode_workers(num_pages=None)
+            self.workers = self.sizing['workers']
+        elif self.workers <= 0:
+            self.workers = os.cpu_count() or 1
+
+        self.pool_type = (pool_type or defaults.get('encode_pool', self.DEFAULT_POOL_TYPE)).lower()
+        if self.pool_type not in self.POOL_TYPES:
+            print(f"WARNING: Unrecognized encode pool type: '{self.pool_type}' -- "
+                  f"Using the default pool type: '{self.DEFAULT_POOL_TYPE}'")
+            self.pool_type = self.DEFAULT_POOL_TYPE
+
+        self._executor = None
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    @property
+    def running_executor(self) -> typing.Optional[Executor]:
+        """
+        The executor of the started (or reserved) workers, for callers that submit pages themselves (e.g. - the
+        streaming pipeline). It is owned by the pool: callers must not shut it down.
+
+        :return: Executor, or None if the pool is not started
+        """
+        return self._executor
+
+    def start(self) -> "EncodePool":
+        """
+        Start the workers now, and keep them running until shutdown().
+
+        :return: self (allows chaining of methods)
+        """
+        if self._executor is None:
+            self._executor = (ThreadPoolExecutor(max_workers=self.workers) if self.pool_type == self.THREAD else
+                              ProcessPoolExecutor(max_workers=self.workers))
+            # Worker processes are spawned on demand; submit a task per worker so they are all running.
+            for future in [self._executor.submit(warm_up) for _ in range(self.workers)]:
+                future.result()
+        return self
+
+    def shutdown(self, wait: bool = True) -> typing.NoReturn:
+        """
+        Stop the workers started by start().
+
+        :param wait: Wait for the pages being encoded to finish (False: return immediately; they finish in their
+              worker)
+
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    @contextmanager
+    def reserved(self, num_jobs: typing.Optional[int] = None, wait: bool = True) -> typing.Iterator["EncodePool"]:
+        """
+        Keep the workers running for the lifetime of a conversion, instead of starting a pool for each set of pages
+        encoded. The workers are sized for all the pages of the conversion, and stopped on exit. A started pool is
+        used (and left running) as is.
+
+        :param num_jobs: Number of pages the conversion encodes (None: unknown; use the configured number of workers)
+        :param wait: On exit, wait for the pages being encoded to finish (see shutdown())
+
+        :return: self
+        """
+        num_jobs = self.workers if num_jobs is None else num_jobs
+        if self._executor is not None or num_jobs <= 1 or self.size(num_jobs) == 1:
+            yield self
+            return
+
+        self._executor = self.executor(num_jobs)
+        try:
+            yield self
+        finally:
+            self.shutdown(wait=wait)
+
+    def size(self, num_jobs: int, raster_bytes: typing.Optional[int] = None) -> int:
+        """
+        Number of workers to use for a set of pages. In 'auto' mode, the workers are sized for the pages (and the
+        decision is kept in self.sizing).
+
+        :param num_jobs: Number of pages to encode
+        :param raster_bytes: Size of a page raster (if known)
+
+        :return: Number of workers
+        """
+        if self.auto:
+            self.sizing = ConcurrencySizer().encode_workers(num_jobs, raster_bytes)
+            return self.sizing['workers']
+        return max(1, min(self.workers, num_jobs))
+
+    def executor(self, num_jobs: int, raster_bytes: typing.Optional[int] = None) -> Executor:
+        """
+        Build an executor sized for the number of jobs (never more workers than pages).
+
+        :param num_jobs: Number of pages to encode
+        :param raster_bytes: Size of a page raster (if known; see size())
+
+        :return: Executor instance
+
+        """
+        workers = self.size(num_jobs, raster_bytes)
+        if self.pool_type == self.THREAD:
+            return ThreadPoolExecutor(max_workers=workers)
+        return ProcessPoolExecutor(max_workers=workers)
+
+    def encode(self, jobs: typing.List[typing.Dict[str, typing.Any]],
+               converter: typing.Type[IImageFormatConverter] = TiffToWebp) -> typing.List[EncodedPage]:
+        """
+        Encode all pages.
+
+        :param jobs: List of converter keyword argument dictionaries, one per page (in page order)
+        :param converter: Page converter (default: TiffToWebp)
+
+        :return: List of EncodedPage, in the same order as the jobs.
+
+        """
+        if not jobs:
+            return []
+
+        # Size the raster from the first in-memory page (TIFF files are only opened by the workers).
+        raster = jobs[0].get('src_image')
+        raster_bytes = raster.width * raster.height * len(raster.getbands()) if raster is not None else None
+
+        task = functools.partial(encode_page, converter=converter)
+
+        # No point in paying for pool start-up for a single page or a single worker.
+        if self.size(len(jobs), raster_bytes) == 1:
+            return [task(job) for job in jobs]
+
+        # Started pool: the workers are already running (and shared), so they are not sized per document.
+        if self._executor is not None:
+            return list(self._executor.map(task, jobs))
+
+        with self.executor(len(jobs), raster_bytes) as executor:
+            return list(executor.map(task, jobs))
+
+    async def encode_async(self, jobs: typing.List[typing.Dict[str, typing.Any]],
+                           converter: typing.Type[IImageFormatConverter] = TiffToWebp) -> typing.List[EncodedPage]:
+        """
+        Encode all pages without blocking the event loop (see encode()). If the calling task is cancelled, the pages
+        that have not started encoding are cancelled (pages being encoded finish in their worker).
+
+        :param jobs: List of converter keyword argument dictionaries, one per page (in page order)
+        :param converter: Page converter (default: TiffToWebp)
+
+        :return: List of EncodedPage, in the same order as the jobs.
+
+        """
+        if not jobs:
+            return []
+
+        loop = asyncio.get_running_loop()
+        task = functools.partial(encode_page, converter=converter)
+        raster = jobs[0].get('src_image')
+        raster_bytes = raster.width * raster.height * len(raster.getbands()) if raster is not None else None
+
+        # A single worker encodes in the loop's default executor (no pool start-up).
+        if self.size(len(jobs), raster_bytes) == 1:
+            return [await loop.run_in_executor(None, task, job) for job in jobs]
+
+        # Started pool: shared by all callers; otherwise, a pool is started for these pages.
+        executor = self._executor or self.executor(len(jobs), raster_bytes)
+        futures = [loop.run_in_executor(executor, task, job) for job in jobs]
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+            if executor is not self._executor:
+                executor.shutdown(wait=False)
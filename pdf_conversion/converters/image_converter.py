@@ -1,12 +1,36 @@
 from abc import ABC, abstractmethod
+import os
 import typing
 
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
 
 class IImageFormatConverter(ABC):
+    """
+    Base class of the format converters. Converters registered in CONVERTERS (see register_converter()) are the steps
+    of the conversion paths chosen by ConversionPlanner: each declares the formats it reads (INPUT_FORMATS), the format
+    it produces (OUTPUT_FORMAT), its cost per page (see cost()) and the defaults section it reads (DEFAULTS_SECTION).
+    """
 
     IMAGE_FORMAT = None
     IMAGE_EXTENSION = None
 
+    INPUT_FORMATS = ()
+    OUTPUT_FORMAT = None
+    DEFAULTS_SECTION = None
+
+    # Relative cost of converting a page (1.0: rendering a PDF page into memory).
+    COST = 1.0
+
+    @classmethod
+    def cost(cls, input_format: SupportedDocTypes) -> float:
+        """
+        :param input_format: Format of the pages read (one of INPUT_FORMATS)
+
+        :return: Relative cost of converting a page from the input format
+        """
+        return cls.COST
+
     def __init__(
             self, src_file_spec: str, output_file: typing.Optional[str] = None,
             output_folder: typing.Optional[str] = '.', extension: typing.Optional[int] = None, **kwargs) -> None:
@@ -49,3 +73,34 @@ class IImageFormatConverter(ABC):
             self
         """
         pass
+
+    @staticmethod
+    def replace_file(file_spec: str) -> str:
+        """
+        Remove an existing output file before it is written again: the file may be a hardlink to a conversion cache
+        entry (see ConversionCache), which must not be overwritten in place.
+
+        :param file_spec: Output file spec
+
+        :return: The file spec
+        """
+        if os.path.lexists(file_spec):
+            os.remove(file_spec)
+        return file_spec
+
+    def settings(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: The effective settings that affect the output (part of the conversion cache key)
+        """
+        return {}
+
+
+CONVERTERS = []
+
+
+def register_converter(converter_class: typing.Type[IImageFormatConverter]) -> typing.Type[IImageFormatConverter]:
+    """
+    Class decorator: register a format converter as a step of the conversion paths (see ConversionPlanner).
+    """
+    CONVERTERS.append(converter_class)
+    return converter_class
@@ -0,0 +1,129 @@
+import collections.abc
+import threading
+import typing
+
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+if typing.TYPE_CHECKING:
+    from pdf_conversion.converters.pdf_conversion import PDFConversion
+
+
+class LazyPages(collections.abc.Sequence):
+    """
+    The pages of a document, converted on demand (see PDFConversion.lazy()). Reading a page (pages[0] is page 1)
+    converts it, along with the next read_ahead pages that have not been converted yet, and returns the files generated
+    for the page; the pages are kept, so reading them again does not convert them again. A page whose conversion
+    failed (no files were generated) is converted again when it is read again.
+
+    The reads share one EncodePool: it is started by the first read, and its workers are kept until close(). The pool
+    belongs to the pages (the conversion only uses it while a page is read), so the conversion's other methods do not
+    keep it running.
+
+    e.g. - a viewer that shows the first pages of a document only pays for those pages:
+
+        with PDFConversion(document).lazy(SupportedDocTypes.WEBP) as pages:
+            first_page_files = pages[0]
+    """
+
+    # Number of pages converted after the page being read (in the same conversion).
+    READ_AHEAD_KW = 'read_ahead'
+    DEFAULT_READ_AHEAD = 2
+
+    def __init__(self, conversion: "PDFConversion", doc_format: SupportedDocTypes,
+                 read_ahead: typing.Optional[int] = None, defaults: typing.Optional[dict] = None,
+                 pool: typing.Optional[EncodePool] = None, **kwargs) -> None:
+        """
+        :param conversion: The document's conversion (each read converts a page range with PDFConversion.convert())
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param read_ahead: Number of pages converted after the page being read (< 0 or None: use the default)
+        :param defaults: rendering defaults (read from file)
+        :param pool: EncodePool of the reads (started by the first read, unless it is already running)
+        :param kwargs: The conversion args (see PDFConversion.convert())
+        """
+        defaults = defaults or {}
+        self.conversion = conversion
+        self.doc_format = doc_format
+        self.read_ahead = (read_ahead if read_ahead is not None and read_ahead >= 0 else
+                           defaults.get(self.READ_AHEAD_KW, self.DEFAULT_READ_AHEAD))
+        self.kwargs = kwargs
+        self.pool = pool
+        self._started_pool = False
+        self.closed = False
+
+        # Pages that have been converted; conversions are serialized (concurrent reads of the same page wait for it).
+        self.converted = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        probe = self.conversion.document.probe()
+        return probe.page_count if probe is not None else 0
+
+    def __getitem__(self, index: typing.Union[int, slice]) -> typing.Union[typing.List[str],
+                                                                          typing.List[typing.List[str]]]:
+        """
+        :param index: Page index (0-based; negative indexes count from the last page), or a slice of pages
+
+        :return: The files generated for the page (a list of them, for a slice)
+        """
+        num_pages = len(self)
+        if isinstance(index, slice):
+            return [self[page_index] for page_index in range(*index.indices(num_pages))]
+
+        if index < 0:
+            index += num_pages
+        if not 0 <= index < num_pages:
+            raise IndexError(f"Page index out of range: {index} ({num_pages} page(s))")
+
+        page_num = index + 1
+        with self._lock:
+            if page_num not in self.converted:
+                self._convert(page_num, num_pages)
+        return [artifact.path for artifact in self.conversion.document.artifacts.page(page_num)]
+
+    def _convert(self, page_num: int, num_pages: int) -> typing.NoReturn:
+        """
+        Convert the page, and the next read_ahead pages (up to the next page already converted).
+
+        :param page_num: Page number of the page being read
+        :param num_pages: Number of pages in the document
+
+        :return: None
+        """
+        last_page = page_num
+        while (last_page < min(page_num + self.read_ahead, num_pages) and
+               last_page + 1 not in self.converted):
+            last_page += 1
+
+        if self.pool is not None and not self.pool.started and not self.closed:
+            self.pool.start()
+            self._started_pool = True
+
+        shared_pool, self.conversion.pool = self.conversion.pool, self.pool
+        try:
+            self.conversion.convert(self.doc_format, first_page=page_num, last_page=last_page, **self.kwargs)
+        finally:
+            self.conversion.pool = shared_pool
+
+        # Render and encode failures are reported, not raised: only the pages that have their files are kept.
+        self.converted.update(num for num in range(page_num, last_page + 1)
+                              if self.conversion.document.artifacts.get(num, self.doc_format))
+
+    def close(self) -> typing.NoReturn:
+        """
+        Stop the encode workers started by the reads (a pool that was already running is left running). Pages read
+        after close() are encoded without a warm pool: the pool is not started again.
+
+        :return: None
+        """
+        with self._lock:
+            self.closed = True
+            if self._started_pool:
+                self.pool.shutdown()
+                self._started_pool = False
+
+    def __enter__(self) -> "LazyPages":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> typing.NoReturn:
+        self.close()
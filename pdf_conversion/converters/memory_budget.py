@@ -0,0 +1,233 @@
+import os
+import platform
+import re
+import resource
+import threading
+import typing
+
+from pdf_conversion.converters.concurrency import ConcurrencySizer
+from pdf_conversion.documents.document_probe import DocumentProbe
+
+
+class PeakMemoryMonitor:
+    """
+    Samples the resident set size of this process plus all of its child processes (e.g. - pdftoppm) while active,
+    and records the peak. Uses /proc (Linux); elsewhere, falls back to getrusage() (lifetime peak of the process).
+
+    Usage:
+        with PeakMemoryMonitor() as monitor:
+            <work>
+        monitor.peak_rss   # bytes
+    """
+
+    DEFAULT_INTERVAL = 0.02
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        """
+        :param interval: Sampling interval in seconds
+        """
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _rss(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/statm", "r") as STATM:
+                return int(STATM.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    @staticmethod
+    def _children(pid: int) -> typing.List[int]:
+        children = []
+        try:
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children", "r") as CHILDREN:
+                    children.extend(int(child) for child in CHILDREN.read().split())
+        except (OSError, ValueError):
+            pass
+        return children
+
+    def sample(self) -> int:
+        """
+        :return: Current RSS (bytes) of this process and all of its descendants.
+        """
+        total = 0
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            total += self._rss(pid)
+            pending.extend(self._children(pid))
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakMemoryMonitor":
+        if os.path.exists('/proc/self/statm'):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, self.sample())
+        else:
+            # ru_maxrss is reported in KB on Linux, bytes on macOS.
+            scale = 1 if platform.system() == 'Darwin' else 1024
+            self.peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+
+
+class MemoryBudget:
+    """
+    Bounds the memory used by in-memory page rasters.
+
+    Each page's raster size is estimated from its dimensions (see DocumentProbe) and the DPI. Rendering is split into
+    page-range chunks that fit the raster budget, and the renderer must reserve a chunk's bytes before rendering it;
+    the bytes are released as the pages are encoded, so a renderer that gets ahead of the encoders blocks
+    (backpressure) instead of accumulating rasters.
+
+    Only RASTER_FRACTION of the budget is used for rasters: the rest is left for the encoders' working copies, the
+    renderer processes and the interpreter itself.
+    """
+
+    MAX_MEMORY_KW = 'max_memory'
+    DEFAULT_MAX_MEMORY = 0          # 0 = no budget
+
+    RASTER_FRACTION = 0.5
+
+    # Interval (seconds) at which a blocked reservation re-checks whether it has been cancelled.
+    POLL_INTERVAL = 0.1
+
+    UNITS = {'': 1, 'k': 2 ** 10, 'm': 2 ** 20, 'g': 2 ** 30, 't': 2 ** 40}
+    SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$', re.IGNORECASE)
+
+    def __init__(self, max_bytes: typing.Optional[typing.Union[int, str]] = None,
+                 defaults: typing.Optional[dict] = None) -> None:
+        """
+        MemoryBudget Constructor
+        :param max_bytes: Memory budget, in bytes or with a unit (e.g. - '2G', '512M'); None or 0: use the default
+        :param defaults: rendering defaults (read from file, used if specific values are not provided)
+        """
+        defaults = defaults or {}
+        self.max_bytes = self.parse_bytes(max_bytes) or self.parse_bytes(
+            defaults.get(self.MAX_MEMORY_KW, self.DEFAULT_MAX_MEMORY))
+        self.raster_budget = int(self.max_bytes * self.RASTER_FRACTION)
+
+        self.in_use = 0
+        self.peak_in_use = 0
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @classmethod
+    def parse_bytes(cls, value: typing.Optional[typing.Union[int, str]]) -> int:
+        """
+        Parse a byte count: an int, or a string with an optional unit (K, M, G, T; binary multiples).
+
+        :param value: Value to parse
+        :return: Number of bytes (0 if not set)
+        """
+        if value is None or isinstance(value, (int, float)):
+            return max(0, int(value or 0))
+
+        match = cls.SIZE_PATTERN.match(str(value))
+        if match is None:
+            raise ValueError(f"Invalid memory size: '{value}' (expected e.g. 2G, 512M or a number of bytes)")
+        return int(float(match.group(1)) * cls.UNITS[match.group(2).lower()])
+
+    @staticmethod
+    def page_sizes(file_spec: str, first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                   probe: typing.Optional[DocumentProbe] = None) -> typing.List[typing.Tuple[float, float]]:
+        """
+        Get the page dimensions (from the document's probe).
+
+        :param file_spec: PDF file spec
+        :param first_page: First page (default: 1)
+        :param last_page: Last page (default: last page of the document)
+        :param probe: The document's probe (if not provided, the document is probed; without the content hash)
+
+        :return: List of (width, height) in inches, one per page (in page order)
+        """
+        probe = probe or DocumentProbe.probe(file_spec, hash_content=False)
+        return probe.page_inches(first_page, last_page, default=ConcurrencySizer.DEFAULT_PAGE_INCHES)
+
+    @classmethod
+    def page_bytes(cls, file_spec: str, dpi: int, first_page: typing.Optional[int] = None,
+                   last_page: typing.Optional[int] = None,
+                   probe: typing.Optional[DocumentProbe] = None) -> typing.List[int]:
+        """
+        Estimate the raster size of each page.
+
+        :return: List of raster sizes in bytes, one per page (in page order)
+        """
+        return [ConcurrencySizer.page_bytes(dpi, size)
+                for size in cls.page_sizes(file_spec, first_page, last_page, probe=probe)]
+
+    def chunks(self, page_bytes: typing.List[int], first_page: int = 1, max_pages: typing.Optional[int] = None,
+               budget: typing.Optional[int] = None) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Split pages into contiguous (first_page, last_page) ranges whose rasters fit the budget. A page that does
+        not fit the budget on its own is rendered by itself.
+
+        :param page_bytes: Raster size of each page (see page_bytes())
+        :param first_page: Page number of the first entry in page_bytes
+        :param max_pages: Max number of pages per chunk (optional)
+        :param budget: Bytes per chunk (default: the raster budget)
+
+        :return: List of inclusive page ranges
+        """
+        budget = budget or self.raster_budget
+        ranges = []
+        chunk_bytes = 0
+        for page_num, size in enumerate(page_bytes, start=first_page):
+            if (ranges and ranges[-1][1] == page_num - 1 and chunk_bytes + size <= budget and
+                    (max_pages is None or page_num - ranges[-1][0] < max_pages)):
+                ranges[-1] = (ranges[-1][0], page_num)
+                chunk_bytes += size
+            else:
+                if size > budget:
+                    print(f"{self.__class__.__name__}: WARNING: Page {page_num} ({size / 2 ** 20:0.1f} MB raster) "
+                          f"exceeds the memory budget ({budget / 2 ** 20:0.1f} MB); rendering it by itself.")
+                ranges.append((page_num, page_num))
+                chunk_bytes = size
+        return ranges
+
+    def reserve(self, num_bytes: int, stop: typing.Optional[threading.Event] = None) -> bool:
+        """
+        Reserve raster bytes, blocking until they fit the budget (or nothing else is reserved, so an oversized
+        chunk can still make progress).
+
+        :param num_bytes: Bytes to reserve
+        :param stop: Event that cancels the wait (optional)
+
+        :return: True if reserved, False if cancelled
+        """
+        with self._condition:
+            while self.in_use > 0 and self.in_use + num_bytes > self.raster_budget:
+                if stop is not None and stop.is_set():
+                    return False
+                self._condition.wait(self.POLL_INTERVAL)
+            self.in_use += num_bytes
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            return True
+
+    def release(self, num_bytes: int) -> typing.NoReturn:
+        """
+        Release reserved raster bytes (e.g. - once a page has been encoded).
+
+        :param num_bytes: Bytes to release
+        :return: None
+        """
+        with self._condition:
+            self.in_use = max(0, self.in_use - num_bytes)
+            self._condition.notify_all()
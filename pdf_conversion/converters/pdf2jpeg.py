@@ -0,0 +1,34 @@
+import typing
+
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.image_converter import register_converter
+from pdf_conversion.converters.pdf2png import PdfToPng
+from pdf_conversion.converters.renderers import IRenderer
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+@register_converter
+class PdfToJpeg(PdfToPng):
+    """
+    PDF to JPEG conversion, using a pluggable rendering backend (see PdfToTiff). The backend writes the JPEG files
+    directly (one file per page, at the backend's default quality). JPEG has no bilevel mode: mono pages are written
+    as gray.
+    """
+    IMAGE_FORMAT = 'jpeg'
+    IMAGE_EXTENSION = SupportedDocTypes.JPEG.value
+
+    OUTPUT_FORMAT = SupportedDocTypes.JPEG
+    COST = 1.3
+    FILE_FORMAT = IRenderer.JPEG
+
+    def _render_pages(self, backend: IRenderer, first_page: typing.Optional[int], last_page: typing.Optional[int],
+                      color_mode: str) -> typing.List[typing.Any]:
+        if color_mode == ColorMode.MONO:
+            color_mode = ColorMode.GRAY
+        return super()._render_pages(backend, first_page, last_page, color_mode)
+
+    async def _render_pages_async(self, backend: IRenderer, first_page: typing.Optional[int],
+                                  last_page: typing.Optional[int], color_mode: str) -> typing.List[typing.Any]:
+        if color_mode == ColorMode.MONO:
+            color_mode = ColorMode.GRAY
+        return await super()._render_pages_async(backend, first_page, last_page, color_mode)
@@ -0,0 +1,38 @@
+import typing
+
+from pdf_conversion.converters.image_converter import register_converter
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.renderers import IRenderer
+from pdf_conversion.documents.document_probe import DocumentProbe
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+@register_converter
+class PdfToPng(PdfToTiff):
+    """
+    PDF to PNG conversion, using a pluggable rendering backend (see PdfToTiff). The backend writes the PNG files
+    directly (one file per page), so no intermediate TIFF file or raster is written or encoded.
+    """
+    IMAGE_FORMAT = 'png'
+    IMAGE_EXTENSION = SupportedDocTypes.PNG.value
+
+    OUTPUT_FORMAT = SupportedDocTypes.PNG
+    COST = 1.5
+    FILE_FORMAT = IRenderer.PNG
+
+    def __init__(self, src_file_spec: str, output_file: typing.Optional[str] = None, dpi: typing.Optional[int] = 0,
+                 threads: typing.Optional[int] = 0, output_folder: typing.Optional[str] = '.',
+                 extension: typing.Optional[int] = None, defaults: typing.Optional[dict] = None,
+                 first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                 renderer: typing.Optional[str] = None, probe: typing.Optional[DocumentProbe] = None,
+                 color_mode: typing.Optional[str] = None, **kwargs) -> None:
+        """
+        PdfToPng Constructor (see PdfToTiff for parameter details)
+        """
+        super().__init__(
+            src_file_spec=src_file_spec, output_file=output_file, dpi=dpi, threads=threads,
+            output_folder=output_folder, extension=extension, defaults=defaults, first_page=first_page,
+            last_page=last_page, renderer=renderer, probe=probe, color_mode=color_mode, **kwargs)
+
+        # PNG pages are always written one file per page (the TIFF container and compression do not apply).
+        self.multipage = False
@@ -0,0 +1,73 @@
+import typing
+
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.image_converter import register_converter
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.renderers import IRenderer
+from pdf_conversion.documents.document_probe import DocumentProbe
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+@register_converter
+class PdfToRaster(PdfToTiff):
+    """
+    PDF to in-memory raster conversion, using a pluggable rendering backend (see PdfToTiff).
+
+    pdftoppm (the default) and ghostscript stream each page as PPM data over stdout, so the rendered pages are returned
+    as PIL images and no intermediate file is written to disk. The resulting rasters can be handed directly to an
+    encoder (e.g. TiffToWebp).
+    """
+    IMAGE_FORMAT = 'ppm'
+    IMAGE_EXTENSION = 'ppm'
+    DEFAULT_RENDERER = 'pdftoppm'
+
+    OUTPUT_FORMAT = SupportedDocTypes.RASTER
+    COST = 1.0
+
+    def __init__(self, src_file_spec: str, output_file: typing.Optional[str] = None, dpi: typing.Optional[int] = 0,
+                 threads: typing.Optional[int] = 0, output_folder: typing.Optional[str] = '.',
+                 extension: typing.Optional[int] = None, defaults: typing.Optional[dict] = None,
+                 first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                 renderer: typing.Optional[str] = None, probe: typing.Optional[DocumentProbe] = None,
+                 color_mode: typing.Optional[str] = None, **kwargs) -> None:
+        """
+        PdfToRaster Constructor (see PdfToTiff for parameter details)
+        """
+        super().__init__(
+            src_file_spec=src_file_spec, output_file=output_file, dpi=dpi, threads=threads,
+            output_folder=output_folder, extension=extension, defaults=defaults, first_page=first_page,
+            last_page=last_page, renderer=renderer, probe=probe, color_mode=color_mode, **kwargs)
+
+        # Pages are rendered into memory, never into a container.
+        self.multipage = False
+
+    def _render_pages(self, backend: IRenderer, first_page: typing.Optional[int], last_page: typing.Optional[int],
+                      color_mode: str) -> typing.List[typing.Any]:
+        """
+        Render a page range into memory, in a color mode (see PdfToTiff._render()).
+
+        :param backend: Instantiated rendering backend
+        :param first_page: First page (None: first page of the document)
+        :param last_page: Last page (None: last page of the document)
+        :param color_mode: rgb, gray or mono
+
+        :return: List of PIL images
+        """
+        return backend.render_images(self.src_file_spec, dpi=self.dpi, threads=self.threads, first_page=first_page,
+                                     last_page=last_page, color_mode=color_mode)
+
+    async def _render_pages_async(self, backend: IRenderer, first_page: typing.Optional[int],
+                                  last_page: typing.Optional[int], color_mode: str) -> typing.List[typing.Any]:
+        """
+        Render a page range into memory, without blocking the event loop (see _render_pages()).
+        """
+        return await backend.render_images_async(self.src_file_spec, dpi=self.dpi, threads=self.threads,
+                                                 first_page=first_page, last_page=last_page, color_mode=color_mode)
+
+    def output_bytes(self) -> int:
+        """
+        Size of the rendered output (for the conversion metrics).
+
+        :return: Total size (bytes) of the in-memory rasters
+        """
+        return sum(ColorMode.raster_bytes(image) for image in self.images)
@@ -1,35 +1,86 @@
+import asyncio
+import contextlib
 import os
+import shutil
+import tempfile
 from time import perf_counter
 import typing
 
 import pdf2image
 import pdf2image.exceptions as pdf_exc
 
-from pdf_conversion.converters.image_converter import IImageFormatConverter
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.concurrency import ConcurrencySizer
+from pdf_conversion.converters.image_converter import IImageFormatConverter, register_converter
+from pdf_conversion.converters.renderers import IRenderer, RENDERERS, RendererError, RendererSelector
+from pdf_conversion.converters.tiff_compression import TiffCompression
+from pdf_conversion.converters.tiff_container import TiffContainer
+from pdf_conversion.documents.document_probe import DocumentProbe
 from pdf_conversion.documents.file_extensions import SupportedDocTypes
 
 
+@register_converter
 class PdfToTiff(IImageFormatConverter):
     """
-    PDF to TIFF conversion, using the 'pdf2image' python implementation.
+    PDF to TIFF conversion, using a pluggable rendering backend (see converters.renderers: pdftoppm, pdftocairo,
+    ghostscript, or 'auto' to pick the fastest installed backend for the document's class).
     """
     IMAGE_FORMAT = 'tiff'
     IMAGE_EXTENSION = SupportedDocTypes.TIFF.value
+
+    INPUT_FORMATS = (SupportedDocTypes.PDF,)
+    OUTPUT_FORMAT = SupportedDocTypes.TIFF
+    DEFAULTS_SECTION = DefaultValues.TIFF_DEFAULTS
+    COST = 1.2
+
+    # File format written by the backend (see IRenderer.FILE_EXTENSIONS).
+    FILE_FORMAT = IRenderer.TIFF
     DEFAULT_DPI = 200
     DEFAULT_THREADS = 4
+    DEFAULT_RENDERER = 'pdftocairo'
+
+    MULTIPAGE_KW = 'multipage'
+
+    # Document class of a renderer resolved from 'auto' (see PDFConversion.resolve_renderer()); the render's
+    # throughput is recorded for it.
+    DOC_CLASS_KW = 'doc_class'
+    DEFAULT_MULTIPAGE = False
+
+    # Errors reported (rather than raised) by convert()/convert_async().
+    RENDER_ERRORS = (pdf_exc.PDFInfoNotInstalledError, pdf_exc.PDFPageCountError, pdf_exc.PDFSyntaxError,
+                     pdf_exc.PopplerNotInstalledError, RendererError, OSError)
 
     def __init__(self, src_file_spec: str, output_file: typing.Optional[str] = None, dpi: typing.Optional[int] = 0,
-                 threads: typing.Optional[int] = 0, output_folder: typing.Optional[str] = '.',
-                 extension: typing.Optional[int] = None, defaults: typing.Optional[dict] = None, **kwargs) -> None:
+                 threads: typing.Optional[typing.Union[int, str]] = 0, output_folder: typing.Optional[str] = '.',
+                 extension: typing.Optional[int] = None, defaults: typing.Optional[dict] = None,
+                 first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                 renderer: typing.Optional[str] = None, probe: typing.Optional[DocumentProbe] = None,
+                 color_mode: typing.Optional[str] = None, compression: typing.Optional[str] = None,
+                 multipage: typing.Optional[bool] = None, doc_class: typing.Optional[str] = None, **kwargs) -> None:
         """
         PdfToTiff Constructor
         :param src_file_spec: File spec (path + name) of file to convert
         :param output_file: Name or template to use as converted output filename(s)
         :param dpi: Dots Per Inch resolution
-        :param threads: Number of threads to use in converting PDP to tiff (recommended: max of 4)
+        :param threads: Number of threads to use in converting PDP to tiff, or 'auto' (sized from the page count,
+              CPUs and available memory when the conversion starts - see ConcurrencySizer)
         :param output_folder: Path to directory where output files are located
         :param extension: extension of output file
         :param defaults: image conversion default (read from file, used if specific values are not provided)
+        :param first_page: First page (1-based) to convert (default: first page of the document)
+        :param last_page: Last page (1-based, inclusive) to convert (default: last page of the document)
+        :param renderer: Rendering backend: pdftoppm, pdftocairo, ghostscript or auto
+        :param probe: The document's probe (see DocumentInfo.probe()); provides the page count, so the backend
+              does not need to read it
+        :param color_mode: rgb, gray, mono or auto (each page is rendered in the smallest mode that keeps its
+              content; see ColorMode)
+        :param compression: TIFF compression: none, lzw, deflate, packbits or g4 (g4 applies to mono pages, the
+              others are compressed with lzw; see TiffCompression)
+        :param multipage: Write a single multi-page TIFF (see TiffContainer) instead of one file per page. The pages
+              are rendered into a temporary folder, and appended to the container one at a time
+        :param doc_class: Document class the renderer was selected for, if 'auto' was already resolved (see
+              RendererSelector); the throughput of the render is recorded for it
         :param kwargs: any extra arguments (used as a catch all for other arguments - based on inheritance
               from parent class)
         """
@@ -40,7 +91,193 @@ class PdfToTiff(IImageFormatConverter):
 
         defaults = defaults or {}
         self.dpi = dpi if dpi > 0 else defaults.get('dpi', self.DEFAULT_DPI)
-        self.threads = threads if threads > 0 else defaults.get('threads', self.DEFAULT_THREADS)
+        self.threads = (threads if threads == ConcurrencySizer.AUTO or (threads and threads > 0) else
+                        defaults.get('threads', self.DEFAULT_THREADS))
+        self.sizing = None
+        self.first_page = first_page
+        self.last_page = last_page
+        self.probe = probe
+        self.color_mode = ColorMode.resolve(color_mode, defaults)
+        self.page_modes = []
+        self.compression = TiffCompression.resolve(compression, defaults)
+        self.multipage = bool(multipage if multipage is not None else
+                              defaults.get(self.MULTIPAGE_KW, self.DEFAULT_MULTIPAGE))
+        self.page_folder = output_folder
+        self.container_pages = []
+
+        # 'auto' is resolved to an installed backend here, unless the conversion resolved it already (see
+        # PDFConversion.resolve_renderer()); doc_class is only set for 'auto' selections (see RendererSelector).
+        self.renderer, self.doc_class = RendererSelector().resolve(
+            renderer or defaults.get('renderer', self.DEFAULT_RENDERER), src_file_spec)
+        self.doc_class = self.doc_class or doc_class
+
+    def page_range(self) -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+        """
+        The page range to render. An open ended range is closed with the probed page count (if available).
+
+        :return: Tuple of (first page, last page); None: not specified
+        """
+        last_page = self.last_page
+        if last_page is None and self.probe is not None:
+            last_page = self.probe.page_count
+        return self.first_page, last_page
+
+    def _size_threads(self) -> typing.NoReturn:
+        """
+        Resolve 'auto' threads for the pages being rendered; the decision is kept in self.sizing.
+
+        :return: None
+        """
+        num_pages = None
+        first_page, last_page = self.page_range()
+        if last_page is not None:
+            num_pages = last_page - (first_page or 1) + 1
+        else:
+            try:
+                num_pages = int(pdf2image.pdfinfo_from_path(self.src_file_spec)['Pages'])
+                num_pages -= (self.first_page or 1) - 1
+            except (pdf_exc.PDFInfoNotInstalledError, pdf_exc.PDFPageCountError, pdf_exc.PDFSyntaxError,
+                    OSError) as exc:
+                print(f"{self.__class__.__name__}: WARNING: Unable to read the page count ({exc}).")
+
+        self.sizing = ConcurrencySizer().render_threads(num_pages, self.dpi)
+        self.threads = self.sizing['workers']
+
+    def _render(self, backend: IRenderer) -> typing.List[typing.Any]:
+        """
+        Render the pages with the backend, in the color mode of each page (see _render_pages()).
+
+        :param backend: Instantiated rendering backend
+        :return: List of rendered pages
+        """
+        first_page, last_page = self.page_range()
+        if self.color_mode != ColorMode.AUTO:
+            images = self._render_pages(backend, first_page, last_page, self.color_mode)
+            self.page_modes = [self.color_mode] * len(images)
+            return images
+
+        first_page, last_page = backend.page_range(self.src_file_spec, first_page, last_page)
+        preview = backend.render_images(self.src_file_spec, dpi=ColorMode.PREVIEW_DPI, threads=self.threads,
+                                        first_page=first_page, last_page=last_page)
+        images = []
+        for first, last, color_mode in self._color_ranges(preview, first_page):
+            images.extend(self._render_pages(backend, first, last, color_mode))
+        return images
+
+    async def _render_async(self, backend: IRenderer) -> typing.List[typing.Any]:
+        """
+        Render the pages with the backend, without blocking the event loop (see _render()).
+
+        :param backend: Instantiated rendering backend
+        :return: List of rendered pages
+        """
+        first_page, last_page = self.page_range()
+        if self.color_mode != ColorMode.AUTO:
+            images = await self._render_pages_async(backend, first_page, last_page, self.color_mode)
+            self.page_modes = [self.color_mode] * len(images)
+            return images
+
+        first_page, last_page = await backend.page_range_async(self.src_file_spec, first_page, last_page)
+        preview = await backend.render_images_async(self.src_file_spec, dpi=ColorMode.PREVIEW_DPI,
+                                                    threads=self.threads, first_page=first_page, last_page=last_page)
+        images = []
+        for first, last, color_mode in self._color_ranges(preview, first_page):
+            images.extend(await self._render_pages_async(backend, first, last, color_mode))
+        return images
+
+    def _color_ranges(self, preview: typing.List[typing.Any],
+                      first_page: int) -> typing.List[typing.Tuple[int, int, str]]:
+        """
+        Detect the color mode of each page from its preview (self.page_modes), and group the pages to render.
+
+        :param preview: Low DPI rasters of the pages (closed once checked)
+        :param first_page: Page number of the first preview
+
+        :return: List of inclusive (first_page, last_page, color_mode) ranges
+        """
+        self.page_modes = []
+        for image in preview:
+            self.page_modes.append(ColorMode.detect(image))
+            image.close()
+        return ColorMode.page_ranges(self.page_modes, first_page)
+
+    def _render_pages(self, backend: IRenderer, first_page: typing.Optional[int], last_page: typing.Optional[int],
+                      color_mode: str) -> typing.List[typing.Any]:
+        """
+        Render a page range in a color mode (FILE_FORMAT files, written to the output folder).
+
+        :param backend: Instantiated rendering backend
+        :param first_page: First page (None: first page of the document)
+        :param last_page: Last page (None: last page of the document)
+        :param color_mode: rgb, gray or mono
+
+        :return: List of generated file specs
+        """
+        return backend.render_files(self.src_file_spec, dpi=self.dpi, threads=self.threads, first_page=first_page,
+                                    last_page=last_page, output_folder=self.page_folder, color_mode=color_mode,
+                                    compression=self._page_compression(), file_format=self.FILE_FORMAT)
+
+    async def _render_pages_async(self, backend: IRenderer, first_page: typing.Optional[int],
+                                  last_page: typing.Optional[int], color_mode: str) -> typing.List[typing.Any]:
+        """
+        Render a page range in a color mode, without blocking the event loop (see _render_pages()).
+        """
+        return await backend.render_files_async(self.src_file_spec, dpi=self.dpi, threads=self.threads,
+                                                first_page=first_page, last_page=last_page,
+                                                output_folder=self.page_folder, color_mode=color_mode,
+                                                compression=self._page_compression(), file_format=self.FILE_FORMAT)
+
+    def _page_compression(self) -> str:
+        """
+        :return: Compression of the rendered page files (pages are compressed once, when appended to a container)
+        """
+        return TiffCompression.NONE if self.multipage else self.compression
+
+    @contextlib.contextmanager
+    def _pages_folder(self) -> typing.Iterator[str]:
+        """
+        Folder the backend writes the page files to (self.page_folder): the output folder, or (multipage) a
+        temporary folder that is removed once the pages have been appended to the container.
+        """
+        if not self.multipage:
+            yield self.page_folder
+            return
+
+        self.page_folder = tempfile.mkdtemp(prefix='pdf2tiff-')
+        try:
+            yield self.page_folder
+        finally:
+            shutil.rmtree(self.page_folder, ignore_errors=True)
+            self.page_folder = self.output_folder
+
+    def _write_container(self, page_files: typing.List[str]) -> typing.List[str]:
+        """
+        Append the rendered pages to the document's container (<output_file or document name>.tif in the output
+        folder); the page entries are kept in self.container_pages.
+
+        :param page_files: Rendered page files (in page order)
+
+        :return: List with the container's file spec
+        """
+        basename = self.output_file or os.path.split(self.src_file_spec)[-1].rsplit('.', 1)[0]
+        container = os.path.join(self.output_folder, f"{basename}.{self.extension}")
+        self.container_pages = TiffContainer.write(container, page_files, self.compression, self.first_page or 1)
+        return [container]
+
+    @property
+    def num_pages(self) -> int:
+        """
+        :return: Number of rendered pages
+        """
+        return len(self.container_pages) if self.multipage else len(self.images)
+
+    def output_bytes(self) -> int:
+        """
+        Size of the rendered output (for the conversion metrics).
+
+        :return: Total size (bytes) of the generated files
+        """
+        return sum(os.path.getsize(image) for image in self.images if os.path.exists(image))
 
     def convert(self) -> "PdfToTiff":
         """
@@ -51,36 +288,80 @@ class PdfToTiff(IImageFormatConverter):
         """
         if os.path.exists(self.src_file_spec):
 
-            # filename = self.src_file_spec.split(os.path.sep)[-1].split('.')[0]
-            # outfile_generator = (filename for _ in range(1000))
             start_conversion = perf_counter()
+            if self.threads == ConcurrencySizer.AUTO:
+                self._size_threads()
 
-            # Actual pdf2image call
+            # Actual rendering call (pdf2image or the backend's executable)
             try:
-                self.images = pdf2image.convert_from_path(
-                    self.src_file_spec,
-                    dpi=self.dpi,
-                    fmt=self.fmt,
-                    thread_count=self.threads,
-                    # output_file=outfile_generator,
-                    output_folder=self.output_folder,
-                    paths_only=True,
-                )
-
-            except (pdf_exc.PDFInfoNotInstalledError, pdf_exc.PDFPageCountError, pdf_exc.PDFSyntaxError) as exc:
-                print(f"ERROR: ({exc.__class__.__name__}): {exc}")
+                with self._pages_folder():
+                    self.images = self._render(RENDERERS[self.renderer]())
+                    if self.multipage:
+                        self.images = self._write_container(self.images)
 
-            except pdf_exc.PopplerNotInstalledError as exc:
+            except self.RENDER_ERRORS as exc:
                 print(f"ERROR: ({exc.__class__.__name__}): {exc}")
 
             else:
-                # Measure time to convert the PDF to image files.
-                self.conversion_duration = perf_counter() - start_conversion
-                print(f"{__class__.__name__}: Conversion took: {self.conversion_duration:0.6f} seconds.")
-                print(f"{__class__.__name__}: Num images: {len(self.images)}")
+                self._rendered(start_conversion)
 
         # Specified PDF was not found.
         else:
             print(f"Unable to find '{self.src_file_spec}'")
 
         return self
+
+    async def convert_async(self) -> "PdfToTiff":
+        """
+        Convert the PDF to tiff image, without blocking the event loop: the backend's executable runs as an asyncio
+        subprocess (killed if the calling task is cancelled). See convert().
+
+        :return: self (allows chaining of methods, since the methods do not return any additional info).
+
+        """
+        if os.path.exists(self.src_file_spec):
+
+            start_conversion = perf_counter()
+            if self.threads == ConcurrencySizer.AUTO:
+                await asyncio.get_running_loop().run_in_executor(None, self._size_threads)
+
+            try:
+                with self._pages_folder():
+                    self.images = await self._render_async(RENDERERS[self.renderer]())
+                    if self.multipage:
+                        self.images = await asyncio.get_running_loop().run_in_executor(
+                            None, self._write_container, self.images)
+
+            except self.RENDER_ERRORS as exc:
+                print(f"ERROR: ({exc.__class__.__name__}): {exc}")
+
+            else:
+                self._rendered(start_conversion)
+
+        else:
+            print(f"Unable to find '{self.src_file_spec}'")
+
+        return self
+
+    def _rendered(self, start_conversion: float) -> typing.NoReturn:
+        """
+        Record (and report) a successful render.
+
+        :param start_conversion: perf_counter() value when the conversion started
+
+        :return: None
+        """
+        # Measure time to convert the PDF to image files.
+        self.conversion_duration = perf_counter() - start_conversion
+        print(f"{self.__class__.__name__}: Conversion took: {self.conversion_duration:0.6f} seconds "
+              f"(renderer: {self.renderer}).")
+        print(f"{self.__class__.__name__}: Num images: {self.num_pages}")
+        if self.multipage and self.images:
+            print(f"{self.__class__.__name__}: Container: {self.images[0]}")
+
+        # Feed the 'auto' selection with the measured throughput.
+        if self.doc_class is not None:
+            RendererSelector().record(self.renderer, self.doc_class, self.num_pages, self.conversion_duration)
+        if self.color_mode == ColorMode.AUTO:
+            counts = {mode: self.page_modes.count(mode) for mode in ColorMode.MODES if mode in self.page_modes}
+            print(f"{self.__class__.__name__}: Color modes: {counts}")
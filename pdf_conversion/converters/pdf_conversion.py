@@ -1,10 +1,27 @@
+import asyncio
+from contextlib import nullcontext
+import functools
+import os
+from time import perf_counter
 import typing
+import weakref
 
+from pdf_conversion.documents.conversion_checkpoint import ConversionCheckpoint
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
 from pdf_conversion.documents.document_info import DocumentInfo
 from pdf_conversion.documents.file_extensions import SupportedDocTypes
+from pdf_conversion.documents.page_fingerprints import PageFingerprints
 from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.conversion_planner import ConversionPlanner, ConversionStep, NoConversionPath
+from pdf_conversion.converters.encode_pool import EncodedPage, EncodePool
+from pdf_conversion.converters.lazy_pages import LazyPages
+from pdf_conversion.converters.memory_budget import MemoryBudget, PeakMemoryMonitor
+from pdf_conversion.converters.pdf2raster import PdfToRaster
 from pdf_conversion.converters.pdf2tiff import PdfToTiff
-from pdf_conversion.converters.tiff2webp import TiffToWebp
+from pdf_conversion.converters.renderers import RendererSelector
+from pdf_conversion.converters.resolutions import Resolution, Resolutions
+from pdf_conversion.converters.streaming import StreamedPage, StreamingPdfToWebp
 
 
 class NoTargetConversionType(Exception):
@@ -12,23 +29,149 @@ class NoTargetConversionType(Exception):
         return "No target conversion format specified."
 
 
+class ConversionRun(typing.NamedTuple):
+    """ The options of a convert()/convert_async() call, resolved by PDFConversion._prepare(). """
+    incremental: bool
+    resume: bool
+    checkpoint_pages: typing.Optional[int]
+    checkpoint_args: typing.Dict[str, typing.Any]
+    resolutions: typing.List[Resolution]
+    budget: MemoryBudget
+    num_existing_files: int
+
+
 class PDFConversion:
     """
     Primary class for converting PDF to specified images. Contains basic logic for determining which conversion
     routines are needed, based on the extension provided.
     """
 
+    # If True, PDF to webp renders the pages into memory and encodes them directly (no intermediate TIFF files).
+    DIRECT_KW = 'direct'
+    DEFAULT_DIRECT = True
+
+    # Number of webp encoding workers, and the type of pool ('process' or 'thread') - see EncodePool.
+    ENCODERS_KW = 'encoders'
+    ENCODE_POOL_KW = 'encode_pool'
+
+    # Streaming pipeline: pages rendered per chunk, and max number of rendered pages waiting to be encoded.
+    CHUNK_PAGES_KW = 'chunk_pages'
+    QUEUE_SIZE_KW = 'queue_size'
+
+    # Incremental mode: only pages whose fingerprint changed since the previous conversion are converted again.
+    INCREMENTAL_KW = 'incremental'
+
+    # Resume: only pages missing from the checkpoint manifest (or whose files are corrupt) are converted; the
+    # manifest is written every checkpoint_pages pages (0: after each render).
+    RESUME_KW = 'resume'
+    CHECKPOINT_PAGES_KW = 'checkpoint_pages'
+    DEFAULT_CHECKPOINT_PAGES = 0
+
+    # Max number of convert_async() conversions running at once (per event loop), unless a limiter is provided.
+    MAX_CONVERSIONS_KW = 'max_conversions'
+    DEFAULT_MAX_CONVERSIONS = 4
+
+    _async_limiters = weakref.WeakKeyDictionary()
+
     def __init__(self, document: DocumentInfo, image_format: SupportedDocTypes = SupportedDocTypes.NOT_DEFINED,
-                 defaults: typing.Optional[DefaultValues] = None) -> None:
+                 defaults: typing.Optional[DefaultValues] = None, cache: typing.Optional[ConversionCache] = None,
+                 pool: typing.Optional[EncodePool] = None) -> None:
         """
         :param document: Instantiated Document object (contains filespec, used for tracking conversion process)
         :param image_format: Convert image from PDF to specified format.
         :param defaults: A dictionary of defaults for each image type (optional)
+        :param cache: Conversion cache; if provided, previously converted documents are restored from the cache
+              instead of being converted again (optional)
+        :param pool: EncodePool shared by several conversions (e.g. - the warm pool of the conversion service); if not
+              provided, a pool is built for each conversion from the encoders/encode_pool args (optional)
 
         """
         self.document = document
         self.image_format = image_format
         self.defaults = defaults
+        self.cache = cache
+        self.pool = pool
+        self.checkpoint = None
+
+    def _section_defaults(self, domain: str) -> dict:
+        """
+        Get the defaults for a specific domain (e.g. - DefaultValues.TIFF_DEFAULTS)
+
+        :param domain: Name of the defaults section
+        :return: Dictionary of defaults (empty if no defaults are available)
+
+        """
+        return getattr(self.defaults, domain, None) or {}
+
+    def conversion_settings(self, doc_format: SupportedDocTypes, **kwargs) -> typing.Dict[str, typing.Any]:
+        """
+        Determine the effective settings that affect the conversion output. The settings are resolved by the
+        converters themselves, so CLI args, configured defaults and class defaults are all accounted for.
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param kwargs: The conversion args (as passed to convert())
+
+        :return: Dictionary of effective settings (JSON serializable)
+        """
+        first_page, last_page = kwargs.pop('first_page', None), kwargs.pop('last_page', None)
+        resolutions = self._resolutions(kwargs)
+        steps = self._plan(doc_format, kwargs, resolutions)
+
+        # The backend that renders the pages (the first step of the path) determines the output.
+        render_class = steps[0].converter
+        renderer = render_class(src_file_spec=self.document.filespec,
+                                defaults=self._section_defaults(render_class.DEFAULTS_SECTION), **kwargs)
+        settings = {'format': doc_format.value, 'dpi': renderer.dpi, 'renderer': renderer.renderer,
+                    'color_mode': renderer.color_mode}
+        if doc_format == SupportedDocTypes.TIFF:
+            settings.update({'compression': renderer.compression, 'multipage': renderer.multipage})
+
+        for step in steps[1:]:
+            converter = step.converter(src_file_spec=self.document.filespec,
+                                       defaults=self._section_defaults(step.converter.DEFAULTS_SECTION), **kwargs)
+            settings.update(converter.settings())
+        if len(steps) > 1:
+            settings['direct'] = steps[0].output_format == SupportedDocTypes.RASTER
+        if resolutions:
+            settings[Resolutions.SIZES_KW] = [str(resolution) for resolution in resolutions]
+        if first_page or last_page:
+            settings['pages'] = [first_page or 1, last_page]
+        return settings
+
+    def cache_key(self, doc_format: SupportedDocTypes, **kwargs) -> str:
+        """
+        Build the cache key for this document, based on its content and the effective conversion settings.
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param kwargs: The conversion args (as passed to convert())
+
+        :return: Cache key
+        """
+        settings = self.conversion_settings(doc_format, **kwargs)
+
+        # The content hash is part of the document's probe (shared with the renderers).
+        if self.document.content_hash is None and self.document.probe() is None:
+            with self.document.metrics.span(ConversionMetrics.PROBE,
+                                            bytes_in=os.path.getsize(self.document.filespec)):
+                self.document.content_hash = ConversionCache.file_hash(self.document.filespec)
+        return ConversionCache.make_key(self.document.content_hash, settings)
+
+    def resolve_renderer(self, kwargs: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+        """
+        Resolve an 'auto' renderer once for the document (see RendererSelector), so every range and step of a
+        conversion, and its cache key, checkpoint and incremental manifest, use the same backend. The backend and the
+        document class (its throughput is recorded for the class) are set in kwargs.
+
+        :param kwargs: The conversion args (updated in place)
+
+        :return: kwargs
+        """
+        renderer = kwargs.get('renderer') or self._section_defaults(DefaultValues.TIFF_DEFAULTS).get(
+            'renderer', PdfToTiff.DEFAULT_RENDERER)
+        if (renderer or '').lower() == RendererSelector.AUTO:
+            kwargs['renderer'], kwargs[PdfToTiff.DOC_CLASS_KW] = RendererSelector().resolve(
+                renderer, self.document.filespec)
+        return kwargs
 
     def set_image_format(self, image_format: SupportedDocTypes) -> "PDFConversion":
         """
@@ -40,17 +183,144 @@ class PDFConversion:
         self.image_format = image_format
         return self
 
-    def convert(self, doc_format: SupportedDocTypes = SupportedDocTypes.NOT_DEFINED, **kwargs) -> typing.NoReturn:
+    def convert(self, doc_format: SupportedDocTypes = SupportedDocTypes.NOT_DEFINED,
+                first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                **kwargs) -> "PDFConversion":
         """
         Convert the pdf to the desired format (either specified at method invocation or stored at the object level)
         :param doc_format: [OPTIONAL] - SupportedDocType enumeration, DEFAULT = NOT_DEFINED
+        :param first_page: [OPTIONAL] - First page to convert (DEFAULT: the first page of the document)
+        :param last_page: [OPTIONAL] - Last page to convert (DEFAULT: the last page of the document)
         :param kwargs: Any additional argument (image format specific; see image format class specifications for
                   lists of specific parameters)
 
+        :return: self (allows chaining of methods)
+
+        """
+        doc_format = self._target_format(doc_format)
+        if doc_format is None:
+            return self
+        self.resolve_renderer(kwargs)
+
+        # If this document has already been converted with the same settings, restore the cached outputs.
+        cache_key = self._restore_cached(doc_format, first_page=first_page, last_page=last_page, **kwargs)
+        if self.document.cache_hit:
+            return self
+
+        run = self._prepare(first_page, last_page, kwargs)
+        with PeakMemoryMonitor() as monitor:
+
+            # Only convert the pages that changed since the previous conversion.
+            if run.incremental:
+                self._convert_incremental(doc_format, budget=run.budget, **kwargs)
+
+            # Follow the cheapest conversion path (e.g. - PDF to webp: rendered into memory and encoded directly, or
+            # through TIFF files if not direct).
+            else:
+                steps = self._plan(doc_format, kwargs, run.resolutions)
+                ranges = self._resume(doc_format, run.resume, first_page, last_page, run.checkpoint_pages,
+                                      **run.checkpoint_args)
+                self._convert_path(steps, pool=self._path_pool(steps, kwargs), budget=run.budget,
+                                   resolutions=run.resolutions, ranges=ranges, **kwargs)
+
+        self.document.peak_memory = monitor.peak_rss
+        self._finish(run, cache_key, doc_format, first_page, last_page)
+        return self
+
+    def _prepare(self, first_page: typing.Optional[int], last_page: typing.Optional[int],
+                 kwargs: typing.Dict[str, typing.Any]) -> ConversionRun:
+        """
+        Resolve the options of a conversion (shared by convert() and convert_async()). The incremental, resume,
+        checkpoint_pages, sizes and max_memory args are removed from kwargs.
+
+        :param first_page: First page to convert (None: the first page of the document)
+        :param last_page: Last page to convert (None: the last page of the document)
+        :param kwargs: The conversion args
+
+        :return: ConversionRun
+        """
+        num_existing_files = len(self.document.files)
+
+        incremental = kwargs.pop(self.INCREMENTAL_KW, False)
+        if incremental and not PageFingerprints.available():
+            print(f"{self.__class__.__name__}: WARNING: Incremental conversion requires 'pypdf'; "
+                  f"converting all pages.")
+            incremental = False
+
+        resume = kwargs.pop(self.RESUME_KW, False)
+        checkpoint_pages = kwargs.pop(self.CHECKPOINT_PAGES_KW, None)
+        checkpoint_args = dict(kwargs)
+
+        resolutions = self._resolutions(kwargs)
+        if incremental and resolutions:
+            print(f"{self.__class__.__name__}: WARNING: Incremental conversion does not support multiple sizes; "
+                  f"converting all pages.")
+            incremental = False
+        if incremental and (first_page or last_page):
+            print(f"{self.__class__.__name__}: WARNING: Incremental conversion applies to the whole document; "
+                  f"converting pages {first_page or 1}-{last_page or 'end'}.")
+            incremental = False
+        resume = self._can_resume(resume, incremental, resolutions)
+
+        budget = MemoryBudget(kwargs.pop(MemoryBudget.MAX_MEMORY_KW, None),
+                              defaults=self._section_defaults(DefaultValues.TIFF_DEFAULTS))
+        return ConversionRun(incremental=incremental, resume=resume, checkpoint_pages=checkpoint_pages,
+                             checkpoint_args=checkpoint_args, resolutions=resolutions, budget=budget,
+                             num_existing_files=num_existing_files)
+
+    def _path_pool(self, steps: typing.List[ConversionStep],
+                   kwargs: typing.Dict[str, typing.Any]) -> typing.Optional[EncodePool]:
+        """
+        :return: The EncodePool that converts the pages after they are rendered (None if the path has a single step)
+        """
+        if len(steps) > 1:
+            return self._encode_pool(self._section_defaults(DefaultValues.WEBP_DEFAULTS), kwargs)
+        return None
+
+    def _reserved(self, pool: typing.Optional[EncodePool],
+                  ranges: typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]],
+                  jobs_per_page: int = 1, wait: bool = True) -> typing.ContextManager:
+        """
+        Keep the workers of a pool built for this conversion running until all its ranges are encoded (see
+        EncodePool.reserved()). A shared pool is left as is.
+
+        :param pool: EncodePool of the conversion
+        :param ranges: Inclusive page ranges of the conversion
+        :param jobs_per_page: Number of pages encoded per rendered page (e.g. - one per output size)
+        :param wait: On exit, wait for the pages being encoded to finish
+
+        :return: Context manager
+        """
+        if pool is None or pool is self.pool:
+            return nullcontext(pool)
+        probe = self.document.probe()
+        num_jobs = None
+        if probe is not None:
+            num_jobs = jobs_per_page * sum(min(last_page or probe.page_count, probe.page_count) - (first_page or 1) + 1
+                                           for first_page, last_page in ranges)
+        return pool.reserved(num_jobs, wait=wait)
+
+    def _finish(self, run: ConversionRun, cache_key: typing.Optional[str], doc_format: SupportedDocTypes,
+                first_page: typing.Optional[int], last_page: typing.Optional[int]) -> typing.NoReturn:
+        """
+        Record the memory budget of a conversion, and store its outputs in the cache (if enabled).
+
         :return: None
+        """
+        self.document.memory_budget = run.budget.max_bytes
+        if cache_key is not None:
+            self._store_cached(cache_key, self.document.files[run.num_existing_files:], doc_format, first_page,
+                               last_page, run.resolutions)
 
+    def _target_format(self, doc_format: SupportedDocTypes) -> typing.Optional[SupportedDocTypes]:
+        """
+        Resolve the target format (specified at method call or at object level).
+
+        :param doc_format: SupportedDocType enumeration (NOT_DEFINED: use the object level format)
+
+        :return: Target format, or None if the document is already in the target format (nothing to do), or if no
+                 conversion path leads to the target format
         """
-        # Get the desired target format (specified at method call or or at object level)
         doc_format = doc_format or self.image_format
         if doc_format is None or not isinstance(doc_format, SupportedDocTypes) or doc_format.value is None:
             raise NoTargetConversionType
@@ -58,66 +328,792 @@ class PDFConversion:
         # If target format matches the current format; no op. (At this point, it must be defined doc type)
         if self.document.doc_type.lower() == doc_format.value:
             print(f"Target Format ('{doc_format.value}') matches the current document type. Nothing to do.")
+            return None
+
+        if doc_format not in ConversionPlanner().targets():
+            print(f"ERROR: {NoConversionPath(SupportedDocTypes.PDF, doc_format)}")
+            return None
+        return doc_format
+
+    def _restore_cached(self, doc_format: SupportedDocTypes, **kwargs) -> typing.Optional[str]:
+        """
+        Restore the outputs of a previous conversion with the same settings from the cache (if enabled). On a hit,
+        the files are added to the Document metadata and document.cache_hit is set.
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param kwargs: The conversion args (as passed to convert())
+
+        :return: Cache key (None if the cache is not enabled)
+        """
+        if self.cache is None:
+            return None
+
+        cache_key = self.cache_key(doc_format, **kwargs)
+        cached_files = self.cache.lookup(cache_key, self.document.file_dir)
+        if cached_files is not None:
+            print(f"{self.__class__.__name__}: Cache hit for '{self.document.filespec}' "
+                  f"({len(cached_files)} file(s) restored).")
+            self.document.add_files(cached_files)
+            self.document.cache_hit = True
+        return cache_key
+
+    def _store_cached(self, cache_key: str, files: typing.List[str], doc_format: SupportedDocTypes,
+                      first_page: typing.Optional[int], last_page: typing.Optional[int],
+                      resolutions: typing.List[Resolution]) -> typing.NoReturn:
+        """
+        Store the outputs of the conversion in the cache, provided every requested page produced its target files
+        (render and encode failures are reported, not raised, and must not be served as hits later).
+
+        :param cache_key: Cache key (see cache_key())
+        :param files: Files generated by the conversion
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param first_page: First requested page (None: the first page of the document)
+        :param last_page: Last requested page (None: the last page of the document)
+        :param resolutions: Output sizes (one target file per page and size)
+
+        :return: None
+        """
+        if not self.document.complete(doc_format, first_page, last_page, files_per_page=max(1, len(resolutions))):
+            print(f"{self.__class__.__name__}: WARNING: Pages of '{self.document.filespec}' are missing; "
+                  f"the outputs are not cached.")
+            return
+        self.cache.store(cache_key, files)
+
+    def async_limiter(self) -> asyncio.Semaphore:
+        """
+        The limiter shared by all convert_async() calls on the running event loop (sized from the 'async' defaults,
+        max_conversions).
+
+        :return: Semaphore
+        """
+        loop = asyncio.get_running_loop()
+        limiter = self._async_limiters.get(loop)
+        if limiter is None:
+            limiter = asyncio.Semaphore(self._section_defaults(DefaultValues.ASYNC_DEFAULTS).get(
+                self.MAX_CONVERSIONS_KW, self.DEFAULT_MAX_CONVERSIONS))
+            self._async_limiters[loop] = limiter
+        return limiter
+
+    async def convert_async(self, doc_format: SupportedDocTypes = SupportedDocTypes.NOT_DEFINED,
+                            limiter: typing.Optional[asyncio.Semaphore] = None, first_page: typing.Optional[int] = None,
+                            last_page: typing.Optional[int] = None, **kwargs) -> "PDFConversion":
+        """
+        Convert the pdf to the desired format without blocking the event loop (see convert()).
+
+        The renderer's executable runs as an asyncio subprocess, and the pages are encoded by the EncodePool (or the
+        loop's default executor); probing the document and incremental conversions run in the default
+        executor. Cancelling the calling task kills the render processes and cancels the pages that have not
+        started encoding. The number of conversions running at once is capped by the limiter.
+
+        NOTE: The peak memory is not recorded (the conversions share the process); pass a started EncodePool to
+        the constructor to share the encode workers across conversions.
+
+        :param doc_format: [OPTIONAL] - SupportedDocType enumeration, DEFAULT = NOT_DEFINED
+        :param limiter: Caps the number of concurrent conversions (default: async_limiter())
+        :param first_page: First page to convert (default: the first page of the document)
+        :param last_page: Last page to convert (default: the last page of the document)
+        :param kwargs: Any additional argument (see convert())
+
+        :return: self (allows chaining of methods)
+
+        """
+        doc_format = self._target_format(doc_format)
+        if doc_format is None:
             return self
 
-        # For PDF to TIFF.
-        if doc_format == SupportedDocTypes.TIFF:
-            defaults_dict = getattr(self.defaults, DefaultValues.TIFF_DEFAULTS) if self.defaults is not None else {}
-            self._convert_pdf_to_tiff(defaults_dict, **kwargs)
+        loop = asyncio.get_running_loop()
+        async with (limiter or self.async_limiter()):
+
+            await loop.run_in_executor(None, self.resolve_renderer, kwargs)
+            cache_key = await loop.run_in_executor(None, functools.partial(
+                self._restore_cached, doc_format, first_page=first_page, last_page=last_page, **kwargs))
+            if self.document.cache_hit:
+                return self
+
+            # Probe the document (page count and sizes) once, off the event loop; the renderers reuse the probe.
+            await loop.run_in_executor(None, self.document.probe)
+
+            run = self._prepare(first_page, last_page, kwargs)
+            if run.incremental:
+                await loop.run_in_executor(None, functools.partial(
+                    self._convert_incremental, doc_format, budget=run.budget, **kwargs))
+
+            else:
+                steps = self._plan(doc_format, kwargs, run.resolutions)
+                ranges = await loop.run_in_executor(None, functools.partial(
+                    self._resume, doc_format, run.resume, first_page, last_page, run.checkpoint_pages,
+                    **run.checkpoint_args))
+                await self._convert_path_async(steps, pool=self._path_pool(steps, kwargs), budget=run.budget,
+                                               resolutions=run.resolutions, ranges=ranges, **kwargs)
+
+            await loop.run_in_executor(None, functools.partial(
+                self._finish, run, cache_key, doc_format, first_page, last_page))
+        return self
+
+    def lazy(self, doc_format: SupportedDocTypes = SupportedDocTypes.NOT_DEFINED,
+             read_ahead: typing.Optional[int] = None, **kwargs) -> typing.Optional[LazyPages]:
+        """
+        Convert the pages on demand: nothing is converted until a page is read, and reading a page converts it (and
+        the next read_ahead pages) with convert(). The pages are also available as document.pages; close them (or use
+        them as a context manager) to stop the encode workers.
+
+        :param doc_format: [OPTIONAL] - SupportedDocType enumeration, DEFAULT = NOT_DEFINED
+        :param read_ahead: Number of pages converted after the page being read (see LazyPages)
+        :param kwargs: Any additional argument (see convert())
+
+        :return: The document's pages (see LazyPages), or None if there is nothing to convert
+        """
+        doc_format = self._target_format(doc_format)
+        if doc_format is None:
+            return None
+
+        # Each read converts a range of pages, so TIFF pages are never written to a multi-page container; they are
+        # all rendered by the same backend.
+        kwargs[PdfToTiff.MULTIPAGE_KW] = False
+        self.resolve_renderer(kwargs)
+
+        # Each read is a conversion: they all use this pool, so its workers are started once (see LazyPages).
+        pool = self._encode_pool(self._section_defaults(DefaultValues.WEBP_DEFAULTS), kwargs)
+        self.document.pages = LazyPages(self, doc_format, read_ahead=read_ahead,
+                                        defaults=self._section_defaults(DefaultValues.TIFF_DEFAULTS), pool=pool,
+                                        **kwargs)
+        return self.document.pages
+
+    def convert_stream(self, **kwargs) -> typing.Iterator[StreamedPage]:
+        """
+        Convert the pdf to webp with overlapping render and encode stages, yielding each page as soon as it has been
+        encoded (completion order). When the generator finishes (or is closed early), the pages that were converted
+        are recorded in the Document metadata, in page order.
 
-        # For PDF to webp format (with intermediate TIFF format)
-        elif doc_format == SupportedDocTypes.WEBP:
-            defaults_dict = getattr(self.defaults, DefaultValues.TIFF_DEFAULTS) if self.defaults is not None else {}
-            self._convert_pdf_to_tiff(defaults_dict, **kwargs)
+        :param kwargs: Any additional argument (see convert(); also chunk_pages and queue_size, see
+                  StreamingPdfToWebp for details)
 
-            defaults_dict = getattr(self.defaults, DefaultValues.WEBP_DEFAULTS) if self.defaults is not None else {}
-            self._convert_tiff_to_webp(defaults_dict, **kwargs)
+        :return: Generator of StreamedPage (page number, generated files, encode duration)
 
-    def _convert_pdf_to_tiff(self, defaults: typing.Optional[dict] = None, **kwargs) -> typing.NoReturn:
         """
-        Call PDF to TIFF libraries.
+        tiff_defaults = self._section_defaults(DefaultValues.TIFF_DEFAULTS)
+        webp_defaults = self._section_defaults(DefaultValues.WEBP_DEFAULTS)
+
+        kwargs.pop(self.DIRECT_KW, None)
+        self.resolve_renderer(kwargs)
+        pool = self._encode_pool(webp_defaults, kwargs)
+
+        budget = MemoryBudget(kwargs.pop(MemoryBudget.MAX_MEMORY_KW, None), defaults=tiff_defaults)
+        pipeline = StreamingPdfToWebp(
+            src_file_spec=self.document.filespec, output_folder=self.document.file_dir,
+            output_file=self.document.filename.rsplit('.', 1)[0], pool=pool,
+            chunk_pages=kwargs.pop(self.CHUNK_PAGES_KW, 0), queue_size=kwargs.pop(self.QUEUE_SIZE_KW, 0),
+            render_defaults=tiff_defaults, encode_defaults=webp_defaults, memory_budget=budget,
+            metrics=self.document.metrics, probe=self.document.probe(), **kwargs)
+
+        finished = []
+        monitor = PeakMemoryMonitor()
+        try:
+            with monitor:
+                for page in pipeline.pages():
+                    finished.append(page)
+                    yield page
 
-        :param defaults: a Dictionary of tiff specific defaults (See PdfToTiff class for DEFAULT_* parameters)
-        :param kwargs: Additional args available to conversion process (beyond standard BaseClass args)
-            * Currently no additional args defined.
+        finally:
+            for page in sorted(finished):
+                self.document.add_page_files(page.page_num, page.files, seconds=page.duration)
+                self.document.page_durations.append(page.duration)
+            self.document.conversion_duration += pipeline.conversion_duration
+            self.document.peak_memory = monitor.peak_rss
+            self.document.memory_budget = budget.max_bytes
+            self._record_concurrency(pool=pool, num_pages=len(finished))
+
+    def _encode_pool(self, webp_defaults: dict, kwargs: typing.Dict[str, typing.Any]) -> EncodePool:
+        """
+        Get the EncodePool for this conversion. The encoders/encode_pool args are removed from kwargs.
+
+        :param webp_defaults: a Dictionary of webp specific defaults (See TiffToWebp class for DEFAULT_* parameters)
+        :param kwargs: The conversion args
+
+        :return: The shared pool (if provided), else a pool built from the args
+        """
+        workers = kwargs.pop(self.ENCODERS_KW, 0)
+        pool_type = kwargs.pop(self.ENCODE_POOL_KW, None)
+        if self.pool is not None:
+            return self.pool
+        return EncodePool(workers=workers, pool_type=pool_type, defaults=webp_defaults)
+
+    def _convert_incremental(self, doc_format: SupportedDocTypes, budget: typing.Optional[MemoryBudget] = None,
+                             **kwargs) -> typing.NoReturn:
+        """
+        Convert only the pages that changed since the previous conversion of this document (into the same
+        conversion directory, with the same settings). Unchanged pages reuse the previously generated images.
+        The pages always follow the cheapest conversion path in this mode (e.g. - webp pages are encoded directly
+        from memory).
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param budget: If enabled, each range of changed pages is rendered in chunks that fit the memory budget
+        :param kwargs: Additional args available to conversion process (see convert())
 
         :return: None
 
         """
-        converter = PdfToTiff(src_file_spec=self.document.filespec, output_folder=self.document.file_dir,
-                              defaults=defaults, **kwargs)
+        # Pages are tracked (and replaced) as individual files in this mode, so TIFF pages are never written to a
+        # multi-page container.
+        kwargs.pop(self.DIRECT_KW, None)
+        kwargs[PdfToTiff.MULTIPAGE_KW] = False
+        pool = self._encode_pool(self._section_defaults(DefaultValues.WEBP_DEFAULTS), kwargs)
+
+        steps = self._plan(doc_format, {self.DIRECT_KW: True})
+        render_step = steps[0]
+        render_defaults = self._section_defaults(render_step.converter.DEFAULTS_SECTION)
+        settings = self.conversion_settings(doc_format, **{**kwargs, self.DIRECT_KW: True})
+
+        start_time = perf_counter()
+        with self.document.metrics.span(ConversionMetrics.PROBE, bytes_in=os.path.getsize(self.document.filespec)):
+            fingerprints = PageFingerprints.compute(self.document.filespec)
+        manifest = PageFingerprints(self.document.file_dir, self.document.filename)
+        previous = manifest.load(settings)
+
+        # Reuse a page if its fingerprint is unchanged, and all of its previously generated files still exist.
+        pages = {}
+        changed = []
+        for page_num, fingerprint in enumerate(fingerprints, start=1):
+            entry = previous.get(page_num)
+            if (entry is not None and entry['fingerprint'] == fingerprint and entry['files'] and
+                    all(os.path.exists(file_) for file_ in entry['files'])):
+                pages[page_num] = entry
+            else:
+                changed.append(page_num)
+
+        # Remove the stale outputs (TIFF names are random, so they would not be overwritten).
+        for page_num, entry in previous.items():
+            if page_num not in pages:
+                for file_ in entry['files']:
+                    if os.path.exists(file_):
+                        os.remove(file_)
+
+        # Render (and convert) each contiguous range of changed pages.
+        durations = {}
+        ranges = self._page_ranges(changed)
+        with self._reserved(pool if len(steps) > 1 else None, ranges):
+            for first_page, last_page in self._render_ranges(ranges, render_defaults, budget, **kwargs):
+                renderer = render_step.converter(
+                    src_file_spec=self.document.filespec, output_folder=self.document.file_dir,
+                    first_page=first_page, last_page=last_page, defaults=render_defaults, **kwargs).convert()
+                self._record_concurrency(renderer=renderer)
+                self._record_render(renderer)
+                if len(steps) == 1:
+                    for page_num, image in enumerate(renderer.images, start=first_page):
+                        pages[page_num] = {'fingerprint': fingerprints[page_num - 1], 'files': [image]}
+                    continue
+
+                sources = self._page_sources(renderer)
+                for step in steps[1:]:
+                    encoded = pool.encode(self._page_jobs(sources, step, **kwargs), converter=step.converter)
+                    sources = [dict(src_file_spec=file_) for page in encoded for file_ in page.files]
+                for page_num, page in enumerate(encoded, start=first_page):
+                    pages[page_num] = {'fingerprint': fingerprints[page_num - 1], 'files': page.files}
+                    durations[page_num] = page.duration
+                    self._record_encode(page_num, page)
+                self._record_concurrency(pool=pool, num_pages=len(encoded))
+                self._release(renderer)
+
+        for page_num in sorted(pages):
+            self.document.add_page_files(page_num, pages[page_num]['files'], seconds=durations.get(page_num))
+            self.document.page_durations.append(durations.get(page_num, 0))
+
+        manifest.save(settings, pages)
+        self.document.pages_reused = len(fingerprints) - len(changed)
+        self.document.pages_regenerated = len(changed)
+        self.document.conversion_duration += perf_counter() - start_time
+        print(f"{self.__class__.__name__}: Incremental conversion: {self.document.pages_reused} page(s) reused, "
+              f"{self.document.pages_regenerated} page(s) regenerated.")
+
+    @staticmethod
+    def _page_ranges(page_nums: typing.List[int]) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Group page numbers into contiguous (first_page, last_page) ranges.
+
+        :param page_nums: Sorted list of page numbers
+        :return: List of inclusive page ranges
+        """
+        ranges = []
+        for page_num in page_nums:
+            if ranges and ranges[-1][1] == page_num - 1:
+                ranges[-1] = (ranges[-1][0], page_num)
+            else:
+                ranges.append((page_num, page_num))
+        return ranges
+
+    def _can_resume(self, resume: bool, incremental: bool, resolutions: typing.List[Resolution]) -> bool:
+        """
+        :return: True if the conversion can be resumed from its checkpoint manifest (warns if resume was requested,
+                 but cannot be applied)
+        """
+        if resume and incremental:
+            print(f"{self.__class__.__name__}: WARNING: Incremental conversions reuse the unchanged pages; "
+                  f"the checkpoint is not used.")
+            return False
+        if resume and resolutions:
+            print(f"{self.__class__.__name__}: WARNING: Resume does not support multiple sizes; "
+                  f"converting all pages.")
+            return False
+        return resume
+
+    def open_checkpoint(self, doc_format: SupportedDocTypes, **kwargs) -> typing.Optional[ConversionCheckpoint]:
+        """
+        Open the checkpoint manifest of a conversion of this document with these settings (see ConversionCheckpoint).
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param kwargs: The conversion args (as passed to convert())
+
+        :return: ConversionCheckpoint, or None if the pages are written to a multi-page TIFF container (which is not
+                 tracked per page) or the document does not exist
+        """
+        settings = self.conversion_settings(doc_format, **kwargs)
+        settings.pop('pages', None)
+        if settings.get(PdfToTiff.MULTIPAGE_KW) or not os.path.isfile(self.document.filespec):
+            return None
+
+        if self.document.content_hash is None and self.document.probe() is None:
+            self.document.content_hash = ConversionCache.file_hash(self.document.filespec)
+
+        # The pages are complete once the target files are written: rendered by the backend, or encoded.
+        plan_args = dict(kwargs)
+        steps = self._plan(doc_format, plan_args, self._resolutions(plan_args))
+        final_stage = ConversionCheckpoint.ENCODE if len(steps) > 1 else ConversionCheckpoint.RENDER
+        return ConversionCheckpoint(self.document.file_dir, self.document.filename, self.document.content_hash,
+                                    settings, final_stage=final_stage).load()
+
+    def _resume(self, doc_format: SupportedDocTypes, resume: bool, first_page: typing.Optional[int] = None,
+                last_page: typing.Optional[int] = None, checkpoint_pages: typing.Optional[int] = None,
+                **kwargs) -> typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]]:
+        """
+        Open the conversion's checkpoint manifest, and plan the page ranges to convert. When resuming, the verified
+        pages of the previous conversions are restored in the Document metadata, and only the other pages are
+        converted; the ranges are split every checkpoint_pages pages, so the manifest is written as they finish.
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param resume: Restore the pages of the previous conversions
+        :param first_page: First page to convert (None: the first page of the document)
+        :param last_page: Last page to convert (None: the last page of the document)
+        :param checkpoint_pages: Max number of pages converted between checkpoints (<= 0: one checkpoint per range;
+              None: use the default)
+        :param kwargs: The conversion args (as passed to convert())
+
+        :return: List of inclusive page ranges
+        """
+        self.checkpoint = self.open_checkpoint(doc_format, **kwargs)
+        probe = self.document.probe()
+        if checkpoint_pages is None:
+            checkpoint_pages = self._section_defaults(DefaultValues.TIFF_DEFAULTS).get(
+                self.CHECKPOINT_PAGES_KW, self.DEFAULT_CHECKPOINT_PAGES)
+        if self.checkpoint is None or probe is None or (not resume and checkpoint_pages <= 0):
+            return [(first_page, last_page)]
+
+        page_nums = list(range(first_page or 1, min(last_page or probe.page_count, probe.page_count) + 1))
+        reused = {}
+        if resume:
+            verified = self.checkpoint.verified_pages()
+            reused = {page_num: verified[page_num] for page_num in page_nums if page_num in verified}
+            for page_num, files in reused.items():
+                self.document.add_page_files(page_num, files)
+                self.document.page_durations.append(0)
+
+            self.checkpoint.discard(page_num for page_num in page_nums if page_num not in reused)
+
+            self.document.pages_reused = len(reused)
+            self.document.pages_regenerated = len(page_nums) - len(reused)
+            print(f"{self.__class__.__name__}: Resuming: {self.document.pages_reused} page(s) restored from the "
+                  f"checkpoint, {self.document.pages_regenerated} page(s) to convert.")
+
+        ranges = []
+        for range_first, range_last in self._page_ranges([page_num for page_num in page_nums
+                                                          if page_num not in reused]):
+            step = checkpoint_pages if checkpoint_pages > 0 else range_last - range_first + 1
+            ranges.extend((page_num, min(page_num + step - 1, range_last))
+                          for page_num in range(range_first, range_last + 1, step))
+        return ranges
+
+    def _resolutions(self, kwargs: typing.Dict[str, typing.Any]) -> typing.List[Resolution]:
+        """
+        Resolve the output sizes (see Resolutions). The sizes arg is removed from kwargs; if sizes are requested, the
+        dpi arg is replaced by the DPI the pages are rendered at (the highest requested DPI).
+
+        :param kwargs: The conversion args
+
+        :return: List of Resolution (empty: a single output size)
+        """
+        tiff_defaults = self._section_defaults(DefaultValues.TIFF_DEFAULTS)
+        resolutions = Resolutions.resolve(kwargs.pop(Resolutions.SIZES_KW, None), tiff_defaults)
+        if resolutions:
+            dpi = kwargs['dpi'] if (kwargs.get('dpi') or 0) > 0 else tiff_defaults.get('dpi', PdfToTiff.DEFAULT_DPI)
+            kwargs['dpi'] = Resolutions.render_dpi(resolutions, dpi)
+        return resolutions
+
+    def _plan(self, doc_format: SupportedDocTypes, kwargs: typing.Dict[str, typing.Any],
+              resolutions: typing.Optional[typing.List[Resolution]] = None) -> typing.List[ConversionStep]:
+        """
+        Plan the conversion path to the target format (see ConversionPlanner). The direct arg is removed from kwargs:
+        if False, the pages go through TIFF files (which are kept), provided the target can be converted from TIFF.
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param kwargs: The conversion args
+        :param resolutions: Output sizes; if provided, the pages are rendered into memory (the sizes are derived
+              from the rasters)
+
+        :return: List of ConversionStep
+        """
+        direct = kwargs.pop(self.DIRECT_KW, None)
+        if direct is None:
+            direct = self._section_defaults(DefaultValues.WEBP_DEFAULTS).get(self.DIRECT_KW, self.DEFAULT_DIRECT)
+
+        planner = ConversionPlanner()
+        if resolutions:
+            return planner.plan(SupportedDocTypes.PDF, doc_format, via=SupportedDocTypes.RASTER)
+        if not direct:
+            try:
+                return planner.plan(SupportedDocTypes.PDF, doc_format, via=SupportedDocTypes.TIFF)
+            except NoConversionPath:
+                pass
+        return planner.plan(SupportedDocTypes.PDF, doc_format)
+
+    def _convert_path(self, steps: typing.List[ConversionStep], pool: typing.Optional[EncodePool] = None,
+                      budget: typing.Optional[MemoryBudget] = None,
+                      resolutions: typing.Optional[typing.List[Resolution]] = None,
+                      ranges: typing.Optional[typing.List[typing.Tuple[typing.Optional[int],
+                                                                       typing.Optional[int]]]] = None,
+                      **kwargs) -> typing.NoReturn:
+        """
+        Run a conversion path: the first step renders the PDF, and each following step converts the pages produced
+        by the previous one, across the pool. Rasters rendered into memory are rendered in chunks that fit the memory
+        budget; each chunk is converted (and its rasters released) before the next chunk is rendered.
 
-        converter.convert()
-        self._print_attribute_settings(converter)
+        :param steps: Conversion path (see ConversionPlanner)
+        :param pool: EncodePool used to convert the pages (needed if the path has more than one step)
+        :param budget: Memory budget of the in-memory rasters
+        :param resolutions: Output sizes: each rendered raster is converted once per size (see Resolutions)
+        :param ranges: Inclusive page ranges to convert (default: the whole document); the checkpoint manifest (if
+              any) is written after each range
+        :param kwargs: Additional args available to conversion process (see convert())
 
-        self.document.files.extend(converter.images)
-        self.document.conversion_duration = converter.conversion_duration
+        :return: None
 
-    def _convert_tiff_to_webp(self, defaults: typing.Optional[dict] = None, **kwargs) -> typing.NoReturn:
         """
-        Call TIFF to webp libraries.
+        render_step, defaults = self._render_step(steps)
+        ranges = ranges if ranges is not None else [(None, None)]
+        if render_step.output_format == SupportedDocTypes.RASTER:
+            ranges = self._render_ranges(ranges, defaults, budget, **kwargs)
 
-        :param kwargs: Additional dictionary of args available to conversion process (beyond standard BaseClass args)
-            * lossless: (bool) - Enable lossless conversion process
-            * quality: (int) 0 - 100 - See pdf_conversion.converters.tiff2web.py:TiffToWeb class for details.
+        with self._reserved(pool, ranges, jobs_per_page=len(resolutions or [None])):
+            for first_page, last_page in ranges:
+                renderer = self._renderer(render_step, defaults, first_page, last_page, **kwargs)
+                renderer.convert()
+                rasters, variants, page_nums = self._rendered_sources(renderer, resolutions)
+                try:
+                    sources = rasters
+                    for step in steps[1:]:
+                        start_time = perf_counter()
+                        pages = pool.encode(self._page_jobs(sources, step, **kwargs), converter=step.converter)
+                        sources = self._encoded(pages, pool, page_nums, start_time)
+                    if variants:
+                        self.document.page_variants.extend(dict(variant, files=page.files)
+                                                           for variant, page in zip(variants, pages))
+                finally:
+                    self._release(renderer, rasters)
+                if self.checkpoint is not None:
+                    self.checkpoint.save()
+
+    async def _convert_path_async(self, steps: typing.List[ConversionStep], pool: typing.Optional[EncodePool] = None,
+                                  budget: typing.Optional[MemoryBudget] = None,
+                                  resolutions: typing.Optional[typing.List[Resolution]] = None,
+                                  ranges: typing.Optional[typing.List[typing.Tuple[typing.Optional[int],
+                                                                                   typing.Optional[int]]]] = None,
+                                  **kwargs) -> typing.NoReturn:
+        """
+        Run a conversion path without blocking the event loop (see _convert_path()).
 
         :return: None
+        """
+        render_step, defaults = self._render_step(steps)
+        ranges = ranges if ranges is not None else [(None, None)]
+        if render_step.output_format == SupportedDocTypes.RASTER:
+            ranges = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                self._render_ranges, ranges, defaults, budget, **kwargs))
+
+        # Cancelling the conversion does not wait for the pages being encoded (see EncodePool.encode_async()).
+        with self._reserved(pool, ranges, jobs_per_page=len(resolutions or [None]), wait=False):
+            for first_page, last_page in ranges:
+                renderer = self._renderer(render_step, defaults, first_page, last_page, **kwargs)
+                await renderer.convert_async()
+                rasters, variants, page_nums = self._rendered_sources(renderer, resolutions)
+                try:
+                    sources = rasters
+                    for step in steps[1:]:
+                        start_time = perf_counter()
+                        pages = await pool.encode_async(self._page_jobs(sources, step, **kwargs),
+                                                        converter=step.converter)
+                        sources = self._encoded(pages, pool, page_nums, start_time)
+                    if variants:
+                        self.document.page_variants.extend(dict(variant, files=page.files)
+                                                           for variant, page in zip(variants, pages))
+                finally:
+                    self._release(renderer, rasters)
+                if self.checkpoint is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, self.checkpoint.save)
 
+    def _render_step(self, steps: typing.List[ConversionStep]) -> typing.Tuple[ConversionStep, dict]:
         """
-        # Conversion of PDF to TIFF generates 1 TIFF per page. This information is stored in the Document class.
-        # Iterate through Document.images metadata list to get the list of TIFF image file specs.
-        tiffs = [image for image in self.document.files if image.lower().endswith(SupportedDocTypes.TIFF.value)]
+        :return: Tuple of (the first step of a conversion path, which renders the PDF, and its defaults)
+        """
+        print(f"{self.__class__.__name__}: Conversion path: {ConversionPlanner.describe(steps)}")
+        render_step = steps[0]
+        return render_step, self._section_defaults(render_step.converter.DEFAULTS_SECTION)
 
-        # Convert each image, and store the information in the Document metadata.
-        for image in tiffs:
-            converter = TiffToWebp(
-                src_file_spec=image, defaults=defaults, output_folder=self.document.file_dir, **kwargs)
+    def _renderer(self, render_step: ConversionStep, defaults: dict, first_page: typing.Optional[int],
+                  last_page: typing.Optional[int], **kwargs) -> PdfToTiff:
+        """
+        :return: The converter that renders a page range of the document (see _render_step())
+        """
+        return render_step.converter(
+            src_file_spec=self.document.filespec, output_folder=self.document.file_dir, first_page=first_page,
+            last_page=last_page, defaults=defaults, probe=self.document.probe(), **kwargs)
+
+    def _rendered_sources(self, renderer: PdfToTiff, resolutions: typing.Optional[typing.List[Resolution]] = None
+                          ) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]],
+                                            typing.List[typing.Dict[str, typing.Any]], typing.List[int]]:
+        """
+        Record a render, and build the sources of the next step of the path (one per page and output size). If this
+        fails, the rasters of the render are released.
+
+        :param renderer: The converter that rendered the pages (first step of the path)
+        :param resolutions: Output sizes (see _sized_sources())
 
-            converter.convert()
-            self._print_attribute_settings(converter)
+        :return: Tuple of (source args, the variant of each source (empty without resolutions), and the page number
+                 of each source)
+        """
+        try:
+            self._rendered(renderer)
+            sources, variants = self._page_sources(renderer), []
+            if resolutions:
+                sources, variants = self._sized_sources(sources, resolutions, renderer)
+        except BaseException:
+            self._release(renderer)
+            raise
+        page_nums = ([variant['page'] for variant in variants] or
+                     list(range(renderer.first_page or 1, (renderer.first_page or 1) + len(sources))))
+        return sources, variants, page_nums
+
+    def _page_sources(self, renderer: PdfToTiff) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        The pages produced by a render, as the source args of the next step: in-memory rasters, pages of a multi-page
+        container (read back by index) or page files. Rasters and container pages are named after the document, and
+        numbered by page.
+
+        :param renderer: The converter that rendered the pages (first step of the path)
+
+        :return: List of keyword argument dictionaries, one per page (in page order)
+        """
+        basename = self.document.filename.rsplit('.', 1)[0]
+        if renderer.OUTPUT_FORMAT == SupportedDocTypes.RASTER:
+            return [dict(src_file_spec=self.document.filespec, src_image=raster,
+                         output_file=f"{basename}-{page_num:04d}")
+                    for page_num, raster in enumerate(renderer.images, start=renderer.first_page or 1)]
+
+        if renderer.container_pages:
+            return [dict(src_file_spec=page['file'], page_index=page['index'],
+                         output_file=f"{basename}-{page['page']:04d}")
+                    for page in renderer.container_pages]
+        return [dict(src_file_spec=image) for image in renderer.images]
+
+    def _page_jobs(self, sources: typing.List[typing.Dict[str, typing.Any]], step: ConversionStep,
+                   **kwargs) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Build the jobs of a conversion step.
+
+        :param sources: Source args of each page (see _page_sources())
+        :param step: The step converting the pages
+        :param kwargs: The conversion args
+
+        :return: List of the step's converter keyword argument dictionaries, one per page (in page order)
+        """
+        defaults = self._section_defaults(step.converter.DEFAULTS_SECTION)
+        return [dict(source, defaults=defaults, output_folder=self.document.file_dir, **kwargs) for source in sources]
+
+    def _sized_sources(self, sources: typing.List[typing.Dict[str, typing.Any]], resolutions: typing.List[Resolution],
+                       renderer: PdfToRaster) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]],
+                                                              typing.List[typing.Dict[str, typing.Any]]]:
+        """
+        Derive the output sizes of each rendered raster (see Resolutions.derive()). Each size is named
+        <document>-<page>-<size name>.
+
+        :param sources: Source args of each rendered page (see _page_sources())
+        :param resolutions: Output sizes
+        :param renderer: The PdfToRaster converter that rendered the pages (at the highest requested DPI)
+
+        :return: Tuple of (source args of each page and size, and the variant of each source: {'page', 'name',
+                 'dpi', 'width', 'height'})
+        """
+        sized, variants = [], []
+        for page_num, source in enumerate(sources, start=renderer.first_page or 1):
+            raster = source['src_image']
+            for resolution in resolutions:
+                image = Resolutions.derive(raster, resolution, renderer.dpi)
+                sized.append(dict(source, src_image=image, output_file=f"{source['output_file']}-{resolution.name}"))
+                variants.append({'page': page_num, 'name': resolution.name,
+                                 'dpi': round(renderer.dpi * image.width / raster.width),
+                                 'width': image.width, 'height': image.height})
+        print(f"{self.__class__.__name__}: Derived {len(sized)} image(s) from {len(sources)} page(s) rendered at "
+              f"{renderer.dpi} DPI ({', '.join(str(resolution) for resolution in resolutions)}).")
+        return sized, variants
+
+    @staticmethod
+    def _release(renderer: PdfToTiff,
+                 sources: typing.Optional[typing.List[typing.Dict[str, typing.Any]]] = None) -> typing.NoReturn:
+        """
+        Release the rasters of a render, and the rasters derived from them (rendered files are kept).
+
+        :param renderer: The converter that rendered the pages
+        :param sources: Source args of the rendered pages (the derived rasters, if any, are released)
+
+        :return: None
+        """
+        if renderer.OUTPUT_FORMAT == SupportedDocTypes.RASTER:
+            for raster in renderer.images:
+                raster.close()
+        for source in sources or []:
+            if source.get('src_image') is not None:
+                source['src_image'].close()
+
+    def _rendered(self, renderer: PdfToTiff) -> typing.NoReturn:
+        """
+        Record a render (settings, concurrency, metrics, duration and the rendered files) in the Document metadata.
+
+        :param renderer: The PdfToTiff/PdfToRaster converter that rendered the pages
+
+        :return: None
+        """
+        self._print_attribute_settings(renderer)
+        self._record_concurrency(renderer=renderer)
+        self._record_render(renderer)
+        self.document.conversion_duration += renderer.conversion_duration
+
+        # Rendered files (the target, or intermediate files that are kept) are part of the outputs.
+        if renderer.OUTPUT_FORMAT != SupportedDocTypes.RASTER:
+            self.document.tiff_pages.extend(renderer.container_pages)
+            for page_num, file_ in ([(page['page'], page['file']) for page in renderer.container_pages] or
+                                    enumerate(renderer.images, start=renderer.first_page or 1)):
+                self.document.add_page_files(page_num, [file_])
+                if self.checkpoint is not None:
+                    self.checkpoint.add(page_num, ConversionCheckpoint.RENDER, [file_])
+
+    def _render_ranges(self, ranges: typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]],
+                       tiff_defaults: dict, budget: typing.Optional[MemoryBudget] = None,
+                       **kwargs) -> typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]]:
+        """
+        Split page ranges into chunks whose rasters fit the memory budget (based on each page's size and the DPI).
+
+        :param ranges: Inclusive page ranges ((None, None) = the whole document)
+        :param tiff_defaults: a Dictionary of rendering defaults (used to resolve the DPI)
+        :param budget: Memory budget (if not provided or not enabled, the ranges are returned as is)
+        :param kwargs: The conversion args
+
+        :return: List of inclusive page ranges
+        """
+        if budget is None or not budget.enabled:
+            return ranges
+
+        dpi = PdfToRaster(src_file_spec=self.document.filespec, defaults=tiff_defaults, **kwargs).dpi
+        chunks = []
+        for first_page, last_page in ranges:
+            page_bytes = MemoryBudget.page_bytes(self.document.filespec, dpi, first_page, last_page,
+                                                 probe=self.document.probe())
+            chunks.extend(budget.chunks(page_bytes, first_page=first_page or 1))
+        print(f"{self.__class__.__name__}: Rendering in {len(chunks)} chunk(s) "
+              f"(memory budget: {budget.max_bytes / 2 ** 20:0.1f} MB).")
+        return chunks
+
+    def _encoded(self, pages: typing.List[EncodedPage], pool: EncodePool, page_nums: typing.List[int],
+                 start_time: float) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Store the encoded pages (in page order) in the Document metadata.
+
+        :param pages: Encoded pages
+        :param pool: EncodePool that encoded the pages
+        :param page_nums: Page number of each encoded page (for the page metrics; a page encoded in several sizes is
+              listed once per size, and its duration is the sum of its sizes)
+        :param start_time: perf_counter() value when the encoding started
+
+        :return: The generated files, as the source args of the next step of the path (see _page_sources())
+        """
+        durations = {}
+        for page_num, page in zip(page_nums, pages):
+            self.document.add_page_files(page_num, page.files, seconds=page.duration, dimensions=page.image_size)
+            if self.checkpoint is not None:
+                self.checkpoint.add(page_num, ConversionCheckpoint.ENCODE, page.files)
+            durations[page_num] = durations.get(page_num, 0) + page.duration
+            self._record_encode(page_num, page)
+        self.document.page_durations.extend(durations.values())
+
+        self._record_concurrency(pool=pool, num_pages=len(pages))
+        print(f"{self.__class__.__name__}: Encoded {len(durations)} page(s) using "
+              f"{self.document.concurrency['encode_workers']} {pool.pool_type} worker(s).")
+
+        # The encode stage is measured as wall-clock time; per-page times are kept in the document.
+        self.document.conversion_duration += perf_counter() - start_time
+        return [dict(src_file_spec=file_) for page in pages for file_ in page.files]
+
+    def _record_render(self, renderer: PdfToTiff) -> typing.NoReturn:
+        """
+        Record a render span in the Document metrics. The source PDF is counted (as bytes in) by the first render
+        span only, so chunked renders do not count it more than once.
+
+        :param renderer: The PdfToTiff/PdfToRaster converter that rendered the pages
+
+        :return: None
+        """
+        metrics = self.document.metrics
+        first_page = renderer.first_page or 1
+        rendered = any(span['stage'] == ConversionMetrics.RENDER for span in metrics.spans)
+        metrics.add(ConversionMetrics.RENDER, renderer.conversion_duration,
+                    first_page=first_page if renderer.images else None,
+                    last_page=first_page + renderer.num_pages - 1 if renderer.images else None,
+                    bytes_in=0 if rendered else os.path.getsize(self.document.filespec),
+                    bytes_out=renderer.output_bytes())
+        self.document.add_color_modes(renderer.page_modes)
+
+    def _record_encode(self, page_num: int, page: EncodedPage) -> typing.NoReturn:
+        """
+        Record the encode and write spans of a page in the Document metrics.
+
+        :param page_num: Page number
+        :param page: Result of encoding the page
+
+        :return: None
+        """
+        self.document.metrics.add(ConversionMetrics.ENCODE, page.encode_seconds, page_num,
+                                  bytes_in=page.bytes_in, bytes_out=page.bytes_out)
+        self.document.metrics.add(ConversionMetrics.WRITE, page.write_seconds, page_num,
+                                  bytes_in=page.bytes_out, bytes_out=page.bytes_out)
+
+    def _record_concurrency(self, renderer: typing.Optional[PdfToTiff] = None, pool: typing.Optional[EncodePool] = None,
+                            num_pages: int = 0) -> typing.NoReturn:
+        """
+        Record the render/encode concurrency that was used (and the 'auto' sizing decisions) in the Document metadata.
+
+        :param renderer: The PdfToTiff/PdfToRaster converter that rendered the pages
+        :param pool: The EncodePool that encoded the pages
+        :param num_pages: Number of pages encoded by the pool
+
+        :return: None
+        """
+        if renderer is not None:
+            self.document.concurrency['render_threads'] = renderer.threads
+            if renderer.sizing is not None:
+                self.document.concurrency['render_sizing'] = renderer.sizing
 
-            self.document.files.extend(converter.images)
-            self.document.conversion_duration += converter.conversion_duration
+        if pool is not None:
+            self.document.concurrency['encode_workers'] = (
+                pool.sizing['workers'] if pool.auto else pool.size(num_pages))
+            self.document.concurrency['encode_pool'] = pool.pool_type
+            if pool.sizing is not None:
+                self.document.concurrency['encode_sizing'] = pool.sizing
 
     @staticmethod
     def _print_attribute_settings(target_obj: typing.Any) -> typing.NoReturn:
@@ -0,0 +1,389 @@
+import collections
+import itertools
+import math
+import threading
+import time
+import typing
+
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+class ScheduledJob:
+    """
+    A document converted by the PriorityScheduler, in page ranges. Tracks the job's priority class and deadline, and
+    its queue wait and time to first page.
+    """
+
+    INTERACTIVE = 'interactive'
+    BULK = 'bulk'
+    PRIORITIES = (INTERACTIVE, BULK)
+    DEFAULT_PRIORITY = BULK
+
+    def __init__(self, document: DocumentInfo, doc_format: SupportedDocTypes,
+                 options: typing.Optional[typing.Dict[str, typing.Any]] = None, priority: typing.Optional[str] = None,
+                 deadline: typing.Optional[float] = None) -> None:
+        """
+        ScheduledJob Constructor
+        :param document: Document to convert (its conversion_dir is where the images are written)
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param options: Conversion args (see PDFConversion.convert())
+        :param priority: 'interactive' (user-facing: the first page is converted first, ahead of the bulk jobs) or
+              'bulk' (fills the remaining capacity)
+        :param deadline: Number of seconds (after submission) the job should be finished in (None: no deadline)
+        """
+        if priority is not None and priority not in self.PRIORITIES:
+            raise ValueError(f"Unsupported priority: '{priority}' (supported: {', '.join(self.PRIORITIES)})")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("The deadline must be a positive number of seconds")
+
+        self.document = document
+        self.doc_format = doc_format
+        self.options = options or {}
+        self.priority = priority or self.DEFAULT_PRIORITY
+        self.deadline = deadline
+
+        self.submitted = time.time()
+        self.started = None
+        self.first_page = None          # time the job's first page was converted
+        self.finished = None
+        self.error = None
+
+        # Scheduling state (see PriorityScheduler): pages of the job (last page None: the end of the document), next
+        # page to dispatch, whether the job is converted as a single range, number of ranges running and merged,
+        # submission order.
+        self.start_page = None
+        self.last_page = None
+        self.next_page = None
+        self.single_range = False
+        self.running = 0
+        self.merged = 0
+        self.order = None
+
+    @property
+    def deadline_at(self) -> typing.Optional[float]:
+        return self.submitted + self.deadline if self.deadline is not None else None
+
+    @property
+    def queue_seconds(self) -> typing.Optional[float]:
+        return self.started - self.submitted if self.started is not None else None
+
+    @property
+    def first_page_seconds(self) -> typing.Optional[float]:
+        return self.first_page - self.submitted if self.first_page is not None else None
+
+    @property
+    def missed_deadline(self) -> bool:
+        return self.deadline is not None and (self.finished or time.time()) > self.deadline_at
+
+    def run_started(self) -> typing.NoReturn:
+        """
+        Called by the scheduler when the first page range of the job is dispatched.
+
+        :return: None
+        """
+        self.started = time.time()
+
+    def run_finished(self) -> typing.NoReturn:
+        """
+        Called by the scheduler when all the page ranges of the job have been converted (self.error is set if a
+        range failed).
+
+        :return: None
+        """
+        self.finished = time.time()
+
+
+class PriorityScheduler:
+    """
+    Converts documents on a fixed number of runners, in page ranges, by priority: each runner converts one page range
+    (PDFConversion.convert(first_page, last_page)) at a time, and then takes the most urgent range queued. A job is
+    thus preempted at page boundaries: a new interactive job waits for at most one page range, rather than for whole
+    bulk documents.
+
+    Ranges are taken in this order:
+        1. interactive jobs (and jobs whose deadline is less than urgent_seconds away), starting with the jobs whose
+           first page has not been dispatched yet: the first range of an interactive job is its first page only
+        2. bulk jobs, which fill the remaining capacity
+    Within a class, the job with the earliest deadline goes first (then the oldest job).
+
+    Queue wait and time to first page percentiles are reported per priority class (see report()).
+    """
+
+    # Pages per range; runners only switch to more urgent jobs between ranges.
+    CHUNK_PAGES_KW = 'chunk_pages'
+    DEFAULT_CHUNK_PAGES = 4
+
+    # Jobs whose deadline is closer than this (seconds) are scheduled with the interactive jobs.
+    URGENT_SECONDS_KW = 'urgent_seconds'
+    DEFAULT_URGENT_SECONDS = 10.0
+
+    DEFAULT_RUNNERS = 4
+    MAX_SAMPLES = 10000         # finished jobs kept for the percentiles (per priority class)
+
+    def __init__(self, runners: typing.Optional[int] = 0, defaults: typing.Optional[DefaultValues] = None,
+                 pool: typing.Optional[EncodePool] = None, cache: typing.Optional[ConversionCache] = None,
+                 chunk_pages: typing.Optional[int] = 0, urgent_seconds: typing.Optional[float] = None) -> None:
+        """
+        PriorityScheduler Constructor
+        :param runners: Number of page ranges converted concurrently (<= 0: use the default)
+        :param defaults: A dictionary of defaults for each image type (optional)
+        :param pool: Shared EncodePool (optional; see PDFConversion)
+        :param cache: Conversion cache (optional)
+        :param chunk_pages: Pages per range (<= 0: use the default)
+        :param urgent_seconds: Jobs whose deadline is closer than this are scheduled with the interactive jobs
+              (None: use the default)
+        """
+        service_defaults = getattr(defaults, DefaultValues.SERVICE_DEFAULTS, None) or {}
+        self.defaults = defaults
+        self.pool = pool
+        self.cache = cache
+        self.num_runners = runners if runners and runners > 0 else service_defaults.get('jobs', self.DEFAULT_RUNNERS)
+        self.chunk_pages = chunk_pages if chunk_pages and chunk_pages > 0 else service_defaults.get(
+            self.CHUNK_PAGES_KW, self.DEFAULT_CHUNK_PAGES)
+        self.urgent_seconds = urgent_seconds if urgent_seconds is not None else service_defaults.get(
+            self.URGENT_SECONDS_KW, self.DEFAULT_URGENT_SECONDS)
+
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._runners = []
+        self._stopping = False
+        self._samples = {priority: collections.deque(maxlen=self.MAX_SAMPLES) for priority in ScheduledJob.PRIORITIES}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._runners) and not self._stopping
+
+    def start(self) -> "PriorityScheduler":
+        """
+        Start the runners.
+
+        :return: self (allows chaining of methods)
+        """
+        with self._condition:
+            if self._runners:
+                return self
+            self._stopping = False
+            self._runners = [threading.Thread(target=self._run, name=f'conversion-runner-{index}', daemon=True)
+                             for index in range(self.num_runners)]
+        for runner in self._runners:
+            runner.start()
+        return self
+
+    def shutdown(self, cancel_queued: bool = True) -> typing.List[ScheduledJob]:
+        """
+        Stop the runners once the jobs that have started are finished.
+
+        :param cancel_queued: If True, the jobs that have not started are removed from the queue (and returned);
+              otherwise the runners finish all the queued jobs first
+
+        :return: The jobs that were removed from the queue
+        """
+        with self._condition:
+            cancelled = [job for job in self._queue if job.started is None] if cancel_queued else []
+            self._queue = [job for job in self._queue if job not in cancelled]
+            self._stopping = True
+            self._condition.notify_all()
+
+        for runner in self._runners:
+            runner.join()
+        self._runners = []
+        return cancelled
+
+    def submit(self, job: ScheduledJob) -> ScheduledJob:
+        """
+        Queue a job. The document is probed now (the page count determines its ranges); documents that cannot be
+        probed, and jobs that must be converted at once (incremental conversions, multi-page TIFF containers), are
+        converted as a single range.
+
+        :param job: Job to convert
+
+        :return: The job
+        """
+        if not self.running:
+            raise RuntimeError(f"{self.__class__.__name__} is not running.")
+
+        # The ranges of a job are all rendered by the same backend.
+        PDFConversion(job.document, defaults=self.defaults).resolve_renderer(job.options)
+
+        probe = job.document.probe()
+        job.start_page = job.next_page = job.options.get('first_page') or 1
+        job.last_page = job.options.get('last_page') or (probe.page_count if probe is not None else None)
+        job.single_range = job.last_page is None or self._single_range(job)
+
+        with self._condition:
+            job.order = next(self._order)
+            self._queue.append(job)
+            self._condition.notify()
+        return job
+
+    def _single_range(self, job: ScheduledJob) -> bool:
+        """
+        :return: True if the job cannot be split into page ranges
+        """
+        tiff_defaults = getattr(self.defaults, DefaultValues.TIFF_DEFAULTS, None) or {}
+        multipage = job.options.get(PdfToTiff.MULTIPAGE_KW)
+        if multipage is None:
+            multipage = tiff_defaults.get(PdfToTiff.MULTIPAGE_KW, False)
+        return bool(job.options.get(PDFConversion.INCREMENTAL_KW) or
+                    (multipage and job.doc_format == SupportedDocTypes.TIFF))
+
+    def _rank(self, job: ScheduledJob, now: float) -> typing.Tuple:
+        """
+        :return: Sort key of a queued job (see the class description)
+        """
+        deadline_at = job.deadline_at
+        urgent = deadline_at is not None and deadline_at - now <= self.urgent_seconds
+        interactive = job.priority == ScheduledJob.INTERACTIVE or urgent
+        return (0 if interactive else 1, 0 if job.started is None else 1,
+                deadline_at if deadline_at is not None else math.inf, job.order)
+
+    def _next_range(self) -> typing.Optional[typing.Tuple[ScheduledJob, typing.Optional[int], typing.Optional[int]]]:
+        """
+        Take the next page range of the most urgent job (the caller holds the lock).
+
+        :return: Tuple of (job, first page, last page); None if the queue is empty
+        """
+        if not self._queue:
+            return None
+
+        now = time.time()
+        job = min(self._queue, key=lambda queued: self._rank(queued, now))
+        first_range = job.started is None
+        if first_range:
+            job.run_started()
+
+        if job.single_range:
+            first_page, last_page = job.options.get('first_page'), job.options.get('last_page')
+            self._queue.remove(job)
+        else:
+            # The first range of an interactive job is its first page only (time to first page).
+            num_pages = 1 if first_range and job.priority == ScheduledJob.INTERACTIVE else self.chunk_pages
+            first_page = job.next_page
+            last_page = min(first_page + num_pages - 1, job.last_page)
+            job.next_page = last_page + 1
+            if job.next_page > job.last_page:
+                self._queue.remove(job)
+
+        job.running += 1
+        return job, first_page, last_page
+
+    def _run(self) -> typing.NoReturn:
+        """
+        Runner loop: convert the most urgent page range, until the scheduler is stopped and the queue is empty.
+
+        :return: None
+        """
+        while True:
+            with self._condition:
+                work = self._next_range()
+                while work is None:
+                    if self._stopping:
+                        return
+                    self._condition.wait()
+                    work = self._next_range()
+            self._convert(*work)
+
+    def _convert(self, job: ScheduledJob, first_page: typing.Optional[int],
+                 last_page: typing.Optional[int]) -> typing.NoReturn:
+        """
+        Convert a page range of a job, and finish the job once all of its ranges are converted. Ranges of a job may
+        run on several runners at once, so each range is converted into its own DocumentInfo (which also keeps the
+        cached files of a range to that range), and merged into the job's document under the scheduler lock.
+
+        :param job: Job
+        :param first_page: First page of the range (None: the first page of the document)
+        :param last_page: Last page of the range (None: the last page of the document)
+
+        :return: None
+        """
+        options = {key: value for key, value in job.options.items() if key not in ('first_page', 'last_page')}
+        error = None
+        document = DocumentInfo(file_spec=job.document.filespec, conversion_dir=job.document.file_dir)
+        # The job's document was probed when it was submitted; the ranges share the probe.
+        document.document_probe = job.document.document_probe
+        document.content_hash = job.document.content_hash
+        try:
+            PDFConversion(document, defaults=self.defaults, cache=self.cache, pool=self.pool).convert(
+                job.doc_format, first_page=first_page, last_page=last_page, **options)
+        except Exception as exc:
+            error = f"({exc.__class__.__name__}): {exc}"
+            print(f"{self.__class__.__name__}: ERROR: Pages {first_page or 1}-{last_page or 'end'} of "
+                  f"'{job.document.filespec}': {error}")
+
+        with self._condition:
+            self._merge(job, document)
+            job.running -= 1
+            job.error = job.error or error
+            if job.first_page is None and (first_page or 1) == job.start_page:
+                job.first_page = time.time()
+            finished = job.running == 0 and job not in self._queue
+            if finished:
+                job.finished = time.time()
+                self._samples[job.priority].append(
+                    (job.queue_seconds, job.first_page_seconds, job.finished - job.submitted, job.missed_deadline))
+        if finished:
+            job.run_finished()
+
+    @staticmethod
+    def _merge(job: ScheduledJob, document: DocumentInfo) -> typing.NoReturn:
+        """
+        Merge the results of a converted range into the job's document (the caller holds the lock).
+
+        :param job: Job
+        :param document: DocumentInfo the range was converted into
+
+        :return: None
+        """
+        target = job.document
+        target.add_artifacts(document.artifacts)
+        target.page_durations.extend(document.page_durations)
+        target.conversion_duration += document.conversion_duration
+        target.metrics.extend(document.metrics.spans)
+        for color_mode, count in document.color_modes.items():
+            target.color_modes[color_mode] = target.color_modes.get(color_mode, 0) + count
+        target.tiff_pages.extend(document.tiff_pages)
+        target.page_variants.extend(document.page_variants)
+        target.pages_reused += document.pages_reused
+        target.pages_regenerated += document.pages_regenerated
+        target.concurrency.update(document.concurrency)
+        target.peak_memory = max(target.peak_memory, document.peak_memory)
+        target.memory_budget = document.memory_budget
+        # The job is a cache hit if every one of its ranges was restored from the cache.
+        target.cache_hit = document.cache_hit and (target.cache_hit or job.merged == 0)
+        job.merged += 1
+
+    def queued(self) -> typing.Dict[str, int]:
+        """
+        :return: Number of jobs waiting for (more of) their pages to be dispatched, per priority class
+        """
+        with self._condition:
+            return {priority: sum(1 for job in self._queue if job.priority == priority)
+                    for priority in ScheduledJob.PRIORITIES}
+
+    def report(self) -> typing.Dict[str, typing.Any]:
+        """
+        Scheduling report of the finished jobs, per priority class: queue wait (submission to first range started),
+        time to first page (submission to first range converted) and total time percentiles, and missed deadlines.
+
+        :return: Dictionary (JSON serializable)
+        """
+        with self._condition:
+            samples = {priority: list(values) for priority, values in self._samples.items()}
+
+        report = {'runners': self.num_runners, 'chunk_pages': self.chunk_pages, 'urgent_seconds': self.urgent_seconds}
+        for priority, values in samples.items():
+            summary = {'jobs': len(values), 'missed_deadlines': sum(1 for value in values if value[3])}
+            for index, name in enumerate(('queue_wait', 'time_to_first_page', 'total')):
+                seconds = [value[index] for value in values]
+                for percent in (50, 95, 99):
+                    summary[f'p{percent}_{name}_seconds'] = round(ConversionMetrics.percentile(seconds, percent), 6)
+            report[priority] = summary
+        return report
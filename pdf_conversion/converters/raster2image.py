@@ -0,0 +1,135 @@
+import os
+from time import perf_counter
+import typing
+
+from PIL import Image
+
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.image_converter import IImageFormatConverter, register_converter
+from pdf_conversion.converters.tiff_compression import TiffCompression
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+class RasterToImage(IImageFormatConverter):
+    """
+    Writes an in-memory raster (e.g. - a page rendered by PdfToRaster) to an image file with PIL.
+
+    Writing the files from the rendering backend is cheaper, so these converters are only part of a conversion path
+    if the pages have to go through memory (e.g. - multi-resolution output; see Resolutions).
+    """
+    INPUT_FORMATS = (SupportedDocTypes.RASTER,)
+    DEFAULTS_SECTION = DefaultValues.TIFF_DEFAULTS
+
+    PIL_FORMAT = None
+
+    def __init__(self, src_file_spec: str, output_file: typing.Optional[str] = None,
+                 output_folder: typing.Optional[str] = '.', extension: typing.Optional[str] = None,
+                 src_image: typing.Optional[Image.Image] = None, defaults: typing.Optional[dict] = None,
+                 **kwargs) -> None:
+        """
+        :param src_file_spec: File spec of the source document (the output is named after it, if output_file is not
+              provided)
+        :param output_file: Base filename of the output file
+        :param output_folder: Path to directory where the output file is written
+        :param extension: Output file extension
+        :param src_image: (PIL.Image) - The raster to write
+        :param defaults: rendering defaults (read from file)
+        :param kwargs: Any extra args (see IImageFormatConverter)
+        """
+        super().__init__(src_file_spec=src_file_spec, output_file=output_file, output_folder=output_folder,
+                         extension=extension)
+        self.src_image = src_image
+        self.defaults = defaults or {}
+
+        # Stage metrics (see EncodedPage).
+        self.encode_duration = 0
+        self.write_duration = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        # Pixel dimensions (width, height) of the written image (see PageArtifact).
+        self.image_size = None
+
+    def _save(self, image: Image.Image, file_spec: str) -> typing.NoReturn:
+        """
+        Write the image to the file.
+
+        :param image: Source raster
+        :param file_spec: Output file spec
+
+        :return: None
+        """
+        image.save(file_spec, format=self.PIL_FORMAT)
+
+    def convert(self) -> "RasterToImage":
+        """
+        Write the raster to <output_file or source name>.<extension> in the output folder.
+
+        :return: self (allows chaining of methods)
+        """
+        if self.src_image is None:
+            print(f"{self.__class__.__name__}: ERROR: No raster to write for '{self.src_file_spec}'")
+            return self
+
+        basename = self.output_file or os.path.split(self.src_file_spec)[-1].rsplit('.', 1)[0]
+        file_spec = os.path.join(self.output_folder, f"{basename}.{self.extension}")
+
+        start_conversion = perf_counter()
+        self._save(self.src_image, self.replace_file(file_spec))
+        self.conversion_duration = self.encode_duration = perf_counter() - start_conversion
+
+        self.images = [file_spec]
+        self.image_size = self.src_image.size
+        self.bytes_in = self.src_image.width * self.src_image.height * len(self.src_image.getbands())
+        self.bytes_out = os.path.getsize(file_spec)
+        return self
+
+
+@register_converter
+class RasterToPng(RasterToImage):
+    IMAGE_FORMAT = 'png'
+    IMAGE_EXTENSION = SupportedDocTypes.PNG.value
+    OUTPUT_FORMAT = SupportedDocTypes.PNG
+    PIL_FORMAT = 'PNG'
+    COST = 2.0
+
+
+@register_converter
+class RasterToJpeg(RasterToImage):
+    """
+    JPEG has no bilevel mode: mono rasters are written as gray (at PIL's default quality, like the backends).
+    """
+    IMAGE_FORMAT = 'jpeg'
+    IMAGE_EXTENSION = SupportedDocTypes.JPEG.value
+    OUTPUT_FORMAT = SupportedDocTypes.JPEG
+    PIL_FORMAT = 'JPEG'
+    COST = 1.5
+
+    def _save(self, image: Image.Image, file_spec: str) -> typing.NoReturn:
+        if ColorMode.of_image(image) == ColorMode.MONO:
+            image = ColorMode.convert(image, ColorMode.GRAY)
+        image.save(file_spec, format=self.PIL_FORMAT)
+
+
+@register_converter
+class RasterToTiff(RasterToImage):
+    """
+    Writes the raster with the configured TIFF compression (see TiffCompression).
+    """
+    IMAGE_FORMAT = 'tiff'
+    IMAGE_EXTENSION = SupportedDocTypes.TIFF.value
+    OUTPUT_FORMAT = SupportedDocTypes.TIFF
+    COST = 1.5
+
+    def __init__(self, src_file_spec: str, compression: typing.Optional[str] = None, **kwargs) -> None:
+        """
+        :param compression: TIFF compression: none, lzw, deflate, packbits or g4 (see TiffCompression)
+        :param kwargs: See RasterToImage
+        """
+        super().__init__(src_file_spec=src_file_spec, **kwargs)
+        self.compression = TiffCompression.resolve(compression, self.defaults)
+
+    def _save(self, image: Image.Image, file_spec: str) -> typing.NoReturn:
+        TiffCompression.save(image, file_spec,
+                             TiffCompression.for_color_mode(self.compression, ColorMode.of_image(image)))
@@ -0,0 +1,676 @@
+from abc import ABC, abstractmethod
+import asyncio
+import functools
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import typing
+import uuid
+
+import pdf2image
+from PIL import Image
+
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.tiff_compression import TiffCompression
+
+# pypdf is optional; it is only used to classify documents for the 'auto' renderer selection.
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+class RendererError(Exception):
+    def __init__(self, renderer: str, message: str) -> None:
+        super().__init__(message)
+        self.renderer = renderer
+
+    def __str__(self):
+        return f"{self.renderer}: {self.args[0]}"
+
+
+class RenderPlan(typing.NamedTuple):
+    """
+    The commands that render a page range (executed concurrently), the function that builds the result (list
+    of PIL images or file specs, in page order) from the stdout of each command, and an optional clean up function
+    (called once the plan has been executed, whether it succeeded or not).
+    """
+    commands: typing.List[typing.List[str]]
+    collect: typing.Callable[[typing.List[bytes]], list]
+    cleanup: typing.Optional[typing.Callable[[], None]] = None
+
+
+class IRenderer(ABC):
+    """
+    Rendering backend: turns a page range of a PDF into either in-memory rasters or image files.
+    Backends are registered in RENDERERS (see register_renderer()) and selected by name.
+
+    Backends that run their executable directly describe the work as a RenderPlan (plan_images()/plan_files()); the
+    plan can be executed with blocking subprocesses, or with asyncio subprocesses (render_*_async()) so an event
+    loop is not blocked while the pages render, and a cancelled render kills its processes.
+    """
+
+    NAME = None
+    EXECUTABLE = None
+
+    PDFINFO_EXECUTABLE = 'pdfinfo'
+
+    # Binary PNM header (PBM, PGM, PPM): magic, width and height (comments allowed), then the max value for PGM/PPM.
+    # A single whitespace character separates the header from the raster.
+    PNM_HEADER = re.compile(rb'(P[456])(?:\s+|#[^\n]*\n)+(\d+)(?:\s+|#[^\n]*\n)+(\d+)\s')
+    PNM_MAXVAL = re.compile(rb'(?:\s*#[^\n]*\n)*\s*(\d+)\s')
+
+    # Command line options that select the color mode (rgb is the default output of poppler's utilities).
+    COLOR_OPTIONS = {ColorMode.RGB: [], ColorMode.GRAY: ['-gray'], ColorMode.MONO: ['-mono']}
+
+    # Command line options for the TIFF compressions the backend applies itself; files written with any other
+    # compression are re-compressed once rendered (see compressed()).
+    TIFF_COMPRESSIONS = {}
+
+    # Image file formats written by render_files(), and their file extensions.
+    TIFF = 'tiff'
+    PNG = 'png'
+    JPEG = 'jpeg'
+    FILE_EXTENSIONS = {TIFF: 'tif', PNG: 'png', JPEG: 'jpg'}
+    PDFINFO_PAGES = re.compile(rb'^Pages:\s+(\d+)', re.MULTILINE)
+
+    @classmethod
+    def installed(cls) -> bool:
+        """
+        :return: True if the backend's executable can be found on the PATH
+        """
+        return shutil.which(cls.EXECUTABLE) is not None
+
+    @staticmethod
+    def page_range(src_file_spec: str, first_page: typing.Optional[int],
+                   last_page: typing.Optional[int]) -> typing.Tuple[int, int]:
+        """
+        Resolve an optional page range to explicit page numbers (the page count is read with pdfinfo). Converters
+        that have the document's probe pass an explicit range, so pdfinfo is not run again.
+        """
+        first_page = first_page or 1
+        if last_page is None:
+            last_page = pdf2image.pdfinfo_from_path(src_file_spec)['Pages']
+        return first_page, last_page
+
+    @staticmethod
+    def split_pages(first_page: int, last_page: int, threads: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Split a page range into (at most) 'threads' contiguous ranges of near equal size.
+        """
+        num_pages = last_page - first_page + 1
+        threads = max(1, min(threads, num_pages))
+        ranges = []
+        start = first_page
+        for index in range(threads):
+            count = num_pages // threads + int(index < num_pages % threads)
+            ranges.append((start, start + count - 1))
+            start += count
+        return ranges
+
+    @classmethod
+    async def page_range_async(cls, src_file_spec: str, first_page: typing.Optional[int],
+                               last_page: typing.Optional[int]) -> typing.Tuple[int, int]:
+        """
+        Resolve an optional page range to explicit page numbers (see page_range()), without blocking the event loop.
+        """
+        first_page = first_page or 1
+        if last_page is None:
+            stdout = await cls._run_async(cls.NAME, [cls.PDFINFO_EXECUTABLE, src_file_spec])
+            match = cls.PDFINFO_PAGES.search(stdout)
+            if match is None:
+                raise RendererError(cls.NAME, f"Unable to read the page count of '{src_file_spec}'")
+            last_page = int(match.group(1))
+        return first_page, last_page
+
+    def plan_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                    color_mode: str = ColorMode.RGB) -> typing.Optional[RenderPlan]:
+        """
+        Describe rendering pages into memory (first_page/last_page are explicit page numbers).
+
+        :return: RenderPlan, or None if the backend can only render through render_images()
+        """
+        return None
+
+    def plan_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                   output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                   file_format: str = TIFF) -> typing.Optional[RenderPlan]:
+        """
+        Describe rendering pages to image files (first_page/last_page are explicit page numbers).
+
+        :return: RenderPlan, or None if the backend can only render through render_files()
+        """
+        return None
+
+    def file_compression(self, file_format: str, compression: typing.Optional[str],
+                         color_mode: str) -> typing.Optional[str]:
+        """
+        :return: The TIFF compression of the files rendered in the color mode (None for the other file formats)
+        """
+        if file_format != self.TIFF:
+            return None
+        return TiffCompression.for_color_mode(compression, color_mode)
+
+    def compression_options(self, compression: typing.Optional[str]) -> typing.List[str]:
+        """
+        :return: Command line options for a TIFF compression (empty if the backend cannot apply it itself)
+        """
+        return list(self.TIFF_COMPRESSIONS.get(compression, []))
+
+    def compressed(self, collect: typing.Callable[[typing.List[bytes]], typing.List[str]],
+                   compression: typing.Optional[str]) -> typing.Callable[[typing.List[bytes]], typing.List[str]]:
+        """
+        Wrap a plan's collect function: if the backend cannot apply the TIFF compression itself, the rendered files
+        are re-compressed (see TiffCompression.recompress()).
+
+        :param collect: Collect function of a plan_files() plan
+        :param compression: TIFF compression (None: keep the backend's default)
+
+        :return: Collect function
+        """
+        if compression is None or compression in self.TIFF_COMPRESSIONS:
+            return collect
+
+        def collect_compressed(outputs: typing.List[bytes]) -> typing.List[str]:
+            files = collect(outputs)
+            for file_spec in files:
+                TiffCompression.recompress(file_spec, compression)
+            return files
+
+        return collect_compressed
+
+    def execute(self, plan: RenderPlan) -> list:
+        """
+        Run the plan's commands concurrently (blocking), and collect the result.
+        """
+        try:
+            processes = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                         for command in plan.commands]
+            outputs = []
+            for process in processes:
+                output, error = process.communicate()
+                if process.returncode != 0:
+                    raise RendererError(self.NAME, error.decode('utf-8', 'replace').strip())
+                outputs.append(output)
+            return plan.collect(outputs)
+        finally:
+            if plan.cleanup is not None:
+                plan.cleanup()
+
+    @staticmethod
+    async def _run_async(name: str, command: typing.List[str]) -> bytes:
+        """
+        Run a command as an asyncio subprocess. If the calling task is cancelled, the process is killed.
+
+        :return: stdout of the command
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            output, error = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RendererError(name, error.decode('utf-8', 'replace').strip())
+        return output
+
+    async def execute_async(self, plan: RenderPlan) -> list:
+        """
+        Run the plan's commands concurrently as asyncio subprocesses, and collect the result (in the loop's default
+        executor, since collecting may parse or rename the rendered pages).
+        """
+        tasks = [asyncio.ensure_future(self._run_async(self.NAME, command)) for command in plan.commands]
+        try:
+            try:
+                outputs = await asyncio.gather(*tasks)
+            except BaseException:
+                # One command failed (or the render was cancelled): stop the others.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            return await asyncio.get_running_loop().run_in_executor(None, plan.collect, outputs)
+        finally:
+            if plan.cleanup is not None:
+                plan.cleanup()
+
+    async def render_images_async(self, src_file_spec: str, dpi: int, threads: int, first_page: int,
+                                  last_page: int, color_mode: str = ColorMode.RGB) -> typing.List[Image.Image]:
+        """
+        Render pages into memory without blocking the event loop (see render_images()). Backends without a
+        RenderPlan are run in the loop's default executor (and cannot be interrupted once started).
+        """
+        first_page, last_page = await self.page_range_async(src_file_spec, first_page, last_page)
+        plan = self.plan_images(src_file_spec, dpi, threads, first_page, last_page, color_mode)
+        if plan is None:
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                self.render_images, src_file_spec, dpi, threads, first_page, last_page, color_mode))
+        return await self.execute_async(plan)
+
+    async def render_files_async(self, src_file_spec: str, dpi: int, threads: int, first_page: int,
+                                 last_page: int, output_folder: str, color_mode: str = ColorMode.RGB,
+                                 compression: typing.Optional[str] = None,
+                                 file_format: str = TIFF) -> typing.List[str]:
+        """
+        Render pages to image files without blocking the event loop (see render_files() and render_images_async()).
+        """
+        first_page, last_page = await self.page_range_async(src_file_spec, first_page, last_page)
+        plan = self.plan_files(src_file_spec, dpi, threads, first_page, last_page, output_folder, color_mode,
+                               compression, file_format)
+        if plan is None:
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                self.render_files, src_file_spec, dpi, threads, first_page, last_page, output_folder, color_mode,
+                compression, file_format))
+        return await self.execute_async(plan)
+
+    @staticmethod
+    def numbered_files(output_folder: str, prefix: str) -> typing.List[str]:
+        """
+        List the files written by poppler's utilities for a prefix: <prefix>-<page>.<ext> (the page number is zero
+        padded to the width of the page count).
+
+        :return: List of file specs (in page order)
+        """
+        prefix_name = os.path.split(prefix)[-1]
+        return sorted((os.path.join(output_folder, name) for name in os.listdir(output_folder)
+                       if name.startswith(f"{prefix_name}-")),
+                      key=lambda name: int(name.rsplit('-', 1)[-1].split('.')[0]))
+
+    @classmethod
+    def parse_images(cls, outputs: typing.List[bytes]) -> typing.List[Image.Image]:
+        """
+        Parse the PPM/PGM/PBM streams written to stdout into PIL images (in page order).
+        """
+        images = []
+        for output in outputs:
+            index = 0
+            while index < len(output):
+                match = cls.PNM_HEADER.match(output, index)
+                if match is None:
+                    raise RendererError(cls.NAME, "Unable to parse the rendered page (unexpected PNM header)")
+                magic, width, height = match.group(1), int(match.group(2)), int(match.group(3))
+                header_end = match.end()
+                if magic != b'P4':
+                    # PGM/PPM headers also have the max value (bilevel PBM does not).
+                    maxval = cls.PNM_MAXVAL.match(output, header_end)
+                    if maxval is None:
+                        raise RendererError(cls.NAME, "Unable to parse the rendered page (unexpected PNM header)")
+                    header_end = maxval.end()
+                row_bytes = {b'P4': (width + 7) // 8, b'P5': width, b'P6': 3 * width}[magic]
+                end = header_end + row_bytes * height
+                images.append(Image.open(io.BytesIO(output[index:end])))
+                index = end
+        return images
+
+    @abstractmethod
+    def render_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                      color_mode: str = ColorMode.RGB) -> typing.List[Image.Image]:
+        """
+        Render pages into memory (color_mode: rgb, gray or mono; see ColorMode).
+
+        :return: List of PIL images (in page order)
+        """
+        pass
+
+    @abstractmethod
+    def render_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                     output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                     file_format: str = TIFF) -> typing.List[str]:
+        """
+        Render pages to image files in the output folder (color_mode: rgb, gray or mono; see ColorMode). file_format
+        is tiff (with a TIFF compression: none, lzw, deflate, packbits or g4; see TiffCompression; None: the backend's
+        default), png or jpeg (the backend's default quality).
+
+        :return: List of file specs (in page order)
+        """
+        pass
+
+
+RENDERERS = {}
+
+
+def register_renderer(renderer_class: typing.Type[IRenderer]) -> typing.Type[IRenderer]:
+    """
+    Class decorator: register a rendering backend under its NAME.
+    """
+    RENDERERS[renderer_class.NAME] = renderer_class
+    return renderer_class
+
+
+@register_renderer
+class PdftoppmRenderer(IRenderer):
+    """
+    poppler's pdftoppm: rasters are streamed (PPM) over stdout; TIFF, PNG and JPEG files are written by pdftoppm
+    directly.
+    """
+    NAME = 'pdftoppm'
+    EXECUTABLE = 'pdftoppm'
+
+    # pdftoppm has no G4 compression (mono pages are re-compressed).
+    TIFF_COMPRESSIONS = {compression: ['-tiffcompression', compression]
+                         for compression in (TiffCompression.NONE, TiffCompression.LZW, TiffCompression.DEFLATE,
+                                             TiffCompression.PACKBITS)}
+
+    def render_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                      color_mode: str = ColorMode.RGB) -> typing.List[Image.Image]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_images(src_file_spec, dpi, threads, first_page, last_page, color_mode))
+
+    def plan_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                    color_mode: str = ColorMode.RGB) -> RenderPlan:
+        # Without an output root, pdftoppm writes the pages (PPM, or PGM/PBM for gray/mono) to stdout.
+        return RenderPlan(
+            commands=[[self.EXECUTABLE, *self.COLOR_OPTIONS[color_mode], '-r', str(dpi), '-f', str(first),
+                       '-l', str(last), src_file_spec]
+                      for first, last in self.split_pages(first_page, last_page, threads)],
+            collect=self.parse_images)
+
+    def plan_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                   output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                   file_format: str = IRenderer.TIFF) -> RenderPlan:
+        compression = self.file_compression(file_format, compression, color_mode)
+        prefix = os.path.join(output_folder, str(uuid.uuid4()))
+        return RenderPlan(
+            commands=[[self.EXECUTABLE, f'-{file_format}', *self.compression_options(compression),
+                       *self.COLOR_OPTIONS[color_mode], '-r', str(dpi), '-f', str(first), '-l', str(last),
+                       src_file_spec, prefix]
+                      for first, last in self.split_pages(first_page, last_page, threads)],
+            collect=self.compressed(lambda _: self.numbered_files(output_folder, prefix), compression))
+
+    def render_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                     output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                     file_format: str = IRenderer.TIFF) -> typing.List[str]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_files(src_file_spec, dpi, threads, first_page, last_page, output_folder,
+                                            color_mode, compression, file_format))
+
+
+@register_renderer
+class PdftocairoRenderer(IRenderer):
+    """
+    poppler's pdftocairo: pdftocairo cannot stream several pages over stdout, so rasters are exchanged as PNG files
+    in a temporary directory (removed once the pages are loaded); TIFF, PNG and JPEG files are written by pdftocairo
+    directly.
+    """
+    NAME = 'pdftocairo'
+    EXECUTABLE = 'pdftocairo'
+
+    TIFF_COMPRESSIONS = PdftoppmRenderer.TIFF_COMPRESSIONS
+
+    def _commands(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                  file_format: str, prefix: str, color_mode: str,
+                  options: typing.Sequence[str] = ()) -> typing.List[typing.List[str]]:
+        return [[self.EXECUTABLE, f'-{file_format}', *options, *self.COLOR_OPTIONS[color_mode], '-r', str(dpi),
+                 '-f', str(first), '-l', str(last), src_file_spec, prefix]
+                for first, last in self.split_pages(first_page, last_page, threads)]
+
+    def plan_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                    color_mode: str = ColorMode.RGB) -> RenderPlan:
+        temp_dir = tempfile.mkdtemp(prefix='pdftocairo-')
+        prefix = os.path.join(temp_dir, 'page')
+
+        def collect(_: typing.List[bytes]) -> typing.List[Image.Image]:
+            images = []
+            for file_spec in self.numbered_files(temp_dir, prefix):
+                image = Image.open(file_spec)
+                image.load()
+                images.append(image)
+            return images
+
+        return RenderPlan(
+            commands=self._commands(src_file_spec, dpi, threads, first_page, last_page, 'png', prefix, color_mode),
+            collect=collect, cleanup=functools.partial(shutil.rmtree, temp_dir, ignore_errors=True))
+
+    def plan_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                   output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                   file_format: str = IRenderer.TIFF) -> RenderPlan:
+        compression = self.file_compression(file_format, compression, color_mode)
+        prefix = os.path.join(output_folder, str(uuid.uuid4()))
+        return RenderPlan(
+            commands=self._commands(src_file_spec, dpi, threads, first_page, last_page, file_format, prefix,
+                                    color_mode, self.compression_options(compression)),
+            collect=self.compressed(lambda _: self.numbered_files(output_folder, prefix), compression))
+
+    def render_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                      color_mode: str = ColorMode.RGB) -> typing.List[Image.Image]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_images(src_file_spec, dpi, threads, first_page, last_page, color_mode))
+
+    def render_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                     output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                     file_format: str = IRenderer.TIFF) -> typing.List[str]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_files(src_file_spec, dpi, threads, first_page, last_page, output_folder,
+                                            color_mode, compression, file_format))
+
+
+@register_renderer
+class GhostscriptRenderer(IRenderer):
+    """
+    Ghostscript (gs executable): rasters are streamed (PPM) over stdout; TIFF files are written with the
+    tiff24nc device, PNG and JPEG files with the png16m and jpeg devices (see IMAGE_DEVICES/FILE_DEVICES for gray
+    and mono). 'threads' is passed as the number of rendering threads (banded rendering).
+    """
+    NAME = 'ghostscript'
+    EXECUTABLE = 'gs'
+
+    # Output devices for each color mode: in-memory rasters (PNM over stdout) and image files (JPEG has no bilevel
+    # device: mono pages are written as gray).
+    IMAGE_DEVICES = {ColorMode.RGB: 'ppmraw', ColorMode.GRAY: 'pgmraw', ColorMode.MONO: 'pbmraw'}
+    FILE_DEVICES = {IRenderer.TIFF: {ColorMode.RGB: 'tiff24nc', ColorMode.GRAY: 'tiffgray', ColorMode.MONO: 'tiffg4'},
+                    IRenderer.PNG: {ColorMode.RGB: 'png16m', ColorMode.GRAY: 'pnggray', ColorMode.MONO: 'pngmono'},
+                    IRenderer.JPEG: {ColorMode.RGB: 'jpeg', ColorMode.GRAY: 'jpeggray', ColorMode.MONO: 'jpeggray'}}
+
+    # The TIFF devices have no deflate compression (deflate files are re-compressed); g4 only applies to mono pages.
+    TIFF_COMPRESSIONS = {TiffCompression.NONE: ['-sCompression=none'], TiffCompression.LZW: ['-sCompression=lzw'],
+                         TiffCompression.PACKBITS: ['-sCompression=pack'], TiffCompression.G4: ['-sCompression=g4']}
+
+    def _command(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                 device: str, output: str, options: typing.Sequence[str] = ()) -> typing.List[str]:
+        return [self.EXECUTABLE, '-q', '-dNOPAUSE', '-dBATCH', '-dSAFER', f'-sDEVICE={device}', *options, f'-r{dpi}',
+                f'-dNumRenderingThreads={threads}', f'-dFirstPage={first_page}', f'-dLastPage={last_page}',
+                f'-sOutputFile={output}', src_file_spec]
+
+    def plan_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                    color_mode: str = ColorMode.RGB) -> RenderPlan:
+        return RenderPlan(
+            commands=[self._command(src_file_spec, dpi, threads, first_page, last_page,
+                                    self.IMAGE_DEVICES[color_mode], '-')],
+            collect=self.parse_images)
+
+    def plan_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                   output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                   file_format: str = IRenderer.TIFF) -> RenderPlan:
+        compression = self.file_compression(file_format, compression, color_mode)
+        prefix, gs_prefix = str(uuid.uuid4()), str(uuid.uuid4())
+        extension = self.FILE_EXTENSIONS[file_format]
+
+        # Ghostscript numbers the output files from 1; rename them to the page numbers.
+        def collect(_: typing.List[bytes]) -> typing.List[str]:
+            files = []
+            for index, page_num in enumerate(range(first_page, last_page + 1), start=1):
+                rendered = os.path.join(output_folder, f"{gs_prefix}-{index:04d}.{extension}")
+                if not os.path.exists(rendered):
+                    break
+                page_file = os.path.join(output_folder, f"{prefix}-{page_num:04d}.{extension}")
+                os.replace(rendered, page_file)
+                files.append(page_file)
+            return files
+
+        return RenderPlan(
+            commands=[self._command(src_file_spec, dpi, threads, first_page, last_page,
+                                    self.FILE_DEVICES[file_format][color_mode],
+                                    os.path.join(output_folder, f"{gs_prefix}-%04d.{extension}"),
+                                    self.compression_options(compression))],
+            collect=self.compressed(collect, compression))
+
+    def render_images(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                      color_mode: str = ColorMode.RGB) -> typing.List[Image.Image]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_images(src_file_spec, dpi, threads, first_page, last_page, color_mode))
+
+    def render_files(self, src_file_spec: str, dpi: int, threads: int, first_page: int, last_page: int,
+                     output_folder: str, color_mode: str = ColorMode.RGB, compression: typing.Optional[str] = None,
+                     file_format: str = IRenderer.TIFF) -> typing.List[str]:
+        first_page, last_page = self.page_range(src_file_spec, first_page, last_page)
+        return self.execute(self.plan_files(src_file_spec, dpi, threads, first_page, last_page, output_folder,
+                                            color_mode, compression, file_format))
+
+
+class RendererSelector:
+    """
+    Resolves the renderer name (including 'auto') to an installed backend.
+
+    'auto' picks the backend with the best recorded throughput (pages/sec) for the document's class (text, scan,
+    mixed). Installed backends that have no throughput recorded for the class are tried first (in PREFERENCE order),
+    so every backend gets measured; once all are recorded, a random other backend is tried EXPLORE_RATE of the time,
+    so a backend whose average is out of date gets measured again. Throughput is recorded (as an exponential moving
+    average) by conversions that run in 'auto' mode, and by the benchmark suite.
+    """
+
+    AUTO = 'auto'
+    PREFERENCE = ('pdftoppm', 'pdftocairo', 'ghostscript')
+
+    DEFAULT_HISTORY_FILE = os.path.join('~', '.cache', 'pdf_conversion', 'renderer_throughput.json')
+    SMOOTHING = 0.3         # Weight of the newest measurement in the moving average
+    EXPLORE_RATE = 0.05     # Fraction of the selections that try a backend other than the fastest
+
+    # Number of pages sampled when classifying a document.
+    CLASSIFY_PAGES = 5
+
+    UNKNOWN = 'unknown'
+
+    _lock = threading.Lock()
+
+    def __init__(self, history_file: typing.Optional[str] = None) -> None:
+        """
+        :param history_file: JSON file with the recorded throughput (default: DEFAULT_HISTORY_FILE)
+        """
+        self.history_file = os.path.abspath(os.path.expanduser(history_file or self.DEFAULT_HISTORY_FILE))
+
+    @staticmethod
+    def installed() -> typing.List[str]:
+        """
+        :return: Names of the registered backends whose executables are installed
+        """
+        return [name for name, renderer_class in RENDERERS.items() if renderer_class.installed()]
+
+    @classmethod
+    def classify(cls, src_file_spec: str) -> str:
+        """
+        Classify a document as 'text' (fonts, no images), 'scan' (images, no fonts) or 'mixed', based on the
+        resources of the first few pages. Requires pypdf; returns 'unknown' if the document cannot be classified.
+        """
+        try:
+            return cls._classify(src_file_spec, os.path.getmtime(src_file_spec))
+        except Exception:
+            return cls.UNKNOWN
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _classify(src_file_spec: str, mtime: float) -> str:
+        if pypdf is None:
+            return RendererSelector.UNKNOWN
+
+        has_fonts = has_images = False
+        for page in pypdf.PdfReader(src_file_spec).pages[:RendererSelector.CLASSIFY_PAGES]:
+            resources = page.get('/Resources') or {}
+            has_fonts = has_fonts or bool(resources.get('/Font'))
+            xobjects = resources.get('/XObject') or {}
+            has_images = has_images or any(xobject.get_object().get('/Subtype') == '/Image'
+                                           for xobject in xobjects.values())
+        if has_images and not has_fonts:
+            return 'scan'
+        if has_fonts and not has_images:
+            return 'text'
+        return 'mixed' if has_fonts or has_images else RendererSelector.UNKNOWN
+
+    def _read(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        if not os.path.exists(self.history_file):
+            return {}
+        try:
+            with open(self.history_file, "r") as HISTORY:
+                return json.load(HISTORY)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, renderer: str, doc_class: str, pages: int, seconds: float) -> typing.NoReturn:
+        """
+        Record the throughput of a render.
+
+        :param renderer: Backend name
+        :param doc_class: Document class (see classify())
+        :param pages: Number of pages rendered
+        :param seconds: Time taken to render the pages
+
+        :return: None
+        """
+        if pages <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            history = self._read()
+            throughput = pages / seconds
+            previous = history.setdefault(doc_class, {}).get(renderer)
+            history[doc_class][renderer] = throughput if previous is None else (
+                self.SMOOTHING * throughput + (1 - self.SMOOTHING) * previous)
+
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            temp_file = f"{self.history_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w") as HISTORY:
+                json.dump(history, HISTORY, indent=2)
+            os.replace(temp_file, self.history_file)
+
+    def select(self, doc_class: str) -> str:
+        """
+        Pick the fastest installed backend for the document class (an unrecorded backend first, see the class
+        description).
+
+        :param doc_class: Document class (see classify())
+        :return: Backend name
+        """
+        installed = self.installed()
+        installed = ([name for name in self.PREFERENCE if name in installed] +
+                     [name for name in installed if name not in self.PREFERENCE])
+        if not installed:
+            return self.PREFERENCE[0]
+
+        throughput = {name: value for name, value in self._read().get(doc_class, {}).items() if name in installed}
+        unrecorded = [name for name in installed if name not in throughput]
+        if unrecorded:
+            return unrecorded[0]
+
+        fastest = max(throughput, key=throughput.get)
+        others = [name for name in installed if name != fastest]
+        if others and random.random() < self.EXPLORE_RATE:
+            return random.choice(others)
+        return fastest
+
+    def resolve(self, name: str, src_file_spec: str) -> typing.Tuple[str, str]:
+        """
+        Resolve a renderer name for a document.
+
+        :param name: Backend name or 'auto'
+        :param src_file_spec: Document to render
+
+        :return: Tuple of (backend name, document class); the class is only determined in 'auto' mode.
+        """
+        name = (name or '').lower()
+        if name == self.AUTO:
+            doc_class = self.classify(src_file_spec)
+            return self.select(doc_class), doc_class
+
+        if name not in RENDERERS:
+            print(f"WARNING: Unrecognized renderer: '{name}' -- Supported renderers: "
+                  f"{', '.join(sorted(RENDERERS.keys()))}, {self.AUTO}\n"
+                  f"\t Using the default renderer: '{self.PREFERENCE[0]}'")
+            name = self.PREFERENCE[0]
+        return name, None
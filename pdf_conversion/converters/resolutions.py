@@ -0,0 +1,103 @@
+import re
+import typing
+
+from PIL import Image
+
+
+class Resolution(typing.NamedTuple):
+    """
+    An output size of the pages: a DPI (e.g. - a 100 DPI preview), or a max size in pixels of the longest side
+    (e.g. - a 256px thumbnail).
+    """
+    name: str
+    dpi: int = 0
+    max_pixels: int = 0
+
+    def __str__(self):
+        return f"{self.name}:{self.dpi}" if self.dpi else f"{self.name}:{self.max_pixels}px"
+
+
+class Resolutions:
+    """
+    Multi-resolution output: each page is rendered once, at the highest requested DPI, and the smaller sizes are
+    derived from that raster (instead of rendering the document once per size).
+
+    Sizes are given as 'name:dpi' or 'name:<pixels>px' (longest side), e.g. - 'thumb:256px,preview:100,full:300'.
+    Sizes are never scaled up: a size larger than the render is written at the rendered size.
+    """
+
+    SIZES_KW = 'sizes'
+
+    SIZE_SPEC = re.compile(r'^\s*([A-Za-z0-9_-]+)\s*:\s*(\d+)\s*(px)?\s*$', re.IGNORECASE)
+
+    # Downscaling: PIL reduces the raster by an integer factor first (box filter, fast), and only resamples the
+    # remaining factor (at most REDUCING_GAP) with RESAMPLE.
+    RESAMPLE = Image.Resampling.BILINEAR
+    REDUCING_GAP = 2.0
+
+    @classmethod
+    def resolve(cls, sizes: typing.Optional[typing.Union[str, typing.List[str], typing.Dict[str, typing.Any]]],
+                defaults: typing.Optional[dict] = None) -> typing.List[Resolution]:
+        """
+        Resolve the sizes option (CLI arg, else configured default).
+
+        :param sizes: 'name:dpi' or 'name:<pixels>px' specs: comma separated string, list, or {name: dpi or
+              '<pixels>px'} (None: use the configured default)
+        :param defaults: rendering defaults (read from file)
+
+        :return: List of Resolution (empty: a single output size, at the conversion DPI)
+        """
+        sizes = sizes or (defaults or {}).get(cls.SIZES_KW)
+        if not sizes:
+            return []
+
+        if isinstance(sizes, dict):
+            specs = [f"{name}:{value}" for name, value in sizes.items()]
+        elif isinstance(sizes, str):
+            specs = sizes.split(',')
+        else:
+            specs = [str(spec) for spec in sizes]
+
+        resolutions = []
+        for spec in specs:
+            match = cls.SIZE_SPEC.match(spec)
+            if match is None or int(match.group(2)) <= 0:
+                print(f"WARNING: Unrecognized size: '{spec.strip()}' -- Expected 'name:dpi' or 'name:<pixels>px'")
+                continue
+            name, value, pixels = match.group(1), int(match.group(2)), match.group(3)
+            if any(resolution.name == name for resolution in resolutions):
+                print(f"WARNING: Duplicate size name: '{name}' -- Using the first one")
+                continue
+            resolutions.append(Resolution(name, max_pixels=value) if pixels else Resolution(name, dpi=value))
+        return resolutions
+
+    @staticmethod
+    def render_dpi(resolutions: typing.List[Resolution], dpi: int) -> int:
+        """
+        :param resolutions: Output sizes
+        :param dpi: Conversion DPI (used if no size is given as a DPI)
+
+        :return: The DPI the pages are rendered at: the highest requested DPI
+        """
+        return max([resolution.dpi for resolution in resolutions if resolution.dpi] or [dpi])
+
+    @classmethod
+    def derive(cls, image: Image.Image, resolution: Resolution, render_dpi: int) -> Image.Image:
+        """
+        Derive an output size from the rendered raster.
+
+        :param image: Raster rendered at render_dpi
+        :param resolution: Output size
+        :param render_dpi: DPI of the raster
+
+        :return: The downscaled raster (the raster itself if the size is not smaller than the render)
+        """
+        if resolution.dpi:
+            scale = resolution.dpi / render_dpi
+        else:
+            scale = resolution.max_pixels / max(image.size)
+        if scale >= 1:
+            return image
+
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, cls.RESAMPLE, reducing_gap=cls.REDUCING_GAP)
@@ -0,0 +1,477 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import signal
+import socketserver
+import threading
+import time
+import typing
+from urllib.parse import parse_qs, urlparse
+import uuid
+
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.conversion_planner import ConversionPlanner
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.priority_scheduler import PriorityScheduler, ScheduledJob
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+class ConversionJob(ScheduledJob):
+    """
+    A document submitted to the ConversionService, and its progress (queued -> running -> done/failed).
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    FINISHED = (DONE, FAILED)
+
+    def __init__(self, document: DocumentInfo, doc_format: SupportedDocTypes,
+                 options: typing.Optional[typing.Dict[str, typing.Any]] = None, priority: typing.Optional[str] = None,
+                 deadline: typing.Optional[float] = None) -> None:
+        """
+        ConversionJob Constructor
+        :param document: Document to convert (its conversion_dir is where the images are written)
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param options: Conversion args (see PDFConversion.convert())
+        :param priority: 'interactive' or 'bulk' (see PriorityScheduler)
+        :param deadline: Number of seconds (after submission) the job should be finished in (optional)
+        """
+        super().__init__(document, doc_format, options=options, priority=priority, deadline=deadline)
+        self.id = uuid.uuid4().hex
+        self.status = self.QUEUED
+        self._finished = threading.Event()
+
+    def run_started(self) -> typing.NoReturn:
+        super().run_started()
+        self.status = self.RUNNING
+
+    def run_finished(self) -> typing.NoReturn:
+        # The converters report their errors (and return no images) rather than raising them.
+        if self.error is None and not self.document.files:
+            self.error = "No images were generated (see the service log)."
+        self.finish(self.FAILED if self.error is not None else self.DONE, self.error)
+        print(f"{self.__class__.__name__}: {self.id} ({self.document.filespec}, {self.priority}): {self.status} "
+              f"in {self.finished - self.started:0.3f} seconds (first page: {self.first_page_seconds or 0:0.3f} "
+              f"seconds after submission).")
+
+    def finish(self, status: str, error: typing.Optional[str] = None) -> typing.NoReturn:
+        """
+        Mark the job as finished (waking up any waiting clients).
+
+        :param status: DONE or FAILED
+        :param error: Error description (if the job failed)
+
+        :return: None
+        """
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+        self._finished.set()
+
+    def wait(self, timeout: typing.Optional[float] = None) -> bool:
+        """
+        Wait for the job to finish.
+
+        :param timeout: Max number of seconds to wait (None: wait until finished)
+
+        :return: True if the job is finished
+        """
+        return self._finished.wait(timeout)
+
+    def status_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: JSON serializable job status
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filespec': self.document.filespec,
+            'format': self.doc_format.value,
+            'output_dir': self.document.file_dir,
+            'options': self.options,
+            'priority': self.priority,
+            'deadline': self.deadline,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'queued_seconds': round((self.started or time.time()) - self.submitted, 6),
+            'run_seconds': round((self.finished or time.time()) - self.started, 6) if self.started else None,
+            'first_page_seconds': (round(self.first_page_seconds, 6) if self.first_page_seconds is not None else
+                                   None),
+            'missed_deadline': self.missed_deadline,
+            'error': self.error,
+        }
+
+    def result_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: JSON serializable job status, plus the DocumentInfo data
+        """
+        return {**self.status_dict(), 'document': self.document.to_dict()}
+
+
+class ConversionService:
+    """
+    Long-running conversion service. The interpreter, imports, configuration, conversion cache and encode workers
+    are set up once, and kept warm for all the documents submitted to it; per document, only the conversion itself
+    is paid for.
+
+    Jobs are queued by priority (see PriorityScheduler): 'jobs' runners convert the documents in page ranges, taking
+    the first page of interactive jobs first, and the bulk jobs fill the remaining capacity. Each range renders its
+    own pages (poppler/ghostscript processes, see converters.renderers); the webp encoding of all running jobs is
+    shared by one EncodePool, started when the service starts.
+
+    Clients can only convert documents under the input directories (default: the directory the service was started
+    from), and only write images under the service output directory; other paths are rejected (403).
+
+    API (JSON over HTTP, on localhost or a Unix socket):
+        POST /jobs                      - submit {'filespec', 'format', 'output_dir', 'options', 'priority',
+                                          'deadline'}: 202 + job status
+        GET  /jobs                      - status of all known jobs
+        GET  /jobs/<id>                 - job status
+        GET  /jobs/<id>/result[?wait=N] - job status + DocumentInfo data (waits up to N seconds for the job to
+                                          finish); 409 if the job has not finished
+        GET  /health                    - service status (and the queue wait / time to first page percentiles)
+    """
+
+    DEFAULT_HOST = '127.0.0.1'
+    DEFAULT_PORT = 8765
+    DEFAULT_JOBS = 4
+    DEFAULT_MAX_HISTORY = 1000      # finished jobs kept for status/result requests (oldest are dropped first)
+
+    # Conversion args that can be set per job (the encoders are shared, so they are service-wide settings).
+    JOB_OPTIONS = ('dpi', 'quality', 'lossless', 'threads', 'renderer', 'color_mode', 'compression', 'multipage',
+                   'profile', 'method', 'target_bytes', 'direct', 'max_memory', 'incremental', 'sizes',
+                   'first_page', 'last_page', 'resume')
+
+    def __init__(self, defaults: typing.Optional[DefaultValues] = None, output_dir: str = '.',
+                 jobs: typing.Optional[int] = 0, pool: typing.Optional[EncodePool] = None,
+                 cache: typing.Optional[ConversionCache] = None,
+                 job_defaults: typing.Optional[typing.Dict[str, typing.Any]] = None,
+                 max_history: typing.Optional[int] = 0, input_dirs: typing.Optional[typing.List[str]] = None) -> None:
+        """
+        ConversionService Constructor
+        :param defaults: A dictionary of defaults for each image type (optional)
+        :param output_dir: Directory to store the converted images (one sub-directory per document, unless the job
+              specifies its own output directory, which must be within this directory)
+        :param jobs: Number of documents converted concurrently (<= 0: use the default)
+        :param pool: Shared EncodePool (default: built from the webp defaults)
+        :param cache: Conversion cache (optional)
+        :param job_defaults: Conversion args applied to every job, unless the job overrides them (see JOB_OPTIONS)
+        :param max_history: Number of finished jobs to keep (<= 0: use the default)
+        :param input_dirs: Directories the submitted documents must be in (default: the service defaults'
+              input_dirs, else the current directory)
+        """
+        self.defaults = defaults
+        service_defaults = getattr(defaults, DefaultValues.SERVICE_DEFAULTS, None) or {}
+        webp_defaults = getattr(defaults, DefaultValues.WEBP_DEFAULTS, None) or {}
+
+        self.output_dir = os.path.realpath(output_dir)
+        self.input_dirs = [os.path.realpath(os.path.expanduser(input_dir))
+                           for input_dir in input_dirs or service_defaults.get('input_dirs') or [os.curdir]]
+        self.num_jobs = jobs if jobs and jobs > 0 else service_defaults.get('jobs', self.DEFAULT_JOBS)
+        self.max_history = max_history if max_history and max_history > 0 else service_defaults.get(
+            'max_history', self.DEFAULT_MAX_HISTORY)
+        self.pool = pool or EncodePool(defaults=webp_defaults)
+        self.cache = cache
+        self.job_defaults = {key: value for key, value in (job_defaults or {}).items() if key in self.JOB_OPTIONS}
+
+        self.scheduler = PriorityScheduler(runners=self.num_jobs, defaults=defaults, pool=self.pool, cache=cache)
+
+        self.started = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self) -> "ConversionService":
+        """
+        Start the encode workers and the job runners.
+
+        :return: self (allows chaining of methods)
+        """
+        if not self.scheduler.running:
+            start_time = time.perf_counter()
+            self.pool.start()
+            self.scheduler.start()
+            self.started = time.time()
+            print(f"{self.__class__.__name__}: Started {self.num_jobs} job runner(s) and {self.pool.workers} "
+                  f"{self.pool.pool_type} encode worker(s) in {time.perf_counter() - start_time:0.3f} seconds.")
+        return self
+
+    def shutdown(self) -> typing.NoReturn:
+        """
+        Stop accepting requests, finish the running jobs, and stop the workers.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+
+        # Jobs that have not started are reported as failed (the runners finish the jobs that have started).
+        for job in self.scheduler.shutdown(cancel_queued=True):
+            job.finish(ConversionJob.FAILED, "Service stopped before the job was started.")
+        self.pool.shutdown()
+
+    def submit(self, filespec: str, doc_format: typing.Optional[str] = None, output_dir: typing.Optional[str] = None,
+               options: typing.Optional[typing.Dict[str, typing.Any]] = None, priority: typing.Optional[str] = None,
+               deadline: typing.Optional[float] = None) -> ConversionJob:
+        """
+        Queue a document for conversion.
+
+        :param filespec: File spec of the PDF (as seen by the service)
+        :param doc_format: Target format ('webp', 'tif', 'png' or 'jpg'; default: webp)
+        :param output_dir: Directory to store the images, within the service output dir (default: <service output
+              dir>/<document name>; a relative directory is relative to the service output dir)
+        :param options: Conversion args (see JOB_OPTIONS)
+        :param priority: 'interactive' or 'bulk' (default: bulk; see PriorityScheduler)
+        :param deadline: Number of seconds (after submission) the job should be finished in (optional)
+
+        :return: ConversionJob
+        :raises PermissionError: The document is not in an input directory, or the output directory is not within
+                the service output directory
+        """
+        if not self.scheduler.running:
+            raise RuntimeError("The service has not been started.")
+        if not filespec or not isinstance(filespec, str):
+            raise ValueError("A 'filespec' is required")
+        filespec = os.path.realpath(filespec)
+        if not self._within(filespec, self.input_dirs):
+            raise PermissionError(f"'{filespec}' is not in an input directory ({', '.join(self.input_dirs)})")
+        if not os.path.isfile(filespec):
+            raise ValueError(f"Unable to find '{filespec}'")
+
+        try:
+            target = SupportedDocTypes((doc_format or SupportedDocTypes.WEBP.value).lower())
+        except ValueError:
+            target = None
+        targets = ConversionPlanner().targets()
+        if target not in targets:
+            raise ValueError(f"Unsupported format: '{doc_format}' (supported: "
+                             f"{', '.join(doc_type.value for doc_type in targets)})")
+
+        unknown = sorted(set(options or {}) - set(self.JOB_OPTIONS))
+        if unknown:
+            raise ValueError(f"Unsupported option(s): {', '.join(unknown)} (supported: {', '.join(self.JOB_OPTIONS)})")
+
+        output_dir = os.path.realpath(os.path.join(
+            self.output_dir, output_dir or os.path.split(filespec)[-1].rsplit('.', 1)[0]))
+        if not self._within(output_dir, [self.output_dir]):
+            raise PermissionError(f"'{output_dir}' is not within the output directory ({self.output_dir})")
+        document = DocumentInfo(file_spec=filespec, conversion_dir=output_dir)
+        job = ConversionJob(document, target, options={**self.job_defaults, **(options or {})}, priority=priority,
+                            deadline=float(deadline) if deadline is not None else None)
+        os.makedirs(document.file_dir, exist_ok=True)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self.scheduler.submit(job)
+        return job
+
+    @staticmethod
+    def _within(path: str, directories: typing.List[str]) -> bool:
+        """
+        :param path: Resolved path (see os.path.realpath())
+        :param directories: Resolved directories
+
+        :return: True if the path is one of the directories, or is in one of them
+        """
+        return any(os.path.commonpath([path, directory]) == directory for directory in directories)
+
+    def job(self, job_id: str) -> typing.Optional[ConversionJob]:
+        """
+        :param job_id: Job id
+        :return: The job (None if unknown)
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> typing.List[ConversionJob]:
+        """
+        :return: All known jobs (in submission order)
+        """
+        with self._lock:
+            return list(self._jobs.values())
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: JSON serializable service status
+        """
+        counts = {status: 0 for status in (ConversionJob.QUEUED, ConversionJob.RUNNING, ConversionJob.DONE,
+                                           ConversionJob.FAILED)}
+        for job in self.jobs():
+            counts[job.status] += 1
+        return {
+            'started': self.started,
+            'uptime_seconds': round(time.time() - self.started, 3) if self.started else 0,
+            'job_runners': self.num_jobs,
+            'encode_workers': self.pool.workers,
+            'encode_pool': self.pool.pool_type,
+            'jobs': counts,
+            'queued': self.scheduler.queued(),
+            'scheduling': self.scheduler.report(),
+            'cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+    def _prune(self) -> typing.NoReturn:
+        """
+        Drop the oldest finished jobs beyond max_history (the caller holds the lock).
+
+        :return: None
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ConversionJob.FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def serve(self, host: typing.Optional[str] = None, port: typing.Optional[int] = 0,
+              socket_path: typing.Optional[str] = None) -> typing.NoReturn:
+        """
+        Start the service and handle requests until interrupted (SIGINT/SIGTERM).
+
+        :param host: Interface to listen on (default: localhost)
+        :param port: Port to listen on
+        :param socket_path: If provided, listen on this Unix socket instead of host/port
+
+        :return: None
+        """
+        service_defaults = getattr(self.defaults, DefaultValues.SERVICE_DEFAULTS, None) or {}
+        socket_path = socket_path or service_defaults.get('socket')
+
+        self.start()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self._server = UnixHTTPServer(socket_path, ServiceRequestHandler)
+            address = f"unix://{socket_path}"
+        else:
+            host = host or service_defaults.get('host', self.DEFAULT_HOST)
+            port = port if port and port > 0 else service_defaults.get('port', self.DEFAULT_PORT)
+            self._server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+            address = f"http://{host}:{self._server.server_address[1]}"
+        self._server.service = self
+
+        # SIGTERM is handled like Ctrl-C, so the workers are shut down cleanly.
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self._server.shutdown).start())
+
+        print(f"{self.__class__.__name__}: Listening on {address}")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            self._server = None
+            self.shutdown()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+            print(f"{self.__class__.__name__}: Stopped.")
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """ HTTP server on a Unix socket (only reachable by local users with access to the socket file). """
+    daemon_threads = True
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of the ConversionService (see ConversionService for the endpoints). The service is attached to the
+    server instance (server.service).
+    """
+
+    server_version = 'PDFConversionService/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    MAX_BODY_BYTES = 1024 * 1024
+    MAX_WAIT_SECONDS = 300
+
+    JOBS_PATH = re.compile(r'^/jobs/?$')
+    JOB_PATH = re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/?$')
+    RESULT_PATH = re.compile(r'^/jobs/(?P<job_id>[0-9a-f]+)/result/?$')
+    HEALTH_PATH = re.compile(r'^/health/?$')
+
+    @property
+    def service(self) -> ConversionService:
+        return self.server.service
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address.
+        return super().address_string() if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        print(f"{self.service.__class__.__name__}: {self.address_string()} - {format % args}")
+
+    def _send_json(self, code: int, payload: typing.Any,
+                   headers: typing.Optional[typing.Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, code: int, message: str) -> None:
+        self._send_json(code, {'error': message})
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+
+        if self.HEALTH_PATH.match(url.path):
+            return self._send_json(200, self.service.status())
+
+        if self.JOBS_PATH.match(url.path):
+            return self._send_json(200, [job.status_dict() for job in self.service.jobs()])
+
+        match = self.JOB_PATH.match(url.path) or self.RESULT_PATH.match(url.path)
+        if match is None:
+            return self._send_error(404, f"Unknown path: '{url.path}'")
+
+        job = self.service.job(match.group('job_id'))
+        if job is None:
+            return self._send_error(404, f"Unknown job: '{match.group('job_id')}'")
+
+        if match.re is self.JOB_PATH:
+            return self._send_json(200, job.status_dict())
+
+        try:
+            wait = float(parse_qs(url.query).get('wait', [0])[0])
+        except ValueError:
+            return self._send_error(400, "'wait' must be a number of seconds")
+        if wait > 0:
+            job.wait(min(wait, self.MAX_WAIT_SECONDS))
+
+        if job.status not in ConversionJob.FINISHED:
+            return self._send_json(409, job.status_dict())
+        return self._send_json(200, job.result_dict())
+
+    def do_POST(self) -> None:
+        if not self.JOBS_PATH.match(urlparse(self.path).path):
+            return self._send_error(404, f"Unknown path: '{self.path}'")
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            return self._send_error(400, "Invalid Content-Length")
+        if length > self.MAX_BODY_BYTES:
+            return self._send_error(413, f"Request body exceeds {self.MAX_BODY_BYTES} bytes")
+
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            job = self.service.submit(filespec=request.get('filespec'), doc_format=request.get('format'),
+                                      output_dir=request.get('output_dir'), options=request.get('options'),
+                                      priority=request.get('priority'), deadline=request.get('deadline'))
+        except PermissionError as exc:
+            return self._send_error(403, str(exc))
+        except (ValueError, TypeError) as exc:
+            return self._send_error(400, str(exc))
+        except RuntimeError as exc:
+            return self._send_error(503, str(exc))
+
+        return self._send_json(202, job.status_dict(), headers={'Location': f"/jobs/{job.id}"})
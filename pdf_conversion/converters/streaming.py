@@ -0,0 +1,280 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+import os
+import queue
+import threading
+from time import perf_counter
+import typing
+
+from pdf_conversion.converters.encode_pool import EncodePool, encode_page
+from pdf_conversion.converters.memory_budget import MemoryBudget
+from pdf_conversion.converters.pdf2raster import PdfToRaster
+from pdf_conversion.converters.renderers import RendererError
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
+from pdf_conversion.documents.document_probe import DocumentProbe
+
+
+class StreamedPage(typing.NamedTuple):
+    """ A page that has been rendered and encoded by the StreamingPdfToWebp pipeline. """
+    page_num: int
+    files: typing.List[str]
+    duration: float
+
+
+class StreamingPdfToWebp:
+    """
+    Streaming PDF to webp pipeline. Pages are rendered in page-range chunks (first_page/last_page) by a render thread
+    and pushed through a bounded queue to the encoding workers, so rendering and encoding overlap. Finished pages
+    are yielded by pages() as soon as they are encoded (i.e. - in completion order, not necessarily page order).
+
+    With a MemoryBudget, chunks are also sized to fit the raster budget, and the render thread reserves each chunk's
+    (estimated) raster bytes before rendering it; the bytes are released as the pages are encoded.
+    """
+
+    DEFAULT_CHUNK_PAGES = 4
+    DEFAULT_QUEUE_SIZE = 0          # 0 = two queued pages per encoding worker
+
+    # Interval (seconds) at which blocked stages re-check whether the pipeline has been stopped.
+    POLL_INTERVAL = 0.1
+
+    _DONE = object()
+
+    def __init__(self, src_file_spec: str, output_folder: typing.Optional[str] = '.',
+                 output_file: typing.Optional[str] = None, pool: typing.Optional[EncodePool] = None,
+                 chunk_pages: typing.Optional[int] = 0, queue_size: typing.Optional[int] = 0,
+                 render_defaults: typing.Optional[dict] = None, encode_defaults: typing.Optional[dict] = None,
+                 memory_budget: typing.Optional[MemoryBudget] = None,
+                 metrics: typing.Optional[ConversionMetrics] = None,
+                 probe: typing.Optional[DocumentProbe] = None, **kwargs) -> None:
+        """
+        StreamingPdfToWebp Constructor
+        :param src_file_spec: File spec (path + name) of the PDF to convert
+        :param output_folder: Path to directory where output files are located
+        :param output_file: Base filename for the output files (page number is appended). Default: PDF filename
+        :param pool: EncodePool that determines the number and type of encoding workers
+        :param chunk_pages: Number of pages rendered per pdf2image call
+        :param queue_size: Max number of rendered pages waiting to be encoded (backpressure on the renderer)
+        :param render_defaults: rendering defaults (See PdfToTiff class for DEFAULT_* parameters)
+        :param encode_defaults: webp encoding defaults (See TiffToWebp class for DEFAULT_* parameters)
+        :param memory_budget: Bounds the memory used by rendered pages (optional)
+        :param metrics: Records the probe, render, encode and write spans (optional)
+        :param probe: The document's probe (page count and sizes); if not provided, the document is probed
+        :param kwargs: Additional args passed to the renderer and encoder (dpi, threads, quality, lossless, etc.)
+        """
+        self.src_file_spec = src_file_spec
+        self.output_folder = output_folder
+        self.output_file = output_file or os.path.split(src_file_spec)[-1].rsplit('.', 1)[0]
+        self.pool = pool or EncodePool(defaults=encode_defaults)
+        self.render_defaults = render_defaults or {}
+        self.encode_defaults = encode_defaults or {}
+        self.memory_budget = memory_budget
+        self.metrics = metrics if metrics is not None else ConversionMetrics()
+        self.probe = probe
+        self.kwargs = kwargs
+        self._page_bytes = []
+
+        self.chunk_pages = chunk_pages if chunk_pages and chunk_pages > 0 else self.render_defaults.get(
+            'chunk_pages', self.DEFAULT_CHUNK_PAGES)
+        self.queue_size = queue_size if queue_size and queue_size > 0 else self.render_defaults.get(
+            'queue_size', self.DEFAULT_QUEUE_SIZE)
+        if self.queue_size <= 0:
+            self.queue_size = 2 * self.pool.workers
+
+        self.render_duration = 0
+        self.conversion_duration = 0
+
+        self._stop = threading.Event()
+
+    def page_count(self) -> int:
+        """
+        Determine the number of pages in the PDF (the document is probed if no probe was provided).
+
+        :return: Number of pages
+        """
+        if self.probe is None:
+            self.probe = DocumentProbe.probe(self.src_file_spec, hash_content=False)
+        return self.probe.page_count
+
+    def chunks(self, num_pages: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Split the document into (first_page, last_page) render ranges.
+
+        :param num_pages: Number of pages in the document
+
+        :return: List of inclusive, 1-based page ranges
+        """
+        if self.memory_budget is not None and self.memory_budget.enabled:
+            return self.memory_budget.chunks(self._page_bytes, max_pages=self.chunk_pages)
+        return [(first, min(first + self.chunk_pages - 1, num_pages))
+                for first in range(1, num_pages + 1, self.chunk_pages)]
+
+    def pages(self) -> typing.Iterator[StreamedPage]:
+        """
+        Run the pipeline, yielding each page as soon as it has been encoded.
+        If the consumer stops iterating early, the render and encode stages are shut down. A render or encode failure
+        is raised (after the pages already encoded), e.g. - RendererError if a chunk could not be rendered.
+
+        :return: Generator of StreamedPage
+        """
+        start_time = perf_counter()
+        with self.metrics.span(ConversionMetrics.PROBE):
+            num_pages = self.page_count()
+            if self.memory_budget is not None and self.memory_budget.enabled:
+                dpi = PdfToRaster(src_file_spec=self.src_file_spec, defaults=self.render_defaults, **self.kwargs).dpi
+                self._page_bytes = MemoryBudget.page_bytes(self.src_file_spec, dpi, last_page=num_pages,
+                                                           probe=self.probe)
+
+        render_queue = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        self._stop.clear()
+
+        # A started pool's workers are already running (and shared); otherwise, process workers are started for
+        # this document.
+        num_encoders = self.pool.size(num_pages)
+        executor = self.pool.running_executor
+        own_executor = executor is None and self.pool.pool_type == EncodePool.PROCESS
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=num_encoders)
+
+        threads = [threading.Thread(target=self._render, args=(num_pages, render_queue, results, num_encoders),
+                                    daemon=True)]
+        threads.extend(threading.Thread(target=self._encode, args=(render_queue, results, executor), daemon=True)
+                       for _ in range(num_encoders))
+        for thread in threads:
+            thread.start()
+
+        try:
+            finished_encoders = 0
+            while finished_encoders < num_encoders:
+                result = results.get()
+                if result is self._DONE:
+                    finished_encoders += 1
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    yield result
+
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            if own_executor:
+                executor.shutdown()
+            self.conversion_duration = perf_counter() - start_time
+
+    def _put(self, target_queue: queue.Queue, item: typing.Any) -> bool:
+        """
+        Put an item on a bounded queue, blocking while it is full (unless the pipeline is stopped).
+
+        :param target_queue: Queue to put the item on
+        :param item: Item to queue
+
+        :return: True if the item was queued, False if the pipeline was stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                target_queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _render(self, num_pages: int, render_queue: queue.Queue, results: queue.Queue, num_encoders: int) -> None:
+        """
+        Render stage: render each chunk into memory and queue the pages for encoding.
+
+        :param num_pages: Number of pages in the document
+        :param render_queue: Bounded queue feeding the encoders
+        :param results: Results queue (used to report render failures)
+        :param num_encoders: Number of encoder threads (each receives an end-of-stream marker)
+
+        :return: None
+        """
+        try:
+            for first_page, last_page in self.chunks(num_pages):
+                if self._stop.is_set():
+                    return
+
+                # Backpressure: wait until the encoders have released enough memory for this chunk.
+                if self._page_bytes and not self.memory_budget.reserve(
+                        sum(self._page_bytes[first_page - 1:last_page]), self._stop):
+                    return
+
+                # Pages handed to the encoders are released by the encoders; the pages of the chunk that were not
+                # rendered (render failure or short render) or not queued (pipeline stopped) are released here.
+                queued = 0
+                try:
+                    renderer = PdfToRaster(
+                        src_file_spec=self.src_file_spec, first_page=first_page, last_page=last_page,
+                        defaults=self.render_defaults, **self.kwargs).convert()
+                    self.render_duration += renderer.conversion_duration
+                    # The source PDF is counted (as bytes in) by the first chunk only.
+                    self.metrics.add(ConversionMetrics.RENDER, renderer.conversion_duration, first_page, last_page,
+                                     bytes_in=os.path.getsize(self.src_file_spec) if first_page == 1 else 0,
+                                     bytes_out=renderer.output_bytes())
+                    # PdfToRaster reports render failures (it does not raise): end the stream with the error.
+                    if not renderer.images:
+                        raise RendererError(renderer.renderer, f"Unable to render pages {first_page}-{last_page} "
+                                                               f"of '{self.src_file_spec}'")
+
+                    for page_num, raster in enumerate(renderer.images[:last_page - first_page + 1],
+                                                      start=first_page):
+                        if not self._put(render_queue, (page_num, raster)):
+                            return
+                        queued += 1
+
+                finally:
+                    if self._page_bytes:
+                        self.memory_budget.release(sum(self._page_bytes[first_page + queued - 1:last_page]))
+
+        except Exception as exc:
+            results.put(exc)
+
+        finally:
+            for _ in range(num_encoders):
+                self._put(render_queue, self._DONE)
+
+    def _encode(self, render_queue: queue.Queue, results: queue.Queue,
+                executor: typing.Optional[Executor]) -> None:
+        """
+        Encode stage: encode queued pages until the end-of-stream marker is received.
+
+        :param render_queue: Bounded queue of (page number, raster) tuples
+        :param results: Queue that receives the StreamedPage results
+        :param executor: Pool to encode in (None: encode in this thread)
+
+        :return: None
+        """
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = render_queue.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is self._DONE:
+                    break
+
+                page_num, raster = item
+                job = dict(src_file_spec=self.src_file_spec, src_image=raster,
+                           output_file=f"{self.output_file}-{page_num:04d}", output_folder=self.output_folder,
+                           defaults=self.encode_defaults, **self.kwargs)
+                try:
+                    if executor is not None:
+                        encoded = executor.submit(encode_page, job).result()
+                    else:
+                        encoded = encode_page(job)
+                finally:
+                    raster.close()
+                    if self._page_bytes:
+                        self.memory_budget.release(self._page_bytes[page_num - 1])
+
+                self.metrics.add(ConversionMetrics.ENCODE, encoded.encode_seconds, page_num,
+                                 bytes_in=encoded.bytes_in, bytes_out=encoded.bytes_out)
+                self.metrics.add(ConversionMetrics.WRITE, encoded.write_seconds, page_num,
+                                 bytes_in=encoded.bytes_out, bytes_out=encoded.bytes_out)
+                results.put(StreamedPage(page_num=page_num, files=encoded.files, duration=encoded.duration))
+
+        except Exception as exc:
+            results.put(exc)
+
+        finally:
+            results.put(self._DONE)
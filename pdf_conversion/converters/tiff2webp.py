@@ -1,17 +1,30 @@
+import io
 import os
 from time import perf_counter
 import typing
 
 from PIL import Image
 
-from pdf_conversion.converters.image_converter import IImageFormatConverter
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.image_converter import IImageFormatConverter, register_converter
+from pdf_conversion.converters.tiff_container import TiffContainer
+from pdf_conversion.converters.webp_profiles import WebpProfile
 from pdf_conversion.documents.file_extensions import SupportedDocTypes
 
 
+@register_converter
 class TiffToWebp(IImageFormatConverter):
     IMAGE_FORMAT = SupportedDocTypes.WEBP.value
     IMAGE_EXTENSION = SupportedDocTypes.WEBP.value
 
+    # Encodes rendered rasters, or reads the pages back from TIFF files (which costs a decode per page).
+    INPUT_FORMATS = (SupportedDocTypes.RASTER, SupportedDocTypes.TIFF)
+    OUTPUT_FORMAT = SupportedDocTypes.WEBP
+    DEFAULTS_SECTION = DefaultValues.WEBP_DEFAULTS
+    COST = 3.0
+    TIFF_READ_COST = 0.5
+
     # DEFAULT QUALITY range: [0, 100]
     # If LOSSLESS, DEFAULT_QUALITY = 0 (quickest compression) to 100 (best compression)
     # If not LOSSLESS, DEFAULT_QUALITY = 0 (smallest size) to 100 = (largest size)
@@ -23,11 +36,18 @@ class TiffToWebp(IImageFormatConverter):
     DPI_KW = 'dpi'
     DEFAULT_DPI = 200
 
+    # Target size mode: the quality is searched (binary search, lossy) between MIN_TARGET_QUALITY and 100.
+    TARGET_BYTES_KW = 'target_bytes'
+    MIN_TARGET_QUALITY = 0
+
     def __init__(
             self, src_file_spec: str, output_file: typing.Optional[str] = None, dpi: typing.Optional[int] = 0,
             threads: typing.Optional[int] = 0, output_folder: typing.Optional[str] = '.',
             extension: typing.Optional[str] = None, lossless: typing.Optional[bool] = None,
-            quality: typing.Optional[int] = -1, defaults: typing.Optional[dict] = None, **kwargs) -> None:
+            quality: typing.Optional[int] = -1, defaults: typing.Optional[dict] = None,
+            src_image: typing.Optional[Image.Image] = None, color_mode: typing.Optional[str] = None,
+            page_index: typing.Optional[int] = None, profile: typing.Optional[str] = None,
+            method: typing.Optional[int] = None, target_bytes: typing.Optional[int] = None, **kwargs) -> None:
 
         """
         Init - Super() does most of the work; this class's __init__() stores conversion specific options.
@@ -41,6 +61,21 @@ class TiffToWebp(IImageFormatConverter):
         :param lossless: (bool) - Do lossless conversion (more expensive, more accurate)
         :param quality: (int: 0 - 100) - Quality for non-lossless, compression for lossless.
               see class description for more detail.
+        :param defaults: image conversion default (read from file, used if specific values are not provided)
+        :param src_image: (PIL.Image) - Already rendered raster to encode. If provided, the image is encoded directly
+              from memory and src_file_spec is only used for reporting.
+        :param color_mode: rgb, gray, mono or auto - the image is encoded in this color mode (auto: the smallest mode
+              that keeps the image's content; gray/mono rasters are kept as is). See ColorMode.
+              Default: the color mode of the source image.
+        :param page_index: Index (0-based) of the page to encode, if src_file_spec is a multi-page TIFF container
+              (see TiffContainer)
+        :param profile: fast, balanced or smallest - sets the method, quality and lossless (an explicit quality still
+              applies). See WebpProfile.
+        :param method: Encoder effort: 0 (fastest) to 6 (smallest output). Default: the profile's method, else the
+              configured method, else Pillow's default (4)
+        :param target_bytes: Target size (bytes) per page: each page is encoded lossless if that fits the target
+              (text pages often compress best lossless), else lossy with the highest quality that fits (binary
+              search; about 8 encodes per page). 0/None: disabled
         :param kwargs: Any extra args (needed to support the ability to overload the base class __init___ in
                other subclasses)
 
@@ -49,11 +84,116 @@ class TiffToWebp(IImageFormatConverter):
                          extension=extension, dpi=dpi, threads=threads)
         self.lossless = lossless if lossless is not None else self.LOSSLESS
         self.quality = quality
+        self.src_image = src_image
+        self.page_index = page_index
         defaults = defaults or {}
+        self.color_mode = (ColorMode.resolve(color_mode, defaults)
+                           if color_mode or defaults.get(ColorMode.COLOR_MODE_KW) else None)
+        self.encoded_mode = None
+
+        # Stage metrics: encoding (in memory) vs. writing the encoded image to disk.
+        self.encode_duration = 0
+        self.write_duration = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        # Pixel dimensions (width, height) of the encoded image (see PageArtifact).
+        self.image_size = None
 
         if self.quality < 0:
             self.quality = defaults.get(self.QUALITY_KW, self.DEFAULT_QUALITY)
 
+        self.profile, profile_settings = WebpProfile.resolve(profile, defaults)
+        if self.profile is not None:
+            self.lossless = profile_settings['lossless']
+            if quality is None or quality < 0:
+                self.quality = profile_settings['quality']
+        self.method = (method if method is not None and method >= 0 else
+                       profile_settings.get(WebpProfile.METHOD_KW,
+                                            defaults.get(WebpProfile.METHOD_KW, WebpProfile.DEFAULT_METHOD)))
+
+        self.target_bytes = target_bytes or defaults.get(self.TARGET_BYTES_KW) or 0
+        self.search_steps = 0
+
+    @classmethod
+    def cost(cls, input_format: SupportedDocTypes) -> float:
+        return cls.COST + (cls.TIFF_READ_COST if input_format == SupportedDocTypes.TIFF else 0)
+
+    def settings(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: The effective encoder settings (JSON serializable)
+        """
+        return {
+            'profile': self.profile,
+            'method': self.method,
+            'quality': self.quality,
+            'lossless': self.lossless,
+            'target_bytes': self.target_bytes,
+        }
+
+    def _encode(self, image: Image.Image, buffer: typing.BinaryIO) -> typing.NoReturn:
+        """
+        Encode the image (in the target color mode) into the buffer.
+
+        :param image: Source image
+        :param buffer: Output buffer
+
+        :return: None
+        """
+        self.encoded_mode = self.color_mode or ColorMode.of_image(image)
+        if self.color_mode == ColorMode.AUTO:
+            # Rasters rendered in gray/mono were already checked by the renderer.
+            self.encoded_mode = ColorMode.of_image(image)
+            if self.encoded_mode == ColorMode.RGB:
+                self.encoded_mode = ColorMode.detect_image(image)
+
+        # webp has no bilevel mode: mono pages are thresholded, then encoded as gray.
+        encoded = ColorMode.convert(image, self.encoded_mode)
+        if encoded.mode == '1':
+            encoded = encoded.convert('L')
+        if self.target_bytes:
+            self._encode_target(encoded, buffer)
+        else:
+            encoded.save(buffer, format=self.IMAGE_FORMAT, lossless=self.lossless, quality=self.quality,
+                         method=self.method)
+
+    def _encode_target(self, image: Image.Image, buffer: typing.BinaryIO) -> typing.NoReturn:
+        """
+        Encode the image lossless if the output fits target_bytes, else lossy with the highest quality whose output
+        fits (self.lossless/self.quality are set to the result). If no quality fits, the image is encoded with
+        MIN_TARGET_QUALITY.
+
+        :param image: Image to encode (already in the target color mode)
+        :param buffer: Output buffer
+
+        :return: None
+        """
+        attempt = io.BytesIO()
+        image.save(attempt, format=self.IMAGE_FORMAT, lossless=True, quality=self.quality, method=self.method)
+        self.search_steps += 1
+        if attempt.tell() <= self.target_bytes:
+            self.lossless = True
+            buffer.write(attempt.getbuffer())
+            return
+
+        self.lossless = False
+        low, high = self.MIN_TARGET_QUALITY, 100
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            attempt = io.BytesIO()
+            image.save(attempt, format=self.IMAGE_FORMAT, lossless=False, quality=quality, method=self.method)
+            self.search_steps += 1
+            if attempt.tell() <= self.target_bytes:
+                best, self.quality, low = attempt, quality, quality + 1
+            else:
+                high = quality - 1
+
+        if best is None:
+            # The last attempt was the lowest quality (the smallest output).
+            best, self.quality = attempt, self.MIN_TARGET_QUALITY
+        buffer.write(best.getbuffer())
+
     def convert(self) -> "TiffToWebp":
         """
         Convert the TIFF to webp image.
@@ -61,18 +201,44 @@ class TiffToWebp(IImageFormatConverter):
         :return: self (allows chaining of methods, since the methods do not return any additional info).
 
         """
-        webp_filename = f"{os.path.split(self.src_file_spec)[-1].split('.')[0]}.{self.IMAGE_EXTENSION}"
-        webp_filespec = os.path.sep.join([self.output_folder, webp_filename])
+        basename = self.output_file or os.path.split(self.src_file_spec)[-1].split('.')[0]
+        webp_filespec = os.path.sep.join([self.output_folder, f"{basename}.{self.IMAGE_EXTENSION}"])
 
         try:
             start_time = perf_counter()
-            with Image.open(self.src_file_spec) as IMAGE:
-                IMAGE.save(webp_filespec, lossless=self.lossless, quality=self.quality)
+            buffer = io.BytesIO()
+            if self.src_image is not None:
+                self.bytes_in = ColorMode.raster_bytes(self.src_image)
+                self.image_size = self.src_image.size
+                self._encode(self.src_image, buffer)
+            elif self.page_index is not None:
+                image = TiffContainer.read_page(self.src_file_spec, self.page_index)
+                self.bytes_in = ColorMode.raster_bytes(image)
+                self.image_size = image.size
+                self._encode(image, buffer)
+                image.close()
+            else:
+                self.bytes_in = os.path.getsize(self.src_file_spec)
+                with Image.open(self.src_file_spec) as IMAGE:
+                    self.image_size = IMAGE.size
+                    self._encode(IMAGE, buffer)
+            self.encode_duration = perf_counter() - start_time
+
+            write_start = perf_counter()
+            with open(self.replace_file(webp_filespec), "wb") as WEBP:
+                WEBP.write(buffer.getbuffer())
+            self.bytes_out = buffer.tell()
+            self.write_duration = perf_counter() - write_start
+
             self.conversion_duration = perf_counter() - start_time
             print(f"\t{self.__class__.__name__}: "
                   f"Conversion to {self.IMAGE_FORMAT}: {self.conversion_duration:0.3f} seconds")
             print(f"\t{self.__class__.__name__}: "
-                  f"LOSSLESS? {str(self.lossless)}    QUALITY: {self.quality}%")
+                  f"LOSSLESS? {str(self.lossless)}    QUALITY: {self.quality}%    METHOD: {self.method}    "
+                  f"COLOR MODE: {self.encoded_mode}")
+            if self.target_bytes:
+                print(f"\t{self.__class__.__name__}: TARGET: {self.target_bytes} bytes    "
+                      f"SIZE: {self.bytes_out} bytes    ENCODES: {self.search_steps}")
 
         except OSError as exc:
             print(f"{self.__class__.__name__}: ERROR: Unable to convert '{self.src_file_spec}': {exc}")
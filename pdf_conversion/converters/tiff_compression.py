@@ -0,0 +1,78 @@
+import os
+import typing
+
+from PIL import Image
+
+from pdf_conversion.converters.color_modes import ColorMode
+
+
+class TiffCompression:
+    """
+    Compression of the TIFF files written by the renderers: none, lzw, deflate, packbits or g4 (CCITT Group 4).
+
+    All of them are lossless. G4 only applies to bilevel (mono) pages; pages in other color modes are compressed
+    with G4_FALLBACK instead. Backends apply the compressions they support themselves (see
+    IRenderer.TIFF_COMPRESSIONS); the other files are re-compressed with PIL once rendered (see recompress()).
+    """
+
+    NONE = 'none'
+    LZW = 'lzw'
+    DEFLATE = 'deflate'
+    PACKBITS = 'packbits'
+    G4 = 'g4'
+    MODES = (NONE, LZW, DEFLATE, PACKBITS, G4)
+
+    COMPRESSION_KW = 'compression'
+    DEFAULT_COMPRESSION = NONE
+
+    G4_FALLBACK = LZW
+
+    # PIL's name of each compression (PIL needs libtiff for all but none/packbits).
+    PIL_COMPRESSIONS = {NONE: 'raw', LZW: 'tiff_lzw', DEFLATE: 'tiff_adobe_deflate', PACKBITS: 'packbits',
+                        G4: 'group4'}
+
+    @classmethod
+    def resolve(cls, compression: typing.Optional[str], defaults: typing.Optional[dict] = None) -> str:
+        """
+        Resolve the compression option (CLI arg, else configured default, else DEFAULT_COMPRESSION).
+
+        :param compression: none, lzw, deflate, packbits or g4 (None: use the default)
+        :param defaults: rendering defaults (read from file)
+
+        :return: Compression
+        """
+        compression = str(compression or (defaults or {}).get(cls.COMPRESSION_KW) or cls.DEFAULT_COMPRESSION).lower()
+        if compression not in cls.MODES:
+            print(f"WARNING: Unrecognized TIFF compression: '{compression}' -- Supported compressions: "
+                  f"{', '.join(cls.MODES)}\n"
+                  f"\t Using the default compression: '{cls.DEFAULT_COMPRESSION}'")
+            compression = cls.DEFAULT_COMPRESSION
+        return compression
+
+    @classmethod
+    def for_color_mode(cls, compression: str, color_mode: str) -> str:
+        """
+        :return: The compression to use for pages in the color mode (G4 is only used for mono pages)
+        """
+        if compression == cls.G4 and color_mode != ColorMode.MONO:
+            return cls.G4_FALLBACK
+        return compression
+
+    @classmethod
+    def save(cls, image: Image.Image, file_spec: typing.Union[str, typing.BinaryIO], compression: str) -> None:
+        """
+        Write an image as a TIFF with the compression (G4 images are converted to mono).
+        """
+        if compression == cls.G4:
+            image = ColorMode.convert(image, ColorMode.MONO)
+        image.save(file_spec, format='TIFF', compression=cls.PIL_COMPRESSIONS[compression])
+
+    @classmethod
+    def recompress(cls, file_spec: str, compression: str) -> None:
+        """
+        Re-write a TIFF file with the compression (the file is replaced once the new one is complete).
+        """
+        temp_file = f"{file_spec}.{os.getpid()}.tmp"
+        with Image.open(file_spec) as IMAGE:
+            cls.save(IMAGE, temp_file, compression)
+        os.replace(temp_file, file_spec)
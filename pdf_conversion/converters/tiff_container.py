@@ -0,0 +1,93 @@
+import os
+import struct
+import typing
+
+from PIL import Image, TiffImagePlugin
+
+from pdf_conversion.converters.color_modes import ColorMode
+from pdf_conversion.converters.tiff_compression import TiffCompression
+
+
+class TiffContainer:
+    """
+    Multi-page TIFF container: one file per document instead of one file per page.
+
+    Pages are appended one at a time (only the page being appended is held in memory), and each page is referenced
+    by its index in the container (and the offset of its IFD, so other readers can jump straight to the page).
+    read_page() loads a single page back.
+    """
+
+    EXTENSION = 'tif'
+
+    # Classic TIFF header: byte order, magic (42) and the offset of the first IFD.
+    BYTE_ORDERS = {b'II': '<', b'MM': '>'}
+    TIFF_MAGIC = 42
+
+    @classmethod
+    def write(cls, file_spec: str, page_files: typing.List[str], compression: str = TiffCompression.NONE,
+              first_page: int = 1, remove: bool = True) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Write the pages into a new container (any existing file is replaced).
+
+        :param file_spec: File spec of the container
+        :param page_files: Single page image files (in page order)
+        :param compression: TIFF compression of the pages (g4 only applies to mono pages; see TiffCompression)
+        :param first_page: Page number of the first page file
+        :param remove: Remove each page file once it has been appended
+
+        :return: List of page entries {'page', 'file', 'index', 'offset'} (in page order)
+        """
+        temp_file = f"{file_spec}.{os.getpid()}.tmp"
+        with TiffImagePlugin.AppendingTiffWriter(temp_file, new=True) as CONTAINER:
+            for page_file in page_files:
+                with Image.open(page_file) as IMAGE:
+                    page_compression = TiffCompression.for_color_mode(compression, ColorMode.of_image(IMAGE))
+                    IMAGE.save(CONTAINER, format='TIFF', compression=TiffCompression.PIL_COMPRESSIONS[page_compression])
+                CONTAINER.newFrame()
+                if remove:
+                    os.remove(page_file)
+        os.replace(temp_file, file_spec)
+
+        return [{'page': page_num, 'file': file_spec, 'index': index, 'offset': offset}
+                for index, (page_num, offset) in enumerate(zip(range(first_page, first_page + len(page_files)),
+                                                               cls.page_offsets(file_spec)))]
+
+    @classmethod
+    def page_offsets(cls, file_spec: str) -> typing.List[int]:
+        """
+        Walk the container's IFD chain (classic TIFF).
+
+        :param file_spec: File spec of the container
+
+        :return: List of IFD offsets, one per page (in page order)
+        """
+        offsets = []
+        with open(file_spec, "rb") as CONTAINER:
+            header = CONTAINER.read(8)
+            byte_order = cls.BYTE_ORDERS.get(header[:2])
+            if byte_order is None or struct.unpack(f"{byte_order}H", header[2:4])[0] != cls.TIFF_MAGIC:
+                raise ValueError(f"'{file_spec}' is not a (classic) TIFF file")
+
+            offset = struct.unpack(f"{byte_order}I", header[4:8])[0]
+            while offset:
+                offsets.append(offset)
+                CONTAINER.seek(offset)
+                num_entries = struct.unpack(f"{byte_order}H", CONTAINER.read(2))[0]
+                CONTAINER.seek(offset + 2 + 12 * num_entries)
+                offset = struct.unpack(f"{byte_order}I", CONTAINER.read(4))[0]
+        return offsets
+
+    @staticmethod
+    def read_page(file_spec: str, index: int) -> Image.Image:
+        """
+        Load one page of a container.
+
+        :param file_spec: File spec of the container
+        :param index: Index of the page in the container (0-based)
+
+        :return: PIL image of the page (loaded, so the container is not kept open)
+        """
+        with Image.open(file_spec) as CONTAINER:
+            CONTAINER.seek(index)
+            CONTAINER.load()
+            return CONTAINER.copy()
@@ -0,0 +1,61 @@
+import typing
+
+
+class WebpProfile:
+    """
+    Named webp encoder profiles: each sets the encoder effort (Pillow's 'method', 0 = fastest to 6 = smallest
+    output), the quality and lossless.
+
+        * fast      - lossy, method 0: latency sensitive conversions (previews)
+        * balanced  - lossy, method 4 (libwebp's default)
+        * smallest  - lossless, method 6 and quality 100 (maximum compression effort): archiving
+
+    The profiles can be adjusted in defaults.cfg ('profiles' in the webp section, e.g. fast: {quality: 70}).
+    """
+
+    FAST = 'fast'
+    BALANCED = 'balanced'
+    SMALLEST = 'smallest'
+
+    PROFILE_KW = 'profile'
+    PROFILES_KW = 'profiles'
+    METHOD_KW = 'method'
+
+    # Pillow's default method.
+    DEFAULT_METHOD = 4
+    MIN_METHOD = 0
+    MAX_METHOD = 6
+
+    PROFILES = {
+        FAST: {'method': 0, 'quality': 75, 'lossless': False},
+        BALANCED: {'method': 4, 'quality': 85, 'lossless': False},
+        SMALLEST: {'method': 6, 'quality': 100, 'lossless': True},
+    }
+
+    @classmethod
+    def resolve(cls, profile: typing.Optional[str], defaults: typing.Optional[dict] = None
+                ) -> typing.Tuple[typing.Optional[str], typing.Dict[str, typing.Any]]:
+        """
+        Resolve the profile option (CLI arg, else configured default) into its encoder settings.
+
+        :param profile: fast, balanced or smallest (None: use the configured default, if any)
+        :param defaults: webp defaults (read from file); 'profiles' adjusts the settings of each profile
+
+        :return: Tuple of (profile name or None, {'method', 'quality', 'lossless'}; empty if no profile is used)
+        """
+        defaults = defaults or {}
+        profile = profile or defaults.get(cls.PROFILE_KW)
+        if not profile:
+            return None, {}
+
+        profile = str(profile).lower()
+        if profile not in cls.PROFILES:
+            print(f"WARNING: Unrecognized webp profile: '{profile}' -- Supported profiles: "
+                  f"{', '.join(cls.PROFILES)}\n"
+                  f"\t Using the configured quality and lossless settings")
+            return None, {}
+
+        settings = dict(cls.PROFILES[profile])
+        settings.update((defaults.get(cls.PROFILES_KW) or {}).get(profile) or {})
+        settings[cls.METHOD_KW] = min(max(int(settings[cls.METHOD_KW]), cls.MIN_METHOD), cls.MAX_METHOD)
+        return profile, settings
@@ -0,0 +1,702 @@
+from abc import ABC, abstractmethod
+import glob
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import typing
+import uuid
+
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+from pdf_conversion.documents.page_artifacts import ArtifactIndex
+
+
+class QueueTask(typing.NamedTuple):
+    """ A page range of a document, leased by a QueueWorker. """
+    id: str
+    job_id: str
+    filespec: str
+    doc_format: str
+    output_dir: str
+    first_page: typing.Optional[int]
+    last_page: typing.Optional[int]
+    options: typing.Dict[str, typing.Any]
+    attempts: int
+
+
+class IWorkQueue(ABC):
+    """
+    Shared work queue: documents are submitted as jobs, split into page-range tasks, and converted by any number of
+    QueueWorkers (processes on this host, or on other hosts sharing the queue). A worker leases a task for
+    lease_seconds, and extends the lease with heartbeats while it converts the pages; the task of a worker that stops
+    sending heartbeats (e.g. - the process or host died) can be leased again once its lease has expired. An expired
+    lease counts as an attempt (the pages may be what kills or hangs the worker), and a task that fails max_attempts
+    times is failed.
+
+    Once all the tasks of a job are finished, the results are merged into the document's DocumentInfo, written to
+    the job's output directory (see merge()).
+
+    Backends are registered in WORK_QUEUES (see register_work_queue()) and selected by open_work_queue().
+    """
+
+    NAME = None
+
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = (PENDING, LEASED, DONE, FAILED)
+
+    DEFAULT_LEASE_SECONDS = 60
+    DEFAULT_MAX_ATTEMPTS = 3
+    DEFAULT_CHUNK_PAGES = 8
+
+    # The merged DocumentInfo of a job: <output dir>/<document name>.document.json
+    MANIFEST_EXTENSION = 'document.json'
+
+    # Options that only apply to a single process (each worker has its own), or to whole documents.
+    WORKER_OPTIONS = ('encoders', 'encode_pool', PDFConversion.INCREMENTAL_KW)
+
+    def __init__(self, location: str, defaults: typing.Optional[dict] = None) -> None:
+        """
+        :param location: Where the queue is stored (see the backends)
+        :param defaults: queue defaults (read from file, used if specific values are not provided)
+        """
+        defaults = defaults or {}
+        self.location = os.path.abspath(location)
+        self.lease_seconds = defaults.get('lease_seconds', self.DEFAULT_LEASE_SECONDS)
+        self.max_attempts = defaults.get('max_attempts', self.DEFAULT_MAX_ATTEMPTS)
+        self.chunk_pages = defaults.get('chunk_pages', self.DEFAULT_CHUNK_PAGES)
+
+    def submit(self, filespec: str, doc_format: SupportedDocTypes, output_dir: str,
+               options: typing.Optional[typing.Dict[str, typing.Any]] = None, chunk_pages: int = 0) -> str:
+        """
+        Submit a document: the document is probed, and split into page-range tasks. Documents that cannot be probed
+        are converted as a single task.
+
+        :param filespec: File spec of the PDF (as seen by the workers)
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param output_dir: Directory to store the images (as seen by the workers)
+        :param options: Conversion args (see PDFConversion.convert())
+        :param chunk_pages: Number of pages per task (<= 0: use the default)
+
+        :return: Job id
+        """
+        filespec = os.path.abspath(filespec)
+        chunk_pages = chunk_pages if chunk_pages and chunk_pages > 0 else self.chunk_pages
+
+        # The pages are converted by different workers, so TIFF pages are never written to a multi-page container.
+        options = {key: value for key, value in (options or {}).items() if key not in self.WORKER_OPTIONS}
+        options[PdfToTiff.MULTIPAGE_KW] = False
+
+        probe = DocumentInfo(filespec, output_dir).probe()
+        first_page = options.pop('first_page', None) or 1
+        last_page = options.pop('last_page', None) or (probe.page_count if probe is not None else None)
+        if last_page is None:
+            ranges = [(None, None)]
+        else:
+            ranges = [(page, min(page + chunk_pages - 1, last_page))
+                      for page in range(first_page, last_page + 1, chunk_pages)]
+
+        job = {'id': uuid.uuid4().hex, 'filespec': filespec, 'format': doc_format.value,
+               'output_dir': os.path.abspath(output_dir), 'options': options, 'submitted': time.time()}
+        self._add_job(job, ranges)
+        print(f"{self.__class__.__name__}: Job {job['id']} ({filespec}): {len(ranges)} task(s).")
+        return job['id']
+
+    def merge(self, job_id: str) -> DocumentInfo:
+        """
+        Merge the results of a job's tasks into the document's DocumentInfo (in page order), and write it to the
+        job's output directory (<document name>.document.json, written atomically).
+
+        :param job_id: Job id
+
+        :return: The merged DocumentInfo
+        """
+        job = self.job(job_id)
+        document = DocumentInfo(file_spec=job['filespec'], conversion_dir=job['output_dir'])
+        errors = {}
+        for task in sorted(self._tasks(job_id), key=lambda entry: entry['first_page'] or 0):
+            if task['state'] == self.FAILED:
+                errors[f"{task['first_page'] or 1}-{task['last_page'] or 'end'}"] = task['error']
+            result = task.get('result')
+            if task['state'] != self.DONE or result is None:
+                continue
+            document.add_artifacts(ArtifactIndex.from_dict(result['artifacts']))
+            document.page_durations.extend(result['page_durations'])
+            document.conversion_duration += result['conversion_duration']
+            document.metrics.extend(result['spans'])
+            document.add_color_modes([color_mode for color_mode, count in result['color_modes'].items()
+                                      for _ in range(count)])
+            document.page_variants.extend(result['page_variants'])
+
+        manifest_file = os.path.join(job['output_dir'],
+                                     f"{document.filename.rsplit('.', 1)[0]}.{self.MANIFEST_EXTENSION}")
+        temp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as MANIFEST:
+            json.dump({'job': job_id, 'errors': errors, 'document': document.to_dict()}, MANIFEST, indent=2)
+        os.replace(temp_file, manifest_file)
+        return document
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: Number of tasks per state, and the jobs that are not finished (JSON serializable)
+        """
+        counts = {state: 0 for state in self.STATES}
+        open_jobs = set()
+        for task in self._tasks():
+            counts[task['state']] += 1
+            if task['state'] in (self.PENDING, self.LEASED):
+                open_jobs.add(task['job_id'])
+        return {'location': self.location, 'backend': self.NAME, 'tasks': counts, 'open_jobs': sorted(open_jobs)}
+
+    def finished(self, job_id: typing.Optional[str] = None) -> bool:
+        """
+        :param job_id: Job id (None: all jobs)
+        :return: True if none of the job's (or the queue's) tasks are pending or leased
+        """
+        return all(task['state'] in (self.DONE, self.FAILED) for task in self._tasks(job_id))
+
+    def _merge_finished(self, job_ids: typing.Iterable[str]) -> typing.NoReturn:
+        """
+        Merge the jobs that were finished by the queue itself (their last task failed when its lease expired, so no
+        worker finished it).
+
+        :param job_ids: Ids of the jobs whose tasks were failed
+
+        :return: None
+        """
+        for job_id in set(job_ids):
+            if self.finished(job_id):
+                self.merge(job_id)
+                print(f"{self.__class__.__name__}: Job {job_id} finished (a task failed {self.max_attempts} time(s)).")
+
+    @staticmethod
+    def _expired_error(task: typing.Dict[str, typing.Any]) -> str:
+        return f"The lease of worker '{task['worker']}' expired (attempt {task['attempts'] + 1})."
+
+    @staticmethod
+    def _task(entry: typing.Dict[str, typing.Any], job: typing.Dict[str, typing.Any]) -> QueueTask:
+        return QueueTask(id=entry['id'], job_id=job['id'], filespec=job['filespec'], doc_format=job['format'],
+                         output_dir=job['output_dir'], first_page=entry['first_page'], last_page=entry['last_page'],
+                         options=job['options'], attempts=entry['attempts'])
+
+    @abstractmethod
+    def _add_job(self, job: typing.Dict[str, typing.Any],
+                 ranges: typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]]) -> typing.NoReturn:
+        pass
+
+    @abstractmethod
+    def _tasks(self, job_id: typing.Optional[str] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        :return: The tasks of a job (None: all the tasks): {'id', 'job_id', 'first_page', 'last_page', 'state',
+                 'worker', 'attempts', 'error', 'result'}
+        """
+        pass
+
+    @abstractmethod
+    def job(self, job_id: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        :return: The job: {'id', 'filespec', 'format', 'output_dir', 'options', 'submitted'} (None if unknown)
+        """
+        pass
+
+    @abstractmethod
+    def lease(self, worker: str, lease_seconds: typing.Optional[float] = None) -> typing.Optional[QueueTask]:
+        """
+        Lease the next pending task (or a task whose lease has expired).
+
+        :param worker: Worker id
+        :param lease_seconds: Lease duration (None: use the queue's)
+
+        :return: QueueTask (None if no task is available)
+        """
+        pass
+
+    @abstractmethod
+    def heartbeat(self, task_id: str, worker: str, lease_seconds: typing.Optional[float] = None) -> bool:
+        """
+        Extend a lease.
+
+        :return: False if the worker no longer holds the lease (the task has expired, and been leased again)
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, task_id: str, worker: str, result: typing.Dict[str, typing.Any]) -> bool:
+        """
+        Store the result of a task.
+
+        :return: False if the worker no longer holds the lease (the result is dropped)
+        """
+        pass
+
+    @abstractmethod
+    def fail(self, task_id: str, worker: str, error: str) -> bool:
+        """
+        Release a task that failed: it is leased again, unless it has failed max_attempts times.
+
+        :return: False if the worker no longer holds the lease
+        """
+        pass
+
+
+WORK_QUEUES = {}
+
+
+def register_work_queue(queue_class: typing.Type[IWorkQueue]) -> typing.Type[IWorkQueue]:
+    """
+    Class decorator: register a work queue backend (by NAME).
+    """
+    WORK_QUEUES[queue_class.NAME] = queue_class
+    return queue_class
+
+
+@register_work_queue
+class SqliteWorkQueue(IWorkQueue):
+    """
+    Work queue stored in a SQLite database: leases are taken in IMMEDIATE transactions, so concurrent workers never
+    lease the same task. Suited to the workers of one host (or to file systems with reliable POSIX locks; otherwise
+    use the spool backend).
+    """
+
+    NAME = 'sqlite'
+    EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, filespec TEXT, format TEXT, output_dir TEXT, options TEXT, submitted REAL);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY, job_id TEXT, seq INTEGER, first_page INTEGER, last_page INTEGER, state TEXT,
+            worker TEXT, expires REAL, attempts INTEGER DEFAULT 0, error TEXT, result TEXT);
+        CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, expires);
+        CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id);
+    """
+
+    def __init__(self, location: str, defaults: typing.Optional[dict] = None) -> None:
+        """
+        :param location: File spec of the database (created if needed)
+        :param defaults: queue defaults (read from file)
+        """
+        super().__init__(location, defaults)
+        os.makedirs(os.path.dirname(self.location), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE takes the write lock before reading).
+        connection = sqlite3.connect(self.location, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _add_job(self, job: typing.Dict[str, typing.Any],
+                 ranges: typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]]) -> typing.NoReturn:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                               (job['id'], job['filespec'], job['format'], job['output_dir'],
+                                json.dumps(job['options']), job['submitted']))
+            connection.executemany(
+                "INSERT INTO tasks (id, job_id, seq, first_page, last_page, state) VALUES (?, ?, ?, ?, ?, ?)",
+                [(f"{job['id']}-{seq:04d}", job['id'], seq, first_page, last_page, self.PENDING)
+                 for seq, (first_page, last_page) in enumerate(ranges)])
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _tasks(self, job_id: typing.Optional[str] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+        connection = self._connect()
+        try:
+            rows = (connection.execute("SELECT * FROM tasks WHERE job_id = ? ORDER BY seq", (job_id,)) if job_id else
+                    connection.execute("SELECT * FROM tasks ORDER BY job_id, seq"))
+            return [dict(row, result=json.loads(row['result']) if row['result'] else None) for row in rows]
+        finally:
+            connection.close()
+
+    def job(self, job_id: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return dict(row, options=json.loads(row['options'])) if row is not None else None
+        finally:
+            connection.close()
+
+    def lease(self, worker: str, lease_seconds: typing.Optional[float] = None) -> typing.Optional[QueueTask]:
+        now = time.time()
+        failed_jobs = []
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            while True:
+                row = connection.execute(
+                    "SELECT * FROM tasks WHERE state = ? OR (state = ? AND expires < ?) ORDER BY job_id, seq LIMIT 1",
+                    (self.PENDING, self.LEASED, now)).fetchone()
+                if row is None:
+                    break
+                row = dict(row)
+
+                # An expired lease counts as an attempt; the task is failed once it reaches max_attempts.
+                if row['state'] == self.LEASED:
+                    error = self._expired_error(row)
+                    row['attempts'] += 1
+                    if row['attempts'] >= self.max_attempts:
+                        connection.execute("UPDATE tasks SET state = ?, attempts = ?, error = ?, worker = NULL, "
+                                           "expires = NULL WHERE id = ?",
+                                           (self.FAILED, row['attempts'], error, row['id']))
+                        failed_jobs.append(row['job_id'])
+                        continue
+                    connection.execute("UPDATE tasks SET attempts = ?, error = ? WHERE id = ?",
+                                       (row['attempts'], error, row['id']))
+
+                connection.execute("UPDATE tasks SET state = ?, worker = ?, expires = ? WHERE id = ?",
+                                   (self.LEASED, worker, now + (lease_seconds or self.lease_seconds), row['id']))
+                job = connection.execute("SELECT * FROM jobs WHERE id = ?", (row['job_id'],)).fetchone()
+                break
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+        self._merge_finished(failed_jobs)
+        return self._task(row, dict(job, options=json.loads(job['options']))) if row is not None else None
+
+    def _update(self, task_id: str, worker: str, sql: str, params: tuple) -> bool:
+        """
+        Update a task, provided the worker still holds its lease.
+
+        :return: True if the task was updated
+        """
+        connection = self._connect()
+        try:
+            cursor = connection.execute(f"{sql} WHERE id = ? AND worker = ? AND state = ?",
+                                        params + (task_id, worker, self.LEASED))
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    def heartbeat(self, task_id: str, worker: str, lease_seconds: typing.Optional[float] = None) -> bool:
+        return self._update(task_id, worker, "UPDATE tasks SET expires = ?",
+                            (time.time() + (lease_seconds or self.lease_seconds),))
+
+    def complete(self, task_id: str, worker: str, result: typing.Dict[str, typing.Any]) -> bool:
+        return self._update(task_id, worker, "UPDATE tasks SET state = ?, result = ?, error = NULL",
+                            (self.DONE, json.dumps(result)))
+
+    def fail(self, task_id: str, worker: str, error: str) -> bool:
+        return self._update(
+            task_id, worker, "UPDATE tasks SET state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END, "
+                             "attempts = attempts + 1, error = ?, worker = NULL, expires = NULL",
+            (self.max_attempts, self.FAILED, self.PENDING, error))
+
+
+@register_work_queue
+class SpoolWorkQueue(IWorkQueue):
+    """
+    Work queue stored in a spool directory (e.g. - on a file system shared by several hosts). Each task is a JSON
+    file, and its state is the directory it is in; a task is leased by renaming it from pending/ to leased/ (a rename
+    is atomic, so only one worker succeeds), and its lease is rewritten (atomically) by the heartbeats.
+
+    Layout:
+        <spool>/jobs/<job id>.json
+        <spool>/<pending|leased|done|failed>/<task id>.json
+    """
+
+    NAME = 'spool'
+
+    def __init__(self, location: str, defaults: typing.Optional[dict] = None) -> None:
+        """
+        :param location: Spool directory (created if needed)
+        :param defaults: queue defaults (read from file)
+        """
+        super().__init__(location, defaults)
+        for directory in ('jobs',) + self.STATES:
+            os.makedirs(os.path.join(self.location, directory), exist_ok=True)
+
+    def _file(self, state: str, task_id: str) -> str:
+        return os.path.join(self.location, state, f"{task_id}.json")
+
+    @staticmethod
+    def _read(file_spec: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        try:
+            with open(file_spec, "r") as TASK:
+                return json.load(TASK)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(file_spec: str, data: typing.Dict[str, typing.Any]) -> typing.NoReturn:
+        temp_file = f"{file_spec}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, "w") as TASK:
+            json.dump(data, TASK)
+        os.replace(temp_file, file_spec)
+
+    def _add_job(self, job: typing.Dict[str, typing.Any],
+                 ranges: typing.List[typing.Tuple[typing.Optional[int], typing.Optional[int]]]) -> typing.NoReturn:
+        # The job is written first: a worker may lease a task as soon as it is in pending/.
+        self._write(os.path.join(self.location, 'jobs', f"{job['id']}.json"), job)
+        for seq, (first_page, last_page) in enumerate(ranges):
+            task_id = f"{job['id']}-{seq:04d}"
+            self._write(self._file(self.PENDING, task_id),
+                        {'id': task_id, 'job_id': job['id'], 'first_page': first_page, 'last_page': last_page,
+                         'worker': None, 'expires': None, 'attempts': 0, 'error': None, 'result': None})
+
+    def _tasks(self, job_id: typing.Optional[str] = None) -> typing.List[typing.Dict[str, typing.Any]]:
+        tasks = []
+        for state in self.STATES:
+            for file_spec in sorted(glob.glob(os.path.join(self.location, state, f"{job_id or ''}*.json"))):
+                task = self._read(file_spec)
+                if task is not None:
+                    tasks.append(dict(task, state=state))
+        return tasks
+
+    def job(self, job_id: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        return self._read(os.path.join(self.location, 'jobs', f"{job_id}.json"))
+
+    def _lease_expired(self, task: typing.Optional[typing.Dict[str, typing.Any]], file_spec: str,
+                       now: float) -> bool:
+        """
+        :param task: Leased task (None: unreadable, e.g. - moved by another worker)
+        :param file_spec: The task's file
+        :param now: Current time
+
+        :return: True if the task's lease has expired
+        """
+        if task is None:
+            return False
+        # A task that has just been renamed has no lease yet: its lease starts when it was renamed.
+        try:
+            expires = task.get('expires') or (os.path.getmtime(file_spec) + self.lease_seconds)
+        except OSError:
+            return False
+        return expires < now
+
+    def _expired(self) -> typing.NoReturn:
+        """
+        Return the tasks whose lease has expired to pending/ (a task being renamed by another worker is skipped).
+
+        :return: None
+        """
+        now = time.time()
+        failed_jobs = []
+        for file_spec in glob.glob(os.path.join(self.location, self.LEASED, '*.json')):
+            if not self._lease_expired(self._read(file_spec), file_spec, now):
+                continue
+
+            # Claim the task (a rename is atomic, so only one worker reclaims it), then move it to pending/. An expired
+            # lease counts as an attempt; the task is failed once it reaches max_attempts.
+            claimed = f"{file_spec}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.expired"
+            try:
+                os.rename(file_spec, claimed)
+            except OSError:
+                continue
+
+            # The task may have been reclaimed, and leased again, since it was read: check the claimed lease.
+            task = self._read(claimed)
+            if not self._lease_expired(task, claimed, now):
+                os.rename(claimed, file_spec)
+                continue
+
+            # The lease is cleared, so the next lease starts when the task is renamed (see _lease_expired()).
+            task.update(attempts=task['attempts'] + 1, error=self._expired_error(task), worker=None, expires=None)
+            state = self.FAILED if task['attempts'] >= self.max_attempts else self.PENDING
+            self._write(self._file(state, task['id']), task)
+            os.remove(claimed)
+            if state == self.FAILED:
+                failed_jobs.append(task['job_id'])
+
+        self._merge_finished(failed_jobs)
+
+    def lease(self, worker: str, lease_seconds: typing.Optional[float] = None) -> typing.Optional[QueueTask]:
+        for attempt in range(2):
+            for file_spec in sorted(glob.glob(os.path.join(self.location, self.PENDING, '*.json'))):
+                task_id = os.path.basename(file_spec)[:-len('.json')]
+                try:
+                    # The lease starts now (see _lease_expired()): the file keeps its modification time when renamed.
+                    os.utime(file_spec)
+                    os.rename(file_spec, self._file(self.LEASED, task_id))
+                except OSError:
+                    continue        # leased by another worker
+
+                task = self._read(self._file(self.LEASED, task_id))
+                if task is None:
+                    continue        # reclaimed by another worker in the meantime
+                task.update(worker=worker, expires=time.time() + (lease_seconds or self.lease_seconds))
+                self._write(self._file(self.LEASED, task_id), task)
+                return self._task(task, self.job(task['job_id']))
+
+            # Nothing pending: reclaim the expired leases, and try again.
+            if attempt == 0:
+                self._expired()
+        return None
+
+    def _leased(self, task_id: str, worker: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        :return: The task, if the worker holds its lease (None otherwise)
+        """
+        task = self._read(self._file(self.LEASED, task_id))
+        return task if task is not None and task.get('worker') == worker else None
+
+    def heartbeat(self, task_id: str, worker: str, lease_seconds: typing.Optional[float] = None) -> bool:
+        task = self._leased(task_id, worker)
+        if task is None:
+            return False
+        task['expires'] = time.time() + (lease_seconds or self.lease_seconds)
+        self._write(self._file(self.LEASED, task_id), task)
+        return True
+
+    def _release(self, task: typing.Dict[str, typing.Any], state: str) -> bool:
+        """
+        Move a leased task to another state (the task file is written there before the lease is removed).
+
+        :return: True if the task was moved
+        """
+        self._write(self._file(state, task['id']), task)
+        try:
+            os.remove(self._file(self.LEASED, task['id']))
+        except OSError:
+            pass
+        return True
+
+    def complete(self, task_id: str, worker: str, result: typing.Dict[str, typing.Any]) -> bool:
+        task = self._leased(task_id, worker)
+        if task is None:
+            return False
+        task.update(result=result, error=None)
+        return self._release(task, self.DONE)
+
+    def fail(self, task_id: str, worker: str, error: str) -> bool:
+        task = self._leased(task_id, worker)
+        if task is None:
+            return False
+        task.update(attempts=task['attempts'] + 1, error=error, worker=None, expires=None)
+        return self._release(task, self.FAILED if task['attempts'] >= self.max_attempts else self.PENDING)
+
+
+def open_work_queue(location: str, defaults: typing.Optional[dict] = None) -> IWorkQueue:
+    """
+    Open a work queue: a SQLite database (*.db, *.sqlite, *.sqlite3, or 'sqlite:<file>') or a spool directory.
+
+    :param location: Location of the queue
+    :param defaults: queue defaults (read from file)
+
+    :return: Work queue
+    """
+    for name, queue_class in WORK_QUEUES.items():
+        if location.startswith(f"{name}:"):
+            return queue_class(location[len(name) + 1:], defaults)
+    if location.lower().endswith(SqliteWorkQueue.EXTENSIONS):
+        return SqliteWorkQueue(location, defaults)
+    return SpoolWorkQueue(location, defaults)
+
+
+class QueueWorker:
+    """
+    Converts the tasks of a work queue (see IWorkQueue): leases a task, converts its pages (PDFConversion), sends
+    heartbeats while converting, and stores the result. The worker that finishes the last task of a job merges the
+    job's results (see IWorkQueue.merge()).
+    """
+
+    DEFAULT_POLL_SECONDS = 1.0
+
+    def __init__(self, queue: IWorkQueue, defaults: typing.Optional[DefaultValues] = None,
+                 pool: typing.Optional[EncodePool] = None, worker_id: typing.Optional[str] = None,
+                 poll_seconds: typing.Optional[float] = None) -> None:
+        """
+        QueueWorker Constructor
+        :param queue: Work queue
+        :param defaults: A dictionary of defaults for each image type (optional)
+        :param pool: EncodePool used to encode the pages (optional; see PDFConversion)
+        :param worker_id: Worker id (default: <host>-<pid>-<random>)
+        :param poll_seconds: Wait between lease attempts, while other workers hold the remaining tasks
+        """
+        queue_defaults = getattr(defaults, DefaultValues.QUEUE_DEFAULTS, None) or {}
+        self.queue = queue
+        self.defaults = defaults
+        self.pool = pool
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_seconds = poll_seconds if poll_seconds is not None else queue_defaults.get(
+            'poll_seconds', self.DEFAULT_POLL_SECONDS)
+
+        self.tasks_done = 0
+        self.tasks_failed = 0
+
+    def run(self, max_tasks: int = 0) -> "QueueWorker":
+        """
+        Convert tasks until every task of the queue is finished (tasks leased by other workers are waited for, so
+        they can be taken over if their lease expires).
+
+        :param max_tasks: Stop after this number of tasks (<= 0: no limit)
+
+        :return: self (allows chaining of methods)
+        """
+        print(f"{self.__class__.__name__}: {self.worker_id} working on {self.queue.location}")
+        while max_tasks <= 0 or self.tasks_done + self.tasks_failed < max_tasks:
+            task = self.queue.lease(self.worker_id)
+            if task is None:
+                if self.queue.finished():
+                    break
+                time.sleep(self.poll_seconds)
+                continue
+            self.convert(task)
+        return self
+
+    def convert(self, task: QueueTask) -> typing.NoReturn:
+        """
+        Convert a leased task, and store its result (or its error). The worker that finishes the last task of the
+        job merges the job's results.
+
+        :param task: Task
+
+        :return: None
+        """
+        # Heartbeats extend the lease while the pages are converted (at a third of the lease duration).
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task, stop), daemon=True)
+        heartbeat.start()
+
+        document = DocumentInfo(file_spec=task.filespec, conversion_dir=task.output_dir)
+        try:
+            os.makedirs(task.output_dir, exist_ok=True)
+            PDFConversion(document, defaults=self.defaults, pool=self.pool).convert(
+                SupportedDocTypes(task.doc_format), first_page=task.first_page, last_page=task.last_page,
+                **task.options)
+            error = None if document.files else "No images were generated (see the worker log)."
+        except Exception as exc:
+            error = f"({exc.__class__.__name__}): {exc}"
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        pages = f"{task.first_page or 1}-{task.last_page or 'end'}"
+        if error is not None:
+            self.tasks_failed += 1
+            print(f"{self.__class__.__name__}: ERROR: Pages {pages} of '{task.filespec}': {error}")
+            if not self.queue.fail(task.id, self.worker_id, error):
+                return
+        else:
+            result = {'artifacts': document.artifacts.to_dict(),
+                      'page_durations': document.page_durations, 'conversion_duration': document.conversion_duration,
+                      'spans': document.metrics.spans, 'color_modes': document.color_modes,
+                      'page_variants': document.page_variants}
+            if not self.queue.complete(task.id, self.worker_id, result):
+                print(f"{self.__class__.__name__}: WARNING: Lease of pages {pages} of '{task.filespec}' was lost; "
+                      f"the result is dropped.")
+                return
+            self.tasks_done += 1
+
+        if self.queue.finished(task.job_id):
+            self.queue.merge(task.job_id)
+            print(f"{self.__class__.__name__}: Job {task.job_id} ({task.filespec}) finished.")
+
+    def _heartbeat(self, task: QueueTask, stop: threading.Event) -> typing.NoReturn:
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(task.id, self.worker_id):
+                print(f"{self.__class__.__name__}: WARNING: Lost the lease of task {task.id}.")
+                return
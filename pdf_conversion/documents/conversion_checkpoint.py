@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+import typing
+
+from pdf_conversion.documents.document_probe import DocumentProbe
+
+# fcntl is not available on every platform; without it, concurrent writers (e.g. - the workers of a work queue
+# converting ranges of the same document) may drop each other's latest pages (which are converted again on resume).
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConversionCheckpoint:
+    """
+    Checkpoint manifest of a document's conversion, stored next to the converted outputs: the files generated for
+    each page are recorded (stage, file spec, size and SHA-256) as soon as the page's range is converted, and the
+    manifest is rewritten atomically, so it always describes pages that are complete on disk.
+
+    A resumed conversion only converts the pages that are missing from the manifest, or whose files are missing or
+    corrupt (see verified_pages()). The manifest only applies to the same document content and the same settings.
+
+    Manifest format (JSON):
+        {'content_hash': str, 'settings': {conversion settings},
+         'pages': {'<page num>': [{'page': int, 'stage': str, 'path': str, 'size': int, 'checksum': str}]}}
+    """
+
+    MANIFEST_EXTENSION = 'checkpoint.json'
+
+    # Stages of the recorded files (see ConversionMetrics): rendered by the backend, or encoded from the renders.
+    RENDER = 'render'
+    ENCODE = 'encode'
+
+    def __init__(self, file_dir: str, filename: str, content_hash: str, settings: typing.Dict[str, typing.Any],
+                 final_stage: str = ENCODE) -> None:
+        """
+        ConversionCheckpoint Constructor
+        :param file_dir: Directory containing the converted outputs (the manifest is stored here)
+        :param filename: Filename of the source document
+        :param content_hash: SHA-256 of the source document
+        :param settings: Effective settings of the conversion
+        :param final_stage: Stage of the target files (a page is complete once its target files are recorded)
+        """
+        self.manifest_file = os.path.join(file_dir, f"{filename.rsplit('.', 1)[0]}.{self.MANIFEST_EXTENSION}")
+        self.content_hash = content_hash
+        self.settings = settings
+        self.final_stage = final_stage
+        self.pages = {}
+
+        # Pages recorded by this conversion replace the entries of the previous conversions.
+        self._recorded = set()
+        self._lock = threading.Lock()
+
+    def _read(self) -> typing.Dict[int, typing.List[dict]]:
+        """
+        :return: The pages of the manifest on disk (empty if it does not exist, or if the document or the settings
+                 changed)
+        """
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, "r") as MANIFEST:
+                manifest = json.load(MANIFEST)
+        except (OSError, ValueError) as exc:
+            print(f"{self.__class__.__name__}: WARNING: Unable to read '{self.manifest_file}': {exc}")
+            return {}
+
+        if manifest.get('content_hash') != self.content_hash or manifest.get('settings') != self.settings:
+            return {}
+        return {int(page_num): entries for page_num, entries in manifest.get('pages', {}).items()}
+
+    def load(self) -> "ConversionCheckpoint":
+        """
+        Read the manifest of the previous conversions.
+
+        :return: self (allows chaining of methods)
+        """
+        self.pages = self._read()
+        return self
+
+    def add(self, page_num: int, stage: str, files: typing.List[str]) -> typing.NoReturn:
+        """
+        Record the files generated for a page (their size and checksum are calculated when the manifest is saved).
+
+        :param page_num: Page number
+        :param stage: Stage that generated the files (RENDER or ENCODE)
+        :param files: File specs
+
+        :return: None
+        """
+        with self._lock:
+            if page_num not in self._recorded:
+                self._recorded.add(page_num)
+                self.pages[page_num] = []
+            self.pages[page_num].extend({'page': page_num, 'stage': stage, 'path': file_, 'size': None,
+                                         'checksum': None} for file_ in files)
+
+    @contextmanager
+    def _locked(self) -> typing.Iterator[None]:
+        """
+        Hold an exclusive lock on the manifest (between processes, where fcntl is available).
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.manifest_file}.lock", "a") as LOCK:
+            fcntl.flock(LOCK, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(LOCK, fcntl.LOCK_UN)
+
+    def save(self) -> typing.NoReturn:
+        """
+        Calculate the size and checksum of the new entries, and write the manifest (atomically: written to a temp
+        file, then renamed). Pages recorded on disk by other conversions of the document (e.g. - other page ranges)
+        are kept.
+
+        :return: None
+        """
+        with self._lock:
+            for entries in self.pages.values():
+                for entry in entries:
+                    if entry['checksum'] is None and os.path.exists(entry['path']):
+                        entry['size'] = os.path.getsize(entry['path'])
+                        entry['checksum'] = DocumentProbe.file_hash(entry['path'])
+
+            with self._locked():
+                pages = {**self._read(), **self.pages}
+                temp_file = f"{self.manifest_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_file, "w") as MANIFEST:
+                    json.dump({'content_hash': self.content_hash, 'settings': self.settings,
+                               'pages': {str(page_num): pages[page_num] for page_num in sorted(pages)}},
+                              MANIFEST, indent=2)
+                os.replace(temp_file, self.manifest_file)
+            self.pages = pages
+
+    def discard(self, page_nums: typing.Iterable[int]) -> typing.NoReturn:
+        """
+        Remove the recorded files of pages that are converted again (TIFF names are random, so they would not be
+        overwritten).
+
+        :param page_nums: Page numbers
+
+        :return: None
+        """
+        for page_num in page_nums:
+            for entry in self.pages.get(page_num, []):
+                if os.path.exists(entry['path']):
+                    os.remove(entry['path'])
+
+    def verified_pages(self) -> typing.Dict[int, typing.List[str]]:
+        """
+        Verify the recorded pages: a page is complete if its target files are recorded, and every file recorded for
+        the page still exists with the recorded size and checksum.
+
+        :return: Dictionary of page number: files (of the complete pages, in page order)
+        """
+        verified = {}
+        corrupt = []
+        for page_num in sorted(self.pages):
+            entries = self.pages[page_num]
+            if not any(entry['stage'] == self.final_stage for entry in entries):
+                continue
+            if all(entry['checksum'] is not None and os.path.exists(entry['path']) and
+                   os.path.getsize(entry['path']) == entry['size'] and
+                   DocumentProbe.file_hash(entry['path']) == entry['checksum'] for entry in entries):
+                verified[page_num] = [entry['path'] for entry in entries]
+            else:
+                corrupt.append(page_num)
+
+        if corrupt:
+            print(f"{self.__class__.__name__}: WARNING: Missing or corrupt files for page(s) {corrupt}; "
+                  f"they will be converted again.")
+        return verified
@@ -0,0 +1,248 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+from time import perf_counter
+import typing
+
+
+class ConversionMetrics:
+    """
+    Structured timing/throughput instrumentation for a document's conversion.
+
+    Work is recorded as spans: {'stage', 'first_page', 'last_page', 'seconds', 'bytes_in', 'bytes_out'}.
+    Page-level spans cover a single page (first_page == last_page), chunk-level spans cover a page range, and
+    document-level spans have no pages (e.g. - probing the document).
+
+    Stages:
+        * probe  - reading the document: page count/sizes, content hash, page fingerprints
+        * render - PDF pages to rasters or TIFF files (bytes in: PDF, bytes out: rasters or TIFF files)
+        * encode - rasters/TIFFs to webp, in memory (bytes in: raster or TIFF, bytes out: encoded webp)
+        * write  - writing the encoded webp to disk (bytes in/out: encoded webp)
+
+    Metrics can be exported as JSON or as a Prometheus textfile-collector file.
+    """
+
+    PROBE = 'probe'
+    RENDER = 'render'
+    ENCODE = 'encode'
+    WRITE = 'write'
+    STAGES = (PROBE, RENDER, ENCODE, WRITE)
+
+    PROMETHEUS_PREFIX = 'pdf_conversion'
+
+    def __init__(self) -> None:
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, first_page: typing.Optional[int] = None,
+            last_page: typing.Optional[int] = None, bytes_in: int = 0,
+            bytes_out: int = 0) -> typing.Dict[str, typing.Any]:
+        """
+        Record a span.
+
+        :param stage: Stage (see STAGES)
+        :param seconds: Duration of the work
+        :param first_page: First page covered by the span (None: document level)
+        :param last_page: Last page covered by the span (default: first_page)
+        :param bytes_in: Bytes consumed by the stage
+        :param bytes_out: Bytes produced by the stage
+
+        :return: The span
+        """
+        span = {
+            'stage': stage,
+            'first_page': first_page,
+            'last_page': last_page if last_page is not None else first_page,
+            'seconds': seconds,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+        }
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, stage: str, first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+             bytes_in: int = 0) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """
+        Time a block of work as a span. The yielded span can be updated (e.g. - bytes_out) inside the block.
+
+        Usage:
+            with metrics.span(ConversionMetrics.PROBE, bytes_in=size) as span:
+                <work>
+                span['bytes_out'] = ...
+        """
+        span = {'stage': stage, 'first_page': first_page,
+                'last_page': last_page if last_page is not None else first_page,
+                'seconds': 0, 'bytes_in': bytes_in, 'bytes_out': 0}
+        start_time = perf_counter()
+        try:
+            yield span
+        finally:
+            span['seconds'] = perf_counter() - start_time
+            with self._lock:
+                self.spans.append(span)
+
+    def extend(self, spans: typing.Iterable[typing.Dict[str, typing.Any]]) -> typing.NoReturn:
+        """
+        Add spans recorded elsewhere (e.g. - by a worker process).
+
+        :param spans: List of spans
+        :return: None
+        """
+        with self._lock:
+            self.spans.extend(spans)
+
+    @staticmethod
+    def _pages(span: typing.Dict[str, typing.Any]) -> int:
+        if span['first_page'] is None:
+            return 0
+        return span['last_page'] - span['first_page'] + 1
+
+    @staticmethod
+    def percentile(values: typing.List[float], percent: float) -> float:
+        """
+        Nearest-rank percentile.
+        """
+        if not values:
+            return 0
+        ordered = sorted(values)
+        rank = max(1, int(round(percent / 100.0 * len(ordered) + 0.5)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def summary(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """
+        Aggregate the spans per stage.
+
+        :return: {stage: {'spans', 'seconds', 'pages', 'bytes_in', 'bytes_out', 'pages_per_sec',
+                          'p50_page_seconds', 'p95_page_seconds'}}
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        summary = {}
+        for stage in self.STAGES:
+            stage_spans = [span for span in spans if span['stage'] == stage]
+            if not stage_spans:
+                continue
+
+            # Chunk-level spans are spread evenly over their pages (document-level spans have no pages).
+            page_seconds = []
+            for span in stage_spans:
+                pages = self._pages(span)
+                if pages > 0:
+                    page_seconds.extend([span['seconds'] / pages] * pages)
+
+            seconds = sum(span['seconds'] for span in stage_spans)
+            summary[stage] = {
+                'spans': len(stage_spans),
+                'seconds': round(seconds, 6),
+                'pages': len(page_seconds),
+                'bytes_in': sum(span['bytes_in'] for span in stage_spans),
+                'bytes_out': sum(span['bytes_out'] for span in stage_spans),
+                'pages_per_sec': round(len(page_seconds) / seconds, 4) if seconds and page_seconds else 0,
+                'p50_page_seconds': round(self.percentile(page_seconds, 50), 6),
+                'p95_page_seconds': round(self.percentile(page_seconds, 95), 6),
+            }
+        return summary
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: JSON serializable metrics: {'stages': summary(), 'spans': [spans]}
+        """
+        with self._lock:
+            spans = [dict(span, seconds=round(span['seconds'], 6)) for span in self.spans]
+        return {'stages': self.summary(), 'spans': spans}
+
+    @classmethod
+    def merge(cls, metrics: typing.Iterable["ConversionMetrics"]) -> "ConversionMetrics":
+        """
+        Combine the spans of several documents (e.g. - for batch totals).
+        """
+        merged = cls()
+        for document_metrics in metrics:
+            merged.extend(document_metrics.spans)
+        return merged
+
+    @staticmethod
+    def _write_atomic(file_spec: str, content: str) -> typing.NoReturn:
+        # Written to a temp file and renamed, so readers (e.g. - the node_exporter textfile collector) never see a
+        # partially written file.
+        temp_file = f"{file_spec}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as OUTPUT:
+            OUTPUT.write(content)
+        os.replace(temp_file, file_spec)
+
+    @classmethod
+    def write_json(cls, file_spec: str, documents: typing.Dict[str, "ConversionMetrics"]) -> typing.NoReturn:
+        """
+        Write the metrics of one or more documents as JSON.
+
+        :param file_spec: Output file spec
+        :param documents: {document name: ConversionMetrics}
+
+        :return: None
+        """
+        cls._write_atomic(file_spec, json.dumps({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'totals': cls.merge(documents.values()).summary(),
+            'documents': {name: metrics.to_dict() for name, metrics in documents.items()},
+        }, indent=2))
+
+    @staticmethod
+    def _label(value: str) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @classmethod
+    def prometheus(cls, documents: typing.Dict[str, "ConversionMetrics"]) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format (per document and stage).
+
+        :param documents: {document name: ConversionMetrics}
+
+        :return: Exposition text
+        """
+        prefix = cls.PROMETHEUS_PREFIX
+        metrics = (
+            ('stage_seconds_total', 'counter', 'Time spent in the stage.', 'seconds'),
+            ('stage_pages_total', 'counter', 'Pages processed by the stage.', 'pages'),
+            ('stage_bytes_in_total', 'counter', 'Bytes consumed by the stage.', 'bytes_in'),
+            ('stage_bytes_out_total', 'counter', 'Bytes produced by the stage.', 'bytes_out'),
+            ('stage_pages_per_second', 'gauge', 'Stage throughput.', 'pages_per_sec'),
+        )
+        summaries = {name: metrics_.summary() for name, metrics_ in documents.items()}
+
+        lines = []
+        for metric, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for name, summary in summaries.items():
+                for stage, values in summary.items():
+                    lines.append(f'{prefix}_{metric}{{document="{cls._label(name)}",stage="{stage}"}} {values[key]}')
+
+        lines.append(f"# HELP {prefix}_page_seconds Per-page stage duration.")
+        lines.append(f"# TYPE {prefix}_page_seconds summary")
+        for name, summary in summaries.items():
+            for stage, values in summary.items():
+                for quantile, key in (('0.5', 'p50_page_seconds'), ('0.95', 'p95_page_seconds')):
+                    lines.append(f'{prefix}_page_seconds{{document="{cls._label(name)}",stage="{stage}",'
+                                 f'quantile="{quantile}"}} {values[key]}')
+
+        lines.append(f"# HELP {prefix}_last_run_timestamp_seconds Time the metrics were written.")
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {time.time():0.3f}")
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def write_prometheus(cls, file_spec: str, documents: typing.Dict[str, "ConversionMetrics"]) -> typing.NoReturn:
+        """
+        Write a Prometheus textfile-collector file (the file name should end with '.prom').
+
+        :param file_spec: Output file spec
+        :param documents: {document name: ConversionMetrics}
+
+        :return: None
+        """
+        cls._write_atomic(file_spec, cls.prometheus(documents))
@@ -3,7 +3,10 @@
 import os
 import typing
 
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
+from pdf_conversion.documents.document_probe import DocumentProbe
 from pdf_conversion.documents.file_extensions import SupportedDocTypes
+from pdf_conversion.documents.page_artifacts import ArtifactIndex
 
 
 class DocumentInfo:
@@ -21,8 +24,138 @@ class DocumentInfo:
         self.file_dir = os.path.abspath(conversion_dir) or os.path.split(self.filespec)[0]
         self.filename = self.filespec.split(os.path.sep)[-1]
         self.doc_type = self.filename.split('.')[-1].lower()
+        # Generated files (in the order they were generated); see artifacts for the files of each page and format.
         self.files = []
+        self.artifacts = ArtifactIndex()
         self.conversion_duration = 0
+        self.page_durations = []
+        self.content_hash = None
+        self.cache_hit = False
+        self.pages_reused = 0
+        self.pages_regenerated = 0
+        self.concurrency = {}
+        self.peak_memory = 0
+        self.memory_budget = 0
+        self.metrics = ConversionMetrics()
+        self.document_probe = None
+        self.color_modes = {}
+        # Pages written to multi-page TIFF containers: {'page', 'file', 'index', 'offset'} (see TiffContainer)
+        self.tiff_pages = []
+        # Output sizes of each page: {'page', 'name', 'dpi', 'width', 'height', 'files'} (see Resolutions)
+        self.page_variants = []
+        # Pages converted on demand, when they are read (see PDFConversion.lazy() and LazyPages)
+        self.pages = None
+
+    def probe(self) -> typing.Optional[DocumentProbe]:
+        """
+        Probe the source document (page count, page sizes and rotation, encryption, content hash). The probe is
+        cached, and only repeated if the file has changed since it was probed.
+
+        :return: DocumentProbe, or None if the document could not be probed
+
+        """
+        if self.document_probe is not None and self.document_probe.current():
+            return self.document_probe
+
+        self.document_probe = None
+        try:
+            with self.metrics.span(ConversionMetrics.PROBE, bytes_in=os.path.getsize(self.filespec)):
+                self.document_probe = DocumentProbe.probe(self.filespec)
+        except Exception as exc:
+            print(f"WARNING: Unable to probe '{self.filespec}': ({exc.__class__.__name__}): {exc}")
+            return None
+
+        self.content_hash = self.document_probe.content_hash
+        return self.document_probe
+
+    def add_color_modes(self, page_modes: typing.List[str]) -> typing.NoReturn:
+        """
+        Count the color modes (rgb, gray, mono) the pages were rendered in.
+
+        :param page_modes: Color mode of each rendered page
+
+        :return: None
+        """
+        for color_mode in page_modes:
+            self.color_modes[color_mode] = self.color_modes.get(color_mode, 0) + 1
+
+    def add_files(self, files: typing.List[str]) -> typing.NoReturn:
+        """
+        Record files generated for the whole document (e.g. - restored from the conversion cache).
+
+        :param files: File specs
+
+        :return: None
+        """
+        for file_ in files:
+            if file_ not in self.artifacts:
+                self.files.append(file_)
+            self.artifacts.add(None, file_, size=ArtifactIndex.file_size(file_))
+
+    def add_page_files(self, page_num: int, files: typing.List[str], seconds: typing.Optional[float] = None,
+                       dimensions: typing.Optional[typing.Tuple[int, int]] = None) -> typing.NoReturn:
+        """
+        Record the files generated for a page (a file shared by several pages, e.g. - a multi-page TIFF container,
+        is listed once in files).
+
+        :param page_num: Page number
+        :param files: File specs generated for the page
+        :param seconds: Time spent producing the files (if known)
+        :param dimensions: (width, height) of the images, in pixels (if known)
+
+        :return: None
+        """
+        width, height = dimensions or (None, None)
+        for file_ in files:
+            if file_ not in self.artifacts:
+                self.files.append(file_)
+            self.artifacts.add(page_num, file_, size=ArtifactIndex.file_size(file_), width=width, height=height,
+                               seconds=seconds)
+
+    def add_artifacts(self, artifacts: ArtifactIndex) -> typing.NoReturn:
+        """
+        Record the artifacts of another conversion of the document (e.g. - a page range converted by a work queue
+        worker; see ArtifactIndex.from_dict()).
+
+        :param artifacts: ArtifactIndex
+
+        :return: None
+        """
+        for artifact in artifacts:
+            if artifact.path not in self.artifacts:
+                self.files.append(artifact.path)
+            self.artifacts.add(artifact.page, artifact.path, doc_format=artifact.format, size=artifact.bytes,
+                               width=artifact.width, height=artifact.height, seconds=artifact.seconds)
+
+    def complete(self, doc_format: SupportedDocTypes, first_page: typing.Optional[int] = None,
+                 last_page: typing.Optional[int] = None, files_per_page: int = 1) -> bool:
+        """
+        Check that every requested page has its target files (render and encode failures are reported, not raised,
+        so a conversion may finish with pages missing).
+
+        :param doc_format: Target format (SupportedDocTypes enumeration)
+        :param first_page: First requested page (default: 1)
+        :param last_page: Last requested page (default: the last page of the document)
+        :param files_per_page: Number of target files expected per page (e.g. - one per output size)
+
+        :return: True if all the pages have their files; False if a page is missing, or the document cannot be probed
+        """
+        probe = self.probe()
+        if probe is None:
+            return False
+        last_page = min(last_page or probe.page_count, probe.page_count)
+        return all(len(self.artifacts.get(page_num, doc_format)) >= files_per_page
+                   for page_num in range(first_page or 1, last_page + 1))
+
+    @property
+    def page_files(self) -> typing.Dict[int, typing.List[str]]:
+        """
+        The files generated for each page (see artifacts, for the files of a page in a format).
+
+        :return: Dictionary of page number: [file specs] (in page order)
+        """
+        return {page_num: [artifact.path for artifact in self.artifacts.page(page_num)]
+                for page_num in self.artifacts.pages()}
 
     def get_format_types(self) -> typing.List[str]:
         """
@@ -31,9 +164,7 @@ class DocumentInfo:
         :return: List of unique file format types
 
         """
-        formats = list(set([filename.split('.')[-1] for filename in self.files]))
-        formats.extend([self.filename.split('.')[-1]])
-        return formats
+        return self.artifacts.formats() + [self.filename.split('.')[-1]]
 
     def _return_list_of_filespecs_of_file_format(self, file_format: SupportedDocTypes) -> typing.List[str]:
         """
@@ -41,10 +172,10 @@ class DocumentInfo:
 
         :param file_format: The file format to list
 
-        :return: List of files matching the file format (extension)
+        :return: List of files matching the file format (in page order)
 
         """
-        return [file_ for file_ in self.files if file_.lower().endswith(file_format.value.lower())]
+        return self.artifacts.paths(file_format)
 
     @property
     def tiff(self) -> typing.List[str]:
@@ -66,10 +197,62 @@ class DocumentInfo:
         """
         return self._return_list_of_filespecs_of_file_format(SupportedDocTypes.WEBP)
 
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Return the document information (source, outputs and conversion info) as a JSON serializable dictionary.
+
+        :return: Dictionary of document information
+
+        """
+        return {
+            'filespec': self.filespec,
+            'file_dir': self.file_dir,
+            'filename': self.filename,
+            'doc_type': self.doc_type,
+            'files': list(self.files),
+            'tiff': self.tiff,
+            'webp': self.webp,
+            'formats': self.get_format_types(),
+            'conversion_duration': round(self.conversion_duration, 6),
+            'page_durations': [round(duration, 6) for duration in self.page_durations],
+            'content_hash': self.content_hash,
+            'cache_hit': self.cache_hit,
+            'pages_reused': self.pages_reused,
+            'pages_regenerated': self.pages_regenerated,
+            'concurrency': self.concurrency,
+            'peak_memory': self.peak_memory,
+            'memory_budget': self.memory_budget,
+            'color_modes': self.color_modes,
+            'tiff_pages': list(self.tiff_pages),
+            'page_variants': list(self.page_variants),
+            'page_files': self.page_files,
+            'artifacts': self.artifacts.to_dict(),
+            'metrics': self.metrics.to_dict(),
+            'probe': self.document_probe.to_dict() if self.document_probe is not None else None,
+        }
+
     def document_status(self) -> str:
         output = f"SOURCE DOCUMENT: {self.filespec}\n"
         output += f"LIST OF TIFFs:\n{self.tiff}\n"
         output += f"LIST OF WEBPs:\n{self.webp}\n"
+        if self.tiff_pages:
+            output += f"TIFF CONTAINER PAGES: {len(self.tiff_pages)}\n"
+        if self.page_variants:
+            output += f"PAGE SIZES: {sorted(set(variant['name'] for variant in self.page_variants))}  " \
+                      f"FILES: {len(self.page_variants)}\n"
         output += f"CONVERSION DURATION: {self.conversion_duration:0.4f} seconds\n"
+        output += f"PAGE ENCODE DURATIONS: {[round(duration, 4) for duration in self.page_durations]}\n"
         output += f"CREATED DOC FORMATS: {self.get_format_types()}\n"
+        output += f"RESTORED FROM CACHE: {self.cache_hit}\n"
+        output += f"PAGES REUSED: {self.pages_reused}  PAGES REGENERATED: {self.pages_regenerated}\n"
+        if self.document_probe is not None:
+            output += f"PAGES: {self.document_probe.page_count}  ENCRYPTED: {self.document_probe.encrypted}\n"
+        output += f"COLOR MODES: {self.color_modes}\n"
+        output += f"CONCURRENCY: {self.concurrency}\n"
+        output += f"PEAK MEMORY: {self.peak_memory / 2 ** 20:0.1f} MB  " \
+                  f"(BUDGET: {f'{self.memory_budget / 2 ** 20:0.1f} MB' if self.memory_budget else 'none'})\n"
+        for stage, summary in self.metrics.summary().items():
+            output += (f"STAGE {stage.upper()}: {summary['seconds']:0.4f} seconds  PAGES: {summary['pages']}  "
+                       f"PAGES/SEC: {summary['pages_per_sec']}  P95 PAGE: {summary['p95_page_seconds']:0.4f} seconds  "
+                       f"BYTES IN: {summary['bytes_in']}  BYTES OUT: {summary['bytes_out']}\n")
         return output
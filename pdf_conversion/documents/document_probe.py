@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import typing
+
+import pdf2image
+
+
+class DocumentProbe:
+    """
+    Document metadata read in a single probe: page count, per-page size and rotation, encryption status and the
+    SHA-256 of the content. One pdfinfo run (with a page range covering the whole document) provides the page
+    information, so renderers, schedulers and the memory budget do not need to run pdfinfo again.
+
+    A probe is tied to the file's size and modification time (see current()), and is JSON serializable
+    (to_dict()/from_dict()), so it can be handed to worker processes or stored with other document data.
+    """
+
+    HASH_BLOCK_SIZE = 1024 * 1024
+
+    # pdfinfo clamps the last page of the range to the page count, so this requests every page.
+    LAST_PAGE = 2 ** 31 - 1
+
+    # pdfinfo: "Page size: 612 x 792 pts (letter)", or "Page    3 size: ..." when a page range is requested
+    # (same for "Page    3 rot:  90").
+    PAGE_SIZE_KEY = re.compile(r'^Page\s*(\d*)\s+size$')
+    PAGE_SIZE_VALUE = re.compile(r'([\d.]+)\s*x\s*([\d.]+)\s*pts')
+    PAGE_ROT_KEY = re.compile(r'^Page\s*(\d*)\s+rot$')
+    POINTS_PER_INCH = 72
+
+    def __init__(self, filespec: str, file_size: int, mtime_ns: int, page_count: int,
+                 page_sizes: typing.List[typing.Optional[typing.Tuple[float, float]]],
+                 rotations: typing.List[int], encrypted: bool = False,
+                 content_hash: typing.Optional[str] = None) -> None:
+        """
+        DocumentProbe Constructor (see probe())
+        :param filespec: File spec of the PDF
+        :param file_size: Size of the file (bytes) when it was probed
+        :param mtime_ns: Modification time of the file (ns) when it was probed
+        :param page_count: Number of pages
+        :param page_sizes: (width, height) in points, one per page (None: unknown)
+        :param rotations: Rotation in degrees, one per page
+        :param encrypted: True if the document is encrypted
+        :param content_hash: SHA-256 of the file's content (hex digest)
+        """
+        self.filespec = filespec
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.page_count = page_count
+        self.page_sizes = page_sizes
+        self.rotations = rotations
+        self.encrypted = encrypted
+        self.content_hash = content_hash
+
+    def __str__(self):
+        return (f"{self.__class__.__name__}(pages={self.page_count}, encrypted={self.encrypted}, "
+                f"content_hash={self.content_hash})")
+
+    @classmethod
+    def file_hash(cls, file_spec: str) -> str:
+        """
+        Calculate the SHA-256 of a file's content.
+
+        :param file_spec: File to hash
+
+        :return: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(file_spec, "rb") as SOURCE:
+            for block in iter(lambda: SOURCE.read(cls.HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @classmethod
+    def probe(cls, file_spec: str, hash_content: bool = True) -> "DocumentProbe":
+        """
+        Probe a PDF (one pdfinfo run, and one pass over the file for the content hash).
+
+        :param file_spec: File spec of the PDF
+        :param hash_content: Calculate the content hash (False: content_hash is None)
+
+        :return: DocumentProbe
+        """
+        stat = os.stat(file_spec)
+        info = pdf2image.pdfinfo_from_path(file_spec, first_page=1, last_page=cls.LAST_PAGE)
+        page_count = int(info['Pages'])
+
+        default_size = default_rotation = None
+        sizes, rotations = {}, {}
+        for key, value in info.items():
+            size_match = cls.PAGE_SIZE_KEY.match(key)
+            value_match = cls.PAGE_SIZE_VALUE.search(str(value))
+            if size_match is not None and value_match is not None:
+                size = (float(value_match.group(1)), float(value_match.group(2)))
+                if size_match.group(1):
+                    sizes[int(size_match.group(1))] = size
+                else:
+                    default_size = size
+                continue
+
+            rot_match = cls.PAGE_ROT_KEY.match(key)
+            if rot_match is not None and str(value).strip().lstrip('-').isdigit():
+                if rot_match.group(1):
+                    rotations[int(rot_match.group(1))] = int(value)
+                else:
+                    default_rotation = int(value)
+
+        return cls(
+            filespec=os.path.abspath(file_spec), file_size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+            page_count=page_count,
+            page_sizes=[sizes.get(page_num, default_size) for page_num in range(1, page_count + 1)],
+            rotations=[rotations.get(page_num, default_rotation or 0) for page_num in range(1, page_count + 1)],
+            encrypted=str(info.get('Encrypted', 'no')).strip().lower().startswith('yes'),
+            content_hash=cls.file_hash(file_spec) if hash_content else None)
+
+    def current(self) -> bool:
+        """
+        :return: True if the file has not changed (size and modification time) since it was probed
+        """
+        try:
+            stat = os.stat(self.filespec)
+        except OSError:
+            return False
+        return stat.st_size == self.file_size and stat.st_mtime_ns == self.mtime_ns
+
+    def page_inches(self, first_page: typing.Optional[int] = None, last_page: typing.Optional[int] = None,
+                    default: typing.Optional[typing.Tuple[float, float]] = None
+                    ) -> typing.List[typing.Tuple[float, float]]:
+        """
+        Rendered page dimensions (the page's rotation applied).
+
+        :param first_page: First page (default: 1)
+        :param last_page: Last page (default: last page of the document)
+        :param default: Size (inches) used for the pages whose size is unknown
+
+        :return: List of (width, height) in inches, one per page (in page order)
+        """
+        first_page = first_page or 1
+        last_page = min(last_page or self.page_count, self.page_count)
+        sizes = []
+        for page_num in range(first_page, last_page + 1):
+            size = self.page_sizes[page_num - 1]
+            if size is None:
+                sizes.append(default)
+                continue
+            width, height = size[0] / self.POINTS_PER_INCH, size[1] / self.POINTS_PER_INCH
+            sizes.append((height, width) if self.rotations[page_num - 1] % 180 else (width, height))
+        return sizes
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: JSON serializable probe (see from_dict())
+        """
+        return {
+            'filespec': self.filespec,
+            'file_size': self.file_size,
+            'mtime_ns': self.mtime_ns,
+            'page_count': self.page_count,
+            'page_sizes': [list(size) if size is not None else None for size in self.page_sizes],
+            'rotations': list(self.rotations),
+            'encrypted': self.encrypted,
+            'content_hash': self.content_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "DocumentProbe":
+        """
+        Rebuild a probe from to_dict() data.
+        """
+        return cls(
+            filespec=data['filespec'], file_size=data['file_size'], mtime_ns=data['mtime_ns'],
+            page_count=data['page_count'],
+            page_sizes=[tuple(size) if size is not None else None for size in data['page_sizes']],
+            rotations=data['rotations'], encrypted=data.get('encrypted', False),
+            content_hash=data.get('content_hash'))
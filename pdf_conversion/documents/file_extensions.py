@@ -5,4 +5,9 @@ class SupportedDocTypes(Enum):
     PDF = 'pdf'
     WEBP = 'webp'
     TIFF = 'tif'
+    PNG = 'png'
+    JPEG = 'jpg'
+
+    # Pages rendered into memory (never written): the intermediate format of the direct conversion paths.
+    RASTER = 'raster'
     NOT_DEFINED = None
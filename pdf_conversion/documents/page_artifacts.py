@@ -0,0 +1,191 @@
+import os
+import typing
+
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+class PageArtifact:
+    """
+    A file generated for a page (page None: for the document, e.g. - files restored from the conversion cache): its
+    format (file extension), size in bytes, pixel dimensions and the seconds spent producing it (None if unknown).
+
+    Large documents hold one artifact per page and format, so the records are compact (__slots__), and serialize to
+    lists (see ArtifactIndex.to_dict()).
+    """
+    __slots__ = ('page', 'format', 'path', 'bytes', 'width', 'height', 'seconds')
+
+    def __init__(self, page: typing.Optional[int], path: str, doc_format: typing.Optional[str] = None,
+                 size: typing.Optional[int] = None, width: typing.Optional[int] = None,
+                 height: typing.Optional[int] = None, seconds: typing.Optional[float] = None) -> None:
+        """
+        PageArtifact Constructor
+        :param page: Page number (None: document level)
+        :param path: File spec
+        :param doc_format: File format (default: the file extension)
+        :param size: Size of the file in bytes
+        :param width: Width of the image, in pixels
+        :param height: Height of the image, in pixels
+        :param seconds: Time spent producing the file
+        """
+        self.page = page
+        self.path = path
+        self.format = doc_format or self.format_of(path)
+        self.bytes = size
+        self.width = width
+        self.height = height
+        self.seconds = seconds
+
+    @staticmethod
+    def format_of(path: str) -> str:
+        """
+        :return: The format of a file (its extension, lower case)
+        """
+        return path.rsplit('.', 1)[-1].lower()
+
+    def to_list(self) -> list:
+        """
+        :return: The artifact's fields (in __slots__ order)
+        """
+        return [self.page, self.format, self.path, self.bytes, self.width, self.height, self.seconds]
+
+    @classmethod
+    def from_list(cls, values: list) -> "PageArtifact":
+        page, doc_format, path, size, width, height, seconds = values
+        return cls(page, path, doc_format=doc_format, size=size, width=width, height=height, seconds=seconds)
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}(page={self.page}, path='{self.path}', bytes={self.bytes}, "
+                f"width={self.width}, height={self.height}, seconds={self.seconds})")
+
+
+class ArtifactIndex:
+    """
+    Index of the files generated for a document: artifacts by page and format (O(1) lookups), and the files of each
+    format in page order. A file shared by several pages (e.g. - a multi-page TIFF container) has one artifact per
+    page, and is listed once per format.
+
+    JSON format (see to_dict()):
+        {'fields': ['page', 'format', 'path', 'bytes', 'width', 'height', 'seconds'], 'artifacts': [[values], ...]}
+    """
+
+    def __init__(self) -> None:
+        self._artifacts = {}        # (page, format): [PageArtifact]
+        self._pages = {}            # page: [PageArtifact]
+        self._formats = {}          # format: [PageArtifact] (in the order they were added)
+        self._keys = set()          # (page, path) of each artifact
+        self._files = set()         # path of each artifact
+
+        # Files of each format, in page order (rebuilt when the format's artifacts change).
+        self._paths = {}
+
+    def add(self, page: typing.Optional[int], path: str, **kwargs) -> typing.Optional[PageArtifact]:
+        """
+        Add an artifact (a file already recorded for the page is ignored).
+
+        :param page: Page number (None: document level)
+        :param path: File spec
+        :param kwargs: Artifact fields (see PageArtifact)
+
+        :return: PageArtifact (None if the file was already recorded for the page)
+        """
+        if (page, path) in self._keys:
+            return None
+        self._keys.add((page, path))
+        self._files.add(path)
+
+        artifact = PageArtifact(page, path, **kwargs)
+        self._artifacts.setdefault((page, artifact.format), []).append(artifact)
+        self._pages.setdefault(page, []).append(artifact)
+        self._formats.setdefault(artifact.format, []).append(artifact)
+        self._paths.pop(artifact.format, None)
+        return artifact
+
+    @staticmethod
+    def _format(doc_format: typing.Union[str, SupportedDocTypes]) -> str:
+        return doc_format.value if isinstance(doc_format, SupportedDocTypes) else doc_format.lower()
+
+    def get(self, page: typing.Optional[int],
+            doc_format: typing.Union[str, SupportedDocTypes]) -> typing.List[PageArtifact]:
+        """
+        :param page: Page number (None: document level)
+        :param doc_format: File format (extension, or SupportedDocTypes enumeration)
+
+        :return: The artifacts of the page in the format (e.g. - one per output size)
+        """
+        return list(self._artifacts.get((page, self._format(doc_format)), []))
+
+    def page(self, page: typing.Optional[int]) -> typing.List[PageArtifact]:
+        """
+        :return: The artifacts of the page, in all formats (in the order they were added)
+        """
+        return list(self._pages.get(page, []))
+
+    def paths(self, doc_format: typing.Union[str, SupportedDocTypes]) -> typing.List[str]:
+        """
+        :param doc_format: File format (extension, or SupportedDocTypes enumeration)
+
+        :return: The files of the format, in page order (document level files first)
+        """
+        doc_format = self._format(doc_format)
+        if doc_format not in self._paths:
+            artifacts = sorted(self._formats.get(doc_format, []), key=lambda artifact: artifact.page or 0)
+            self._paths[doc_format] = list(dict.fromkeys(artifact.path for artifact in artifacts))
+        return list(self._paths[doc_format])
+
+    def formats(self) -> typing.List[str]:
+        """
+        :return: The formats of the files (in the order they were first generated)
+        """
+        return list(self._formats)
+
+    def pages(self) -> typing.List[int]:
+        """
+        :return: The page numbers that have artifacts (in page order)
+        """
+        return sorted(page for page in self._pages if page is not None)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, path: str) -> bool:
+        """
+        :return: True if the file has been recorded (for any page)
+        """
+        return path in self._files
+
+    def __iter__(self) -> typing.Iterator[PageArtifact]:
+        """
+        :return: Iterator of the artifacts, in page order (document level artifacts first)
+        """
+        for page in sorted(self._pages, key=lambda page_num: page_num or 0):
+            yield from self._pages[page]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        :return: The artifacts, in page order (JSON serializable; see the class doc)
+        """
+        return {'fields': list(PageArtifact.__slots__), 'artifacts': [artifact.to_list() for artifact in self]}
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "ArtifactIndex":
+        """
+        :param data: Artifacts (see to_dict())
+
+        :return: ArtifactIndex
+        """
+        index = cls()
+        for values in data.get('artifacts', []):
+            artifact = PageArtifact.from_list(values)
+            index.add(artifact.page, artifact.path, doc_format=artifact.format, size=artifact.bytes,
+                      width=artifact.width, height=artifact.height, seconds=artifact.seconds)
+        return index
+
+    @staticmethod
+    def file_size(path: str) -> typing.Optional[int]:
+        """
+        :return: Size of the file in bytes (None if it does not exist)
+        """
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
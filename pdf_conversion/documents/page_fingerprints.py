@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import typing
+
+# pypdf is optional; it is only needed to fingerprint pages for incremental conversions.
+try:
+    import pypdf
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+except ImportError:
+    pypdf = None
+
+
+class PageFingerprints:
+    """
+    Per-page fingerprints of a PDF, and the manifest (stored next to the converted outputs) that maps each page's
+    fingerprint to the files generated for it.
+
+    A page's fingerprint is a SHA-256 over everything that determines how the page renders: its content streams,
+    resources (fonts, images, forms; resolved recursively), page boxes, rotation and annotations. The digest is built
+    from the object content (not the object numbers), so pages that are unchanged in a revised PDF keep their
+    fingerprint even when the file is rewritten.
+
+    Manifest format (JSON):
+        {'settings': {conversion settings}, 'pages': {'<page num>': {'fingerprint': str, 'files': [file specs]}}}
+    """
+
+    MANIFEST_EXTENSION = 'pages.json'
+
+    # Page attributes that affect the rendered page.
+    PAGE_KEYS = ('/Contents', '/Resources', '/MediaBox', '/CropBox', '/Rotate', '/Annots', '/UserUnit')
+
+    # Back-references that would walk the rest of the document (and are irrelevant to the page's appearance).
+    SKIP_KEYS = ('/Parent', '/P')
+
+    def __init__(self, file_dir: str, filename: str) -> None:
+        """
+        PageFingerprints Constructor
+        :param file_dir: Directory containing the converted outputs (the manifest is stored here)
+        :param filename: Filename of the source document
+        """
+        self.manifest_file = os.path.join(file_dir, f"{filename.rsplit('.', 1)[0]}.{self.MANIFEST_EXTENSION}")
+
+    @staticmethod
+    def available() -> bool:
+        """
+        :return: True if page fingerprints can be computed (pypdf is installed)
+        """
+        return pypdf is not None
+
+    @classmethod
+    def compute(cls, file_spec: str) -> typing.List[str]:
+        """
+        Fingerprint every page of the PDF.
+
+        :param file_spec: File spec of the PDF
+
+        :return: List of hex digests, one per page (in page order)
+        """
+        reader = pypdf.PdfReader(file_spec)
+        fingerprints = []
+        for page in reader.pages:
+            digest = hashlib.sha256()
+            for key in cls.PAGE_KEYS:
+                if key in page:
+                    digest.update(key.encode('utf-8'))
+                    cls._digest(page[key], digest, set())
+            fingerprints.append(digest.hexdigest())
+        return fingerprints
+
+    @classmethod
+    def _digest(cls, obj: typing.Any, digest: typing.Any, seen: typing.Set[typing.Tuple[int, int]]) -> None:
+        """
+        Recursively add a PDF object's content to the digest.
+
+        :param obj: PDF object
+        :param digest: hashlib digest to update
+        :param seen: Indirect object references already visited (cycle protection)
+
+        :return: None
+        """
+        if isinstance(obj, IndirectObject):
+            reference = (obj.idnum, obj.generation)
+            if reference in seen:
+                digest.update(b'<ref>')
+                return
+            seen.add(reference)
+            obj = obj.get_object()
+
+        if isinstance(obj, StreamObject):
+            try:
+                data = obj.get_data()
+            except Exception:
+                data = obj._data
+            digest.update(b'<stream>')
+            digest.update(hashlib.sha256(data or b'').digest())
+
+        if isinstance(obj, DictionaryObject):
+            digest.update(b'<<')
+            for key in sorted(obj.keys()):
+                if key in cls.SKIP_KEYS or (isinstance(obj, StreamObject) and key in ('/Length', '/Filter')):
+                    continue
+                digest.update(key.encode('utf-8'))
+                cls._digest(obj.raw_get(key), digest, seen)
+            digest.update(b'>>')
+
+        elif isinstance(obj, ArrayObject):
+            digest.update(b'[')
+            for item in obj:
+                cls._digest(item, digest, seen)
+            digest.update(b']')
+
+        elif not isinstance(obj, StreamObject):
+            digest.update(repr(obj).encode('utf-8'))
+
+    def load(self, settings: typing.Dict[str, typing.Any]) -> typing.Dict[int, dict]:
+        """
+        Read the manifest of the previous conversion.
+
+        :param settings: Effective settings of the current conversion; if the previous conversion used different
+              settings, none of its outputs can be reused.
+
+        :return: Dictionary of page number: {'fingerprint': str, 'files': [file specs]}
+        """
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, "r") as MANIFEST:
+                manifest = json.load(MANIFEST)
+        except (OSError, ValueError) as exc:
+            print(f"{self.__class__.__name__}: WARNING: Unable to read '{self.manifest_file}': {exc}")
+            return {}
+
+        if manifest.get('settings') != settings:
+            return {}
+        return {int(page_num): entry for page_num, entry in manifest.get('pages', {}).items()}
+
+    def save(self, settings: typing.Dict[str, typing.Any], pages: typing.Dict[int, dict]) -> typing.NoReturn:
+        """
+        Write the manifest (atomically: written to a temp file, then renamed).
+
+        :param settings: Effective settings of the conversion
+        :param pages: Dictionary of page number: {'fingerprint': str, 'files': [file specs]}
+
+        :return: None
+        """
+        temp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as MANIFEST:
+            json.dump({'settings': settings,
+                       'pages': {str(page_num): pages[page_num] for page_num in sorted(pages)}}, MANIFEST, indent=2)
+        os.replace(temp_file, self.manifest_file)
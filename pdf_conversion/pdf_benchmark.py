@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import sys
+
+from pdf_conversion.benchmark.suite import BenchmarkSuite
+from pdf_conversion.config.cli import BenchmarkCommandLine
+
+if __name__ == '__main__':
+    cli = BenchmarkCommandLine()
+
+    if cli.args.compare is not None:
+        results = BenchmarkSuite.read(cli.args.compare)
+    else:
+        results = BenchmarkSuite(corpus_dir=cli.args.corpus_dir, page_counts=cli.page_counts(), sweep=cli.sweep(),
+                                 iterations=cli.args.iterations, stages=cli.stages()).run()
+        BenchmarkSuite.write(results, cli.args.output)
+
+        border = '-' * 80
+        print(border)
+        for entry in results['results']:
+            print(f"{entry['stage']:<12} {entry['doc_class']:<12} {entry['params']}: "
+                  f"{entry['pages_per_sec']:0.2f} pages/sec  p50: {entry['p50_page_seconds']:0.4f}s  "
+                  f"p95: {entry['p95_page_seconds']:0.4f}s  "
+                  f"peak RSS: {entry['peak_rss_bytes'] / 2 ** 20:0.1f} MB  written: {entry['bytes_written']} bytes")
+        print(border)
+        print(f"Results written to '{cli.args.output}'")
+
+    if cli.args.baseline is not None:
+        regressions = BenchmarkSuite.compare(BenchmarkSuite.read(cli.args.baseline), results, cli.args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression['stage']} {regression['doc_class']} {regression['params']} "
+                  f"{regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                  f"({regression['change']:+0.1%})")
+        print(f"{len(regressions)} regression(s) found (threshold: {cli.args.threshold:0.0%}).")
+        sys.exit(1 if regressions else 0)
@@ -2,22 +2,52 @@
 
 from pdf_conversion.config.cli import CommandLine
 from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.conversion_cache import ConversionCache
 from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.documents.conversion_metrics import ConversionMetrics
 from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
 
 source_pdf = "../../data/pdfs/ddmdp.pdf"
 default_cfg = './defaults.cfg'
 
-defaults = DefaultValues(filespec=default_cfg)
-app_defaults = getattr(defaults, DefaultValues.APP_DEFAULTS)
+# NOTE: The main guard is required; the webp encode pool may spawn worker processes that re-import this module.
+if __name__ == '__main__':
+    defaults = DefaultValues(filespec=default_cfg)
+    app_defaults = getattr(defaults, DefaultValues.APP_DEFAULTS)
 
-cli = CommandLine(app_defaults)
-cli.print_args()
+    cli = CommandLine(app_defaults)
+    cli.print_args()
 
-pdf = DocumentInfo(file_spec=source_pdf, conversion_dir=cli.args.image_dir)
+    cache = None
+    cache_defaults = getattr(defaults, DefaultValues.CACHE_DEFAULTS, None) or {}
+    if cli.args.cache_dir is not None or cache_defaults.get('enabled', False):
+        cache = ConversionCache(cache_dir=cli.args.cache_dir, max_bytes=cli.args.cache_max_bytes,
+                                defaults=cache_defaults)
 
-PDFConversion(document=pdf, defaults=defaults).convert(
-    doc_format=cli.args.doc_format, lossless=cli.args.lossless, dpi=cli.args.dpi, quality=cli.args.quality,
-    threads=cli.args.threads)
+    pdf = DocumentInfo(file_spec=source_pdf, conversion_dir=cli.args.image_dir)
 
-print(pdf.document_status())
+    conversion = PDFConversion(document=pdf, defaults=defaults, cache=cache)
+    conversion_args = dict(
+        lossless=cli.args.lossless, dpi=cli.args.dpi, quality=cli.args.quality, threads=cli.args.threads,
+        direct=cli.args.direct, encoders=cli.args.encoders, encode_pool=cli.args.encode_pool,
+        renderer=cli.args.renderer, color_mode=cli.args.color_mode, compression=cli.args.compression,
+        multipage=cli.args.multipage, profile=cli.args.profile, method=cli.args.method,
+        target_bytes=cli.args.target_bytes, max_memory=cli.args.max_memory, sizes=cli.args.sizes)
+
+    # Pages are streamed in a single size.
+    if cli.args.stream and cli.args.doc_format == SupportedDocTypes.WEBP and not cli.args.sizes:
+        for page in conversion.convert_stream(chunk_pages=cli.args.chunk_pages, **conversion_args):
+            print(f"Page {page.page_num}: {page.files} ({page.duration:0.3f} seconds)")
+    else:
+        conversion.convert(doc_format=cli.args.doc_format, incremental=cli.args.incremental, resume=cli.args.resume,
+                           **conversion_args)
+
+    if cli.args.metrics_json is not None:
+        ConversionMetrics.write_json(cli.args.metrics_json, {pdf.filespec: pdf.metrics})
+    if cli.args.metrics_prom is not None:
+        ConversionMetrics.write_prometheus(cli.args.metrics_prom, {pdf.filespec: pdf.metrics})
+
+    print(pdf.document_status())
+    if cache is not None:
+        print(f"CACHE: {cache.stats()}")
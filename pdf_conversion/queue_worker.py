@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+from pdf_conversion.config.cli import QueueCommandLine
+from pdf_conversion.config.defaults import DefaultValues
+from pdf_conversion.converters.batch import BatchConversion
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.converters.work_queue import QueueWorker, open_work_queue
+from pdf_conversion.documents.document_info import DocumentInfo
+
+default_cfg = './defaults.cfg'
+
+# NOTE: The main guard is required; the encode pool may spawn worker processes that re-import this module.
+if __name__ == '__main__':
+    defaults = DefaultValues(filespec=default_cfg)
+    app_defaults = getattr(defaults, DefaultValues.APP_DEFAULTS)
+
+    cli = QueueCommandLine(app_defaults)
+    cli.print_args()
+
+    queue_defaults = dict(getattr(defaults, DefaultValues.QUEUE_DEFAULTS, None) or {})
+    if cli.args.lease_seconds > 0:
+        queue_defaults['lease_seconds'] = cli.args.lease_seconds
+    queue = open_work_queue(cli.args.queue, defaults=queue_defaults)
+
+    options = dict(lossless=cli.args.lossless, dpi=cli.args.dpi, quality=cli.args.quality, threads=cli.args.threads,
+                   renderer=cli.args.renderer, color_mode=cli.args.color_mode, compression=cli.args.compression,
+                   profile=cli.args.profile, method=cli.args.method, target_bytes=cli.args.target_bytes,
+                   direct=cli.args.direct, max_memory=cli.args.max_memory, sizes=cli.args.sizes,
+                   resume=cli.args.resume)
+    for filespec in BatchConversion.collect_documents(cli.args.inputs, cli.args.manifest):
+        # The tasks of a document are all rendered by the same backend (an 'auto' renderer is resolved here).
+        document = DocumentInfo(file_spec=filespec, conversion_dir=cli.args.image_dir)
+        queue.submit(filespec, cli.args.doc_format, cli.args.image_dir,
+                     options=PDFConversion(document, defaults=defaults).resolve_renderer(dict(options)),
+                     chunk_pages=cli.args.chunk_pages)
+
+    if cli.args.work or not (cli.args.inputs or cli.args.manifest):
+        pool = EncodePool(workers=cli.args.encoders, pool_type=cli.args.encode_pool,
+                          defaults=getattr(defaults, DefaultValues.WEBP_DEFAULTS, None))
+        worker = QueueWorker(queue, defaults=defaults, pool=pool.start(), worker_id=cli.args.worker_id)
+        try:
+            worker.run()
+        finally:
+            pool.shutdown()
+        print(f"{worker.worker_id}: {worker.tasks_done} task(s) converted, {worker.tasks_failed} failed.")
+
+    print(queue.status())
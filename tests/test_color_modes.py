@@ -0,0 +1,56 @@
+from PIL import Image, ImageDraw, ImageFont
+import pytest
+
+from pdf_conversion.converters.color_modes import ColorMode
+
+RENDER_DPI = 300
+PAGE_INCHES = (8.5, 11)
+
+
+@pytest.fixture(scope='module')
+def text_page() -> Image.Image:
+    """ A bilevel page of 10 pt text, rendered at 300 DPI. """
+    width, height = (int(inches * RENDER_DPI) for inches in PAGE_INCHES)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=42)
+    for top in range(300, height - 300, 60):
+        draw.text((250, top), "The quick brown fox jumps over the lazy dog; lorem ipsum dolor sit amet.", fill=0,
+                  font=font)
+    return page.point(lambda value: 255 if value >= ColorMode.MONO_THRESHOLD else 0, '1')
+
+
+def _preview(page: Image.Image) -> Image.Image:
+    """ Downsample a page to the auto check's preview DPI (area averaging, i.e. - anti-aliased like a render). """
+    scale = ColorMode.PREVIEW_DPI / RENDER_DPI
+    return page.convert('L').resize((int(page.width * scale), int(page.height * scale)), Image.BOX)
+
+
+def test_text_page_is_mono_on_the_preview(text_page):
+    preview = _preview(text_page)
+    mid_tones = sum(preview.histogram()[ColorMode.MONO_LOW + 1:ColorMode.MONO_HIGH])
+    assert mid_tones > 0.05 * preview.width * preview.height        # anti-aliased text edges
+    assert ColorMode.detect(preview) == ColorMode.MONO
+    assert ColorMode.detect_image(text_page.convert('L')) == ColorMode.MONO
+
+
+def test_gray_content_is_gray(text_page):
+    page = text_page.convert('L')
+    draw = ImageDraw.Draw(page)
+    for offset in range(RENDER_DPI):        # one inch square gray gradient (e.g. - a photo)
+        draw.line([(900 + offset, 1200), (900 + offset, 1200 + RENDER_DPI)], fill=80 + offset // 4)
+    assert ColorMode.detect(_preview(page)) == ColorMode.GRAY
+
+
+def test_color_content_is_rgb(text_page):
+    page = text_page.convert('RGB')
+    ImageDraw.Draw(page).rectangle([900, 1200, 1200, 1500], fill=(200, 30, 30))
+    scale = ColorMode.PREVIEW_DPI / RENDER_DPI
+    preview = page.resize((int(page.width * scale), int(page.height * scale)), Image.BOX)
+    assert ColorMode.detect(preview) == ColorMode.RGB
+
+
+def test_convert_and_page_ranges():
+    assert ColorMode.convert(Image.new('L', (4, 4), 100), ColorMode.MONO).mode == '1'
+    assert ColorMode.page_ranges([ColorMode.MONO, ColorMode.MONO, ColorMode.RGB], first_page=3) == \
+        [(3, 4, ColorMode.MONO), (5, 5, ColorMode.RGB)]
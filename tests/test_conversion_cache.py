@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from PIL import Image
+
+from pdf_conversion.converters.conversion_cache import ConversionCache
+from pdf_conversion.converters.image_converter import IImageFormatConverter
+
+
+def _outputs(folder, name: str, num_files: int = 2, size: int = 100):
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    for page_num in range(1, num_files + 1):
+        file_spec = os.path.join(folder, f"{name}-{page_num:04d}.webp")
+        with open(file_spec, "wb") as OUTPUT:
+            OUTPUT.write(b'x' * size)
+        files.append(file_spec)
+    return files
+
+
+def _store(cache_dir: str, work_dir: str, name: str) -> None:
+    ConversionCache(cache_dir=cache_dir).store(name, _outputs(os.path.join(work_dir, name), name))
+
+
+def test_store_and_lookup(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'))
+    files = _outputs(str(tmp_path / 'out'), 'doc')
+    cache.store('key', files)
+
+    restored = cache.lookup('key', str(tmp_path / 'restored'))
+    assert [os.path.split(file_)[-1] for file_ in restored] == [os.path.split(file_)[-1] for file_ in files]
+    assert all(os.path.getsize(file_) == 100 for file_ in restored)
+    assert cache.lookup('other', str(tmp_path / 'restored')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'), max_bytes=450)
+    cache.store('old', _outputs(str(tmp_path / 'old'), 'old'))
+    cache.store('new', _outputs(str(tmp_path / 'new'), 'new'))
+    cache.store('newest', _outputs(str(tmp_path / 'newest'), 'newest'))
+
+    assert cache.evictions == 1
+    assert cache.lookup('old', str(tmp_path / 'restored')) is None
+    assert cache.lookup('newest', str(tmp_path / 'restored')) is not None
+
+
+def test_processes_sharing_the_cache_keep_each_others_entries(tmp_path):
+    cache_dir, work_dir = str(tmp_path / 'cache'), str(tmp_path / 'work')
+    names = [f"doc{index}" for index in range(16)]
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_store, [cache_dir] * len(names), [work_dir] * len(names), names))
+
+    assert ConversionCache(cache_dir=cache_dir).stats()['entries'] == len(names)
+
+
+def _page(file_spec: str, color: str) -> str:
+    Image.new('RGB', (8, 8), color).save(file_spec, format='WEBP', lossless=True)
+    return file_spec
+
+
+def _color(file_spec: str):
+    with Image.open(file_spec) as IMAGE:
+        return IMAGE.convert('RGB').getpixel((0, 0))
+
+
+def test_overwritten_outputs_do_not_change_the_entry(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'), link=True)
+    output = _page(str(tmp_path / 'doc-0001.webp'), 'red')
+    cache.store('red', [output])
+
+    # Re-converting into the same directory (e.g. - other settings) writes the same file name in place.
+    _page(output, 'blue')
+    [restored] = cache.lookup('red', str(tmp_path / 'restored'))
+    assert _color(restored) == (255, 0, 0)
+
+    # The restored file is a link to the entry: the converters replace it instead of writing into it.
+    _page(IImageFormatConverter.replace_file(restored), 'blue')
+    assert _color(cache.lookup('red', str(tmp_path / 'again'))[0]) == (255, 0, 0)
+
+
+def test_modified_entry_is_a_miss(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / 'cache'))
+    cache.store('key', _outputs(str(tmp_path / 'out'), 'doc'))
+
+    [entry_file] = [os.path.join(root, name) for root, _, names in os.walk(tmp_path / 'cache')
+                    for name in names if name == 'doc-0001.webp']
+    os.chmod(entry_file, 0o644)
+    with open(entry_file, "ab") as ENTRY:
+        ENTRY.write(b'y')
+    assert cache.lookup('key', str(tmp_path / 'restored')) is None
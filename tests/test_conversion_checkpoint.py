@@ -0,0 +1,56 @@
+import os
+
+from pdf_conversion.documents.conversion_checkpoint import ConversionCheckpoint
+
+SETTINGS = {'format': 'webp', 'dpi': 200}
+
+
+def _checkpoint(tmp_path, content_hash: str = 'abc', settings: dict = None) -> ConversionCheckpoint:
+    return ConversionCheckpoint(str(tmp_path), 'doc.pdf', content_hash, settings or SETTINGS).load()
+
+
+def _page(tmp_path, page_num: int, data: bytes = b"webp") -> str:
+    file_ = tmp_path / f"doc-{page_num:04d}.webp"
+    file_.write_bytes(data)
+    return str(file_)
+
+
+def test_saved_pages_are_verified_on_resume(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    for page_num in (1, 2):
+        checkpoint.add(page_num, ConversionCheckpoint.ENCODE, [_page(tmp_path, page_num)])
+    checkpoint.add(3, ConversionCheckpoint.RENDER, [str(tmp_path / "doc-0003.tif")])
+    checkpoint.save()
+
+    # Page 3 has no target file yet, so only pages 1-2 are complete.
+    assert _checkpoint(tmp_path).verified_pages() == {
+        page_num: [os.path.join(str(tmp_path), f"doc-{page_num:04d}.webp")] for page_num in (1, 2)}
+
+
+def test_corrupt_and_missing_files_are_not_verified(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    for page_num in (1, 2, 3):
+        checkpoint.add(page_num, ConversionCheckpoint.ENCODE, [_page(tmp_path, page_num)])
+    checkpoint.save()
+
+    _page(tmp_path, 1, b"webq")
+    os.remove(tmp_path / "doc-0002.webp")
+    assert list(_checkpoint(tmp_path).verified_pages()) == [3]
+
+
+def test_manifest_only_applies_to_the_same_content_and_settings(tmp_path):
+    checkpoint = _checkpoint(tmp_path)
+    checkpoint.add(1, ConversionCheckpoint.ENCODE, [_page(tmp_path, 1)])
+    checkpoint.save()
+
+    assert _checkpoint(tmp_path, content_hash='def').verified_pages() == {}
+    assert _checkpoint(tmp_path, settings={**SETTINGS, 'dpi': 300}).verified_pages() == {}
+
+
+def test_saves_keep_the_pages_of_other_ranges(tmp_path):
+    first, second = _checkpoint(tmp_path), _checkpoint(tmp_path)
+    first.add(1, ConversionCheckpoint.ENCODE, [_page(tmp_path, 1)])
+    second.add(2, ConversionCheckpoint.ENCODE, [_page(tmp_path, 2)])
+    first.save()
+    second.save()
+    assert list(_checkpoint(tmp_path).verified_pages()) == [1, 2]
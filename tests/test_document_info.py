@@ -0,0 +1,24 @@
+import os
+
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.document_probe import DocumentProbe
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+def test_incomplete_conversions_are_detected(tmp_path):
+    pdf = tmp_path / 'doc.pdf'
+    pdf.write_bytes(b"%PDF-1.4\n")
+    stat = os.stat(pdf)
+    document = DocumentInfo(file_spec=str(pdf), conversion_dir=str(tmp_path))
+    document.document_probe = DocumentProbe(filespec=str(pdf), file_size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                                            page_count=3, page_sizes=[None] * 3, rotations=[0] * 3)
+
+    document.add_page_files(1, [str(tmp_path / 'doc-0001.webp')])
+    document.add_page_files(3, [str(tmp_path / 'doc-0003.webp')])
+    assert not document.complete(SupportedDocTypes.WEBP)
+    assert document.complete(SupportedDocTypes.WEBP, first_page=3)
+    assert not document.complete(SupportedDocTypes.TIFF, first_page=3)
+
+    document.add_page_files(2, [str(tmp_path / 'doc-0002.webp')])
+    assert document.complete(SupportedDocTypes.WEBP)
+    assert not document.complete(SupportedDocTypes.WEBP, files_per_page=2)
@@ -0,0 +1,37 @@
+from PIL import Image
+
+from pdf_conversion.converters.encode_pool import EncodePool
+
+
+def _jobs(folder, first_page: int, num_pages: int):
+    return [dict(src_file_spec=str(folder / f"doc-{page_num}.tif"), output_file=f"doc-{page_num}",
+                 output_folder=str(folder), src_image=Image.new('RGB', (8, 8), 'red'))
+            for page_num in range(first_page, first_page + num_pages)]
+
+
+def test_reserved_pool_encodes_every_range_with_one_executor(tmp_path, monkeypatch):
+    pool = EncodePool(workers=2, pool_type='thread')
+    executors = []
+    build = pool.executor
+    monkeypatch.setattr(pool, 'executor', lambda *args: executors.append(build(*args)) or executors[-1])
+
+    with pool.reserved(num_jobs=4):
+        assert pool.started
+        pages = pool.encode(_jobs(tmp_path, 1, 2)) + pool.encode(_jobs(tmp_path, 3, 2))
+    assert len(executors) == 1 and not pool.started
+    assert all(len(page.files) == 1 for page in pages)
+
+    # Without a reservation, each set of pages starts (and stops) its own workers.
+    pool.encode(_jobs(tmp_path, 1, 2))
+    pool.encode(_jobs(tmp_path, 3, 2))
+    assert len(executors) == 3
+
+
+def test_started_pool_is_left_running(tmp_path):
+    pool = EncodePool(workers=2, pool_type='thread').start()
+    try:
+        with pool.reserved(num_jobs=4):
+            pool.encode(_jobs(tmp_path, 1, 2))
+        assert pool.started
+    finally:
+        pool.shutdown()
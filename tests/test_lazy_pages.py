@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.document_probe import DocumentProbe
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+@pytest.fixture
+def document(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    stat = os.stat(pdf)
+    document = DocumentInfo(file_spec=str(pdf), conversion_dir=str(tmp_path))
+    document.document_probe = DocumentProbe(
+        filespec=str(pdf), file_size=stat.st_size, mtime_ns=stat.st_mtime_ns, page_count=5,
+        page_sizes=[(612.0, 792.0)] * 5, rotations=[0] * 5)
+    return document
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    """ Stub PDFConversion.convert(): records the ranges and pools, and 'generates' the pages not in failing. """
+    calls, failing = [], set()
+
+    def convert(self, doc_format, first_page=None, last_page=None, **kwargs):
+        calls.append((first_page, last_page, self.pool, self.pool.started))
+        for page_num in range(first_page, last_page + 1):
+            if page_num not in failing:
+                self.document.add_page_files(page_num, [os.path.join(self.document.file_dir, f"doc-{page_num}.webp")])
+        return self
+
+    monkeypatch.setattr(PDFConversion, 'convert', convert)
+    return calls, failing
+
+
+def test_failed_page_is_converted_again(document, conversions):
+    calls, failing = conversions
+    failing.add(2)
+    pages = PDFConversion(document).lazy(SupportedDocTypes.WEBP, read_ahead=2, encoders=1, encode_pool='thread')
+    with pages:
+        assert pages[0] == [os.path.join(document.file_dir, "doc-1.webp")]
+        assert pages.converted == {1, 3}
+
+        failing.clear()
+        assert pages[1] == [os.path.join(document.file_dir, "doc-2.webp")]
+        assert pages[2] == [os.path.join(document.file_dir, "doc-3.webp")]
+    assert [(first_page, last_page) for first_page, last_page, _, _ in calls] == [(1, 3), (2, 2)]
+
+
+def test_reads_share_one_started_pool(document, conversions):
+    calls, _ = conversions
+    pages = PDFConversion(document).lazy(SupportedDocTypes.WEBP, read_ahead=0, encoders=1, encode_pool='thread')
+    with pages:
+        pages[0]
+        pages[3]
+        assert len({id(pool) for _, _, pool, _ in calls}) == 1
+        assert all(started for _, _, _, started in calls)
+    assert not pages.pool.started
+
+
+def test_reads_after_close_leave_the_pool_stopped(document, conversions):
+    calls, _ = conversions
+    conversion = PDFConversion(document)
+    pages = conversion.lazy(SupportedDocTypes.WEBP, read_ahead=0, encoders=1, encode_pool='thread')
+    with pages:
+        pages[0]
+    assert conversion.pool is None
+
+    pages[1]
+    assert calls[-1][2] is pages.pool and not calls[-1][3]
+    assert not pages.pool.started and conversion.pool is None
+
+
+def test_running_pool_is_left_running(document, conversions):
+    pool = EncodePool(workers=1, pool_type='thread').start()
+    try:
+        with PDFConversion(document, pool=pool).lazy(SupportedDocTypes.WEBP) as pages:
+            pages[0]
+        assert pages.pool is pool and pool.started
+    finally:
+        pool.shutdown()
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from pdf_conversion.converters.memory_budget import MemoryBudget
+
+
+def test_parse_bytes():
+    assert MemoryBudget.parse_bytes('512M') == 512 * 2 ** 20
+    assert MemoryBudget.parse_bytes('1.5g') == int(1.5 * 2 ** 30)
+    assert MemoryBudget.parse_bytes(None) == 0
+    with pytest.raises(ValueError):
+        MemoryBudget.parse_bytes('lots')
+
+
+def test_budget_from_defaults():
+    budget = MemoryBudget(None, defaults={MemoryBudget.MAX_MEMORY_KW: '2K'})
+    assert (budget.enabled, budget.max_bytes, budget.raster_budget) == (True, 2048, 1024)
+    assert not MemoryBudget().enabled
+
+
+def test_chunks_fit_the_budget():
+    budget = MemoryBudget(2000)
+    assert budget.chunks([400, 400, 400, 300, 1500, 100], first_page=3) == [(3, 4), (5, 6), (7, 7), (8, 8)]
+    assert budget.chunks([100] * 5, max_pages=2) == [(1, 2), (3, 4), (5, 5)]
+
+
+def test_reserve_blocks_until_released():
+    budget = MemoryBudget(2000)
+    assert budget.reserve(800)
+
+    reserved = threading.Event()
+    thread = threading.Thread(target=lambda: budget.reserve(400) and reserved.set())
+    thread.start()
+    assert not reserved.wait(3 * MemoryBudget.POLL_INTERVAL)
+
+    budget.release(800)
+    assert reserved.wait(5)
+    thread.join()
+    assert (budget.in_use, budget.peak_in_use) == (400, 800)
+
+
+def test_oversized_reservation_proceeds_alone():
+    budget = MemoryBudget(2000)
+    assert budget.reserve(5000)
+    budget.release(5000)
+    assert budget.in_use == 0
+
+
+def test_reserve_is_cancelled_by_stop():
+    budget = MemoryBudget(2000)
+    budget.reserve(1000)
+    stop = threading.Event()
+    stop.set()
+    assert not budget.reserve(100, stop=stop)
+    assert budget.in_use == 1000
@@ -0,0 +1,34 @@
+import json
+
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+from pdf_conversion.documents.page_artifacts import ArtifactIndex
+
+
+def _index() -> ArtifactIndex:
+    index = ArtifactIndex()
+    index.add(None, '/out/doc.zip', size=10)
+    index.add(2, '/out/doc-0002.webp', size=200, width=850, height=1100, seconds=0.2)
+    index.add(1, '/out/doc-0001.webp', size=100, width=850, height=1100, seconds=0.1)
+    index.add(1, '/out/doc.tif', doc_format='tif', size=300)
+    index.add(2, '/out/doc.tif', doc_format='tif', size=300)
+    return index
+
+
+def test_lookups():
+    index = _index()
+    assert index.add(1, '/out/doc-0001.webp') is None
+    assert len(index) == 5
+    assert index.pages() == [1, 2]
+    assert index.formats() == ['zip', 'webp', 'tif']
+    assert index.paths(SupportedDocTypes.WEBP) == ['/out/doc-0001.webp', '/out/doc-0002.webp']
+    assert index.paths('TIF') == ['/out/doc.tif']
+    assert [artifact.path for artifact in index.get(1, SupportedDocTypes.WEBP)] == ['/out/doc-0001.webp']
+    assert '/out/doc.tif' in index and '/out/doc-0003.webp' not in index
+
+
+def test_round_trip():
+    index = _index()
+    restored = ArtifactIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+    assert restored.to_dict() == index.to_dict()
+    assert [artifact.page for artifact in restored] == [None, 1, 1, 2, 2]
+    assert restored.paths(SupportedDocTypes.WEBP) == index.paths(SupportedDocTypes.WEBP)
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+
+from pdf_conversion.converters import priority_scheduler
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.converters.priority_scheduler import PriorityScheduler, ScheduledJob
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.document_probe import DocumentProbe
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+class StubConversion:
+    """ PDFConversion stand-in: records the ranges it converts, and 'generates' one webp file per page. """
+
+    INCREMENTAL_KW = PDFConversion.INCREMENTAL_KW
+    calls = []
+    gate = None             # threading.Event: conversions wait for it (None: no wait)
+    started = threading.Event()
+    lock = threading.Lock()
+
+    def __init__(self, document: DocumentInfo, **kwargs) -> None:
+        self.document = document
+
+    def resolve_renderer(self, kwargs: dict) -> dict:
+        return kwargs
+
+    def convert(self, doc_format: SupportedDocTypes, first_page: int = None, last_page: int = None, **kwargs):
+        with self.lock:
+            self.calls.append((self.document.filename, first_page, last_page))
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        stem = self.document.filename.rsplit('.', 1)[0]
+        for page_num in range(first_page, last_page + 1):
+            self.document.add_page_files(page_num, [os.path.join(self.document.file_dir, f"{stem}-{page_num}.webp")],
+                                         seconds=0.01)
+            self.document.page_durations.append(0.01)
+        return self
+
+
+@pytest.fixture(autouse=True)
+def stub_conversion(monkeypatch):
+    StubConversion.calls = []
+    StubConversion.gate = None
+    StubConversion.started = threading.Event()
+    monkeypatch.setattr(priority_scheduler, 'PDFConversion', StubConversion)
+
+
+def _job(tmp_path, name: str, num_pages: int, priority: str = None) -> ScheduledJob:
+    pdf = tmp_path / f"{name}.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    stat = os.stat(pdf)
+    document = DocumentInfo(file_spec=str(pdf), conversion_dir=str(tmp_path))
+    document.document_probe = DocumentProbe(
+        filespec=str(pdf), file_size=stat.st_size, mtime_ns=stat.st_mtime_ns, page_count=num_pages,
+        page_sizes=[(612.0, 792.0)] * num_pages, rotations=[0] * num_pages)
+    return ScheduledJob(document, SupportedDocTypes.WEBP, priority=priority)
+
+
+def test_interactive_ranges_go_ahead_of_bulk(tmp_path):
+    scheduler = PriorityScheduler(runners=1, chunk_pages=2).start()
+    StubConversion.gate = threading.Event()
+
+    # Keep the only runner busy while the other jobs are queued.
+    scheduler.submit(_job(tmp_path, 'blocker', 1))
+    assert StubConversion.started.wait(5)
+    bulk = scheduler.submit(_job(tmp_path, 'bulk', 4))
+    interactive = scheduler.submit(_job(tmp_path, 'interactive', 4, priority=ScheduledJob.INTERACTIVE))
+    assert scheduler.queued() == {ScheduledJob.INTERACTIVE: 1, ScheduledJob.BULK: 1}
+
+    StubConversion.gate.set()
+    scheduler.shutdown(cancel_queued=False)
+
+    # The first range of an interactive job is its first page only.
+    assert StubConversion.calls == [
+        ('blocker.pdf', 1, 1),
+        ('interactive.pdf', 1, 1), ('interactive.pdf', 2, 3), ('interactive.pdf', 4, 4),
+        ('bulk.pdf', 1, 2), ('bulk.pdf', 3, 4),
+    ]
+    assert interactive.finished is not None and bulk.finished is not None
+    assert interactive.first_page <= bulk.first_page
+
+
+def test_concurrent_ranges_are_merged_into_the_job(tmp_path):
+    scheduler = PriorityScheduler(runners=3, chunk_pages=2).start()
+    job = scheduler.submit(_job(tmp_path, 'doc', 7))
+    scheduler.shutdown(cancel_queued=False)
+
+    document = job.document
+    assert job.error is None and job.finished is not None
+    assert document.artifacts.pages() == list(range(1, 8))
+    assert sorted(document.files) == sorted(os.path.join(str(tmp_path), f"doc-{page}.webp") for page in range(1, 8))
+    assert document.webp == [os.path.join(str(tmp_path), f"doc-{page}.webp") for page in range(1, 8)]
+    assert len(document.page_durations) == 7
+
+
+def test_report_counts_finished_jobs(tmp_path):
+    scheduler = PriorityScheduler(runners=2, chunk_pages=2).start()
+    scheduler.submit(_job(tmp_path, 'a', 3, priority=ScheduledJob.INTERACTIVE))
+    scheduler.submit(_job(tmp_path, 'b', 3))
+    scheduler.shutdown(cancel_queued=False)
+
+    report = scheduler.report()
+    assert report[ScheduledJob.INTERACTIVE]['jobs'] == 1
+    assert report[ScheduledJob.BULK]['jobs'] == 1
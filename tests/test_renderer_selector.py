@@ -0,0 +1,56 @@
+import pytest
+
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.pdf_conversion import PDFConversion
+from pdf_conversion.converters.renderers import RendererSelector
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+
+@pytest.fixture
+def selector(tmp_path, monkeypatch):
+    monkeypatch.setattr(RendererSelector, 'installed',
+                        staticmethod(lambda: ['ghostscript', 'pdftocairo', 'pdftoppm']))
+    return RendererSelector(history_file=str(tmp_path / "throughput.json"))
+
+
+def test_unrecorded_backends_are_tried_first(selector):
+    assert selector.select('text') == 'pdftoppm'
+    selector.record('pdftoppm', 'text', pages=10, seconds=1)
+    assert selector.select('text') == 'pdftocairo'
+    selector.record('pdftocairo', 'text', pages=10, seconds=2)
+    assert selector.select('text') == 'ghostscript'
+
+
+def test_fastest_recorded_backend_is_selected(selector, monkeypatch):
+    monkeypatch.setattr(RendererSelector, 'EXPLORE_RATE', 0)
+    for name, seconds in (('pdftoppm', 2), ('pdftocairo', 1), ('ghostscript', 4)):
+        selector.record(name, 'scan', pages=10, seconds=seconds)
+    assert selector.select('scan') == 'pdftocairo'
+
+
+def test_other_backends_are_explored(selector, monkeypatch):
+    monkeypatch.setattr(RendererSelector, 'EXPLORE_RATE', 1)
+    for name, seconds in (('pdftoppm', 2), ('pdftocairo', 1), ('ghostscript', 4)):
+        selector.record(name, 'scan', pages=10, seconds=seconds)
+    assert selector.select('scan') in ('pdftoppm', 'ghostscript')
+
+
+def test_auto_is_resolved_once_per_conversion(selector, monkeypatch, tmp_path):
+    monkeypatch.setattr(RendererSelector, 'DEFAULT_HISTORY_FILE', selector.history_file)
+    monkeypatch.setattr(RendererSelector, 'EXPLORE_RATE', 1)
+    for name, seconds in (('pdftoppm', 2), ('pdftocairo', 1), ('ghostscript', 4)):
+        selector.record(name, RendererSelector.UNKNOWN, pages=10, seconds=seconds)
+
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    conversion = PDFConversion(DocumentInfo(file_spec=str(pdf), conversion_dir=str(tmp_path)))
+    kwargs = conversion.resolve_renderer({'renderer': RendererSelector.AUTO})
+    assert kwargs['renderer'] in RendererSelector.PREFERENCE
+    assert kwargs[PdfToTiff.DOC_CLASS_KW] == RendererSelector.UNKNOWN
+
+    # Every step (and the settings of the cache key / checkpoint) uses the resolved backend, even while exploring.
+    for _ in range(10):
+        assert conversion.conversion_settings(SupportedDocTypes.WEBP, **kwargs)['renderer'] == kwargs['renderer']
+        renderer = PdfToTiff(src_file_spec=str(pdf), **kwargs)
+        assert (renderer.renderer, renderer.doc_class) == (kwargs['renderer'], RendererSelector.UNKNOWN)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from pdf_conversion.converters import priority_scheduler
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.service import ConversionService
+
+
+class StubConversion:
+    """ PDFConversion stand-in (the submitted documents are never converted). """
+
+    INCREMENTAL_KW = 'incremental'
+
+    def __init__(self, document, **kwargs) -> None:
+        self.document = document
+
+    def resolve_renderer(self, kwargs: dict) -> dict:
+        return kwargs
+
+    def convert(self, doc_format, first_page=None, last_page=None, **kwargs):
+        return self
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(priority_scheduler, 'PDFConversion', StubConversion)
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "doc.pdf").write_bytes(b"%PDF-1.4\n")
+    (tmp_path / "private.pdf").write_bytes(b"%PDF-1.4\n")
+    service = ConversionService(output_dir=str(tmp_path / "output"), jobs=1,
+                                pool=EncodePool(workers=1, pool_type='thread'),
+                                input_dirs=[str(tmp_path / "input")]).start()
+    yield service
+    service.shutdown()
+
+
+def test_documents_in_input_dirs_are_accepted(service, tmp_path):
+    job = service.submit(str(tmp_path / "input" / "doc.pdf"), output_dir="pages")
+    assert job.document.file_dir == os.path.join(service.output_dir, "pages")
+
+
+@pytest.mark.parametrize('filespec', ["private.pdf", os.path.join("input", "..", "private.pdf")])
+def test_documents_outside_input_dirs_are_rejected(service, tmp_path, filespec):
+    with pytest.raises(PermissionError):
+        service.submit(str(tmp_path / filespec))
+
+
+def test_symlinks_out_of_input_dirs_are_rejected(service, tmp_path):
+    os.symlink(tmp_path / "private.pdf", tmp_path / "input" / "link.pdf")
+    with pytest.raises(PermissionError):
+        service.submit(str(tmp_path / "input" / "link.pdf"))
+
+
+@pytest.mark.parametrize('output_dir', ["/tmp", os.path.join("..", "escaped")])
+def test_output_dirs_outside_the_service_output_dir_are_rejected(service, tmp_path, output_dir):
+    with pytest.raises(PermissionError):
+        service.submit(str(tmp_path / "input" / "doc.pdf"), output_dir=output_dir)
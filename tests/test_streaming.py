@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from pdf_conversion.converters import streaming
+from pdf_conversion.converters.encode_pool import EncodePool
+from pdf_conversion.converters.memory_budget import MemoryBudget
+from pdf_conversion.converters.renderers import RendererError
+from pdf_conversion.converters.streaming import StreamingPdfToWebp
+from pdf_conversion.documents.document_probe import DocumentProbe
+
+NUM_PAGES = 4
+
+
+class StubRenderer:
+    """ PdfToRaster stand-in: renders nothing (as PdfToRaster does when pdftoppm fails - it prints the error). """
+
+    dpi = 100
+    renderer = 'stub'
+
+    def __init__(self, **kwargs) -> None:
+        self.images = []
+        self.conversion_duration = 0
+
+    def convert(self) -> "StubRenderer":
+        return self
+
+    def output_bytes(self) -> int:
+        return 0
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    file_spec = tmp_path / "doc.pdf"
+    file_spec.write_bytes(b"%PDF-1.4\n")
+    return str(file_spec)
+
+
+def _pipeline(pdf: str, output_folder: str, budget: MemoryBudget) -> StreamingPdfToWebp:
+    stat = os.stat(pdf)
+    probe = DocumentProbe(filespec=pdf, file_size=stat.st_size, mtime_ns=stat.st_mtime_ns, page_count=NUM_PAGES,
+                          page_sizes=[(612.0, 792.0)] * NUM_PAGES, rotations=[0] * NUM_PAGES)
+    return StreamingPdfToWebp(pdf, output_folder=output_folder, pool=EncodePool(workers=2, pool_type='thread'),
+                              chunk_pages=2, memory_budget=budget, probe=probe)
+
+
+def test_failed_render_releases_the_budget(monkeypatch, pdf, tmp_path):
+    monkeypatch.setattr(streaming, 'PdfToRaster', StubRenderer)
+    # Budget fits one chunk at a time: the reservation of the chunk that failed to render is released.
+    budget = MemoryBudget(max_bytes=2 * 3 * 850 * 1100 * 2 + 1)
+
+    with pytest.raises(RendererError, match="Unable to render pages 1-2"):
+        list(_pipeline(pdf, str(tmp_path), budget).pages())
+    assert budget.in_use == 0
+    assert budget.peak_in_use > 0
+
+
+def test_failed_encode_releases_the_budget(monkeypatch, pdf, tmp_path):
+    from PIL import Image
+
+    class OnePageRenderer(StubRenderer):
+        def __init__(self, **kwargs) -> None:
+            super().__init__(**kwargs)
+            self.images = [Image.new('RGB', (8, 8), 'white')]
+
+    def failing_encode(job):
+        raise RuntimeError("encode failed")
+
+    monkeypatch.setattr(streaming, 'PdfToRaster', OnePageRenderer)
+    monkeypatch.setattr(streaming, 'encode_page', failing_encode)
+    budget = MemoryBudget(max_bytes='1G')
+
+    with pytest.raises(RuntimeError, match="encode failed"):
+        list(_pipeline(pdf, str(tmp_path), budget).pages())
+    assert budget.in_use == 0
+
+
+def test_started_pool_encodes_the_stream(monkeypatch, pdf, tmp_path):
+    from PIL import Image
+
+    class PagesRenderer(StubRenderer):
+        def __init__(self, first_page: int = 1, last_page: int = 0, **kwargs) -> None:
+            super().__init__(**kwargs)
+            self.images = [Image.new('RGB', (8, 8), 'white') for _ in range(first_page, last_page + 1)]
+
+    def no_executor(*args, **kwargs):
+        raise AssertionError("the stream started its own workers")
+
+    monkeypatch.setattr(streaming, 'PdfToRaster', PagesRenderer)
+    monkeypatch.setattr(streaming, 'ProcessPoolExecutor', no_executor)
+    pool = EncodePool(workers=2, pool_type='process').start()
+    try:
+        pipeline = _pipeline(pdf, str(tmp_path), MemoryBudget(max_bytes='1G'))
+        pipeline.pool = pool
+        assert sorted(page.page_num for page in pipeline.pages()) == list(range(1, NUM_PAGES + 1))
+        assert pool.started
+    finally:
+        pool.shutdown()
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+import pytest
+
+from pdf_conversion.converters.pdf2tiff import PdfToTiff
+from pdf_conversion.converters.work_queue import IWorkQueue, SpoolWorkQueue, SqliteWorkQueue, open_work_queue
+from pdf_conversion.documents.document_info import DocumentInfo
+from pdf_conversion.documents.file_extensions import SupportedDocTypes
+
+LEASE_SECONDS = 0.05
+
+
+@pytest.fixture(params=[SqliteWorkQueue.NAME, SpoolWorkQueue.NAME])
+def work_queue(request, tmp_path) -> IWorkQueue:
+    location = str(tmp_path / 'queue.db') if request.param == SqliteWorkQueue.NAME else str(tmp_path / 'spool')
+    return open_work_queue(location, defaults={'max_attempts': 2, 'lease_seconds': 30})
+
+
+@pytest.fixture
+def document(tmp_path):
+    pdf = tmp_path / 'doc.pdf'
+    pdf.write_bytes(b"%PDF-1.4\n")
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    return str(pdf), str(output_dir)
+
+
+def _submit(work_queue: IWorkQueue, document, last_page: int = 4, chunk_pages: int = 2) -> str:
+    filespec, output_dir = document
+    return work_queue.submit(filespec, SupportedDocTypes.WEBP, output_dir, options={'last_page': last_page},
+                             chunk_pages=chunk_pages)
+
+
+def test_expired_lease_counts_as_an_attempt(work_queue, document):
+    job_id = _submit(work_queue, document, last_page=1)
+
+    first = work_queue.lease('worker-1', lease_seconds=LEASE_SECONDS)
+    time.sleep(2 * LEASE_SECONDS)
+    second = work_queue.lease('worker-2', lease_seconds=LEASE_SECONDS)
+    assert second.id == first.id
+    assert (first.attempts, second.attempts) == (0, 1)
+    assert not work_queue.heartbeat(first.id, 'worker-1')
+
+    # The second expired lease reaches max_attempts: the task is failed, and the job is merged.
+    time.sleep(2 * LEASE_SECONDS)
+    assert work_queue.lease('worker-3', lease_seconds=LEASE_SECONDS) is None
+    [task] = work_queue._tasks(job_id)
+    assert task['state'] == IWorkQueue.FAILED
+    assert task['attempts'] == 2
+    assert "expired" in task['error']
+    assert work_queue.finished(job_id)
+    assert os.path.exists(os.path.join(document[1], f"doc.{IWorkQueue.MANIFEST_EXTENSION}"))
+
+
+def test_spool_reclaimed_task_has_no_stale_lease(tmp_path, document):
+    work_queue = SpoolWorkQueue(str(tmp_path / 'spool'), defaults={'lease_seconds': LEASE_SECONDS})
+    _submit(work_queue, document, last_page=1)
+
+    task = work_queue.lease('worker-1')
+    time.sleep(2 * LEASE_SECONDS)
+    work_queue._expired()
+    pending = SpoolWorkQueue._read(work_queue._file(IWorkQueue.PENDING, task.id))
+    assert (pending['worker'], pending['expires'], pending['attempts']) == (None, None, 1)
+
+    # Once renamed into leased/ by another worker (before its lease is written), the task is not reclaimed by a third
+    # worker's sweep: its lease starts at the rename.
+    os.utime(work_queue._file(IWorkQueue.PENDING, task.id))
+    os.rename(work_queue._file(IWorkQueue.PENDING, task.id), work_queue._file(IWorkQueue.LEASED, task.id))
+    work_queue._expired()
+    assert os.path.exists(work_queue._file(IWorkQueue.LEASED, task.id))
+
+
+def _result(page_nums, output_dir: str) -> dict:
+    document = DocumentInfo(file_spec=os.path.join(output_dir, '..', 'doc.pdf'), conversion_dir=output_dir)
+    for page_num in page_nums:
+        document.add_page_files(page_num, [os.path.join(output_dir, f"doc-{page_num:04d}.webp")], seconds=0.01)
+    return {'artifacts': document.artifacts.to_dict(), 'page_durations': [0.01] * len(page_nums),
+            'conversion_duration': 0.01 * len(page_nums), 'spans': [], 'color_modes': {'rgb': len(page_nums)},
+            'page_variants': []}
+
+
+def test_tasks_are_leased_once_in_page_order(work_queue, document):
+    job_id = _submit(work_queue, document)
+
+    first = work_queue.lease('worker-1')
+    second = work_queue.lease('worker-2')
+    assert (first.job_id, second.job_id) == (job_id, job_id)
+    assert sorted([(first.first_page, first.last_page), (second.first_page, second.last_page)]) == [(1, 2), (3, 4)]
+    assert first.options[PdfToTiff.MULTIPAGE_KW] is False
+    assert work_queue.lease('worker-3') is None
+    assert work_queue.status()['tasks'][IWorkQueue.LEASED] == 2
+
+
+def test_completed_tasks_are_merged_in_page_order(work_queue, document):
+    job_id = _submit(work_queue, document)
+    leases = {worker: work_queue.lease(worker) for worker in ('worker-1', 'worker-2')}
+
+    # Only the lease holder can store a result; the results are stored out of page order.
+    assert not work_queue.complete(leases['worker-1'].id, 'worker-2', _result([1, 2], document[1]))
+    for worker, task in reversed(list(leases.items())):
+        assert work_queue.heartbeat(task.id, worker)
+        assert work_queue.complete(task.id, worker, _result(range(task.first_page, task.last_page + 1), document[1]))
+    assert work_queue.finished(job_id)
+
+    merged = work_queue.merge(job_id)
+    assert merged.webp == [os.path.join(document[1], f"doc-{page_num:04d}.webp") for page_num in range(1, 5)]
+    assert merged.color_modes == {'rgb': 4}
+    with open(os.path.join(document[1], f"doc.{IWorkQueue.MANIFEST_EXTENSION}")) as MANIFEST:
+        manifest = json.load(MANIFEST)
+    assert (manifest['job'], manifest['errors']) == (job_id, {})
+
+
+def test_failed_task_is_retried_until_max_attempts(work_queue, document):
+    job_id = _submit(work_queue, document, last_page=2)
+
+    task = work_queue.lease('worker-1')
+    assert work_queue.fail(task.id, 'worker-1', "render failed")
+    assert not work_queue.finished(job_id)
+
+    retry = work_queue.lease('worker-2')
+    assert (retry.id, retry.attempts) == (task.id, 1)
+    assert not work_queue.fail(retry.id, 'worker-1', "stale worker")
+    assert work_queue.fail(retry.id, 'worker-2', "render failed again")
+
+    assert work_queue.lease('worker-3') is None
+    assert work_queue.finished(job_id)
+    assert work_queue.merge(job_id).files == []
+    with open(os.path.join(document[1], f"doc.{IWorkQueue.MANIFEST_EXTENSION}")) as MANIFEST:
+        assert json.load(MANIFEST)['errors'] == {'1-2': "render failed again"}